@@ -1,13 +1,15 @@
 import csv
 import io
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from flask import Blueprint, Response, jsonify, request
 from flask_jwt_extended import jwt_required
-from sqlalchemy import func, or_
+from sqlalchemy import or_
 
 from extensions import db
 from audit import record_admin_action
+from geocode_cache import get_cache_stats
+from platform_stats import get_platform_stats
 from auth import (
     get_authenticated_user,
     normalize_email,
@@ -18,9 +20,7 @@ from auth import (
 from models import (
     User,
     EnterpriseCertification,
-    InventoryItem,
     Order,
-    SupplyInfo,
     Tenant,
     to_iso,
     AdminAuditLog,
@@ -462,50 +462,25 @@ def system_status():
     if not _require_admin(admin):
         return jsonify({'msg': '仅系统管理员可访问'}), 403
 
-    now = datetime.utcnow()
-    today = now.date()
-    near_expiry_threshold = today + timedelta(days=30)
-
-    user_stats = {
-        'total': db.session.query(func.count(User.id)).scalar() or 0,
-        'active': db.session.query(func.count(User.id)).filter(User.is_active.is_(True)).scalar() or 0,
-        'disabled': db.session.query(func.count(User.id)).filter(User.is_active.is_(False)).scalar() or 0,
-        'new_last_7_days': db.session.query(func.count(User.id)).filter(User.created_at >= now - timedelta(days=7)).scalar() or 0,
-    }
-
-    cert_stats = {
-        'pending': db.session.query(func.count(EnterpriseCertification.id)).filter(EnterpriseCertification.status == 'pending').scalar() or 0,
-        'approved': db.session.query(func.count(EnterpriseCertification.id)).filter(EnterpriseCertification.status == 'approved').scalar() or 0,
-        'rejected': db.session.query(func.count(EnterpriseCertification.id)).filter(EnterpriseCertification.status == 'rejected').scalar() or 0,
-    }
-
-    order_counts = dict(
-        db.session.query(Order.status, func.count(Order.id)).group_by(Order.status).all()
-    )
-    order_stats = {
-        'total': sum(order_counts.values()),
-        'by_status': order_counts,
-    }
-
-    inventory_stats = {
-        'total_items': db.session.query(func.count(InventoryItem.id)).scalar() or 0,
-        'low_stock': db.session.query(func.count(InventoryItem.id)).filter(InventoryItem.quantity < 10).scalar() or 0,
-        'near_expiry': db.session.query(func.count(InventoryItem.id)).filter(InventoryItem.expiry_date <= near_expiry_threshold).scalar() or 0,
-        'expired': db.session.query(func.count(InventoryItem.id)).filter(InventoryItem.expiry_date < today).scalar() or 0,
-    }
-
-    supply_stats = {
-        'active_supplies': db.session.query(func.count(SupplyInfo.id)).filter(SupplyInfo.status == 'ACTIVE').scalar() or 0,
-        'inactive_supplies': db.session.query(func.count(SupplyInfo.id)).filter(SupplyInfo.status != 'ACTIVE').scalar() or 0,
-    }
-
+    # 计数来自平台统计快照（后台定时刷新），as_of 为快照的统计时间
+    stats = get_platform_stats()
     payload = {
-        'generated_at': now.isoformat(),
-        'users': user_stats,
-        'certifications': cert_stats,
-        'orders': order_stats,
-        'inventory': inventory_stats,
-        'supply': supply_stats,
+        'generated_at': datetime.utcnow().isoformat(),
+        'as_of': stats['as_of'],
+        'users': {
+            key: stats['users'][key] for key in ('total', 'active', 'disabled', 'new_last_7_days')
+        },
+        'certifications': stats['certifications'],
+        'orders': {
+            'total': stats['orders']['total'],
+            'by_status': stats['orders']['by_status'],
+        },
+        'inventory': stats['inventory'],
+        'supply': {
+            'active_supplies': stats['supply']['active'],
+            'inactive_supplies': stats['supply']['inactive'],
+        },
+        'geocode_cache': get_cache_stats(),
     }
 
     record_admin_action(
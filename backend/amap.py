@@ -8,6 +8,9 @@ import hashlib
 from typing import Dict, List, Tuple, Optional
 from flask import current_app
 
+import route_optimizer
+from geo_distance import haversine_matrix, haversine_one_to_many
+
 
 class AmapService:
     """高德地图服务类"""
@@ -30,7 +33,7 @@ class AmapService:
     @staticmethod
     def geocode_address(address: str, city: Optional[str] = None) -> Optional[Dict]:
         """
-        地理编码：将地址转换为经纬度坐标
+        地理编码：将地址转换为经纬度坐标（优先读取持久化缓存）
         
         Args:
             address: 地址字符串
@@ -48,6 +51,23 @@ class AmapService:
             }
             如果查询失败返回 None
         """
+        from geocode_cache import geocode_with_cache
+        return geocode_with_cache(address, city, AmapService.request_geocode)
+    
+    @staticmethod
+    def request_geocode(address: str, city: Optional[str] = None) -> Tuple[Optional[Dict], bool]:
+        """
+        直接调用高德地理编码 API（不经过缓存）
+        
+        Args:
+            address: 地址字符串
+            city: 城市名称（可选）
+            
+        Returns:
+            (result, definitive)：result 格式同 geocode_address；
+            definitive 表示 API 是否给出了明确答复（地址无法解析也算明确答复，
+            网络异常或配额错误则不算），用于决定是否缓存失败结果
+        """
         try:
             params = {
                 'key': AmapService.get_api_key(),
@@ -61,28 +81,37 @@ class AmapService:
             response = requests.get(AmapService.GEOCODE_URL, params=params, timeout=10)
             response.raise_for_status()
             
-            data = response.json()
-            
-            if data.get('status') == '1' and data.get('count') != '0':
-                geocode = data['geocodes'][0]
-                location = geocode['location'].split(',')
-                
-                return {
-                    'longitude': float(location[0]),
-                    'latitude': float(location[1]),
-                    'formatted_address': geocode.get('formatted_address', ''),
-                    'province': geocode.get('province', ''),
-                    'city': geocode.get('city', ''),
-                    'district': geocode.get('district', ''),
-                    'adcode': geocode.get('adcode', '')
-                }
-            else:
-                print(f"地理编码失败: {data.get('info', 'Unknown error')}")
-                return None
+            return AmapService.parse_geocode_response(response.json())
                 
         except Exception as e:
             print(f"地理编码异常: {str(e)}")
-            return None
+            return None, False
+    
+    @staticmethod
+    def parse_geocode_response(data: Dict) -> Tuple[Optional[Dict], bool]:
+        """
+        解析高德地理编码 API 的响应
+        
+        Returns:
+            (result, definitive)，含义同 request_geocode
+        """
+        if data.get('status') == '1' and data.get('count') != '0' and data.get('geocodes'):
+            geocode = data['geocodes'][0]
+            location = geocode['location'].split(',')
+            
+            return {
+                'longitude': float(location[0]),
+                'latitude': float(location[1]),
+                'formatted_address': geocode.get('formatted_address', ''),
+                'province': geocode.get('province', ''),
+                'city': geocode.get('city', ''),
+                'district': geocode.get('district', ''),
+                'adcode': geocode.get('adcode', '')
+            }, True
+        
+        print(f"地理编码失败: {data.get('info', 'Unknown error')}")
+        # status 为 1 但没有结果，说明地址确实无法解析
+        return None, data.get('status') == '1'
     
     @staticmethod
     def calculate_distance_haversine(lon1: float, lat1: float, 
@@ -316,28 +345,27 @@ def find_nearby_suppliers(pharmacy_location: Tuple[float, float],
     Returns:
         按距离排序的供应商列表，每个供应商新增 'distance' 和 'distance_text' 字段
     """
-    results = []
-    
-    for supplier in suppliers:
-        # 检查供应商是否有坐标信息
-        if not supplier.get('longitude') or not supplier.get('latitude'):
-            continue
-        
-        supplier_location = (supplier['longitude'], supplier['latitude'])
-        
-        # 计算距离
-        if use_api:
-            distance = AmapService.calculate_distance_api(
-                pharmacy_location, 
-                supplier_location,
+    # 只保留有坐标信息的供应商
+    located = [s for s in suppliers if s.get('longitude') and s.get('latitude')]
+    
+    # 计算距离：直线距离一次批量计算，API 方式逐个调用
+    if use_api:
+        distances = [
+            AmapService.calculate_distance_api(
+                pharmacy_location,
+                (supplier['longitude'], supplier['latitude']),
                 distance_type=1  # 驾车距离
             )
-        else:
-            distance = AmapService.calculate_distance_haversine(
-                pharmacy_location[0], pharmacy_location[1],
-                supplier_location[0], supplier_location[1]
-            )
-        
+            for supplier in located
+        ]
+    else:
+        distances = haversine_one_to_many(
+            pharmacy_location[0], pharmacy_location[1],
+            [(supplier['longitude'], supplier['latitude']) for supplier in located]
+        )
+    
+    results = []
+    for supplier, distance in zip(located, distances):
         if distance is None:
             continue
         
@@ -417,34 +445,19 @@ def calculate_distance_matrix(origin: Tuple[float, float],
         
     Returns:
         距离矩阵 matrix[i][j] 表示点 i 到点 j 的距离（米）
-        其中索引 0 代表起点，索引 1~n 代表各目的地
+        其中索引 0 代表起点，索引 1~n 代表各目的地；驾车距离可能不对称
     """
     # 所有点：起点 + 目的地
     all_points = [origin] + destinations
-    n = len(all_points)
     
-    # 初始化距离矩阵
-    matrix = [[0.0] * n for _ in range(n)]
+    # 直线距离一次批量计算整个矩阵
+    if not use_api:
+        return haversine_matrix(all_points)
     
-    for i in range(n):
-        for j in range(i + 1, n):
-            if use_api:
-                distance = AmapService.calculate_distance_api(
-                    all_points[i], 
-                    all_points[j],
-                    distance_type=1  # 驾车距离
-                )
-            else:
-                distance = AmapService.calculate_distance_haversine(
-                    all_points[i][0], all_points[i][1],
-                    all_points[j][0], all_points[j][1]
-                )
-            
-            if distance is not None:
-                matrix[i][j] = distance
-                matrix[j][i] = distance
-    
-    return matrix
+    # 驾车距离：按终点批量请求高德、并发执行，并缓存点对距离
+    from distance_matrix import DistanceMatrixService
+    with DistanceMatrixService.from_app() as service:
+        return service.matrix(all_points)
 
 
 def optimize_delivery_route(origin: Tuple[float, float],
@@ -454,19 +467,44 @@ def optimize_delivery_route(origin: Tuple[float, float],
     """
     优化配送路径顺序（求解旅行商问题 TSP）
     
+    Args:
+        origin: 起点坐标 (longitude, latitude)
+        destinations: 目的地列表，每个目的地包含 'name', 'longitude', 'latitude' 等字段
+        use_api: 是否使用高德 API 计算驾车距离
+        algorithm: 优化算法，见 plan_delivery_route
+        
+    Returns:
+        优化后的目的地列表（按访问顺序排序），每个目的地增加 'order' 和 'distance_from_prev' 字段
+    """
+    route, _ = plan_delivery_route(origin, destinations, use_api, algorithm)
+    return route
+
+
+def plan_delivery_route(origin: Tuple[float, float],
+                        destinations: List[Dict],
+                        use_api: bool = False,
+                        algorithm: str = 'greedy',
+                        time_budget: float = route_optimizer.DEFAULT_TIME_BUDGET) -> Tuple[List[Dict], Dict]:
+    """
+    优化配送路径顺序，并返回求解信息
+    
     Args:
         origin: 起点坐标 (longitude, latitude)
         destinations: 目的地列表，每个目的地包含 'name', 'longitude', 'latitude' 等字段
         use_api: 是否使用高德 API 计算驾车距离
         algorithm: 优化算法
                   'greedy' - 贪心最近邻算法（快速，适合目的地较多）
-                  'dp' - 动态规划精确解（慢，仅适合目的地 <= 15 个）
+                  'dp' - 动态规划精确解（仅适合目的地 <= 15 个，超出时改用 local_search）
+                  'local_search' - 最近邻 + 2-opt / Or-opt 局部搜索（受 time_budget 限制）
+        time_budget: local_search 的时间预算（秒）
         
     Returns:
-        优化后的目的地列表（按访问顺序排序），每个目的地增加 'order' 和 'distance_from_prev' 字段
+        (优化后的目的地列表, 求解信息)
+        求解信息包含 length（总距离）、iterations（局部搜索改进次数）、
+        algorithm（实际使用的算法）、elapsed（求解耗时，秒）
     """
     if not destinations:
-        return []
+        return [], {'length': 0.0, 'iterations': 0, 'algorithm': algorithm, 'elapsed': 0.0}
     
     # 提取目的地坐标
     dest_coords = [(d['longitude'], d['latitude']) for d in destinations]
@@ -474,11 +512,9 @@ def optimize_delivery_route(origin: Tuple[float, float],
     # 计算距离矩阵
     distance_matrix = calculate_distance_matrix(origin, dest_coords, use_api)
     
-    # 根据算法选择优化方法
-    if algorithm == 'dp' and len(destinations) <= 15:
-        order = _tsp_dynamic_programming(distance_matrix)
-    else:
-        order = _tsp_greedy_nearest_neighbor(distance_matrix)
+    # 求解访问顺序
+    solution = route_optimizer.solve(distance_matrix, algorithm, time_budget)
+    order = solution.pop('order')
     
     # 构建结果（order 中的索引是基于 distance_matrix 的，0 代表起点）
     result = []
@@ -495,7 +531,7 @@ def optimize_delivery_route(origin: Tuple[float, float],
         result.append(dest)
         prev_point_idx = dest_idx
     
-    return result
+    return result, solution
 
 
 def _tsp_greedy_nearest_neighbor(distance_matrix: List[List[float]]) -> List[int]:
@@ -508,35 +544,12 @@ def _tsp_greedy_nearest_neighbor(distance_matrix: List[List[float]]) -> List[int
     Returns:
         访问顺序列表（不包括起点 0），如 [2, 1, 3] 表示访问顺序是点 2 -> 点 1 -> 点 3
     """
-    n = len(distance_matrix)
-    if n <= 1:
-        return []
-    
-    visited = [False] * n
-    visited[0] = True  # 起点已访问
-    current = 0
-    route = []
-    
-    for _ in range(n - 1):
-        nearest = -1
-        min_distance = float('inf')
-        
-        for i in range(1, n):  # 从 1 开始，跳过起点
-            if not visited[i] and distance_matrix[current][i] < min_distance:
-                min_distance = distance_matrix[current][i]
-                nearest = i
-        
-        if nearest != -1:
-            visited[nearest] = True
-            route.append(nearest)
-            current = nearest
-    
-    return route
+    return route_optimizer.nearest_neighbor(distance_matrix)
 
 
 def _tsp_dynamic_programming(distance_matrix: List[List[float]]) -> List[int]:
     """
-    动态规划精确求解 TSP（适合小规模问题，时间复杂度 O(n^2 * 2^n)）
+    动态规划精确求解 TSP（适合小规模问题，时间复杂度 O(2^n * n^2)）
     
     Args:
         distance_matrix: 距离矩阵，matrix[0] 是起点
@@ -544,61 +557,7 @@ def _tsp_dynamic_programming(distance_matrix: List[List[float]]) -> List[int]:
     Returns:
         最优访问顺序列表
     """
-    n = len(distance_matrix)
-    if n <= 1:
-        return []
-    if n == 2:
-        return [1]
-    
-    # dp[mask][i] 表示访问了 mask 集合中的点，当前在点 i 的最短距离
-    # mask 是位掩码，第 k 位为 1 表示点 k 已访问
-    INF = float('inf')
-    dp = [[INF] * n for _ in range(1 << n)]
-    parent = [[-1] * n for _ in range(1 << n)]
-    
-    # 初始状态：从起点 0 出发
-    dp[1][0] = 0
-    
-    # 状态转移
-    for mask in range(1 << n):
-        for u in range(n):
-            if dp[mask][u] == INF:
-                continue
-            for v in range(1, n):  # 只访问目的地（跳过起点 0）
-                if mask & (1 << v):  # v 已访问
-                    continue
-                new_mask = mask | (1 << v)
-                new_dist = dp[mask][u] + distance_matrix[u][v]
-                if new_dist < dp[new_mask][v]:
-                    dp[new_mask][v] = new_dist
-                    parent[new_mask][v] = u
-    
-    # 找到最优终点（访问完所有目的地后的最后一个点）
-    full_mask = (1 << n) - 1
-    min_dist = INF
-    last_node = -1
-    for i in range(1, n):
-        if dp[full_mask][i] < min_dist:
-            min_dist = dp[full_mask][i]
-            last_node = i
-    
-    # 回溯路径
-    if last_node == -1:
-        # 无法访问所有点，使用贪心算法
-        return _tsp_greedy_nearest_neighbor(distance_matrix)
-    
-    route = []
-    mask = full_mask
-    current = last_node
-    
-    while current != 0:
-        route.append(current)
-        prev = parent[mask][current]
-        mask ^= (1 << current)
-        current = prev
-    
-    route.reverse()
-    return route
+    return route_optimizer.held_karp(distance_matrix)
 
 
 def search_address_suggestions(keyword: str, city: str = '上海') -> List[Dict]:
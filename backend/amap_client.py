@@ -0,0 +1,122 @@
+"""
+高德 REST 接口的批量调用基础
+功能：批量地理编码（batch_geocoder）与驾车距离矩阵（distance_matrix）共用的
+带连接池的 requests.Session、令牌桶限流，以及对网络异常、5xx、高德限流错误的指数退避重试
+"""
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 高德返回这些 infocode 表示访问过于频繁，可以退避后重试
+RETRYABLE_INFOCODES = {'10004', '10014', '10015', '10019', '10020', '10021'}
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+
+
+class TokenBucket:
+    """令牌桶限流器（线程安全）"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class AmapRestClient:
+    """
+    并发调用高德 REST 接口的客户端基类
+
+    连接池大小与并发数一致；stats 记录请求、重试与最终失败次数，子类可以追加自己的计数项
+    """
+
+    def __init__(self, api_key: str, url: str, qps: float, concurrency: int,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF,
+                 timeout: float = 10):
+        self.api_key = api_key
+        self.url = url
+        self.concurrency = max(1, int(concurrency))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(qps)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'errors': 0}
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def request_json(self, params: Dict, failure_message: str) -> Optional[Dict]:
+        """
+        发起一次 GET 请求（带限流与重试），返回高德的 JSON 响应
+
+        非限流类的业务错误（status 不为 1）原样返回，由调用方处理；
+        重试耗尽时记一次失败并返回 None
+
+        Args:
+            failure_message: 重试耗尽时输出的提示
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self._count('requests')
+            try:
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise _RetryableError(f'HTTP {response.status_code}')
+                response.raise_for_status()
+                data = response.json()
+                if data.get('status') != '1' and str(data.get('infocode')) in RETRYABLE_INFOCODES:
+                    raise _RetryableError(data.get('info', 'rate limited'))
+                return data
+            except (requests.RequestException, ValueError, _RetryableError) as e:
+                if attempt >= self.max_retries:
+                    self._count('errors')
+                    print(f"{failure_message}（已重试 {attempt} 次）: {e}")
+                    return None
+                self._count('retries')
+                # 指数退避并加入随机抖动，避免并发请求同时重试
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random() / 2))
+
+        return None
@@ -3,6 +3,7 @@ from flask import Flask
 from flask_cors import CORS
 from config import DevelopmentConfig, ProductionConfig, TestingConfig
 from extensions import db, migrate, jwt, mail
+from db_utils import configure_database, install_database_hooks
 from auth import bp as auth_bp
 from supply import bp as supply_bp
 from catalog import bp as catalog_bp
@@ -58,11 +59,14 @@ def create_app(config_name=None):
     # init CORS
     CORS(app, 
          origins=['http://localhost:5174', 'http://localhost:5173', 'http://127.0.0.1:5174', 'http://127.0.0.1:5173'],
-         allow_headers=['Content-Type', 'Authorization'],
+         allow_headers=['Content-Type', 'Authorization', 'X-Read-Consistency'],
          methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 
     # init extensions
+    # 按数据库类型设置连接池参数，SQLite 连接建立时开启 WAL 等 PRAGMA
+    configure_database(app)
     db.init_app(app)
+    install_database_hooks(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     mail.init_app(app)
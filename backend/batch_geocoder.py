@@ -0,0 +1,178 @@
+"""
+批量地理编码模块
+功能：为批量更新租户坐标提供并发地理编码，复用连接池、按高德 QPS 配额限流、
+失败自动重试，并用一条批量 UPDATE 写回租户坐标
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from amap import AmapService
+from amap_client import DEFAULT_BACKOFF, DEFAULT_MAX_RETRIES, AmapRestClient
+from extensions import db
+from models import Tenant
+import geocode_cache
+
+DEFAULT_QPS = 3
+DEFAULT_CONCURRENCY = 4
+
+
+class BatchGeocoder(AmapRestClient):
+    """
+    并发地理编码器
+
+    使用带连接池的 requests.Session，线程池控制并发数，令牌桶控制 QPS，
+    对网络异常、5xx 以及高德限流错误按指数退避重试（见 amap_client）。
+    """
+
+    def __init__(self, api_key: str,
+                 url: str = AmapService.GEOCODE_URL,
+                 qps: float = DEFAULT_QPS,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF,
+                 timeout: float = 10):
+        super().__init__(api_key, url, qps, concurrency, max_retries, backoff, timeout)
+
+    @classmethod
+    def from_app(cls, **overrides) -> 'BatchGeocoder':
+        """按应用配置创建批量地理编码器"""
+        config = current_app.config
+        options = {
+            'api_key': config.get('AMAP_REST_KEY'),
+            'url': config.get('AMAP_GEOCODE_URL') or AmapService.GEOCODE_URL,
+            'qps': config.get('AMAP_GEOCODE_QPS', DEFAULT_QPS),
+            'concurrency': config.get('AMAP_GEOCODE_CONCURRENCY', DEFAULT_CONCURRENCY),
+            'max_retries': config.get('AMAP_GEOCODE_MAX_RETRIES', DEFAULT_MAX_RETRIES),
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    def geocode(self, address: str, city: Optional[str] = None) -> Tuple[Optional[Dict], bool]:
+        """
+        地理编码单个地址（带限流与重试）
+
+        Returns:
+            (result, definitive)，含义同 AmapService.request_geocode
+        """
+        params = {'key': self.api_key, 'address': address, 'output': 'json'}
+        if city:
+            params['city'] = city
+
+        data = self.request_json(params, f'地理编码失败: {address}')
+        if data is None:
+            return None, False
+        return AmapService.parse_geocode_response(data)
+
+    def geocode_many(self, items: Dict[str, Tuple[str, Optional[str]]]) -> Dict[str, Tuple[Optional[Dict], bool]]:
+        """
+        并发地理编码
+
+        Args:
+            items: key -> (address, city)
+
+        Returns:
+            key -> (result, definitive)
+        """
+        if not items:
+            return {}
+        keys = list(items.keys())
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(keys))) as executor:
+            results = executor.map(lambda key: self.geocode(*items[key]), keys)
+            return dict(zip(keys, results))
+
+
+def batch_geocode_tenants(tenants: List, geocoder: Optional[BatchGeocoder] = None,
+                          city: Optional[str] = None) -> Dict:
+    """
+    批量为租户地理编码并写回坐标
+
+    先批量查询地理编码缓存，只对未命中的地址（去重后）并发发起远程调用，
+    结果写入缓存，成功的坐标用一条按主键的批量 UPDATE 写回 tenants 表。
+    不提交事务，由调用方负责提交。
+
+    Args:
+        tenants: 待处理的租户列表（应都有地址）
+        geocoder: 批量地理编码器，None 则按应用配置创建
+        city: 城市名称（可选）
+
+    Returns:
+        {
+            'results': {tenant_id: result 或 None},
+            'updated': 成功数, 'failed': 失败数,
+            'cache_hits': 缓存命中数, 'remote_calls': 远程调用数,
+            'retries': 重试次数, 'elapsed': 耗时（秒）
+        }
+    """
+    started = time.monotonic()
+    tenant_keys = {
+        tenant.id: geocode_cache.make_cache_key(tenant.address, city)
+        for tenant in tenants if tenant.address
+    }
+
+    entries = geocode_cache.lookup_entries(tenant_keys.values())
+    resolved: Dict[str, Optional[Dict]] = {}
+    cache_hits = 0
+    for key, entry in entries.items():
+        if geocode_cache.is_fresh(entry):
+            resolved[key] = geocode_cache.record_hit(entry)
+            cache_hits += 1
+
+    pending: Dict[str, Tuple[str, Optional[str]]] = {}
+    for tenant in tenants:
+        key = tenant_keys.get(tenant.id)
+        if key and key not in resolved and key not in pending:
+            pending[key] = (tenant.address, city)
+            geocode_cache.record_miss()
+
+    retries = 0
+    if pending:
+        owns_geocoder = geocoder is None
+        geocoder = geocoder or BatchGeocoder.from_app()
+        try:
+            retries_before = geocoder.stats['retries']
+            fetched = geocoder.geocode_many(pending)
+            retries = geocoder.stats['retries'] - retries_before
+        finally:
+            if owns_geocoder:
+                geocoder.close()
+
+        for key, (result, definitive) in fetched.items():
+            address, key_city = pending[key]
+            geocode_cache.store_result(address, key_city, result, definitive,
+                                       entry=entries.get(key))
+            resolved[key] = result
+
+    results = {}
+    mappings = []
+    for tenant in tenants:
+        result = resolved.get(tenant_keys.get(tenant.id))
+        results[tenant.id] = result
+        if result:
+            mappings.append({
+                'id': tenant.id,
+                'longitude': result['longitude'],
+                'latitude': result['latitude']
+            })
+
+    if mappings:
+        db.session.execute(update(Tenant), mappings)
+        # 同步会话中已加载对象的属性，避免再逐行 UPDATE 或重新查询
+        by_id = {tenant.id: tenant for tenant in tenants}
+        for mapping in mappings:
+            set_committed_value(by_id[mapping['id']], 'longitude', mapping['longitude'])
+            set_committed_value(by_id[mapping['id']], 'latitude', mapping['latitude'])
+
+    return {
+        'results': results,
+        'updated': len(mappings),
+        'failed': len(results) - len(mappings),
+        'cache_hits': cache_hits,
+        'remote_calls': len(pending),
+        'retries': retries,
+        'elapsed': round(time.monotonic() - started, 3)
+    }
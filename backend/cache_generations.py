@@ -0,0 +1,138 @@
+"""
+跨进程缓存版本号
+功能：订单统计、合规报告分段等进程内缓存在提交后的事件里失效，只对本进程有效，
+部署多个 gunicorn worker 时其他 worker 会继续返回旧结果直到 TTL 到期。
+这里为每组缓存在数据库中维护一个版本号：
+
+- 相关数据 flush 时只记下要递增的版本号（mark_generations_stale），事务提交前统一加一，
+  每个事务对每个版本号只 UPDATE 一次，避免每次 flush 都去争用同一行；事务回滚则版本号不变
+- 读缓存前查询版本号（current_generations，一条主键查询），与本进程记录的不一致时清空该组缓存
+"""
+import threading
+import time
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import CacheGeneration
+
+
+# session.info 中本事务待递增的版本号
+PENDING_GENERATIONS_KEY = 'pending_cache_generations'
+
+
+def mark_generations_stale(session, names: Iterable[str]):
+    """记下本事务提交时要递增的版本号（在 after_flush 事件中调用）"""
+    session.info.setdefault(PENDING_GENERATIONS_KEY, set()).update(names)
+
+
+def bump_generations(session, names: Iterable[str]):
+    """在 session 当前事务内把这些版本号各加一（已有的版本号用一条 UPDATE）"""
+    table = CacheGeneration.__table__
+    connection = session.connection()
+    names = sorted(set(names))
+    if not names:
+        return
+
+    def increment(keys):
+        return update(table).where(table.c.name.in_(keys)).values(generation=table.c.generation + 1)
+
+    if connection.execute(increment(names)).rowcount == len(names):
+        return
+    # 有版本号还没有记录（只在第一次递增时发生）：逐个插入，已存在的再递增一次
+    # （可能多加一次，只会让缓存多清空一次）
+    for name in names:
+        try:
+            # 并发创建同一版本号时主键冲突，回到递增
+            with connection.begin_nested():
+                connection.execute(insert(table).values(name=name, generation=1))
+        except IntegrityError:
+            connection.execute(increment([name]))
+
+
+@event.listens_for(db.session, 'before_commit')
+def _bump_pending_generations(session):
+    if session.in_nested_transaction():
+        return
+    # 提交时的最后一次 flush 发生在 before_commit 之后，先 flush 把其中的变更也记下来
+    session.flush()
+    names = session.info.pop(PENDING_GENERATIONS_KEY, None)
+    if names:
+        bump_generations(session, names)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending_generations(session, previous_transaction):
+    # 只在整个事务回滚时丢弃；回滚到保存点时外层事务之前的变更仍要提交
+    if previous_transaction.parent is None:
+        session.info.pop(PENDING_GENERATIONS_KEY, None)
+
+
+def current_generations(names: Iterable[str]) -> Dict[str, int]:
+    """读取版本号，没有记录的视为 0"""
+    names = list(names)
+    rows = db.session.execute(
+        select(CacheGeneration.name, CacheGeneration.generation).where(CacheGeneration.name.in_(names))
+    ).all()
+    generations = dict.fromkeys(names, 0)
+    generations.update(rows)
+    return generations
+
+
+class GenerationCache:
+    """
+    带版本号的进程内缓存（线程安全，按 TTL 过期）
+
+    每个键属于一个版本号名称（group，默认为键的第一项）；sync 发现版本号变化时清空该组的缓存条目。
+    缓存的值不能为 None
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: Dict[Hashable, Tuple[Any, float]] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def group(self, key: Hashable) -> str:
+        return key[0]
+
+    def sync(self, generations: Dict[str, int]):
+        """对照数据库中的版本号，清空被其他进程（或本进程）提交变更过的组"""
+        with self._lock:
+            changed = {name for name, generation in generations.items()
+                       if self._generations.get(name) != generation}
+            if not changed:
+                return
+            for key in [k for k in self._data if self.group(k) in changed]:
+                del self._data[key]
+            self._generations.update(generations)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """未命中或已过期时返回 None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generations.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses}
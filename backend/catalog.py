@@ -1,11 +1,12 @@
-from datetime import date
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from sqlalchemy import or_, func
 from sqlalchemy.orm import joinedload
 
-from models import Drug, InventoryItem, Tenant, SupplyInfo
+from models import Drug, InventoryItem, Tenant
 from extensions import db
 from auth import get_authenticated_user
+from drug_search import NAME_FIELDS, filter_drugs_by_keyword, search_drug_ids
+from price_index import get_price_index
 from flask import abort
 
 bp = Blueprint('catalog', __name__, url_prefix='/api/catalog')
@@ -46,14 +47,7 @@ def list_drugs():
 
     query = Drug.query
     if keyword:
-        like = f"%{keyword}%"
-        query = query.filter(
-            or_(
-                Drug.generic_name.ilike(like),
-                Drug.brand_name.ilike(like),
-                Drug.approval_number.ilike(like),
-            )
-        )
+        query = filter_drugs_by_keyword(query, keyword, ('generic_name', 'brand_name', 'approval_number'))
     if category:
         query = query.filter(Drug.category == category)
     if prescription:
@@ -67,7 +61,7 @@ def list_drugs():
 def search_drugs():
     """
     药品搜索接口
-    支持按药品通用名、商品名、厂家进行模糊搜索
+    支持按药品通用名、商品名、厂家进行模糊搜索，结果按相关度排序
     
     查询参数:
     - q: 搜索关键词（必填）
@@ -84,13 +78,8 @@ def search_drugs():
             'total': 0
         }), 400
     
-    like = f"%{keyword}%"
-    query = Drug.query.filter(
-        or_(
-            Drug.generic_name.ilike(like),
-            Drug.brand_name.ilike(like),
-            Drug.manufacturer.ilike(like),
-        )
+    query = filter_drugs_by_keyword(
+        Drug.query, keyword, ('generic_name', 'brand_name', 'manufacturer')
     ).order_by(Drug.generic_name.asc())
     
     result = paginate_query(query, lambda d: d.to_dict())
@@ -233,11 +222,18 @@ def compare_drug_prices():
     查询参数:
     - drug_name: 药品名称（必填）
     - sort: 排序方式（price_asc/price_desc），默认 price_asc
+    - min_price / max_price: 单价区间（可选）
+    - page / per_page: 分页，默认第 1 页，每页 PRICE_COMPARE_PAGE_SIZE 条（最多 PRICE_COMPARE_MAX_PAGE_SIZE 条）
     
-    返回指定药品在各药房/供应商的价格列表
+    返回指定药品在各药房/供应商的价格列表（从内存价格索引读取）
     """
     drug_name = (request.args.get('drug_name') or '').strip()
     sort = (request.args.get('sort') or 'price_asc').strip()
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    page = max(parse_int(request.args.get('page'), 1) or 1, 1)
+    per_page = parse_int(request.args.get('per_page'), current_app.config['PRICE_COMPARE_PAGE_SIZE'])
+    per_page = max(min(per_page or 1, current_app.config['PRICE_COMPARE_MAX_PAGE_SIZE']), 1)
     
     if not drug_name:
         return jsonify({
@@ -247,15 +243,9 @@ def compare_drug_prices():
         }), 400
     
     # 先查找匹配的药品
-    like = f"%{drug_name}%"
-    drugs = Drug.query.filter(
-        or_(
-            Drug.generic_name.ilike(like),
-            Drug.brand_name.ilike(like)
-        )
-    ).all()
+    drug_ids = search_drug_ids(drug_name, NAME_FIELDS)
     
-    if not drugs:
+    if not drug_ids:
         return jsonify({
             'success': True,
             'msg': '未找到匹配的药品',
@@ -263,49 +253,21 @@ def compare_drug_prices():
             'total': 0
         })
     
-    drug_ids = [d.id for d in drugs]
-    
-    # 查询这些药品的有效供应信息
-    query = db.session.query(SupplyInfo).options(
-        joinedload(SupplyInfo.drug),
-        joinedload(SupplyInfo.tenant)
-    ).filter(
-        SupplyInfo.drug_id.in_(drug_ids),
-        SupplyInfo.status == 'ACTIVE',
-        SupplyInfo.valid_until > date.today(),
-        SupplyInfo.available_quantity > 0
+    items, total = get_price_index().query(
+        drug_ids,
+        sort=sort,
+        min_price=min_price,
+        max_price=max_price,
+        offset=(page - 1) * per_page,
+        limit=per_page
     )
     
-    # 排序
-    if sort == 'price_desc':
-        query = query.order_by(SupplyInfo.unit_price.desc())
-    else:
-        query = query.order_by(SupplyInfo.unit_price.asc())
-    
-    supply_list = query.all()
-    
-    # 格式化结果
-    items = []
-    for s in supply_list:
-        items.append({
-            'supply_id': s.id,
-            'drug_id': s.drug_id,
-            'drug_name': s.drug.generic_name if s.drug else '',
-            'brand_name': s.drug.brand_name if s.drug else '',
-            'specification': s.drug.specification if s.drug else '',
-            'manufacturer': s.drug.manufacturer if s.drug else '',
-            'supplier_id': s.tenant_id,
-            'supplier_name': s.tenant.name if s.tenant else '',
-            'supplier_type': s.tenant.type if s.tenant else '',
-            'unit_price': float(s.unit_price) if s.unit_price else 0,
-            'available_quantity': s.available_quantity,
-            'min_order_quantity': s.min_order_quantity,
-            'valid_until': s.valid_until.isoformat() if s.valid_until else None
-        })
-    
     return jsonify({
         'success': True,
-        'msg': f'找到 {len(items)} 条价格信息',
+        'msg': f'找到 {total} 条价格信息',
         'items': items,
-        'total': len(items)
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page
     })
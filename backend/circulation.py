@@ -1,4 +1,3 @@
-from collections import defaultdict
 from datetime import datetime, timedelta
 
 from flask import Blueprint, jsonify, request, current_app
@@ -6,6 +5,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import func, or_
 
 from extensions import db
+from circulation_rollup import apply_record, extract_region, summarize
+from db_utils import read_replica
 from models import (
     InventoryItem, InventoryTransaction, Tenant, User, Order, OrderItem,
     CirculationRecord, Drug
@@ -100,20 +101,9 @@ TIME_RANGE_DAYS = {
 }
 
 
-def _extract_region(address: str) -> str:
-    """Try to normalize address string into a district/region label."""
-    if not address:
-        return '其他'
-    for marker in ('区', '县', '市'):
-        idx = address.find(marker)
-        if idx != -1:
-            return address[: idx + 1]
-    return address[:4] if len(address) >= 2 else '其他'
-
-
 def _available_regions():
     rows = db.session.query(Tenant.address).filter(Tenant.address.isnot(None)).all()
-    regions = {_extract_region(addr) for (addr,) in rows if addr}
+    regions = {extract_region(addr) for (addr,) in rows if addr}
     if '其他' in regions:
         regions.remove('其他')
     return sorted(regions)
@@ -121,6 +111,7 @@ def _available_regions():
 
 @bp.route('/dashboard', methods=['GET'])
 @jwt_required()
+@read_replica
 def circulation_dashboard():
     """
     监管分析看板数据
@@ -155,28 +146,6 @@ def circulation_dashboard():
         start_time = datetime.utcnow() - timedelta(days=days)
         end_time = datetime.utcnow()
 
-    inventory_query = db.session.query(func.coalesce(func.sum(InventoryItem.quantity), 0)).join(
-        Tenant, InventoryItem.tenant_id == Tenant.id
-    )
-    if region_filter:
-        inventory_query = inventory_query.filter(Tenant.address.contains(region_filter))
-    total_inventory = int(inventory_query.scalar() or 0)
-
-    # 查询流通记录
-    records_query = CirculationRecord.query.filter(
-        CirculationRecord.timestamp >= start_time,
-        CirculationRecord.timestamp <= end_time
-    )
-    
-    if region_filter and region_filter != 'all':
-        # 通过订单关联的租户地址筛选
-        records_query = records_query.join(Order).join(
-            Tenant, Order.buyer_tenant_id == Tenant.id
-        ).filter(Tenant.address.ilike(f'%{region_filter}%'))
-    
-    records = records_query.all()
-    
-    # 指标计算
     # 总库存量
     inventory_query = db.session.query(func.coalesce(func.sum(InventoryItem.quantity), 0))
     if region_filter and region_filter != 'all':
@@ -185,44 +154,16 @@ def circulation_dashboard():
         )
     total_inventory = int(inventory_query.scalar() or 0)
     
-    # 在途药品数量
-    in_transit_count = sum(1 for r in records if r.transport_status == 'IN_TRANSIT')
-    
-    # 异常上报数量（通过备注中的关键词判断）
-    abnormal_keywords = ['异常', '延迟', '告警', '超时']
-    abnormal_count = 0
-    for record in records:
-        if record.remarks:
-            if any(keyword in record.remarks for keyword in abnormal_keywords):
-                abnormal_count += 1
+    # 流通指标：整天部分读按日汇总，首尾不足一天的部分扫描原始记录
+    summary = summarize(start_time, end_time, region_filter)
     
     # 区域流向统计
-    region_flow = defaultdict(int)
-    for record in records:
-        if record.current_location:
-            region_name = _extract_region(record.current_location)
-            region_flow[region_name] += 1
-        elif record.order and record.order.buyer_tenant:
-            region_name = _extract_region(record.order.buyer_tenant.address or '')
-            region_flow[region_name] += 1
-    
     region_flow_list = [
         {'region': region, 'count': count}
-        for region, count in sorted(region_flow.items(), key=lambda x: x[1], reverse=True)
+        for region, count in sorted(summary['region_flow'].items(), key=lambda x: x[1], reverse=True)
     ]
     
     # 时间序列趋势（按状态统计）
-    trend_map = defaultdict(lambda: {'shipped': 0, 'in_transit': 0, 'delivered': 0})
-    for record in records:
-        day_key = record.timestamp.strftime('%Y-%m-%d') if record.timestamp else '未知'
-        status = record.transport_status
-        if status == 'SHIPPED':
-            trend_map[day_key]['shipped'] += 1
-        elif status == 'IN_TRANSIT':
-            trend_map[day_key]['in_transit'] += 1
-        elif status == 'DELIVERED':
-            trend_map[day_key]['delivered'] += 1
-    
     trend_list = [
         {
             'date': date,
@@ -230,18 +171,14 @@ def circulation_dashboard():
             'in_transit': values['in_transit'],
             'delivered': values['delivered']
         }
-        for date, values in sorted(trend_map.items())
+        for date, values in sorted(summary['trend'].items())
     ]
     
     # 地图数据
     map_data = [
         {'name': region, 'value': count}
-        for region, count in region_flow.items()
+        for region, count in summary['region_flow'].items()
     ]
-    
-    last_activity = datetime.utcnow()
-    if records:
-        last_activity = max(r.timestamp for r in records)
 
     return jsonify({
         'filters': {
@@ -252,8 +189,8 @@ def circulation_dashboard():
         },
         'metrics': {
             'total_inventory': total_inventory,
-            'in_transit': in_transit_count,
-            'abnormal_reports': abnormal_count,
+            'in_transit': summary['in_transit'],
+            'abnormal_reports': summary['abnormal'],
             'regions': len(region_flow_list)
         },
         'trend': trend_list,
@@ -388,6 +325,9 @@ def report_circulation():
         
         db.session.add(record)
         
+        # 累加到看板的按日汇总
+        apply_record(record, order.buyer_tenant.address if order.buyer_tenant else None)
+        
         # 同步更新订单状态
         sync_order_status(order, transport_status)
         
@@ -0,0 +1,267 @@
+"""
+流通记录按日汇总
+功能：监管看板原先每次请求都把时间窗口内的流通记录全部读入内存再统计。
+这里按 日期 × 药店区域 × 流向区域 × 运输状态 维护计数：
+流通上报时增量累加，历史数据或区域调整后用 rebuild_rollups 重建。
+看板对整天的部分读汇总行，只有首尾不足一天的部分才扫描原始记录
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, case, or_
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import CirculationDailyRollup, CirculationRecord, Order, Tenant
+
+# 备注中出现这些关键词视为异常上报
+ABNORMAL_KEYWORDS = ('异常', '延迟', '告警', '超时')
+
+# 重建时每批读取的记录数
+REBUILD_BATCH_SIZE = 5000
+
+RollupKey = Tuple[date, str, str, str]
+
+
+def extract_region(address: str) -> str:
+    """Try to normalize address string into a district/region label."""
+    if not address:
+        return '其他'
+    for marker in ('区', '县', '市'):
+        idx = address.find(marker)
+        if idx != -1:
+            return address[: idx + 1]
+    return address[:4] if len(address) >= 2 else '其他'
+
+
+def is_abnormal(remarks: Optional[str]) -> bool:
+    return bool(remarks) and any(keyword in remarks for keyword in ABNORMAL_KEYWORDS)
+
+
+def rollup_key(timestamp: datetime, transport_status: str, current_location: Optional[str],
+               buyer_address: Optional[str]) -> RollupKey:
+    """
+    计算一条流通记录所属的汇总组
+
+    没有关联药店时 buyer_region 为空串（区域筛选不会命中）；
+    既没有上报位置也没有药店地址时 flow_region 为空串（不计入区域流向）
+    """
+    buyer_region = extract_region(buyer_address) if buyer_address is not None else ''
+    if current_location:
+        flow_region = extract_region(current_location)
+    else:
+        flow_region = buyer_region
+    return timestamp.date(), buyer_region, flow_region, transport_status
+
+
+def _key_filter(key: RollupKey):
+    day, buyer_region, flow_region, transport_status = key
+    return and_(
+        CirculationDailyRollup.day == day,
+        CirculationDailyRollup.buyer_region == buyer_region,
+        CirculationDailyRollup.flow_region == flow_region,
+        CirculationDailyRollup.transport_status == transport_status
+    )
+
+
+def _increment(key: RollupKey, count: int, abnormal: int, last_timestamp: datetime) -> int:
+    rollup = CirculationDailyRollup
+    return db.session.query(rollup).filter(_key_filter(key)).update({
+        rollup.record_count: rollup.record_count + count,
+        rollup.abnormal_count: rollup.abnormal_count + abnormal,
+        rollup.last_timestamp: case(
+            (or_(rollup.last_timestamp.is_(None), rollup.last_timestamp < last_timestamp), last_timestamp),
+            else_=rollup.last_timestamp
+        ),
+        rollup.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+
+
+def apply_record(record: CirculationRecord, buyer_address: Optional[str]):
+    """
+    把一条新上报的流通记录累加到汇总表（与记录在同一事务中，由调用方提交）
+
+    Args:
+        record: 流通记录
+        buyer_address: 关联订单买方药店的地址，没有关联订单时传 None
+    """
+    key = rollup_key(record.timestamp, record.transport_status, record.current_location, buyer_address)
+    abnormal = 1 if is_abnormal(record.remarks) else 0
+    if _increment(key, 1, abnormal, record.timestamp):
+        return
+    try:
+        # 新的汇总组：并发上报同一组时唯一约束冲突，回到累加
+        with db.session.begin_nested():
+            day, buyer_region, flow_region, transport_status = key
+            db.session.add(CirculationDailyRollup(
+                day=day,
+                buyer_region=buyer_region,
+                flow_region=flow_region,
+                transport_status=transport_status,
+                record_count=1,
+                abnormal_count=abnormal,
+                last_timestamp=record.timestamp
+            ))
+    except IntegrityError:
+        _increment(key, 1, abnormal, record.timestamp)
+
+
+def _record_rows(start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                 end_inclusive: bool = True):
+    """按 id 分批读取流通记录及其药店地址（只取统计需要的列）"""
+    query = db.session.query(
+        CirculationRecord.id,
+        CirculationRecord.timestamp,
+        CirculationRecord.transport_status,
+        CirculationRecord.current_location,
+        CirculationRecord.remarks,
+        Tenant.address,
+        Order.id
+    ).outerjoin(Order, CirculationRecord.order_id == Order.id).outerjoin(
+        Tenant, Order.buyer_tenant_id == Tenant.id
+    )
+    if start_time is not None:
+        query = query.filter(CirculationRecord.timestamp >= start_time)
+    if end_time is not None:
+        query = query.filter(CirculationRecord.timestamp <= end_time if end_inclusive
+                             else CirculationRecord.timestamp < end_time)
+
+    last_id = 0
+    while True:
+        batch = query.filter(CirculationRecord.id > last_id).order_by(
+            CirculationRecord.id
+        ).limit(REBUILD_BATCH_SIZE).all()
+        for record_id, timestamp, status, location, remarks, address, order_id in batch:
+            # 有订单但药店无地址时按空地址处理，与关联到药店的记录保持一致
+            buyer_address = (address or '') if order_id is not None else None
+            yield timestamp, status, location, remarks, buyer_address
+        if len(batch) < REBUILD_BATCH_SIZE:
+            break
+        last_id = batch[-1][0]
+
+
+def _aggregate(rows: Iterable) -> Dict[RollupKey, list]:
+    groups = defaultdict(lambda: [0, 0, None])
+    for timestamp, status, location, remarks, buyer_address in rows:
+        group = groups[rollup_key(timestamp, status, location, buyer_address)]
+        group[0] += 1
+        group[1] += 1 if is_abnormal(remarks) else 0
+        if group[2] is None or timestamp > group[2]:
+            group[2] = timestamp
+    return groups
+
+
+def rebuild_rollups(start_day: Optional[date] = None, end_day: Optional[date] = None) -> int:
+    """
+    从原始流通记录重建汇总（由调用方提交）
+
+    Args:
+        start_day: 重建的第一天（含），None 表示不限
+        end_day: 重建的最后一天（含），None 表示不限
+
+    Returns:
+        int: 写入的汇总行数
+    """
+    delete_query = db.session.query(CirculationDailyRollup)
+    if start_day is not None:
+        delete_query = delete_query.filter(CirculationDailyRollup.day >= start_day)
+    if end_day is not None:
+        delete_query = delete_query.filter(CirculationDailyRollup.day <= end_day)
+    delete_query.delete(synchronize_session=False)
+
+    start_time = datetime.combine(start_day, time.min) if start_day is not None else None
+    end_time = datetime.combine(end_day + timedelta(days=1), time.min) if end_day is not None else None
+    groups = _aggregate(_record_rows(start_time, end_time, end_inclusive=False))
+
+    db.session.bulk_insert_mappings(CirculationDailyRollup, [
+        {
+            'day': day,
+            'buyer_region': buyer_region,
+            'flow_region': flow_region,
+            'transport_status': transport_status,
+            'record_count': count,
+            'abnormal_count': abnormal,
+            'last_timestamp': last_timestamp,
+            'updated_at': datetime.utcnow()
+        }
+        for (day, buyer_region, flow_region, transport_status), (count, abnormal, last_timestamp) in groups.items()
+    ])
+    return len(groups)
+
+
+def _matches_region(buyer_region: str, region_filter: Optional[str]) -> bool:
+    if not region_filter or region_filter == 'all':
+        return True
+    return region_filter.lower() in buyer_region.lower()
+
+
+def summarize(start_time: datetime, end_time: datetime, region_filter: Optional[str] = None) -> Dict:
+    """
+    统计时间窗口 [start_time, end_time] 内的流通数据
+
+    Args:
+        start_time: 窗口起点（UTC，不带时区）
+        end_time: 窗口终点（UTC，不带时区，包含）
+        region_filter: 药店区域筛选，'all' 或空表示不筛选
+
+    Returns:
+        dict: in_transit、abnormal、region_flow（区域 -> 记录数）、
+              trend（日期 -> 各状态记录数）、last_activity（最近上报时间，没有记录时为 None）
+    """
+    # 完整落在窗口内的日期读汇总，首尾不足一天的部分读原始记录
+    first_full = start_time.date() if start_time.time() == time.min else start_time.date() + timedelta(days=1)
+    last_full = end_time.date() - timedelta(days=1)
+
+    groups: Dict[RollupKey, list] = {}
+    if first_full <= last_full:
+        query = db.session.query(CirculationDailyRollup).filter(
+            CirculationDailyRollup.day >= first_full,
+            CirculationDailyRollup.day <= last_full
+        )
+        if region_filter and region_filter != 'all':
+            query = query.filter(CirculationDailyRollup.buyer_region.ilike(f'%{region_filter}%'))
+        for row in query.all():
+            key = (row.day, row.buyer_region, row.flow_region, row.transport_status)
+            groups[key] = [row.record_count, row.abnormal_count, row.last_timestamp]
+
+        edges = [(start_time, datetime.combine(first_full, time.min), False),
+                 (datetime.combine(last_full + timedelta(days=1), time.min), end_time, True)]
+    else:
+        edges = [(start_time, end_time, True)]
+
+    for edge_start, edge_end, inclusive in edges:
+        if edge_start > edge_end or (edge_start == edge_end and not inclusive):
+            continue
+        rows = (row for row in _record_rows(edge_start, edge_end, end_inclusive=inclusive)
+                if _matches_region(extract_region(row[4]) if row[4] is not None else '', region_filter))
+        for key, (count, abnormal, last_timestamp) in _aggregate(rows).items():
+            group = groups.setdefault(key, [0, 0, None])
+            group[0] += count
+            group[1] += abnormal
+            if group[2] is None or last_timestamp > group[2]:
+                group[2] = last_timestamp
+
+    region_flow = defaultdict(int)
+    trend = defaultdict(lambda: {'shipped': 0, 'in_transit': 0, 'delivered': 0})
+    in_transit = abnormal_total = 0
+    last_activity = None
+    for (day, _, flow_region, status), (count, abnormal, last_timestamp) in groups.items():
+        if flow_region:
+            region_flow[flow_region] += count
+        day_trend = trend[day.strftime('%Y-%m-%d')]
+        if status.lower() in day_trend:
+            day_trend[status.lower()] += count
+        if status == 'IN_TRANSIT':
+            in_transit += count
+        abnormal_total += abnormal
+        if last_timestamp and (last_activity is None or last_timestamp > last_activity):
+            last_activity = last_timestamp
+
+    return {
+        'in_transit': in_transit,
+        'abnormal': abnormal_total,
+        'region_flow': dict(region_flow),
+        'trend': dict(trend),
+        'last_activity': last_activity
+    }
@@ -0,0 +1,334 @@
+"""
+合规分析报告引擎
+功能：合规报告的库存、流通、企业三部分原先各自把库存批次和流通记录全部读入内存，
+企业部分还会重复计算一遍库存合规并逐个订单查询。
+这里每部分在一次请求内只算一次：按企业计数、SHIPPED -> IN_TRANSIT 时效都用分组聚合查询完成，
+各部分结果按 (时间范围, 区域) 缓存，预览和导出同一范围时共用；
+库存、流通记录、订单或企业数据提交变更后，本进程中依赖它们的部分随即失效；
+其他进程通过同一事务内递增的分段版本号（cache_generations）在下一次生成报告时清空对应部分
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import and_, case, event, func
+
+from cache_generations import GenerationCache, current_generations, mark_generations_stale
+from extensions import db
+from models import CirculationRecord, InventoryItem, Order, Tenant
+
+# 各部分缓存有效期（秒）
+DEFAULT_CACHE_TTL_SECONDS = 300
+
+# SHIPPED 之后超过该时长仍未 IN_TRANSIT 视作延迟
+DELAY_THRESHOLD = timedelta(hours=24)
+
+# 各部分依赖的数据表，相关对象提交变更后对应部分的缓存失效
+SECTION_DEPENDENCIES = {
+    "inventory": {"InventoryItem", "Tenant"},
+    "circulation": {"CirculationRecord", "Order", "Tenant"},
+    "enterprise": {"InventoryItem", "CirculationRecord", "Order", "Tenant"},
+}
+_WATCHED_MODELS = set().union(*SECTION_DEPENDENCIES.values())
+
+# 各部分跨进程失效使用的缓存版本号
+SECTION_GENERATIONS = {name: f"compliance:{name}" for name in SECTION_DEPENDENCIES}
+
+
+def _dependent_sections(model_names: Iterable[str]) -> set:
+    model_names = set(model_names)
+    return {name for name, deps in SECTION_DEPENDENCIES.items() if deps & model_names}
+
+
+class SectionCache(GenerationCache):
+    """报告分段结果缓存（线程安全，按 TTL 过期），键的第一项为分段名，每个分段一个版本号"""
+
+    def __init__(self, ttl: float = DEFAULT_CACHE_TTL_SECONDS):
+        super().__init__(ttl)
+
+    def group(self, key: tuple) -> str:
+        return SECTION_GENERATIONS[key[0]]
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate_models(self, model_names: Iterable[str]):
+        """使依赖这些表的分段失效"""
+        sections = _dependent_sections(model_names)
+        with self._lock:
+            for key in [k for k in self._data if k[0] in sections]:
+                del self._data[key]
+
+
+def get_section_cache() -> SectionCache:
+    """获取当前应用的合规报告分段缓存（首次访问时创建）"""
+    cache = current_app.extensions.get("compliance_section_cache")
+    if cache is None:
+        cache = SectionCache(
+            ttl=current_app.config.get("COMPLIANCE_CACHE_TTL_SECONDS", DEFAULT_CACHE_TTL_SECONDS)
+        )
+        current_app.extensions["compliance_section_cache"] = cache
+    return cache
+
+
+def _risk_by_ratio(ratio: float) -> str:
+    if ratio >= 0.3:
+        return "high"
+    if ratio >= 0.1:
+        return "medium"
+    return "low"
+
+
+def _compute_inventory(region: Optional[str], today) -> Dict[str, Any]:
+    """库存合规：按企业一次聚合低库存、缺货、近效期、过期批次数。"""
+    quantity = InventoryItem.quantity
+    expiry = InventoryItem.expiry_date
+    # 仅统计“有库存责任”的主体：药店 / 供应商；物流公司不参与库存合规
+    query = db.session.query(
+        InventoryItem.tenant_id,
+        Tenant.name,
+        func.count(InventoryItem.id),
+        func.sum(case((and_(quantity != 0, quantity < 10), 1), else_=0)),
+        func.sum(case((quantity == 0, 1), else_=0)),
+        func.sum(case((and_(expiry > today, expiry <= today + timedelta(days=30)), 1), else_=0)),
+        func.sum(case((expiry <= today, 1), else_=0)),
+    ).join(Tenant, InventoryItem.tenant_id == Tenant.id).filter(
+        Tenant.type.in_(["PHARMACY", "SUPPLIER"])
+    )
+    if region:
+        query = query.filter(Tenant.address.ilike(f"%{region}%"))
+    rows = query.group_by(InventoryItem.tenant_id, Tenant.name).order_by(InventoryItem.tenant_id).all()
+
+    tenant_stats: List[Dict[str, Any]] = []
+    total_batches = total_abnormal = 0
+    for tenant_id, tenant_name, batches, low_stock, out_of_stock, near_expiry, expired in rows:
+        low_stock, out_of_stock = int(low_stock or 0), int(out_of_stock or 0)
+        near_expiry, expired = int(near_expiry or 0), int(expired or 0)
+        abnormal = low_stock + out_of_stock + near_expiry + expired
+        ratio = round(abnormal / batches, 4) if batches else 0.0
+        tenant_stats.append({
+            "tenant_id": tenant_id,
+            "tenant_name": tenant_name or "",
+            "total_batches": batches,
+            "low_stock": low_stock,
+            "out_of_stock": out_of_stock,
+            "near_expiry": near_expiry,
+            "expired": expired,
+            "abnormal_batches": abnormal,
+            "abnormal_ratio": ratio,
+            "risk_level": _risk_by_ratio(ratio),
+        })
+        total_batches += batches
+        total_abnormal += abnormal
+
+    # 标记异常比例较高的企业
+    tenant_stats.sort(key=lambda x: x["abnormal_ratio"], reverse=True)
+    return {
+        "summary": {
+            "total_batches": total_batches,
+            "total_abnormal_batches": total_abnormal,
+            "abnormal_ratio": round(total_abnormal / total_batches, 4) if total_batches else 0.0,
+        },
+        "by_tenant": tenant_stats,
+    }
+
+
+def _records_query(columns, start: datetime, end: datetime, region: Optional[str]):
+    """时间窗口内、关联了订单的流通记录（可按买方药店地址筛选区域）"""
+    query = db.session.query(*columns).select_from(CirculationRecord).join(
+        Order, CirculationRecord.order_id == Order.id
+    ).filter(CirculationRecord.timestamp >= start, CirculationRecord.timestamp <= end)
+    if region:
+        query = query.join(Tenant, Order.buyer_tenant_id == Tenant.id).filter(
+            Tenant.address.ilike(f"%{region}%")
+        )
+    return query
+
+
+def _first_status_columns():
+    """每组中第一条 SHIPPED 与第一条 IN_TRANSIT 记录的时间"""
+    status, timestamp = CirculationRecord.transport_status, CirculationRecord.timestamp
+    return (
+        func.min(case((status == "SHIPPED", timestamp))),
+        func.min(case((status == "IN_TRANSIT", timestamp))),
+    )
+
+
+def _is_delayed(first_shipped: datetime, first_in_transit: Optional[datetime]) -> bool:
+    # 一直没有 IN_TRANSIT 也视作延迟
+    return first_in_transit is None or first_in_transit - first_shipped > DELAY_THRESHOLD
+
+
+def _compute_circulation(start: datetime, end: datetime, region: Optional[str]) -> Dict[str, Any]:
+    """
+    流通合规：
+    - 统计各运输状态记录数量
+    - 以运单号分组评估延迟上报：SHIPPED -> IN_TRANSIT > 24h 视作延迟
+    - 生成按天的时效性对比数据（达标率）
+    """
+    status_counts = dict(
+        _records_query(
+            (CirculationRecord.transport_status, func.count(CirculationRecord.id)), start, end, region
+        ).group_by(CirculationRecord.transport_status).all()
+    )
+
+    shipments = _records_query(
+        (CirculationRecord.tracking_number,) + _first_status_columns(), start, end, region
+    ).group_by(CirculationRecord.tracking_number).all()
+
+    delayed_count = total_shipments = 0
+    daily_total: Dict[str, int] = defaultdict(int)
+    daily_on_time: Dict[str, int] = defaultdict(int)
+    for _, first_shipped, first_in_transit in shipments:
+        if not first_shipped:
+            continue
+        total_shipments += 1
+        shipped_day = first_shipped.date().isoformat()
+        daily_total[shipped_day] += 1
+        if _is_delayed(first_shipped, first_in_transit):
+            delayed_count += 1
+        else:
+            daily_on_time[shipped_day] += 1
+
+    trend = [
+        {
+            "date": day,
+            "total_shipments": daily_total[day],
+            "on_time": daily_on_time.get(day, 0),
+            "on_time_ratio": round(daily_on_time.get(day, 0) / daily_total[day], 4),
+        }
+        for day in sorted(daily_total)
+    ]
+
+    return {
+        "summary": {
+            "total_records": sum(status_counts.values()),
+            "status_counts": status_counts,
+            "total_shipments": total_shipments,
+            "delayed_shipments": delayed_count,
+            "delayed_ratio": round(delayed_count / total_shipments, 4) if total_shipments else 0.0,
+        },
+        "timeliness_trend": trend,
+    }
+
+
+def _compute_enterprise(start: datetime, end: datetime, region: Optional[str],
+                        inventory: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    企业合规：
+    - 从租户维度统计库存异常 + 流通延迟次数（按订单分组，延迟时买卖双方各记一次）
+    - 计算简单的合规率，并标记违规次数较多的企业
+    """
+    per_tenant = {t["tenant_id"]: t for t in inventory["by_tenant"]}
+
+    delays = _records_query(
+        (CirculationRecord.order_id, Order.buyer_tenant_id, Order.supplier_tenant_id) + _first_status_columns(),
+        start, end, region
+    ).group_by(CirculationRecord.order_id, Order.buyer_tenant_id, Order.supplier_tenant_id).all()
+
+    tenant_delay_counts: Dict[int, int] = defaultdict(int)
+    for _, buyer_tenant_id, supplier_tenant_id, first_shipped, first_in_transit in delays:
+        if first_shipped and _is_delayed(first_shipped, first_in_transit):
+            if buyer_tenant_id:
+                tenant_delay_counts[buyer_tenant_id] += 1
+            if supplier_tenant_id:
+                tenant_delay_counts[supplier_tenant_id] += 1
+
+    tenants = db.session.query(Tenant.id, Tenant.name, Tenant.type)
+    if region:
+        tenants = tenants.filter(Tenant.address.contains(region))
+
+    enterprise_rows: List[Dict[str, Any]] = []
+    for tenant_id, tenant_name, tenant_type in tenants.order_by(Tenant.id).all():
+        inv_stats = per_tenant.get(tenant_id)
+        inventory_violations = inv_stats["abnormal_batches"] if inv_stats else 0
+        circulation_violations = tenant_delay_counts.get(tenant_id, 0)
+        total_violations = inventory_violations + circulation_violations
+        total_checks = (inv_stats["total_batches"] if inv_stats else 0) + max(circulation_violations, 1)
+
+        if total_violations >= 10:
+            risk_level = "high"
+        elif total_violations >= 3:
+            risk_level = "medium"
+        else:
+            risk_level = "low"
+
+        enterprise_rows.append({
+            "tenant_id": tenant_id,
+            "tenant_name": tenant_name,
+            "type": tenant_type,
+            "inventory_violations": inventory_violations,
+            "circulation_violations": circulation_violations,
+            "total_violations": total_violations,
+            "compliance_rate": round(1 - (total_violations / total_checks), 4),
+            "risk_level": risk_level,
+        })
+
+    enterprise_rows.sort(key=lambda x: (x["risk_level"] != "high", -x["total_violations"]))
+    return {"items": enterprise_rows}
+
+
+def build_report(start: datetime, end: datetime, region: Optional[str]) -> Dict[str, Any]:
+    """
+    汇总三大类合规分析结果，用于前端预览与导出。
+    返回的分段可能来自缓存，调用方不要修改
+    """
+    cache = get_section_cache()
+    cache.sync(current_generations(SECTION_GENERATIONS.values()))
+    # 库存合规与时间范围无关，只随区域和当天日期变化
+    today = datetime.utcnow().date()
+    inventory = cache.get_or_compute(
+        ("inventory", region, today), lambda: _compute_inventory(region, today)
+    )
+    circulation = cache.get_or_compute(
+        ("circulation", start, end, region), lambda: _compute_circulation(start, end, region)
+    )
+    enterprise = cache.get_or_compute(
+        ("enterprise", start, end, region, today),
+        lambda: _compute_enterprise(start, end, region, inventory)
+    )
+    return {
+        "range": {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "region": region,
+        },
+        "inventory": inventory,
+        "circulation": circulation,
+        "enterprise": enterprise,
+    }
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_changed_models(session, flush_context):
+    """flush 时记录变更涉及的表，等事务提交后再让缓存失效"""
+    changed = {
+        type(obj).__name__
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if type(obj).__name__ in _WATCHED_MODELS
+    }
+    if changed:
+        session.info.setdefault("compliance_changed_models", set()).update(changed)
+        mark_generations_stale(session, [SECTION_GENERATIONS[name] for name in _dependent_sections(changed)])
+
+
+@event.listens_for(db.session, "after_commit")
+def _invalidate_after_commit(session):
+    changed = session.info.pop("compliance_changed_models", None)
+    if not changed or not has_app_context():
+        return
+    cache = current_app.extensions.get("compliance_section_cache")
+    if cache is not None:
+        cache.invalidate_models(changed)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("compliance_changed_models", None)
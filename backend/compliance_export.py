@@ -0,0 +1,384 @@
+"""
+合规分析报告导出任务
+功能：导出文件的渲染放到有界进程池里执行，请求线程只负责生成报告数据和登记任务。
+任务状态以 JSON 文件保存在导出目录中，多个 gunicorn worker 都能查询进度和下载；
+Excel 使用 openpyxl 的 write-only 模式逐行写出，生成中的文件带 .part 后缀，
+完成后改名，过期的任务文件在提交新任务时清理
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Optional, Union
+
+from flask import current_app
+
+try:  # optional heavy deps; imported lazily below too
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+except Exception:  # pragma: no cover - if not installed, render_pdf will fail explicitly
+    A4 = None  # type: ignore
+    canvas = None  # type: ignore
+
+try:
+    from openpyxl import Workbook
+except Exception:  # pragma: no cover
+    Workbook = None  # type: ignore
+
+# 默认配置（未在 config 中设置时使用）
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8
+DEFAULT_TTL_SECONDS = 3600
+
+EXPORT_FORMATS = {
+    "pdf": ("pdf", "application/pdf"),
+    "excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# 进度至少变化这么多（百分比）才写一次状态文件
+PROGRESS_STEP = 5
+
+_JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+Target = Union[str, BinaryIO]
+ProgressCallback = Callable[[float], None]
+
+
+class ExportQueueFull(Exception):
+    """当前进程排队中的导出任务已达上限"""
+
+
+def _noop_progress(fraction: float):
+    pass
+
+
+def render_pdf(payload: Dict[str, Any], target: Target, progress: ProgressCallback = _noop_progress):
+    """把报告数据渲染为 PDF，写入文件路径或文件对象"""
+    if not canvas or not A4:
+        raise RuntimeError("PDF 导出依赖 reportlab，请先在后端安装该依赖")
+
+    # Use Latin font only; all labels below are English to avoid CJK garbling
+    font_name = "Helvetica"
+
+    c = canvas.Canvas(target, pagesize=A4)
+    width, height = A4
+
+    textobject = c.beginText(40, height - 50)
+    textobject.setFont(font_name, 16)
+    textobject.textLine("Drug Circulation Compliance Analysis Report")
+
+    textobject.setFont(font_name, 11)
+    r = payload["range"]
+    textobject.textLine(
+        f"Time range: {r['start'][:19]} to {r['end'][:19]}   Region: {r['region'] or 'All'}"
+    )
+    textobject.textLine("")
+
+    # Inventory compliance summary
+    inv = payload["inventory"]["summary"]
+    textobject.setFont(font_name, 13)
+    textobject.textLine("1. Inventory Compliance Analysis")
+    textobject.setFont(font_name, 11)
+    textobject.textLine(
+        f"- Total batches: {inv['total_batches']}  Abnormal batches: {inv['total_abnormal_batches']}  "
+        f"Abnormal ratio: {inv['abnormal_ratio'] * 100:.2f}%"
+    )
+    textobject.textLine("")
+    progress(0.3)
+
+    # Circulation compliance summary
+    circ = payload["circulation"]["summary"]
+    textobject.setFont(font_name, 13)
+    textobject.textLine("2. Circulation Compliance Analysis")
+    textobject.setFont(font_name, 11)
+    textobject.textLine(
+        f"- Total records: {circ['total_records']}  Shipments: {circ['total_shipments']}  "
+        f"Delayed shipments: {circ['delayed_shipments']}  Delay ratio: {circ['delayed_ratio'] * 100:.2f}%"
+    )
+    textobject.textLine("")
+    progress(0.6)
+
+    # Enterprise compliance summary
+    ent_items = payload["enterprise"]["items"]
+    high_risk = [e for e in ent_items if e["risk_level"] == "high"][:10]
+    textobject.setFont(font_name, 13)
+    textobject.textLine("3. Enterprise Compliance Analysis")
+    textobject.setFont(font_name, 11)
+    textobject.textLine(f"- Enterprises in scope: {len(ent_items)}")
+    if high_risk:
+        textobject.textLine("- High-risk enterprises (top 10 by violations):")
+        for e in high_risk:
+            line = (
+                f"  · {e['tenant_name']} (Type: {e['type']}, "
+                f"Total violations: {e['total_violations']}, "
+                f"Compliance rate: {e['compliance_rate'] * 100:.2f}%)"
+            )
+            textobject.textLine(line)
+    else:
+        textobject.textLine("- No high-risk enterprises in current range.")
+
+    c.drawText(textobject)
+    c.showPage()
+    c.save()
+    progress(1.0)
+
+
+def render_excel(payload: Dict[str, Any], target: Target, progress: ProgressCallback = _noop_progress):
+    """
+    把报告数据渲染为 Excel，写入文件路径或文件对象
+
+    使用 write-only 工作簿，行数据直接序列化，不在内存中保留单元格对象
+    """
+    if not Workbook:
+        raise RuntimeError("Excel 导出依赖 openpyxl，请先在后端安装该依赖")
+
+    sheets = [
+        (
+            "库存合规",
+            ["企业ID", "企业名称", "总批次", "低库存", "缺货", "近效期", "过期", "异常批次", "异常比例", "风险等级"],
+            payload["inventory"]["by_tenant"],
+            lambda t: [
+                t["tenant_id"], t["tenant_name"], t["total_batches"], t["low_stock"], t["out_of_stock"],
+                t["near_expiry"], t["expired"], t["abnormal_batches"], t["abnormal_ratio"], t["risk_level"],
+            ],
+        ),
+        (
+            "流通时效",
+            ["日期", "发运批次", "按时批次", "按时比例"],
+            payload["circulation"]["timeliness_trend"],
+            lambda row: [row["date"], row["total_shipments"], row["on_time"], row["on_time_ratio"]],
+        ),
+        (
+            "企业合规",
+            ["企业ID", "企业名称", "类型", "库存违规", "流通违规", "总违规", "合规率", "风险等级"],
+            payload["enterprise"]["items"],
+            lambda e: [
+                e["tenant_id"], e["tenant_name"], e["type"], e["inventory_violations"],
+                e["circulation_violations"], e["total_violations"], e["compliance_rate"], e["risk_level"],
+            ],
+        ),
+    ]
+
+    # 最后保存压缩文件也算一份工作量
+    total = sum(len(rows) for _, _, rows, _ in sheets) + 1
+    written = 0
+    wb = Workbook(write_only=True)
+    for title, header, rows, to_row in sheets:
+        ws = wb.create_sheet(title)
+        ws.append(header)
+        for item in rows:
+            ws.append(to_row(item))
+            written += 1
+            progress(written / total)
+    wb.save(target)
+    progress(1.0)
+
+
+RENDERERS = {"pdf": render_pdf, "excel": render_excel}
+
+
+def _state_path(export_dir: str, job_id: str) -> str:
+    return os.path.join(export_dir, f"{job_id}.json")
+
+
+def _output_path(export_dir: str, job_id: str, fmt: str) -> str:
+    return os.path.join(export_dir, f"{job_id}.{EXPORT_FORMATS[fmt][0]}")
+
+
+def _read_state(export_dir: str, job_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_state_path(export_dir, job_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(export_dir: str, state: Dict[str, Any]):
+    """先写临时文件再改名，轮询方不会读到写了一半的状态"""
+    path = _state_path(export_dir, state["job_id"])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _update_state(export_dir: str, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+    state = _read_state(export_dir, job_id)
+    if state is None:
+        return None
+    state.update(fields)
+    _write_state(export_dir, state)
+    return state
+
+
+def run_export_job(export_dir: str, job_id: str, fmt: str, payload: Dict[str, Any]) -> str:
+    """
+    渲染导出文件（在进程池的子进程中执行，不访问数据库）
+
+    Returns:
+        str: 生成的文件路径
+    """
+    _update_state(export_dir, job_id, status="running", progress=0)
+    reported = [0]
+
+    def progress(fraction: float):
+        percent = int(fraction * 100)
+        if percent - reported[0] >= PROGRESS_STEP and percent < 100:
+            reported[0] = percent
+            _update_state(export_dir, job_id, progress=percent)
+
+    output_path = _output_path(export_dir, job_id, fmt)
+    part_path = f"{output_path}.part"
+    try:
+        with open(part_path, "wb") as f:
+            RENDERERS[fmt](payload, f, progress)
+        os.replace(part_path, output_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return output_path
+
+
+class ExportJobQueue:
+    """
+    合规报告导出任务队列
+
+    每个进程持有一个有界进程池，workers 为 0 时在当前线程内直接渲染（测试与开发环境）
+    """
+
+    def __init__(self, export_dir: str, workers: int = DEFAULT_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING, ttl: int = DEFAULT_TTL_SECONDS):
+        self.export_dir = export_dir
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        os.makedirs(export_dir, exist_ok=True)
+
+    def is_full(self) -> bool:
+        """排队中的任务是否已达上限（submit 时仍会再检查一次）"""
+        with self._lock:
+            return len(self._pending) >= self.max_pending
+
+    def submit(self, user_id: int, fmt: str, payload: Dict[str, Any], filename: str) -> Dict[str, Any]:
+        """
+        登记导出任务并交给进程池
+
+        Raises:
+            ValueError: 不支持的导出格式
+            ExportQueueFull: 排队中的任务已达上限
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        self.cleanup_expired()
+
+        job_id = uuid.uuid4().hex
+        state = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "format": fmt,
+            "filename": filename,
+            "status": "queued",
+            "progress": 0,
+            "error": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+        }
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                raise ExportQueueFull()
+            _write_state(self.export_dir, state)
+            if self.workers <= 0:
+                self._finish(job_id, lambda: run_export_job(self.export_dir, job_id, fmt, payload))
+                return self.get(job_id)
+            try:
+                future = self._get_pool().submit(run_export_job, self.export_dir, job_id, fmt, payload)
+            except (BrokenProcessPool, RuntimeError):
+                # 子进程异常退出后进程池不可再用，换一个新的
+                self._pool = None
+                future = self._get_pool().submit(run_export_job, self.export_dir, job_id, fmt, payload)
+            self._pending[job_id] = future
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return state
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _on_done(self, job_id: str, future: Future):
+        with self._lock:
+            self._pending.pop(job_id, None)
+        self._finish(job_id, future.result)
+
+    def _finish(self, job_id: str, result: Callable[[], str]):
+        try:
+            result()
+        except Exception as exc:
+            _update_state(self.export_dir, job_id, status="failed", error=str(exc) or type(exc).__name__,
+                          finished_at=datetime.utcnow().isoformat())
+        else:
+            _update_state(self.export_dir, job_id, status="done", progress=100,
+                          finished_at=datetime.utcnow().isoformat())
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务状态，job_id 不合法或任务已清理时返回 None"""
+        if not _JOB_ID_PATTERN.match(job_id or ""):
+            return None
+        return _read_state(self.export_dir, job_id)
+
+    def output_path(self, state: Dict[str, Any]) -> Optional[str]:
+        """已完成任务的导出文件路径，文件不存在时返回 None"""
+        if state.get("status") != "done":
+            return None
+        path = _output_path(self.export_dir, state["job_id"], state["format"])
+        return path if os.path.exists(path) else None
+
+    def cleanup_expired(self) -> int:
+        """删除超过有效期未更新的任务文件（状态、导出文件与残留的临时文件），返回删除的文件数"""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        try:
+            names = os.listdir(self.export_dir)
+        except OSError:
+            return 0
+        for name in names:
+            job_id = name.split(".", 1)[0]
+            if not _JOB_ID_PATTERN.match(job_id) or job_id in self._pending:
+                continue
+            path = os.path.join(self.export_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+def get_export_queue() -> ExportJobQueue:
+    """获取当前应用的导出任务队列（首次访问时创建）"""
+    queue = current_app.extensions.get("compliance_export_queue")
+    if queue is None:
+        export_dir = current_app.config.get("COMPLIANCE_EXPORT_DIR") or os.path.join(
+            current_app.instance_path, "compliance_exports"
+        )
+        queue = ExportJobQueue(
+            export_dir,
+            workers=current_app.config.get("COMPLIANCE_EXPORT_WORKERS", DEFAULT_WORKERS),
+            max_pending=current_app.config.get("COMPLIANCE_EXPORT_MAX_PENDING", DEFAULT_MAX_PENDING),
+            ttl=current_app.config.get("COMPLIANCE_EXPORT_TTL_SECONDS", DEFAULT_TTL_SECONDS),
+        )
+        current_app.extensions["compliance_export_queue"] = queue
+    return queue
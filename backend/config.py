@@ -20,6 +20,103 @@ class Config:
     # 高德 API 安全密钥（用于签名，请在 .env 中配置）
     AMAP_API_SECRET = os.getenv('AMAP_API_SECRET', '')
     
+    # 就近推荐供应商空间索引：网格边长（度）与全量刷新间隔（秒）
+    SUPPLIER_INDEX_CELL_SIZE = float(os.getenv('SUPPLIER_INDEX_CELL_SIZE', '0.01'))
+    SUPPLIER_INDEX_REFRESH_SECONDS = int(os.getenv('SUPPLIER_INDEX_REFRESH_SECONDS', '60'))
+    
+    # 地理编码缓存有效期：成功结果（天）与无法解析地址的负缓存（小时）
+    GEOCODE_CACHE_TTL_DAYS = int(os.getenv('GEOCODE_CACHE_TTL_DAYS', '30'))
+    GEOCODE_CACHE_NEGATIVE_TTL_HOURS = int(os.getenv('GEOCODE_CACHE_NEGATIVE_TTL_HOURS', '24'))
+    
+    # 批量地理编码：高德 QPS 配额、并发数、失败重试次数；AMAP_GEOCODE_URL 可指向本地模拟服务
+    AMAP_GEOCODE_URL = os.getenv('AMAP_GEOCODE_URL', '')
+    AMAP_GEOCODE_QPS = float(os.getenv('AMAP_GEOCODE_QPS', '3'))
+    AMAP_GEOCODE_CONCURRENCY = int(os.getenv('AMAP_GEOCODE_CONCURRENCY', '4'))
+    AMAP_GEOCODE_MAX_RETRIES = int(os.getenv('AMAP_GEOCODE_MAX_RETRIES', '3'))
+    
+    # 驾车距离矩阵：高德 QPS 配额、并发数、重试次数，以及点对距离缓存（有效期秒、坐标小数位、最大条目数）
+    AMAP_DISTANCE_URL = os.getenv('AMAP_DISTANCE_URL', '')
+    AMAP_DISTANCE_QPS = float(os.getenv('AMAP_DISTANCE_QPS', '3'))
+    AMAP_DISTANCE_CONCURRENCY = int(os.getenv('AMAP_DISTANCE_CONCURRENCY', '4'))
+    AMAP_DISTANCE_MAX_RETRIES = int(os.getenv('AMAP_DISTANCE_MAX_RETRIES', '3'))
+    DISTANCE_CACHE_TTL_SECONDS = int(os.getenv('DISTANCE_CACHE_TTL_SECONDS', '86400'))
+    DISTANCE_CACHE_PRECISION = int(os.getenv('DISTANCE_CACHE_PRECISION', '4'))
+    DISTANCE_CACHE_MAX_ENTRIES = int(os.getenv('DISTANCE_CACHE_MAX_ENTRIES', '100000'))
+    
+    # 配送路径局部搜索（local_search）：默认时间预算与请求可指定的上限（秒）
+    ROUTE_OPTIMIZER_TIME_BUDGET = float(os.getenv('ROUTE_OPTIMIZER_TIME_BUDGET', '1.0'))
+    ROUTE_OPTIMIZER_MAX_TIME_BUDGET = float(os.getenv('ROUTE_OPTIMIZER_MAX_TIME_BUDGET', '10.0'))
+    
+    # 多车辆配送计划：默认时间预算（秒）、并行求解路线的进程数（0 表示不启用进程池）、车辆数与订单数上限
+    FLEET_PLANNER_TIME_BUDGET = float(os.getenv('FLEET_PLANNER_TIME_BUDGET', '2.0'))
+    FLEET_PLANNER_WORKERS = int(os.getenv('FLEET_PLANNER_WORKERS', '4'))
+    FLEET_PLANNER_MAX_VEHICLES = int(os.getenv('FLEET_PLANNER_MAX_VEHICLES', '50'))
+    FLEET_PLANNER_MAX_STOPS = int(os.getenv('FLEET_PLANNER_MAX_STOPS', '500'))
+    
+    # 订单统计缓存有效期（秒）：本进程的订单变更提交后相关缓存立即失效，
+    # 其他 worker 的变更在下一次读取时按共享的缓存版本号（cache_generations 表）失效
+    ORDER_STATS_CACHE_TTL_SECONDS = int(os.getenv('ORDER_STATS_CACHE_TTL_SECONDS', '30'))
+    
+    # 物流订单列表：默认每页数量、每页上限、流式导出每批读取的订单数
+    LOGISTICS_ORDERS_PAGE_SIZE = int(os.getenv('LOGISTICS_ORDERS_PAGE_SIZE', '100'))
+    LOGISTICS_ORDERS_MAX_PAGE_SIZE = int(os.getenv('LOGISTICS_ORDERS_MAX_PAGE_SIZE', '500'))
+    LOGISTICS_ORDERS_STREAM_BATCH = int(os.getenv('LOGISTICS_ORDERS_STREAM_BATCH', '500'))
+    
+    # 合规分析报告分段结果缓存有效期（秒），本进程内相关数据变更提交后立即失效，
+    # 其他 worker 的变更在下一次生成报告时按各分段的缓存版本号（cache_generations 表）失效
+    COMPLIANCE_CACHE_TTL_SECONDS = int(os.getenv('COMPLIANCE_CACHE_TTL_SECONDS', '300'))
+    
+    # 合规报告导出任务：渲染进程数（0 表示在请求线程内生成）、每个进程排队任务上限、
+    # 任务文件保留时间（秒）、导出目录（为空时使用 instance/compliance_exports）
+    COMPLIANCE_EXPORT_WORKERS = int(os.getenv('COMPLIANCE_EXPORT_WORKERS', '2'))
+    COMPLIANCE_EXPORT_MAX_PENDING = int(os.getenv('COMPLIANCE_EXPORT_MAX_PENDING', '8'))
+    COMPLIANCE_EXPORT_TTL_SECONDS = int(os.getenv('COMPLIANCE_EXPORT_TTL_SECONDS', '3600'))
+    COMPLIANCE_EXPORT_DIR = os.getenv('COMPLIANCE_EXPORT_DIR', '')
+    
+    # 库存预警快照整体重载间隔（秒），期间按库存流水增量刷新
+    INVENTORY_SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv('INVENTORY_SNAPSHOT_MAX_AGE_SECONDS', '3600'))
+    
+    # 平台统计快照刷新间隔（秒），监管仪表盘与系统状态读取快照
+    PLATFORM_STATS_REFRESH_SECONDS = int(os.getenv('PLATFORM_STATS_REFRESH_SECONDS', '60'))
+    # 是否启动后台线程定时刷新平台统计（关闭或测试时读取发现过期后在线刷新）
+    PLATFORM_STATS_WORKER = os.getenv('PLATFORM_STATS_WORKER', 'True').lower() in ('true', '1', 'yes')
+    
+    # SQLite 写锁冲突（database is locked）时写入单元的最多执行次数与首次重试等待（秒）
+    DB_BUSY_RETRY_ATTEMPTS = int(os.getenv('DB_BUSY_RETRY_ATTEMPTS', '5'))
+    DB_BUSY_RETRY_DELAY_SECONDS = float(os.getenv('DB_BUSY_RETRY_DELAY_SECONDS', '0.05'))
+    
+    # SQLite 连接参数：是否在每个连接上设置下列 PRAGMA；日志模式（WAL 读写互不阻塞）、同步级别、
+    # 等待写锁的超时（毫秒）、页缓存大小（KiB）、内存映射大小（字节）、临时表存储位置
+    SQLITE_TUNING = os.getenv('SQLITE_TUNING', 'True').lower() in ('true', '1', 'yes')
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_TEMP_STORE = os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
+    
+    # 数据库连接池：每个进程保持的连接数、高峰时允许额外创建的连接数、
+    # 连接回收时间（秒，仅非 SQLite 数据库）
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv('DB_POOL_RECYCLE_SECONDS', '1800'))
+    
+    # 读写分离：标记为只读的接口（db_utils.read_replica）使用的只读库地址（如从库 URL）；
+    # 未设置时可对 SQLite 文件库开启只读连接（mode=ro，WAL 下与写连接互不阻塞）
+    READ_DATABASE_URL = os.getenv('READ_DATABASE_URL') or None
+    SQLITE_READ_ONLY_ENGINE = os.getenv('SQLITE_READ_ONLY_ENGINE', 'False').lower() in ('true', '1', 'yes')
+    
+    # 药品搜索后端：auto（有 drugs_fts 时使用 SQLite FTS5，否则进程内索引）、fts5、memory
+    DRUG_SEARCH_BACKEND = os.getenv('DRUG_SEARCH_BACKEND', 'auto')
+    
+    # 药品候选项（输入联想）内存索引全量刷新间隔（秒），期间按本进程的库存/供应变更增量更新
+    DRUG_SUGGESTION_REFRESH_SECONDS = int(os.getenv('DRUG_SUGGESTION_REFRESH_SECONDS', '300'))
+    
+    # 价格对比：内存价格索引全量刷新间隔（秒）、默认每页条数与每页上限
+    PRICE_INDEX_REFRESH_SECONDS = int(os.getenv('PRICE_INDEX_REFRESH_SECONDS', '60'))
+    PRICE_COMPARE_PAGE_SIZE = int(os.getenv('PRICE_COMPARE_PAGE_SIZE', '100'))
+    PRICE_COMPARE_MAX_PAGE_SIZE = int(os.getenv('PRICE_COMPARE_MAX_PAGE_SIZE', '500'))
+    
     # 邮件配置
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.qq.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', '465'))
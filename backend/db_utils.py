@@ -0,0 +1,228 @@
+"""
+数据库连接与写入工具
+功能：生产环境多个 gunicorn worker 共用一个 SQLite 文件。默认的 rollback 日志模式下读写互斥、
+同一时刻只允许一个写事务，多个 worker 同时写入时后来者拿不到写锁，报 "database is locked"。
+
+- engine_options / install_sqlite_pragmas：按数据库类型设置连接池参数；SQLite 文件库每个连接建立时
+  开启 WAL（读写不再互相阻塞）、synchronous=NORMAL，并设置 busy_timeout、页缓存、mmap 与临时表存储
+- retry_on_busy：busy_timeout 到期或 WAL 下读事务升级为写事务失败时，回滚后按指数退避重试整个写入单元
+- read_replica：监管报表等重读接口的查询走只读引擎（READ_DATABASE_URL 或 SQLite 只读连接），写入仍在主库；
+  会话写入过之后的查询、请求头 X-Read-Consistency: primary 以及 read_from_primary() 内的查询都读主库
+"""
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Mapping, Optional, TypeVar
+
+from flask import current_app, request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import OperationalError
+
+from extensions import READ_ENGINE_KEY, db
+
+# 默认配置（未在 config 中设置时使用）
+DEFAULT_BUSY_RETRY_ATTEMPTS = 5
+DEFAULT_BUSY_RETRY_DELAY_SECONDS = 0.05
+
+DEFAULT_SQLITE_PRAGMAS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_CACHE_SIZE_KB': 20000,
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_TEMP_STORE': 'MEMORY',
+}
+
+T = TypeVar('T')
+
+
+def is_memory_database(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(uri: str, config: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    按数据库类型返回 create_engine 的连接池参数
+
+    - SQLite 文件库：驱动层等锁超时与 busy_timeout 一致；连接数量按 worker 线程数限定
+    - SQLite 内存库：由 Flask-SQLAlchemy 使用 StaticPool，不设置
+    - 其他数据库：连接池大小、溢出、回收时间与 pre_ping（断线重连）
+    """
+    backend = make_url(uri).get_backend_name()
+    if backend == 'sqlite':
+        if is_memory_database(uri):
+            return {}
+        busy_timeout = config.get('SQLITE_BUSY_TIMEOUT_MS', DEFAULT_SQLITE_PRAGMAS['SQLITE_BUSY_TIMEOUT_MS'])
+        return {
+            'connect_args': {'timeout': busy_timeout / 1000},
+            'pool_size': config.get('DB_POOL_SIZE', 5),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        }
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE_SECONDS', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+def sqlite_pragmas(config: Mapping[str, Any], memory: bool = False) -> Dict[str, Any]:
+    """每个 SQLite 连接建立时执行的 PRAGMA（配置为空字符串或 None 的项不设置）"""
+    def setting(key):
+        return config.get(key, DEFAULT_SQLITE_PRAGMAS[key])
+
+    cache_size_kb = setting('SQLITE_CACHE_SIZE_KB')
+    pragmas = {
+        # 内存库不支持 WAL
+        'journal_mode': None if memory else setting('SQLITE_JOURNAL_MODE'),
+        'synchronous': setting('SQLITE_SYNCHRONOUS'),
+        'busy_timeout': setting('SQLITE_BUSY_TIMEOUT_MS'),
+        # 负数表示按 KiB 计
+        'cache_size': -int(cache_size_kb) if cache_size_kb else None,
+        'mmap_size': None if memory else setting('SQLITE_MMAP_SIZE'),
+        'temp_store': setting('SQLITE_TEMP_STORE'),
+    }
+    return {name: value for name, value in pragmas.items() if value not in (None, '')}
+
+
+def install_sqlite_pragmas(engine: Engine, config: Mapping[str, Any], read_only: bool = False) -> Dict[str, Any]:
+    """
+    在 SQLite engine 的每个新连接上执行 PRAGMA，返回将要设置的 PRAGMA（非 SQLite 返回空字典）
+
+    只读连接不能切换日志模式，沿用主库连接设置的 WAL
+    """
+    if engine.dialect.name != 'sqlite' or not config.get('SQLITE_TUNING', True):
+        return {}
+    pragmas = sqlite_pragmas(config, memory=is_memory_database(str(engine.url)))
+    if read_only:
+        pragmas.pop('journal_mode', None)
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+
+    return pragmas
+
+
+def read_database_url(config: Mapping[str, Any], primary_uri: Optional[str] = None) -> Optional[str]:
+    """
+    只读引擎的地址：优先 READ_DATABASE_URL；开启 SQLITE_READ_ONLY_ENGINE 时对 SQLite 文件库
+    使用同一文件的只读连接；都没有时返回 None（只读接口也读主库）
+
+    Args:
+        primary_uri: 主库地址，默认取 SQLALCHEMY_DATABASE_URI（相对路径需先解析为主库实际使用的路径）
+    """
+    if config.get('READ_DATABASE_URL'):
+        return config['READ_DATABASE_URL']
+    uri = primary_uri or config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri or not config.get('SQLITE_READ_ONLY_ENGINE', False):
+        return None
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or is_memory_database(uri) or url.query.get('uri'):
+        return None
+    return f'sqlite:///file:{url.database}?mode=ro&uri=true'
+
+
+def configure_database(app):
+    """
+    在 db.init_app 之前调用：按数据库类型补全 SQLALCHEMY_ENGINE_OPTIONS（配置中已有的项优先）
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    options = dict(engine_options(uri, app.config))
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def install_database_hooks(app):
+    """
+    在 db.init_app 之后调用：为应用的 engine 注册 SQLite 连接 PRAGMA，返回主库的 PRAGMA；
+    配置了只读库时创建只读引擎（app.extensions['read_engine']）
+    """
+    with app.app_context():
+        pragmas = install_sqlite_pragmas(db.engine, app.config)
+        read_url = read_database_url(app.config, db.engine.url.render_as_string(hide_password=False))
+        if read_url:
+            engine = create_engine(read_url, **engine_options(read_url, app.config))
+            install_sqlite_pragmas(engine, app.config, read_only=True)
+            app.extensions[READ_ENGINE_KEY] = engine
+        return pragmas
+
+
+@contextmanager
+def read_from_primary(enabled: bool = True):
+    """
+    在只读接口中临时改读主库（如刚提交的数据需要立即读到），enabled=False 时改读只读引擎
+    """
+    session = db.session()
+    previous = session.info.get('use_read_engine')
+    session.info['use_read_engine'] = not enabled
+    try:
+        yield session
+    finally:
+        session.info['use_read_engine'] = previous
+
+
+def read_replica(view: Callable[..., T]) -> Callable[..., T]:
+    """
+    只读接口装饰器：接口内的查询走只读引擎（未配置时仍读主库）
+
+    - 接口内发生写入（flush）时，写入及之后的查询都在主库，能读到自己的写入
+    - 请求头 X-Read-Consistency: primary 时整个请求读主库，用于客户端刚提交写入后立即查看报表
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        primary = request.headers.get('X-Read-Consistency', '').lower() == 'primary'
+        with read_from_primary(primary):
+            return view(*args, **kwargs)
+    return wrapper
+
+
+@event.listens_for(db.session, 'after_flush')
+def _mark_session_wrote(session, flush_context):
+    # 写入过的会话不再读只读引擎（从库可能尚未同步这次写入）
+    session.info['wrote'] = True
+
+
+def is_database_busy(exc: Exception) -> bool:
+    """是否为 SQLite 写锁冲突（可以重试的错误）"""
+    message = str(getattr(exc, 'orig', exc)).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def retry_on_busy(work: Callable[[], T], attempts: Optional[int] = None,
+                  delay: Optional[float] = None) -> T:
+    """
+    执行一个写入单元（由 work 自己提交），遇到写锁冲突时回滚并重试
+
+    work 每次重试都会从头执行，必须在事务内重新读取需要的数据
+
+    Args:
+        work: 写入单元
+        attempts: 最多执行次数，默认取 DB_BUSY_RETRY_ATTEMPTS
+        delay: 首次重试前的等待秒数，之后每次翻倍并加随机抖动，默认取 DB_BUSY_RETRY_DELAY_SECONDS
+
+    Returns:
+        work 的返回值
+    """
+    if attempts is None:
+        attempts = current_app.config.get('DB_BUSY_RETRY_ATTEMPTS', DEFAULT_BUSY_RETRY_ATTEMPTS)
+    if delay is None:
+        delay = current_app.config.get('DB_BUSY_RETRY_DELAY_SECONDS', DEFAULT_BUSY_RETRY_DELAY_SECONDS)
+
+    for attempt in range(1, attempts + 1):
+        try:
+            return work()
+        except OperationalError as exc:
+            db.session.rollback()
+            if not is_database_busy(exc) or attempt == attempts:
+                raise
+            current_app.logger.warning(f'数据库写锁冲突，第 {attempt} 次重试')
+            time.sleep(delay * 2 ** (attempt - 1) * (1 + random.random()))
@@ -2,12 +2,14 @@
 配送路径规划 API
 为物流公司提供多目的地配送路径优化服务
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User, Tenant, Order
-from amap import AmapService, optimize_delivery_route, search_address_suggestions
+from amap import AmapService, plan_delivery_route, search_address_suggestions
 from extensions import db
+from fleet_planner import plan_fleet
 from typing import List, Dict, Tuple, Optional
+from datetime import date
 
 bp = Blueprint('dispatch', __name__, url_prefix='/api/dispatch')
 
@@ -68,7 +70,8 @@ def optimize_route():
             }
         ],
         "use_api": false,          // 是否使用高德 API 计算驾车距离（可选，默认 false）
-        "algorithm": "greedy"      // 优化算法：greedy 或 dp（可选，默认 greedy）
+        "algorithm": "greedy",     // 优化算法：greedy、dp 或 local_search（可选，默认 greedy）
+        "time_budget": 1.0         // local_search 的时间预算（秒，可选）
     }
     
     返回:
@@ -90,7 +93,10 @@ def optimize_route():
             ...
         ],
         "total_distance": 12345.6,
-        "total_distance_text": "12.3km"
+        "total_distance_text": "12.3km",
+        "algorithm": "local_search",     // 实际使用的算法（dp 超出规模时为 local_search）
+        "iterations": 42,                // 局部搜索应用的改进次数
+        "elapsed_ms": 85.3               // 求解耗时（毫秒，不含距离矩阵计算）
     }
     """
     try:
@@ -154,16 +160,28 @@ def optimize_route():
                 'original_location': dest['location']
             })
         
+        # 保存解析地址时产生的地理编码缓存
+        db.session.commit()
+        
         # 获取优化参数
         use_api = data.get('use_api', False)
         algorithm = data.get('algorithm', 'greedy')
         
+        max_budget = current_app.config.get('ROUTE_OPTIMIZER_MAX_TIME_BUDGET', 10.0)
+        try:
+            time_budget = float(data.get('time_budget',
+                                         current_app.config.get('ROUTE_OPTIMIZER_TIME_BUDGET', 1.0)))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'time_budget 必须是数字（秒）'}), 400
+        time_budget = min(max(time_budget, 0.0), max_budget)
+        
         # 执行路径优化
-        optimized_route = optimize_delivery_route(
+        optimized_route, solution = plan_delivery_route(
             start_coords,
             parsed_destinations,
             use_api=use_api,
-            algorithm=algorithm
+            algorithm=algorithm,
+            time_budget=time_budget
         )
         
         # 计算总距离
@@ -178,7 +196,9 @@ def optimize_route():
             'route': optimized_route,
             'total_distance': round(total_distance, 2),
             'total_distance_text': AmapService.format_distance(total_distance),
-            'algorithm': algorithm,
+            'algorithm': solution['algorithm'],
+            'iterations': solution['iterations'],
+            'elapsed_ms': round(solution['elapsed'] * 1000, 1),
             'use_api': use_api
         }), 200
         
@@ -192,6 +212,54 @@ def optimize_route():
         }), 500
 
 
+# 物流公司需要配送的订单状态（发货时才会分配物流公司）
+DELIVERY_STATUSES = ('SHIPPED', 'IN_TRANSIT')
+
+
+def load_order_destinations(logistics_tenant_id: int, statuses: List[str],
+                            limit: Optional[int] = None,
+                            order_ids: Optional[List[int]] = None) -> List[Dict]:
+    """
+    查询分配给物流公司的订单目的地（买方药店坐标）及订单药品总件数
+    
+    一次查询关联买方企业，件数取订单的合计列，期望送达日期早的订单排在前面；
+    买方没有坐标的订单不返回。
+    """
+    query = db.session.query(Order, Tenant).join(
+        Tenant, Order.buyer_tenant_id == Tenant.id
+    ).filter(
+        Order.logistics_tenant_id == logistics_tenant_id,
+        Order.status.in_(statuses),
+        Tenant.longitude.isnot(None),
+        Tenant.latitude.isnot(None)
+    )
+    if order_ids is not None:
+        query = query.filter(Order.id.in_(order_ids))
+    query = query.order_by(
+        Order.expected_delivery_date.is_(None),
+        Order.expected_delivery_date,
+        Order.id
+    )
+    if limit:
+        query = query.limit(limit)
+    
+    destinations = []
+    for order, buyer_tenant in query:
+        destinations.append({
+            'order_id': order.id,
+            'order_number': order.order_number,
+            'name': buyer_tenant.name,
+            'address': buyer_tenant.address or '',
+            'longitude': float(buyer_tenant.longitude),
+            'latitude': float(buyer_tenant.latitude),
+            'contact_phone': buyer_tenant.contact_phone or '',
+            'quantity': order.total_quantity,
+            'expected_delivery_date': order.expected_delivery_date.isoformat() if order.expected_delivery_date else None,
+            'order_created_at': order.created_at.isoformat() if order.created_at else None
+        })
+    return destinations
+
+
 @bp.route('/orders_destinations', methods=['GET'])
 @jwt_required()
 def get_orders_destinations():
@@ -199,7 +267,7 @@ def get_orders_destinations():
     获取待配送订单的目的地列表（从订单数据中提取）
     
     查询参数:
-        status: 订单状态筛选（可选，默认为 'pending' 和 'confirmed'）
+        status: 订单状态筛选（可选，默认为 SHIPPED 和 IN_TRANSIT）
         limit: 返回数量限制（可选，默认 20）
     
     返回:
@@ -212,7 +280,9 @@ def get_orders_destinations():
                 "address": "上海市xxx",
                 "longitude": 121.50,
                 "latitude": 31.22,
-                "contact_phone": "021-12345678"
+                "contact_phone": "021-12345678",
+                "quantity": 120,                          // 订单药品总件数
+                "expected_delivery_date": "2026-03-01"    // 期望送达日期（可能为 null）
             },
             ...
         ]
@@ -233,40 +303,14 @@ def get_orders_destinations():
             }), 403
         
         # 获取查询参数
-        status_filter = request.args.get('status', 'pending,confirmed')
+        status_filter = request.args.get('status', ','.join(DELIVERY_STATUSES))
         limit = int(request.args.get('limit', 20))
         
         # 解析状态列表
-        statuses = [s.strip() for s in status_filter.split(',')]
-        
-        # 查询订单（需要配送的订单）
-        orders_query = Order.query.filter(
-            Order.status.in_(statuses),
-            Order.logistics_id == user.id  # 分配给当前物流公司
-        ).limit(limit)
-        
-        destinations = []
-        for order in orders_query:
-            # 获取买方（药店）信息
-            buyer = User.query.get(order.buyer_id)
-            if not buyer:
-                continue
-            
-            buyer_tenant = Tenant.query.filter_by(user_id=buyer.id).first()
-            if not buyer_tenant:
-                continue
-            
-            # 检查是否有坐标信息
-            if buyer_tenant.longitude and buyer_tenant.latitude:
-                destinations.append({
-                    'order_id': order.id,
-                    'name': buyer_tenant.name or buyer.username,
-                    'address': buyer_tenant.address or '',
-                    'longitude': float(buyer_tenant.longitude),
-                    'latitude': float(buyer_tenant.latitude),
-                    'contact_phone': buyer_tenant.contact_phone or '',
-                    'order_created_at': order.created_at.isoformat() if order.created_at else None
-                })
+        statuses = [s.strip().upper() for s in status_filter.split(',') if s.strip()]
+        
+        # 查询分配给当前物流公司、需要配送的订单
+        destinations = load_order_destinations(user.tenant_id, statuses, limit=limit)
         
         return jsonify({
             'success': True,
@@ -284,6 +328,166 @@ def get_orders_destinations():
         }), 500
 
 
+@bp.route('/plan_fleet', methods=['POST'])
+@jwt_required()
+def plan_fleet_route():
+    """
+    多车辆配送计划：把当前物流公司待配送的订单分配给多辆车，并规划每辆车的访问顺序
+    
+    请求体:
+    {
+        "start": "121.48,31.23" 或 "上海市浦东新区张江高科",  // 起点（仓库）
+        "vehicles": 3,                   // 车辆数
+        "capacity": 500,                 // 每辆车装载上限（药品件数），也可按车辆给出列表 [500, 300, 300]
+        "order_ids": [1, 2, 3],          // 参与计划的订单（可选，默认全部待配送订单）
+        "status": "SHIPPED,IN_TRANSIT",  // 订单状态筛选（可选）
+        "plan_date": "2026-03-01",       // 计划配送日期（可选，默认今天），用于判断逾期
+        "time_budget": 2.0               // 求解时间预算（秒，可选）
+    }
+    
+    返回:
+    {
+        "success": true,
+        "vehicles": [
+            {
+                "vehicle": 1,
+                "capacity": 500,
+                "load": 420,                     // 已装载件数
+                "distance": 23456.7,
+                "distance_text": "23.5km",
+                "stops": [                       // 订单目的地（字段同 orders_destinations），按访问顺序
+                    {"order_id": 12, "order": 1, "distance_from_prev": 2534.5, "overdue": false, ...},
+                    ...
+                ]
+            },
+            ...
+        ],
+        "unassigned": [                          // 本次未安排的订单
+            {"order_id": 30, "reason": "capacity", ...}   // capacity：车队容量不足；oversize：超过单车容量
+        ],
+        "total_distance": 67890.1,
+        "total_distance_text": "67.9km",
+        "iterations": 215,
+        "elapsed_ms": 812.4
+    }
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        if not user:
+            return jsonify({'success': False, 'message': '用户未找到'}), 404
+        
+        if user.role != 'logistics':
+            return jsonify({
+                'success': False,
+                'message': '仅物流公司用户可以使用配送计划功能'
+            }), 403
+        
+        data = request.get_json() or {}
+        config = current_app.config
+        
+        if 'start' not in data or 'vehicles' not in data or 'capacity' not in data:
+            return jsonify({
+                'success': False,
+                'message': '缺少必需参数：start（起点）、vehicles（车辆数）和 capacity（装载上限）'
+            }), 400
+        
+        # 校验车辆与装载上限
+        try:
+            vehicles = int(data['vehicles'])
+            capacity = data['capacity']
+            if isinstance(capacity, list):
+                capacities = [float(c) for c in capacity]
+            else:
+                capacities = [float(capacity)] * vehicles
+            time_budget = float(data.get('time_budget', config.get('FLEET_PLANNER_TIME_BUDGET', 2.0)))
+            plan_date = date.fromisoformat(data['plan_date']) if data.get('plan_date') else None
+            order_ids = [int(i) for i in data['order_ids']] if data.get('order_ids') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': '参数格式错误'}), 400
+        
+        max_vehicles = config.get('FLEET_PLANNER_MAX_VEHICLES', 50)
+        if not 1 <= vehicles <= max_vehicles:
+            return jsonify({'success': False, 'message': f'车辆数必须在 1~{max_vehicles} 之间'}), 400
+        if len(capacities) != vehicles or any(c <= 0 for c in capacities):
+            return jsonify({'success': False, 'message': 'capacity 必须为正数，按车辆给出时数量需与 vehicles 一致'}), 400
+        time_budget = min(max(time_budget, 0.0), config.get('ROUTE_OPTIMIZER_MAX_TIME_BUDGET', 10.0))
+        
+        start_coords = parse_location_input(data['start'])
+        if not start_coords:
+            return jsonify({
+                'success': False,
+                'message': f'无法解析起点位置：{data["start"]}。请输入有效的经纬度（如 121.48,31.23）或地址'
+            }), 400
+        
+        # 保存解析地址时产生的地理编码缓存
+        db.session.commit()
+        
+        status_filter = data.get('status') or ','.join(DELIVERY_STATUSES)
+        statuses = [s.strip().upper() for s in status_filter.split(',') if s.strip()]
+        destinations = load_order_destinations(
+            user.tenant_id, statuses,
+            limit=config.get('FLEET_PLANNER_MAX_STOPS', 500),
+            order_ids=order_ids
+        )
+        
+        stops = []
+        for dest in destinations:
+            due = dest['expected_delivery_date']
+            stops.append(dict(
+                dest,
+                demand=dest['quantity'],
+                expected_delivery_date=date.fromisoformat(due) if due else None
+            ))
+        
+        plan = plan_fleet(
+            start_coords, stops, capacities,
+            plan_date=plan_date,
+            time_budget=time_budget,
+            workers=config.get('FLEET_PLANNER_WORKERS')
+        )
+        
+        def serialize(stop):
+            stop = dict(stop)
+            stop.pop('demand', None)
+            if stop.get('expected_delivery_date'):
+                stop['expected_delivery_date'] = stop['expected_delivery_date'].isoformat()
+            if 'distance_from_prev' in stop:
+                stop['distance_from_prev_text'] = AmapService.format_distance(stop['distance_from_prev'])
+            return stop
+        
+        return jsonify({
+            'success': True,
+            'start': {
+                'longitude': start_coords[0],
+                'latitude': start_coords[1]
+            },
+            'vehicles': [
+                dict(
+                    vehicle,
+                    distance_text=AmapService.format_distance(vehicle['distance']),
+                    stops=[serialize(stop) for stop in vehicle['stops']]
+                )
+                for vehicle in plan['vehicles']
+            ],
+            'unassigned': [serialize(stop) for stop in plan['unassigned']],
+            'total_distance': plan['total_distance'],
+            'total_distance_text': AmapService.format_distance(plan['total_distance']),
+            'iterations': plan['iterations'],
+            'elapsed_ms': round(plan['elapsed'] * 1000, 1)
+        }), 200
+        
+    except Exception as e:
+        print(f"多车辆配送计划异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'message': f'服务器错误：{str(e)}'
+        }), 500
+
+
 @bp.route('/geocode', methods=['POST'])
 @jwt_required()
 def geocode():
@@ -326,6 +530,7 @@ def geocode():
         city = data.get('city')
         
         result = AmapService.geocode_address(address, city)
+        db.session.commit()  # 保存地理编码缓存
         
         if result:
             return jsonify({
@@ -453,6 +658,9 @@ def get_driving_route():
                 if wp_coords:
                     waypoints.append(wp_coords)
         
+        # 保存解析地址时产生的地理编码缓存
+        db.session.commit()
+        
         # 调用高德 API 获取路径
         route_info = AmapService.get_driving_route(origin_coords, dest_coords, waypoints)
         
@@ -0,0 +1,213 @@
+"""
+驾车距离矩阵服务
+功能：为配送路径规划（use_api 模式）构建距离矩阵。
+高德距离测量接口一次可传入多个起点到同一终点，这里按终点分列批量请求，
+用线程池并发、令牌桶限流，并按取整后的坐标缓存点对距离，
+重复规划相同药店的路线时基本不再请求高德
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from flask import current_app
+
+from amap import AmapService
+from amap_client import DEFAULT_BACKOFF, DEFAULT_MAX_RETRIES, AmapRestClient
+
+Point = Tuple[float, float]
+
+# 高德距离测量接口单次最多 100 个起点
+MAX_ORIGINS_PER_REQUEST = 100
+
+DEFAULT_QPS = 3
+DEFAULT_CONCURRENCY = 4
+
+# 点对距离缓存：有效期 1 天，坐标保留 4 位小数（约 10 米）
+DEFAULT_CACHE_TTL_SECONDS = 86400
+DEFAULT_CACHE_PRECISION = 4
+DEFAULT_CACHE_MAX_ENTRIES = 100000
+
+
+class PairDistanceCache:
+    """点对距离缓存（线程安全，按 TTL 过期，超出容量时淘汰最久未使用的条目）"""
+
+    def __init__(self, ttl: float = DEFAULT_CACHE_TTL_SECONDS,
+                 precision: int = DEFAULT_CACHE_PRECISION,
+                 max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.precision = precision
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[tuple, Tuple[float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, origin: Point, destination: Point, distance_type: int) -> tuple:
+        p = self.precision
+        return (round(origin[0], p), round(origin[1], p),
+                round(destination[0], p), round(destination[1], p), distance_type)
+
+    def get(self, origin: Point, destination: Point, distance_type: int = 1) -> Optional[float]:
+        key = self._key(origin, destination, distance_type)
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, origin: Point, destination: Point, distance: float, distance_type: int = 1):
+        key = self._key(origin, destination, distance_type)
+        with self._lock:
+            self._data[key] = (distance, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+def get_pair_cache() -> PairDistanceCache:
+    """获取当前应用的点对距离缓存（首次访问时创建）"""
+    cache = current_app.extensions.get('distance_pair_cache')
+    if cache is None:
+        config = current_app.config
+        cache = PairDistanceCache(
+            ttl=config.get('DISTANCE_CACHE_TTL_SECONDS', DEFAULT_CACHE_TTL_SECONDS),
+            precision=config.get('DISTANCE_CACHE_PRECISION', DEFAULT_CACHE_PRECISION),
+            max_entries=config.get('DISTANCE_CACHE_MAX_ENTRIES', DEFAULT_CACHE_MAX_ENTRIES)
+        )
+        current_app.extensions['distance_pair_cache'] = cache
+    return cache
+
+
+class DistanceMatrixService(AmapRestClient):
+    """
+    批量驾车距离矩阵
+
+    每个终点一列：把缓存未命中的起点按 batch_size 分组，每组一次高德请求，
+    各组在线程池中并发执行；请求失败的点对回退为直线距离，不写入缓存。
+    """
+
+    def __init__(self, api_key: str,
+                 url: str = AmapService.DISTANCE_URL,
+                 qps: float = DEFAULT_QPS,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF,
+                 timeout: float = 10,
+                 batch_size: int = MAX_ORIGINS_PER_REQUEST,
+                 cache: Optional[PairDistanceCache] = None):
+        super().__init__(api_key, url, qps, concurrency, max_retries, backoff, timeout)
+        self.batch_size = max(1, min(int(batch_size), MAX_ORIGINS_PER_REQUEST))
+        self.cache = cache
+        self.stats.update({'cache_hits': 0, 'api_pairs': 0, 'fallbacks': 0})
+
+    @classmethod
+    def from_app(cls, **overrides) -> 'DistanceMatrixService':
+        """按应用配置创建距离矩阵服务（使用应用级点对缓存）"""
+        config = current_app.config
+        options = {
+            'api_key': config.get('AMAP_REST_KEY'),
+            'url': config.get('AMAP_DISTANCE_URL') or AmapService.DISTANCE_URL,
+            'qps': config.get('AMAP_DISTANCE_QPS', DEFAULT_QPS),
+            'concurrency': config.get('AMAP_DISTANCE_CONCURRENCY', DEFAULT_CONCURRENCY),
+            'max_retries': config.get('AMAP_DISTANCE_MAX_RETRIES', DEFAULT_MAX_RETRIES),
+            'cache': get_pair_cache(),
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    def request_distances(self, origins: Sequence[Point], destination: Point,
+                          distance_type: int = 1) -> List[Optional[float]]:
+        """
+        一次请求计算多个起点到同一终点的距离（带限流与重试）
+
+        Returns:
+            与 origins 顺序一致的距离列表（米），失败的位置为 None
+        """
+        params = {
+            'key': self.api_key,
+            'origins': '|'.join(f"{lon},{lat}" for lon, lat in origins),
+            'destination': f"{destination[0]},{destination[1]}",
+            'type': distance_type,
+            'output': 'json'
+        }
+        distances: List[Optional[float]] = [None] * len(origins)
+
+        data = self.request_json(params, '距离计算异常')
+        if data is None:
+            return distances
+        if data.get('status') != '1':
+            print(f"距离计算失败: {data.get('info', 'Unknown error')}")
+            self._count('errors')
+            return distances
+
+        for position, item in enumerate(data.get('results') or []):
+            try:
+                index = int(item.get('origin_id', position + 1)) - 1
+                if 0 <= index < len(distances):
+                    distances[index] = round(float(item['distance']), 2)
+            except (KeyError, TypeError, ValueError):
+                continue
+        return distances
+
+    def matrix(self, points: Sequence[Point], distance_type: int = 1) -> List[List[float]]:
+        """
+        计算距离矩阵
+
+        驾车距离不对称，matrix[i][j] 为从点 i 到点 j 的距离（米）。
+        相同坐标之间的距离为 0；请求失败的点对回退为直线距离。
+        """
+        n = len(points)
+        matrix = [[0.0] * n for _ in range(n)]
+
+        # 按终点分列，收集缓存未命中的起点并分批
+        tasks: List[Tuple[int, List[int]]] = []
+        for j in range(n):
+            missing = []
+            for i in range(n):
+                if i == j or points[i] == points[j]:
+                    continue
+                cached = self.cache.get(points[i], points[j], distance_type) if self.cache else None
+                if cached is not None:
+                    matrix[i][j] = cached
+                    self._count('cache_hits')
+                else:
+                    missing.append(i)
+            for start in range(0, len(missing), self.batch_size):
+                tasks.append((j, missing[start:start + self.batch_size]))
+
+        if not tasks:
+            return matrix
+
+        def run(task):
+            j, origin_indexes = task
+            return self.request_distances([points[i] for i in origin_indexes], points[j], distance_type)
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(tasks))) as executor:
+            for (j, origin_indexes), distances in zip(tasks, executor.map(run, tasks)):
+                for i, distance in zip(origin_indexes, distances):
+                    if distance is None:
+                        self._count('fallbacks')
+                        distance = AmapService.calculate_distance_haversine(*points[i], *points[j])
+                    else:
+                        self._count('api_pairs')
+                        if self.cache:
+                            self.cache.set(points[i], points[j], distance, distance_type)
+                    matrix[i][j] = distance
+
+        return matrix
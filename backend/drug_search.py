@@ -0,0 +1,304 @@
+"""
+药品搜索
+功能：药品目录、价格对比、附近供应商等接口原先都用 ilike('%关键词%') 在通用名/商品名/厂家/批准文号上
+模糊匹配，前导通配符用不上索引，每次输入都全表扫描。这里统一提供按关键词筛选药品并按相关度排序：
+
+- fts5：SQLite FTS5 外部内容表 drugs_fts（trigram 分词，适合没有空格分词的中文药名），
+  由 drugs 表上的触发器保持同步；不足 3 个字的关键词 trigram 无法匹配，退回在 drugs_fts 上 LIKE
+- memory：进程内的二元组（bigram）倒排索引，首次搜索时从 drugs 表加载，药品变更提交后失效重建；
+  其他进程的药品变更通过缓存版本号（cache_generations）在下一次搜索时发现并重建；
+  用于没有 drugs_fts 的数据库（如非 SQLite）与测试
+
+关键词按空白切分为多个词，每个词都要在指定字段之一中出现；命中通用名的排在命中厂家的前面。
+
+后端由 DRUG_SEARCH_BACKEND 配置（auto/fts5/memory），auto 在 drugs_fts 存在时使用 fts5。
+drugs_fts 随 db.create_all() 一起创建，已有数据库通过迁移创建并回填；
+对 drugs 表做 batch_alter_table（重建表）后触发器会丢失，需要运行 tools/rebuild_drug_search_index.py。
+"""
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from flask import current_app, has_app_context
+from sqlalchemy import DDL, case, column, event, func, inspect, literal, literal_column, or_, select, table, text
+
+from cache_generations import current_generations, mark_generations_stale
+from extensions import db
+from models import Drug
+
+FTS_TABLE = 'drugs_fts'
+
+# 进程内索引跨进程失效使用的缓存版本号
+GENERATION_NAME = 'drug_search'
+
+# 可搜索字段及相关度权重（顺序与 drugs_fts 的列顺序一致）
+FIELD_WEIGHTS = {
+    'generic_name': 10.0,
+    'brand_name': 8.0,
+    'approval_number': 5.0,
+    'manufacturer': 2.0,
+}
+SEARCH_FIELDS = tuple(FIELD_WEIGHTS)
+NAME_FIELDS = ('generic_name', 'brand_name')
+
+# trigram 分词可匹配的最短词长
+TRIGRAM_MIN_LENGTH = 3
+
+_columns = ', '.join(SEARCH_FIELDS)
+_new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+_old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+
+# drugs_fts 与同步触发器
+FTS_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_columns}, content='drugs', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON drugs BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON drugs BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON drugs BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values}); END",
+]
+
+for _statement in FTS_SCHEMA:
+    event.listen(Drug.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(Drug.__table__, 'before_drop', DDL(f'DROP TABLE IF EXISTS {FTS_TABLE}').execute_if(dialect='sqlite'))
+
+
+def split_terms(keyword: str) -> List[str]:
+    """按空白切分关键词（去重，保持顺序）"""
+    return list(dict.fromkeys((keyword or '').split()))
+
+
+class DrugSearchIndex(ABC):
+    """药品搜索后端（子类实现 search）"""
+
+    name = ''
+
+    @abstractmethod
+    def search(self, keyword: str, fields: Sequence[str] = SEARCH_FIELDS,
+               limit: Optional[int] = None) -> List[int]:
+        """返回匹配关键词的药品 ID（按相关度排序）"""
+
+    def apply(self, query, keyword: str, fields: Sequence[str] = SEARCH_FIELDS, rank: bool = True):
+        """
+        在包含 Drug 的查询上按关键词筛选药品
+
+        Args:
+            query: 查询（Drug.query 或 join 了 Drug 的查询）
+            rank: 是否先按相关度排序（调用方之后追加的 order_by 作为次要排序）
+        """
+        drug_ids = self.search(keyword, fields)
+        query = query.filter(Drug.id.in_(drug_ids))
+        if rank and drug_ids:
+            query = query.order_by(case({drug_id: position for position, drug_id in enumerate(drug_ids)},
+                                        value=Drug.id))
+        return query
+
+    def invalidate(self) -> None:
+        """药品数据变更后调用"""
+
+    def rebuild(self) -> int:
+        """按 drugs 表重建索引，返回药品数"""
+        self.invalidate()
+        return db.session.query(func.count(Drug.id)).scalar()
+
+
+class Fts5DrugSearchIndex(DrugSearchIndex):
+    """基于 SQLite FTS5（trigram）的药品搜索"""
+
+    name = 'fts5'
+
+    def __init__(self):
+        self.table = table(FTS_TABLE, column('rowid'), *(column(field) for field in SEARCH_FIELDS))
+
+    @staticmethod
+    def match_expression(terms: Iterable[str], fields: Sequence[str]) -> str:
+        """构造 MATCH 表达式：每个词作为短语（trigram 下即子串），限定在指定列中"""
+        phrases = ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        return '{' + ' '.join(fields) + '} : (' + phrases + ')'
+
+    def matches(self, keyword: str, fields: Sequence[str] = SEARCH_FIELDS):
+        """
+        匹配关键词的 (drug_id, score, rank) 子查询
+
+        score 为命中字段的权重之和（与进程内索引的打分一致，越大越相关），rank 为 bm25（越小越相关）
+        """
+        terms = split_terms(keyword)
+        long_terms = [term for term in terms if len(term) >= TRIGRAM_MIN_LENGTH]
+        short_terms = [term for term in terms if len(term) < TRIGRAM_MIN_LENGTH]
+
+        conditions = []
+        rank = literal(0.0)
+        if long_terms:
+            fts = literal_column(FTS_TABLE)
+            conditions.append(fts.op('MATCH')(self.match_expression(long_terms, fields)))
+            rank = func.bm25(fts, *FIELD_WEIGHTS.values())
+        for term in short_terms:
+            # 带 ESCAPE 的 LIKE 不走 trigram 索引；SQLite 3.40 用索引处理不足 3 字的模式时查不到任何行
+            conditions.append(or_(*(self.table.c[field].contains(term, autoescape=True) for field in fields)))
+
+        score = literal(0.0)
+        for term in terms:
+            for field in fields:
+                value = self.table.c[field]
+                # 整个字段相同或以关键词开头的更相关
+                score = score + case(
+                    (func.lower(value) == term.lower(), FIELD_WEIGHTS[field] * 2.0),
+                    (value.startswith(term, autoescape=True), FIELD_WEIGHTS[field] * 1.5),
+                    (value.contains(term, autoescape=True), FIELD_WEIGHTS[field]),
+                    else_=0.0
+                )
+
+        return select(
+            self.table.c.rowid.label('drug_id'),
+            score.label('score'),
+            rank.label('rank')
+        ).where(*conditions).subquery()
+
+    def search(self, keyword, fields=SEARCH_FIELDS, limit=None):
+        matches = self.matches(keyword, fields)
+        statement = select(matches.c.drug_id).order_by(
+            matches.c.score.desc(), matches.c.rank, matches.c.drug_id
+        )
+        if limit:
+            statement = statement.limit(limit)
+        return list(db.session.execute(statement).scalars())
+
+    def apply(self, query, keyword, fields=SEARCH_FIELDS, rank=True):
+        matches = self.matches(keyword, fields)
+        query = query.join(matches, matches.c.drug_id == Drug.id)
+        if rank:
+            query = query.order_by(matches.c.score.desc(), matches.c.rank)
+        return query
+
+    def rebuild(self):
+        for statement in FTS_SCHEMA:
+            db.session.execute(text(statement))
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        return db.session.execute(text(f'SELECT COUNT(*) FROM {FTS_TABLE}')).scalar()
+
+
+class InMemoryDrugSearchIndex(DrugSearchIndex):
+    """进程内二元组倒排索引（药品变更提交后，或缓存版本号变化时整体重建）"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents: Optional[Dict[int, Dict[str, str]]] = None
+        self._postings: Dict[tuple, set] = {}
+        self._generation: Optional[int] = None
+
+    @staticmethod
+    def bigrams(value: str) -> set:
+        return {value[i:i + 2] for i in range(len(value) - 1)}
+
+    def _load(self):
+        documents, postings = {}, defaultdict(set)
+        rows = db.session.query(Drug.id, *(getattr(Drug, field) for field in SEARCH_FIELDS))
+        for drug_id, *values in rows:
+            document = {field: (value or '').casefold() for field, value in zip(SEARCH_FIELDS, values)}
+            documents[drug_id] = document
+            for field, value in document.items():
+                for gram in self.bigrams(value):
+                    postings[(field, gram)].add(drug_id)
+        return documents, postings
+
+    def _snapshot(self):
+        generation = current_generations([GENERATION_NAME])[GENERATION_NAME]
+        with self._lock:
+            if self._documents is None or self._generation != generation:
+                self._documents, self._postings = self._load()
+                self._generation = generation
+            return self._documents, self._postings
+
+    def _score_term(self, term, fields, documents, postings) -> Dict[int, float]:
+        scores = defaultdict(float)
+        for field in fields:
+            candidates = documents.keys()
+            if len(term) >= 2:
+                candidates = set.intersection(*(postings.get((field, gram), set()) for gram in self.bigrams(term)))
+            for drug_id in candidates:
+                value = documents[drug_id][field]
+                if term in value:
+                    # 整个字段相同或以关键词开头的更相关
+                    bonus = 2.0 if value == term else 1.5 if value.startswith(term) else 1.0
+                    scores[drug_id] += FIELD_WEIGHTS[field] * bonus
+        return scores
+
+    def search(self, keyword, fields=SEARCH_FIELDS, limit=None):
+        documents, postings = self._snapshot()
+        totals = None
+        for term in split_terms(keyword.casefold()):
+            scores = self._score_term(term, fields, documents, postings)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {drug_id: totals[drug_id] + score for drug_id, score in scores.items()
+                          if drug_id in totals}
+            if not totals:
+                return []
+        ranked = sorted((totals or {}).items(), key=lambda item: (-item[1], item[0]))
+        return [drug_id for drug_id, _ in ranked[:limit or None]]
+
+    def invalidate(self):
+        with self._lock:
+            self._documents = None
+            self._postings = {}
+
+
+BACKENDS = {
+    Fts5DrugSearchIndex.name: Fts5DrugSearchIndex,
+    InMemoryDrugSearchIndex.name: InMemoryDrugSearchIndex,
+}
+
+
+def fts5_available() -> bool:
+    """当前数据库是否为已创建 drugs_fts 的 SQLite"""
+    engine = db.engine
+    return engine.dialect.name == 'sqlite' and inspect(engine).has_table(FTS_TABLE)
+
+
+def get_drug_search_index() -> DrugSearchIndex:
+    """获取当前应用的药品搜索后端（首次访问时按 DRUG_SEARCH_BACKEND 创建）"""
+    index = current_app.extensions.get('drug_search')
+    if index is None:
+        backend = current_app.config.get('DRUG_SEARCH_BACKEND', 'auto')
+        if backend == 'auto':
+            backend = Fts5DrugSearchIndex.name if fts5_available() else InMemoryDrugSearchIndex.name
+        index = BACKENDS[backend]()
+        current_app.extensions['drug_search'] = index
+    return index
+
+
+def filter_drugs_by_keyword(query, keyword: str, fields: Sequence[str] = SEARCH_FIELDS, rank: bool = True):
+    """按关键词筛选查询中的药品（见 DrugSearchIndex.apply）"""
+    return get_drug_search_index().apply(query, keyword, fields, rank)
+
+
+def search_drug_ids(keyword: str, fields: Sequence[str] = SEARCH_FIELDS, limit: Optional[int] = None) -> List[int]:
+    """匹配关键词的药品 ID（按相关度排序）"""
+    return get_drug_search_index().search(keyword, fields, limit)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _track_drug_changes(session, flush_context):
+    if any(isinstance(obj, Drug) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['drug_search_dirty'] = True
+        mark_generations_stale(session, [GENERATION_NAME])
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('drug_search_dirty', False) and has_app_context():
+        index = current_app.extensions.get('drug_search')
+        if index is not None:
+            index.invalidate()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_drug_changes(session):
+    session.info.pop('drug_search_dirty', None)
@@ -0,0 +1,275 @@
+"""
+药品候选项（输入联想）索引
+功能：就近推荐输入框每输入一个字都会请求候选药品，原先每次都对库存批次和供应信息各做一次
+多表 join + LIKE '%关键词%' + GROUP BY 再在 Python 中合并。这里在内存中维护：
+
+- 药品（通用名, 商品名, 规格）→ 有货且有坐标的企业数（库存批次数量 > 0 或供应信息上架且可供数量 > 0）
+- 按字典序排列的检索词数组：通用名/商品名的每个后缀（前缀查找后缀即子串匹配），
+  安装了 pypinyin 时再加入全拼与首字母（及其从每个音节开始的后缀），如 amoxilin / amxl
+
+查询只做二分查找，不访问数据库。索引在首次查询时构建，超过 DRUG_SUGGESTION_REFRESH_SECONDS 后全量刷新
+（同步其他 worker 进程的写入）；本进程中库存、供应信息与企业坐标的变更在事务提交后增量更新，
+药品主数据变更后下次查询时重建。
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select, union
+
+from extensions import db
+from models import Drug, InventoryItem, SupplyInfo, Tenant
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+HAS_PINYIN = lazy_pinyin is not None
+
+# 默认全量刷新间隔（秒）
+DEFAULT_REFRESH_SECONDS = 300
+
+# 候选项：(通用名, 商品名, 规格)
+DrugKey = Tuple[str, str, str]
+
+
+def name_terms(name: str) -> Set[str]:
+    """药品名称的检索词：名称的所有后缀，以及全拼、首字母从每个音节开始的后缀"""
+    name = (name or '').strip().casefold()
+    terms = {name[i:] for i in range(len(name))}
+    if HAS_PINYIN and name:
+        syllables = [s for s in lazy_pinyin(name, errors='ignore') if s]
+        initials = [s[0] for s in lazy_pinyin(name, style=Style.FIRST_LETTER, errors='ignore') if s]
+        terms.update(''.join(syllables[i:]) for i in range(len(syllables)))
+        terms.update(''.join(initials[i:]) for i in range(len(initials)))
+    terms.discard('')
+    return terms
+
+
+def _holding_pairs(drug_ids: Optional[Iterable[int]] = None,
+                   tenant_ids: Optional[Iterable[int]] = None) -> Set[Tuple[int, int]]:
+    """有货的 (药品, 企业)：库存批次数量 > 0，或供应信息上架且可供数量 > 0"""
+    inventory = select(InventoryItem.drug_id, InventoryItem.tenant_id).where(InventoryItem.quantity > 0)
+    supply = select(SupplyInfo.drug_id, SupplyInfo.tenant_id).where(
+        SupplyInfo.status == 'ACTIVE',
+        SupplyInfo.available_quantity > 0
+    )
+    if drug_ids is not None:
+        drug_ids = list(drug_ids)
+        inventory = inventory.where(InventoryItem.drug_id.in_(drug_ids))
+        supply = supply.where(SupplyInfo.drug_id.in_(drug_ids))
+    if tenant_ids is not None:
+        tenant_ids = list(tenant_ids)
+        inventory = inventory.where(InventoryItem.tenant_id.in_(tenant_ids))
+        supply = supply.where(SupplyInfo.tenant_id.in_(tenant_ids))
+    return {(drug_id, tenant_id) for drug_id, tenant_id in db.session.execute(union(inventory, supply))}
+
+
+class DrugSuggestionIndex:
+    """药品候选项内存索引"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._terms: List[Tuple[str, DrugKey]] = []
+        self._drug_keys: Dict[int, DrugKey] = {}
+        self._key_drugs: Dict[DrugKey, Set[int]] = defaultdict(set)
+        self._holders: Dict[int, Set[int]] = defaultdict(set)
+        self._tenant_drugs: Dict[int, Set[int]] = defaultdict(set)
+        self._located: Set[int] = set()
+        self._counts: Dict[DrugKey, int] = {}
+        self.loaded_at: Optional[float] = None
+
+    def rebuild(self):
+        """从数据库全量构建"""
+        drug_keys = {
+            drug_id: (generic_name, brand_name, specification)
+            for drug_id, generic_name, brand_name, specification in db.session.query(
+                Drug.id, Drug.generic_name, Drug.brand_name, Drug.specification
+            )
+        }
+        key_terms = defaultdict(set)
+        for key in drug_keys.values():
+            key_terms[key].update(name_terms(key[0]), name_terms(key[1]))
+        terms = sorted((term, key) for key, values in key_terms.items() for term in values)
+        pairs = _holding_pairs()
+        located = {tenant_id for tenant_id, in db.session.query(Tenant.id).filter(
+            Tenant.longitude.isnot(None),
+            Tenant.latitude.isnot(None)
+        )}
+
+        with self._lock:
+            self._terms = terms
+            self._drug_keys = drug_keys
+            self._key_drugs = defaultdict(set)
+            for drug_id, key in drug_keys.items():
+                self._key_drugs[key].add(drug_id)
+            self._holders = defaultdict(set)
+            self._tenant_drugs = defaultdict(set)
+            for drug_id, tenant_id in pairs:
+                self._holders[drug_id].add(tenant_id)
+                self._tenant_drugs[tenant_id].add(drug_id)
+            self._located = located
+            self._counts = {}
+            for key in self._key_drugs:
+                self._recount(key)
+            self.loaded_at = time.time()
+
+    def _recount(self, key: DrugKey):
+        tenants = set()
+        for drug_id in self._key_drugs.get(key, ()):
+            tenants |= self._holders.get(drug_id, set())
+        count = len(tenants & self._located)
+        if count:
+            self._counts[key] = count
+        else:
+            self._counts.pop(key, None)
+
+    def apply_holdings(self, drug_id: int, tenant_id: int, holds: bool):
+        """更新一个企业是否有某药品的货"""
+        with self._lock:
+            if holds:
+                self._holders[drug_id].add(tenant_id)
+                self._tenant_drugs[tenant_id].add(drug_id)
+            else:
+                self._holders.get(drug_id, set()).discard(tenant_id)
+                self._tenant_drugs.get(tenant_id, set()).discard(drug_id)
+            key = self._drug_keys.get(drug_id)
+            if key is not None:
+                self._recount(key)
+
+    def apply_location(self, tenant_id: int, located: bool):
+        """更新企业是否有坐标"""
+        with self._lock:
+            if located:
+                self._located.add(tenant_id)
+            else:
+                self._located.discard(tenant_id)
+            for drug_id in self._tenant_drugs.get(tenant_id, ()):
+                key = self._drug_keys.get(drug_id)
+                if key is not None:
+                    self._recount(key)
+
+    def supplier_count(self, generic_name: str, brand_name: str, specification: str) -> int:
+        return self._counts.get((generic_name, brand_name, specification), 0)
+
+    def suggest(self, keyword: str, limit: int = 10) -> List[dict]:
+        """
+        按关键词（名称子串、全拼或首字母前缀）返回候选药品，按有货企业数从多到少排序
+        """
+        prefix = (keyword or '').strip().casefold()
+        if not prefix or limit <= 0:
+            return []
+
+        with self._lock:
+            matched = {}
+            position = bisect_left(self._terms, (prefix,))
+            while position < len(self._terms):
+                term, key = self._terms[position]
+                if not term.startswith(prefix):
+                    break
+                count = self._counts.get(key)
+                if count:
+                    matched[key] = count
+                position += 1
+
+        ranked = sorted(matched.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [
+            {
+                'generic_name': generic_name,
+                'brand_name': brand_name,
+                'specification': specification,
+                'supplier_count': count
+            }
+            for (generic_name, brand_name, specification), count in ranked
+        ]
+
+
+def get_drug_suggestion_index() -> DrugSuggestionIndex:
+    """
+    获取当前应用的药品候选项索引
+
+    首次访问时从数据库构建；超过 DRUG_SUGGESTION_REFRESH_SECONDS 后全量刷新。
+    """
+    index = current_app.extensions.get('drug_suggestions')
+    if index is None:
+        index = DrugSuggestionIndex()
+        current_app.extensions['drug_suggestions'] = index
+
+    refresh_seconds = current_app.config.get('DRUG_SUGGESTION_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+    if index.loaded_at is None or time.time() - index.loaded_at > refresh_seconds:
+        index.rebuild()
+    return index
+
+
+def _pending(session) -> dict:
+    return session.info.setdefault('drug_suggestions', {'holdings': {}, 'locations': {}, 'drugs': False})
+
+
+def _stage_holdings(session, pairs: Set[Tuple[int, int]]):
+    """在当前事务中查出这些 (药品, 企业) 是否有货，提交后再写入索引"""
+    pairs = {(drug_id, tenant_id) for drug_id, tenant_id in pairs if drug_id and tenant_id}
+    if not pairs:
+        return
+    holding = _holding_pairs({drug_id for drug_id, _ in pairs}, {tenant_id for _, tenant_id in pairs})
+    staged = _pending(session)['holdings']
+    for pair in pairs:
+        staged[pair] = pair in holding
+
+
+def mark_drug_holdings_changed(tenant_id: int, drug_id: int):
+    """
+    绕过 ORM 修改了库存或供应信息（如 Core UPDATE）后调用，使候选项索引在提交后更新
+
+    ORM 对象的增删改由 flush 事件自动处理。
+    """
+    if has_app_context() and current_app.extensions.get('drug_suggestions') is not None:
+        _stage_holdings(db.session(), {(drug_id, tenant_id)})
+
+
+@event.listens_for(db.session, 'after_flush')
+def _track_suggestion_changes(session, flush_context):
+    if not has_app_context() or current_app.extensions.get('drug_suggestions') is None:
+        return
+
+    pairs = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (InventoryItem, SupplyInfo)):
+            pairs.add((obj.drug_id, obj.tenant_id))
+            # 批次或供应信息换了药品/企业时，原来的组合也要更新
+            for attr in ('drug_id', 'tenant_id'):
+                history = inspect(obj).attrs[attr].history
+                for old in history.deleted or ():
+                    pairs.add((old, obj.tenant_id) if attr == 'drug_id' else (obj.drug_id, old))
+        elif isinstance(obj, Tenant) and obj.id is not None:
+            located = obj not in session.deleted and obj.longitude is not None and obj.latitude is not None
+            _pending(session)['locations'][obj.id] = located
+        elif isinstance(obj, Drug):
+            _pending(session)['drugs'] = True
+    _stage_holdings(session, pairs)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_suggestion_changes(session):
+    pending = session.info.pop('drug_suggestions', None)
+    if not pending or not has_app_context():
+        return
+    index = current_app.extensions.get('drug_suggestions')
+    if index is None or index.loaded_at is None:
+        return
+    if pending['drugs']:
+        # 药品名称或规格变了，检索词需要重建，下次查询时全量构建
+        index.loaded_at = None
+        return
+    for (drug_id, tenant_id), holds in pending['holdings'].items():
+        index.apply_holdings(drug_id, tenant_id, holds)
+    for tenant_id, located in pending['locations'].items():
+        index.apply_location(tenant_id, located)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_suggestion_changes(session):
+    session.info.pop('drug_suggestions', None)
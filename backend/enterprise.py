@@ -10,6 +10,8 @@ from extensions import db
 from audit import record_admin_action
 from models import EnterpriseCertification, EnterpriseReviewLog, User, Tenant, to_iso
 from auth import get_authenticated_user
+from geo_index import sync_tenant_location
+from batch_geocoder import batch_geocode_tenants
 
 bp = Blueprint('enterprise', __name__, url_prefix='/api/enterprise')
 
@@ -424,11 +426,11 @@ def batch_update_tenant_locations():
         "success": true,
         "updated": 10,
         "failed": 2,
+        "cache_hits": 3,     // 命中地理编码缓存的数量
+        "remote_calls": 9,   // 实际调用高德 API 的地址数（已去重）
         "details": [...]
     }
     """
-    from amap import AmapService
-    
     try:
         user = get_authenticated_user()
         
@@ -450,73 +452,72 @@ def batch_update_tenant_locations():
         
         tenants = query.all()
         
-        updated = 0
         failed = 0
         details = []
+        to_geocode = []
         
         for tenant in tenants:
-            try:
-                # 如果已有坐标，跳过
-                if tenant.longitude and tenant.latitude:
+            # 如果已有坐标，跳过
+            if tenant.longitude and tenant.latitude:
+                details.append({
+                    'tenant_id': tenant.id,
+                    'name': tenant.name,
+                    'status': 'skipped',
+                    'message': '已有坐标'
+                })
+                continue
+            
+            # 如果没有地址，无法地理编码
+            if not tenant.address:
+                details.append({
+                    'tenant_id': tenant.id,
+                    'name': tenant.name,
+                    'status': 'failed',
+                    'message': '缺少地址信息'
+                })
+                failed += 1
+                continue
+            
+            to_geocode.append(tenant)
+        
+        # 并发批量地理编码（经缓存、限流与重试），坐标批量写回
+        report = {'updated': 0, 'cache_hits': 0, 'remote_calls': 0, 'elapsed': 0}
+        if auto_geocode and to_geocode:
+            report = batch_geocode_tenants(to_geocode)
+            for tenant in to_geocode:
+                result = report['results'].get(tenant.id)
+                if result:
                     details.append({
                         'tenant_id': tenant.id,
                         'name': tenant.name,
-                        'status': 'skipped',
-                        'message': '已有坐标'
+                        'status': 'success',
+                        'longitude': result['longitude'],
+                        'latitude': result['latitude']
                     })
-                    continue
-                
-                # 如果没有地址，无法地理编码
-                if not tenant.address:
+                else:
                     details.append({
                         'tenant_id': tenant.id,
                         'name': tenant.name,
                         'status': 'failed',
-                        'message': '缺少地址信息'
+                        'message': '地理编码失败'
                     })
                     failed += 1
-                    continue
-                
-                # 执行地理编码
-                if auto_geocode:
-                    geocode_result = AmapService.geocode_address(tenant.address)
-                    
-                    if geocode_result:
-                        tenant.longitude = geocode_result['longitude']
-                        tenant.latitude = geocode_result['latitude']
-                        updated += 1
-                        details.append({
-                            'tenant_id': tenant.id,
-                            'name': tenant.name,
-                            'status': 'success',
-                            'longitude': tenant.longitude,
-                            'latitude': tenant.latitude
-                        })
-                    else:
-                        details.append({
-                            'tenant_id': tenant.id,
-                            'name': tenant.name,
-                            'status': 'failed',
-                            'message': '地理编码失败'
-                        })
-                        failed += 1
-                
-            except Exception as e:
-                details.append({
-                    'tenant_id': tenant.id,
-                    'name': tenant.name,
-                    'status': 'error',
-                    'message': str(e)
-                })
-                failed += 1
+        updated = report['updated']
         
         db.session.commit()
         
+        # 同步就近推荐的供应商空间索引
+        for tenant in to_geocode:
+            sync_tenant_location(tenant)
+        
         return jsonify({
             'success': True,
             'updated': updated,
             'failed': failed,
             'total': len(tenants),
+            'cache_hits': report['cache_hits'],
+            'remote_calls': report['remote_calls'],
+            'elapsed': report['elapsed'],
             'details': details
         })
         
@@ -1,9 +1,33 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_mail import Mail
 
-db = SQLAlchemy()
+# 只读引擎在 app.extensions 中的键（见 db_utils.install_database_hooks），未配置时所有查询都走主库
+READ_ENGINE_KEY = 'read_engine'
+
+
+class RoutingSession(Session):
+    """
+    读写分离的会话：标记为只读（session.info['use_read_engine']）时查询走只读引擎；
+    一旦本会话写入过（flush 或直接执行 INSERT/UPDATE/DELETE），之后的查询都回到主库，保证读到自己刚写入的数据
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if clause is not None and getattr(clause, 'is_dml', False):
+            # db.session.execute(update(...)) 等语句不经过 flush，同样写主库
+            self.info['wrote'] = True
+        elif (bind is None and self.info.get('use_read_engine') and not self.info.get('wrote')
+                and not self._flushing):
+            engine = current_app.extensions.get(READ_ENGINE_KEY) if has_app_context() else None
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
 mail = Mail()
@@ -0,0 +1,364 @@
+"""
+多车辆配送计划
+功能：把待配送订单的目的地分配给多辆有装载上限的车辆，并为每辆车规划访问顺序
+
+求解分三步：
+1. 选点：总需求超出车队总容量时，按期望送达日期从晚到早暂缓部分订单
+   （未填写期望日期的最先暂缓），单个订单超过任一车辆容量的直接标记为无法装载
+2. 分组：以起点为中心按极角扫描分组（sweep），尝试多个起始角度，取估算总里程最短的分组，
+   再做跨车辆的单点迁移（relocate）改进
+3. 排序：各车辆路线互不相关，在进程池中并行调用 route_optimizer 求解访问顺序
+"""
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import route_optimizer
+from geo_distance import haversine_matrix
+
+DEFAULT_TIME_BUDGET = 2.0
+
+# 扫描分组尝试的起始角度数量
+SWEEP_STARTS = 16
+
+# 目的地不超过该数量的路线直接用 Held-Karp 求精确解
+EXACT_ROUTE_SIZE = 10
+
+_EPS = 1e-7
+
+
+def plan_fleet(depot: Tuple[float, float],
+               stops: List[Dict],
+               capacities: Sequence[float],
+               plan_date: Optional[date] = None,
+               time_budget: float = DEFAULT_TIME_BUDGET,
+               workers: Optional[int] = None) -> Dict:
+    """
+    多车辆配送计划
+
+    Args:
+        depot: 起点坐标 (longitude, latitude)，所有车辆从这里出发（不返回）
+        stops: 目的地列表，每项包含 'longitude', 'latitude', 'demand'（装载量），
+               可选 'expected_delivery_date'（date），其余字段原样返回
+        capacities: 每辆车的装载上限，长度即车辆数
+        plan_date: 计划配送日期（默认今天），早于该日期的期望送达视为已逾期
+        time_budget: 求解时间预算（秒）
+        workers: 并行求解路线的进程数，0 表示在当前进程内求解，None 表示按 CPU 数
+
+    Returns:
+        {
+            'vehicles': [{'vehicle': 1, 'capacity', 'load', 'distance', 'stops': [...]}, ...],
+            'unassigned': [{...目的地, 'reason': 'capacity' 或 'oversize'}],
+            'total_distance': 总里程（米）,
+            'iterations': 局部搜索改进次数（含跨车辆迁移）,
+            'elapsed': 耗时（秒）
+        }
+    """
+    started = time.perf_counter()
+    deadline = started + max(0.0, time_budget)
+    plan_date = plan_date or date.today()
+
+    selected, unassigned = _select_stops(stops, capacities, plan_date)
+    points = [depot] + [(s['longitude'], s['latitude']) for s in selected]
+    demands = [0.0] + [float(s.get('demand') or 0) for s in selected]
+    matrix = haversine_matrix(points)
+
+    routes = _sweep(points, demands, capacities, matrix)
+    # 扫描分组时因装箱碎片放不下的点，先尝试插入仍有余量的车辆，
+    # 再尝试替换掉一个不如它紧急的已装车点
+    ranks = [None] + [_priority(stop, plan_date) for stop in selected]
+    assigned = {node for route in routes for node in route}
+    leftovers = [node for node in range(1, len(points)) if node not in assigned]
+    for node in sorted(leftovers, key=lambda i: ranks[i]):
+        if _insert_cheapest(matrix, routes, demands, capacities, node):
+            continue
+        evicted = _swap_less_urgent(matrix, routes, demands, capacities, ranks, node)
+        dropped = node if evicted is None else evicted
+        unassigned.append(dict(selected[dropped - 1], reason='capacity'))
+
+    relocations = _relocate(matrix, routes, demands, capacities, deadline)
+
+    remaining = max(0.0, deadline - time.perf_counter())
+    solutions = _solve_routes(points, routes, remaining, workers)
+
+    vehicles = []
+    total_distance = 0.0
+    iterations = relocations
+    for index, (route, solution) in enumerate(zip(routes, solutions)):
+        stops_out = []
+        distance = 0.0
+        if route:
+            sub_matrix = _sub_matrix(matrix, route)
+            prev = 0
+            for position, local in enumerate(solution['order'], 1):
+                node = route[local - 1]
+                leg = sub_matrix[prev][local]
+                stop = dict(selected[node - 1])
+                stop['order'] = position
+                stop['distance_from_prev'] = leg
+                stop['overdue'] = _is_overdue(stop, plan_date)
+                stops_out.append(stop)
+                distance += leg
+                prev = local
+            iterations += solution['iterations']
+        total_distance += distance
+        vehicles.append({
+            'vehicle': index + 1,
+            'capacity': capacities[index],
+            'load': sum(demands[node] for node in route),
+            'distance': round(distance, 2),
+            'stops': stops_out
+        })
+
+    return {
+        'vehicles': vehicles,
+        'unassigned': unassigned,
+        'total_distance': round(total_distance, 2),
+        'iterations': iterations,
+        'elapsed': round(time.perf_counter() - started, 4)
+    }
+
+
+def _is_overdue(stop: Dict, plan_date: date) -> bool:
+    due = stop.get('expected_delivery_date')
+    return due is not None and due < plan_date
+
+
+def _priority(stop: Dict, plan_date: date) -> Tuple[bool, date]:
+    """紧急程度排序键：期望日期越早越优先，未填写期望日期的排在最后"""
+    due = stop.get('expected_delivery_date')
+    return (due is None, due or plan_date)
+
+
+def _select_stops(stops: List[Dict], capacities: Sequence[float],
+                  plan_date: date) -> Tuple[List[Dict], List[Dict]]:
+    """按期望送达日期的紧急程度选出本次配送的目的地"""
+    largest = max(capacities) if capacities else 0
+    unassigned = []
+    candidates = []
+    for stop in stops:
+        if float(stop.get('demand') or 0) > largest:
+            unassigned.append(dict(stop, reason='oversize'))
+        else:
+            candidates.append(stop)
+
+    ranked = sorted(enumerate(candidates), key=lambda item: (_priority(item[1], plan_date), item[0]))
+    budget = float(sum(capacities))
+    selected_positions = set()
+    for position, stop in ranked:
+        demand = float(stop.get('demand') or 0)
+        if demand <= budget:
+            budget -= demand
+            selected_positions.add(position)
+        else:
+            unassigned.append(dict(stop, reason='capacity'))
+
+    selected = [stop for position, stop in enumerate(candidates) if position in selected_positions]
+    return selected, unassigned
+
+
+def _sweep(points, demands, capacities, matrix) -> List[List[int]]:
+    """按极角扫描分组，返回估算总里程最短的分组（每组为按最近邻排好的点编号）"""
+    n = len(points)
+    vehicles = len(capacities)
+    if n <= 1:
+        return [[] for _ in range(vehicles)]
+
+    depot_lon, depot_lat = points[0]
+    scale = math.cos(math.radians(depot_lat))
+    by_angle = sorted(
+        range(1, n),
+        key=lambda i: math.atan2(points[i][1] - depot_lat, (points[i][0] - depot_lon) * scale)
+    )
+
+    starts = sorted({round(k * len(by_angle) / SWEEP_STARTS) % len(by_angle)
+                     for k in range(SWEEP_STARTS)})
+    best_routes, best_length = None, math.inf
+    for start in starts:
+        sequence = by_angle[start:] + by_angle[:start]
+        routes = _fill_vehicles(sequence, demands, capacities)
+        routes = [_nearest_neighbor_order(matrix, route) for route in routes]
+        length = sum(_route_length(matrix, route) for route in routes)
+        if length < best_length:
+            best_routes, best_length = routes, length
+    return best_routes
+
+
+def _fill_vehicles(sequence, demands, capacities) -> List[List[int]]:
+    """
+    按扫描顺序依次装车：每辆车开始装载时按剩余需求平均分摊得到份额，
+    装到份额或容量上限后换下一辆；放不下的点留给调用方做插入
+    """
+    routes = [[] for _ in capacities]
+    remaining = sum(demands[node] for node in sequence)
+    vehicle, load = 0, 0.0
+    share = remaining / len(capacities)
+    for node in sequence:
+        demand = demands[node]
+        while routes[vehicle] and (load + demand > capacities[vehicle] or load >= share):
+            vehicle += 1
+            if vehicle >= len(capacities):
+                return routes
+            load, share = 0.0, remaining / (len(capacities) - vehicle)
+        if load + demand > capacities[vehicle]:
+            continue
+        routes[vehicle].append(node)
+        load += demand
+        remaining -= demand
+    return routes
+
+
+def _nearest_neighbor_order(matrix, route: List[int]) -> List[int]:
+    if len(route) <= 1:
+        return list(route)
+    local = route_optimizer.nearest_neighbor(_sub_matrix(matrix, route))
+    return [route[i - 1] for i in local]
+
+
+def _sub_matrix(matrix, route: List[int]) -> List[List[float]]:
+    nodes = [0] + list(route)
+    return [[matrix[i][j] for j in nodes] for i in nodes]
+
+
+def _route_length(matrix, route: List[int]) -> float:
+    total, prev = 0.0, 0
+    for node in route:
+        total += matrix[prev][node]
+        prev = node
+    return total
+
+
+def _insertion(matrix, route: List[int], node: int) -> Tuple[float, int]:
+    """把 node 插入 route 的最小增量与位置（位置 q 表示插在 route[q] 之前）"""
+    best_cost, best_position = math.inf, 0
+    prev = 0
+    for position in range(len(route) + 1):
+        nxt = route[position] if position < len(route) else None
+        cost = matrix[prev][node]
+        if nxt is not None:
+            cost += matrix[node][nxt] - matrix[prev][nxt]
+        if cost < best_cost:
+            best_cost, best_position = cost, position
+        prev = nxt
+    return best_cost, best_position
+
+
+def _insert_cheapest(matrix, routes, demands, capacities, node) -> bool:
+    best = None
+    for index, route in enumerate(routes):
+        if sum(demands[i] for i in route) + demands[node] > capacities[index]:
+            continue
+        cost, position = _insertion(matrix, route, node)
+        if best is None or cost < best[0]:
+            best = (cost, index, position)
+    if best is None:
+        return False
+    routes[best[1]].insert(best[2], node)
+    return True
+
+
+def _swap_less_urgent(matrix, routes, demands, capacities, ranks, node) -> Optional[int]:
+    """用 node 替换某辆车上最不紧急且腾出空间后能装下 node 的点，返回被替换的点"""
+    best = None
+    for index, route in enumerate(routes):
+        load = sum(demands[i] for i in route)
+        for position, other in enumerate(route):
+            if ranks[other] <= ranks[node] or load - demands[other] + demands[node] > capacities[index]:
+                continue
+            if best is None or ranks[other] > ranks[best[2]]:
+                best = (index, position, other)
+    if best is None:
+        return None
+    index, position, evicted = best
+    route = routes[index]
+    route.pop(position)
+    _, insert_at = _insertion(matrix, route, node)
+    route.insert(insert_at, node)
+    return evicted
+
+
+def _relocate(matrix, routes, demands, capacities, deadline) -> int:
+    """跨车辆单点迁移：把某个点移到另一辆车的最佳位置能缩短总里程且不超载时执行"""
+    loads = [sum(demands[node] for node in route) for route in routes]
+    moves = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for source, route in enumerate(routes):
+            position = 0
+            while position < len(route):
+                node = route[position]
+                prev = route[position - 1] if position > 0 else 0
+                nxt = route[position + 1] if position + 1 < len(route) else None
+                gain = matrix[prev][node]
+                if nxt is not None:
+                    gain += matrix[node][nxt] - matrix[prev][nxt]
+
+                best = None
+                for target, other in enumerate(routes):
+                    if target == source or loads[target] + demands[node] > capacities[target]:
+                        continue
+                    cost, insert_at = _insertion(matrix, other, node)
+                    if gain - cost > _EPS and (best is None or cost < best[0]):
+                        best = (cost, target, insert_at)
+
+                if best is None:
+                    position += 1
+                    continue
+                _, target, insert_at = best
+                route.pop(position)
+                routes[target].insert(insert_at, node)
+                loads[source] -= demands[node]
+                loads[target] += demands[node]
+                moves += 1
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return moves
+
+
+def _solve_route(payload) -> Dict:
+    """求解单辆车的访问顺序（在工作进程中执行）"""
+    points, time_budget = payload
+    matrix = haversine_matrix(points)
+    algorithm = 'dp' if len(points) - 1 <= EXACT_ROUTE_SIZE else 'local_search'
+    return route_optimizer.solve(matrix, algorithm, time_budget)
+
+
+def _solve_routes(points, routes, time_budget, workers) -> List[Dict]:
+    payloads = []
+    for route in routes:
+        route_points = [points[0]] + [points[node] for node in route]
+        payloads.append((route_points, time_budget))
+
+    busy = [i for i, route in enumerate(routes) if len(route) > 1]
+    results = [
+        {'order': list(range(1, len(route) + 1)), 'iterations': 0}
+        for route in routes
+    ]
+    if not busy:
+        return results
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(busy))
+
+    solved = None
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                solved = list(pool.map(_solve_route, [payloads[i] for i in busy]))
+        except (BrokenProcessPool, OSError) as e:
+            print(f"配送计划进程池不可用，改为当前进程求解: {str(e)}")
+    if solved is None:
+        # 在当前进程内依次求解时平分时间预算
+        share = time_budget / len(busy)
+        solved = [_solve_route((payloads[i][0], share)) for i in busy]
+
+    for i, solution in zip(busy, solved):
+        results[i] = solution
+    return results
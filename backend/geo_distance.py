@@ -0,0 +1,123 @@
+"""
+批量直线距离计算
+功能：一次调用计算一点到多点、多点两两之间的 Haversine 距离。
+安装了 NumPy 时按数组向量化计算，否则退回纯 Python 实现（结果一致）
+"""
+import math
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 地球平均半径（米），与 AmapService.calculate_distance_haversine 保持一致
+EARTH_RADIUS = 6371000
+
+HAS_NUMPY = np is not None
+
+
+def _want_numpy(use_numpy: Optional[bool]) -> bool:
+    if use_numpy is None:
+        return HAS_NUMPY
+    if use_numpy and not HAS_NUMPY:
+        raise RuntimeError('NumPy 未安装，无法使用向量化距离计算')
+    return use_numpy
+
+
+def haversine_one_to_many(longitude: float, latitude: float,
+                          points: Sequence[Tuple[float, float]],
+                          use_numpy: Optional[bool] = None) -> List[float]:
+    """
+    计算一个点到多个点的直线距离
+
+    Args:
+        longitude, latitude: 起点经纬度
+        points: 目标点列表 [(lon, lat), ...]
+        use_numpy: 是否使用 NumPy，None 表示已安装时自动使用
+
+    Returns:
+        与 points 顺序一致的距离列表（米，保留两位小数）
+    """
+    if not points:
+        return []
+    if _want_numpy(use_numpy):
+        return _one_to_many_numpy(longitude, latitude, points)
+    return _one_to_many_python(longitude, latitude, points)
+
+
+def haversine_matrix(points: Sequence[Tuple[float, float]],
+                     use_numpy: Optional[bool] = None) -> List[List[float]]:
+    """
+    计算多个点两两之间的直线距离矩阵
+
+    Args:
+        points: 坐标列表 [(lon, lat), ...]
+        use_numpy: 是否使用 NumPy，None 表示已安装时自动使用
+
+    Returns:
+        对称矩阵 matrix[i][j]（米，保留两位小数），对角线为 0
+    """
+    if not points:
+        return []
+    if _want_numpy(use_numpy):
+        return _matrix_numpy(points)
+    return _matrix_python(points)
+
+
+def _one_to_many_numpy(longitude, latitude, points):
+    coords = np.asarray(points, dtype=float)
+    a = (np.sin(np.radians(coords[:, 1] - latitude) / 2) ** 2 +
+         math.cos(math.radians(latitude)) * np.cos(np.radians(coords[:, 1])) *
+         np.sin(np.radians(coords[:, 0] - longitude) / 2) ** 2)
+    distances = EARTH_RADIUS * (2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))))
+    return np.round(distances, 2).tolist()
+
+
+def _matrix_numpy(points):
+    coords = np.asarray(points, dtype=float)
+    lons, lats = coords[:, 0], coords[:, 1]
+    cos_lats = np.cos(np.radians(lats))
+    a = (np.sin(np.radians(lats[None, :] - lats[:, None]) / 2) ** 2 +
+         cos_lats[:, None] * cos_lats[None, :] *
+         np.sin(np.radians(lons[None, :] - lons[:, None]) / 2) ** 2)
+    distances = EARTH_RADIUS * (2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))))
+    distances = np.round(distances, 2)
+    # 只取上三角再镜像，保证矩阵严格对称
+    upper = np.triu(distances, 1)
+    return (upper + upper.T).tolist()
+
+
+# 纯 Python 实现与 AmapService.calculate_distance_haversine 的运算顺序一致，
+# 结果逐位相同；区别只是起点的三角函数值只算一次
+def _one_to_many_python(longitude, latitude, points):
+    sin, cos, asin, sqrt, radians = math.sin, math.cos, math.asin, math.sqrt, math.radians
+    cos_lat0 = cos(radians(latitude))
+    distances = []
+    for lon, lat in points:
+        a = (sin(radians(lat - latitude) / 2) ** 2 +
+             cos_lat0 * cos(radians(lat)) *
+             sin(radians(lon - longitude) / 2) ** 2)
+        distances.append(round(EARTH_RADIUS * (2 * asin(sqrt(a))), 2))
+    return distances
+
+
+def _matrix_python(points):
+    sin, cos, asin, sqrt, radians = math.sin, math.cos, math.asin, math.sqrt, math.radians
+    n = len(points)
+    cos_lats = [cos(radians(lat)) for _, lat in points]
+
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        lon_i, lat_i = points[i]
+        cos_i = cos_lats[i]
+        row = matrix[i]
+        for j in range(i + 1, n):
+            lon_j, lat_j = points[j]
+            a = (sin(radians(lat_j - lat_i) / 2) ** 2 +
+                 cos_i * cos_lats[j] *
+                 sin(radians(lon_j - lon_i) / 2) ** 2)
+            distance = round(EARTH_RADIUS * (2 * asin(sqrt(a))), 2)
+            row[j] = distance
+            matrix[j][i] = distance
+    return matrix
@@ -0,0 +1,307 @@
+"""
+供应商空间索引模块
+功能：基于经纬度网格的内存索引，支持半径过滤与 K 近邻查询
+
+就近推荐原先每次请求都对全部供应商逐个计算距离再整体排序，
+这里按固定大小的经纬度网格把供应商坐标分桶，查询时从药店所在网格
+向外逐圈扩展，配合有界堆在结果足够近时提前结束，只访问附近的网格。
+"""
+import heapq
+import math
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import current_app
+
+from amap import AmapService
+from geo_distance import haversine_one_to_many
+
+# 地球平均半径（米），与 AmapService.calculate_distance_haversine 保持一致
+EARTH_RADIUS = 6371000
+
+# 默认网格边长（度），约 1.1km
+DEFAULT_CELL_SIZE = 0.01
+
+# 默认索引全量刷新间隔（秒），用于同步其他 worker 进程写入的坐标
+DEFAULT_REFRESH_SECONDS = 60
+
+Cell = Tuple[int, int]
+
+
+class SupplierSpatialIndex:
+    """供应商经纬度网格索引"""
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells: Dict[Cell, Dict[int, Tuple[float, float]]] = {}
+        self._points: Dict[int, Tuple[float, float]] = {}
+        # 每行、每列已占用的网格数，以及网格范围（行最小/最大, 列最小/最大），None 表示需要重新计算
+        self._row_cells: Counter = Counter()
+        self._col_cells: Counter = Counter()
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+        self._lock = threading.RLock()
+        self.loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, tenant_id: int) -> bool:
+        return tenant_id in self._points
+
+    def _cell_of(self, longitude: float, latitude: float) -> Cell:
+        return (int(math.floor(latitude / self.cell_size)),
+                int(math.floor(longitude / self.cell_size)))
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+            self._row_cells.clear()
+            self._col_cells.clear()
+            self._bounds = None
+            self.loaded_at = None
+
+    def upsert(self, tenant_id: int, longitude: float, latitude: float):
+        """新增或移动一个供应商坐标"""
+        with self._lock:
+            self._discard(tenant_id)
+            cell = self._cell_of(longitude, latitude)
+            if cell not in self._cells:
+                self._cells[cell] = {}
+                self._occupy(cell)
+            self._cells[cell][tenant_id] = (longitude, latitude)
+            self._points[tenant_id] = (longitude, latitude)
+
+    def remove(self, tenant_id: int):
+        """从索引中移除供应商"""
+        with self._lock:
+            self._discard(tenant_id)
+
+    def _discard(self, tenant_id: int):
+        point = self._points.pop(tenant_id, None)
+        if point is None:
+            return
+        cell = self._cell_of(*point)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(tenant_id, None)
+            if not bucket:
+                del self._cells[cell]
+                self._vacate(cell)
+
+    def _occupy(self, cell: Cell):
+        """新占用一个网格：更新行列计数并扩展网格范围"""
+        row, col = cell
+        self._row_cells[row] += 1
+        self._col_cells[col] += 1
+        if self._bounds is not None:
+            min_row, max_row, min_col, max_col = self._bounds
+            self._bounds = (min(min_row, row), max(max_row, row), min(min_col, col), max(max_col, col))
+
+    def _vacate(self, cell: Cell):
+        """网格清空：更新行列计数，边界上的行或列被清空时让网格范围失效"""
+        row, col = cell
+        for counter, key, edge in ((self._row_cells, row, 0), (self._col_cells, col, 2)):
+            counter[key] -= 1
+            if counter[key] == 0:
+                del counter[key]
+                if self._bounds is not None and key in self._bounds[edge:edge + 2]:
+                    self._bounds = None
+
+    def _grid_bounds(self) -> Tuple[int, int, int, int]:
+        """已占用网格的行、列范围（只在边界行列被清空后按行列计数重新计算）"""
+        if self._bounds is None:
+            self._bounds = (min(self._row_cells), max(self._row_cells),
+                            min(self._col_cells), max(self._col_cells))
+        return self._bounds
+
+    def rebuild(self, points: Iterable[Tuple[int, float, float]]):
+        """
+        用 (tenant_id, longitude, latitude) 序列全量重建索引
+        """
+        cells: Dict[Cell, Dict[int, Tuple[float, float]]] = {}
+        all_points: Dict[int, Tuple[float, float]] = {}
+        for tenant_id, longitude, latitude in points:
+            if longitude is None or latitude is None:
+                continue
+            cells.setdefault(self._cell_of(longitude, latitude), {})[tenant_id] = (longitude, latitude)
+            all_points[tenant_id] = (longitude, latitude)
+
+        with self._lock:
+            self._cells = cells
+            self._points = all_points
+            self._row_cells = Counter(row for row, _ in cells)
+            self._col_cells = Counter(col for _, col in cells)
+            self._bounds = None
+            self.loaded_at = time.time()
+
+    def count(self, candidate_ids: Optional[Set[int]] = None) -> int:
+        """统计索引中（可选：属于候选集合的）供应商数量"""
+        with self._lock:
+            if candidate_ids is None:
+                return len(self._points)
+            return sum(1 for tid in candidate_ids if tid in self._points)
+
+    def _ring_lower_bound(self, latitude: float, ring: int) -> float:
+        """
+        第 ring 圈及更外圈网格中任意点到查询点距离的下界（米）
+
+        查询点位于中心网格内，这些点的纬度差或经度差至少为 ring - 1 个网格边长，
+        分别按 Haversine 公式取下界。
+        """
+        if ring <= 1:
+            return 0.0
+        span = (ring - 1) * self.cell_size
+        delta = math.radians(span)
+        lat_bound = EARTH_RADIUS * delta
+        max_lat = min(abs(latitude) + span, 90.0)
+        factor = math.cos(math.radians(latitude)) * math.cos(math.radians(max_lat))
+        h = max(factor, 0.0) * math.sin(delta / 2) ** 2
+        lon_bound = 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(h)))
+        return min(lat_bound, lon_bound)
+
+    def nearest(self, longitude: float, latitude: float,
+                limit: int = 10,
+                max_distance: Optional[float] = None,
+                candidate_ids: Optional[Set[int]] = None) -> List[Tuple[float, int]]:
+        """
+        查询距离最近的供应商
+
+        Args:
+            longitude, latitude: 查询点坐标
+            limit: 返回数量上限
+            max_distance: 最大搜索半径（米），None 表示不限制
+            candidate_ids: 候选供应商ID集合（如有该药品供应的供应商），None 表示全部
+
+        Returns:
+            按距离升序排列的 [(distance, tenant_id), ...]，距离单位为米
+        """
+        if limit is None or limit <= 0:
+            return []
+
+        with self._lock:
+            if not self._points:
+                return []
+
+            # 候选集合远小于索引规模时，直接遍历候选点更省事
+            if candidate_ids is not None and len(candidate_ids) * 4 < len(self._points):
+                return self._scan(longitude, latitude, limit, max_distance,
+                                  ((tid, self._points[tid]) for tid in candidate_ids
+                                   if tid in self._points))
+
+            center_row, center_col = self._cell_of(longitude, latitude)
+            min_row, max_row, min_col, max_col = self._grid_bounds()
+            max_ring = max(
+                abs(center_row - min_row), abs(center_row - max_row),
+                abs(center_col - min_col), abs(center_col - max_col)
+            )
+
+            # 最大堆（存负距离），只保留当前最近的 limit 个
+            heap: List[Tuple[float, int]] = []
+            for ring in range(max_ring + 1):
+                bound = self._ring_lower_bound(latitude, ring)
+                if max_distance is not None and bound > max_distance:
+                    break
+                if len(heap) >= limit and -heap[0][0] <= bound:
+                    break
+
+                for cell in self._ring_cells(center_row, center_col, ring):
+                    bucket = self._cells.get(cell)
+                    if not bucket:
+                        continue
+                    for tenant_id, (lon, lat) in bucket.items():
+                        if candidate_ids is not None and tenant_id not in candidate_ids:
+                            continue
+                        distance = AmapService.calculate_distance_haversine(
+                            longitude, latitude, lon, lat
+                        )
+                        if max_distance is not None and distance > max_distance:
+                            continue
+                        item = (-distance, -tenant_id)
+                        if len(heap) < limit:
+                            heapq.heappush(heap, item)
+                        elif item > heap[0]:
+                            heapq.heapreplace(heap, item)
+
+        return sorted((-d, -tid) for d, tid in heap)
+
+    def _scan(self, longitude: float, latitude: float, limit: int,
+              max_distance: Optional[float],
+              points: Iterable[Tuple[int, Tuple[float, float]]]) -> List[Tuple[float, int]]:
+        points = list(points)
+        distances = haversine_one_to_many(longitude, latitude, [point for _, point in points])
+        results = [
+            (distance, tenant_id)
+            for (tenant_id, _), distance in zip(points, distances)
+            if max_distance is None or distance <= max_distance
+        ]
+        return heapq.nsmallest(limit, results)
+
+    @staticmethod
+    def _ring_cells(center_row: int, center_col: int, ring: int) -> Iterable[Cell]:
+        """枚举与中心网格切比雪夫距离恰为 ring 的网格"""
+        if ring == 0:
+            yield (center_row, center_col)
+            return
+        for col in range(center_col - ring, center_col + ring + 1):
+            yield (center_row - ring, col)
+            yield (center_row + ring, col)
+        for row in range(center_row - ring + 1, center_row + ring):
+            yield (row, center_col - ring)
+            yield (row, center_col + ring)
+
+
+def _load_supplier_points() -> List[Tuple[int, float, float]]:
+    """从数据库读取所有已设置坐标的活跃供应商"""
+    from models import Tenant
+
+    return Tenant.query.with_entities(
+        Tenant.id, Tenant.longitude, Tenant.latitude
+    ).filter(
+        Tenant.type == 'SUPPLIER',
+        Tenant.is_active == True,
+        Tenant.longitude.isnot(None),
+        Tenant.latitude.isnot(None)
+    ).all()
+
+
+def get_supplier_index() -> SupplierSpatialIndex:
+    """
+    获取当前应用的供应商索引
+
+    首次访问时从数据库构建；超过 SUPPLIER_INDEX_REFRESH_SECONDS 后全量刷新，
+    以便其他 worker 进程更新的坐标也能被看到。
+    """
+    index = current_app.extensions.get('supplier_index')
+    if index is None:
+        index = SupplierSpatialIndex(
+            cell_size=current_app.config.get('SUPPLIER_INDEX_CELL_SIZE', DEFAULT_CELL_SIZE)
+        )
+        current_app.extensions['supplier_index'] = index
+
+    refresh_seconds = current_app.config.get('SUPPLIER_INDEX_REFRESH_SECONDS',
+                                             DEFAULT_REFRESH_SECONDS)
+    if index.loaded_at is None or time.time() - index.loaded_at > refresh_seconds:
+        index.rebuild(_load_supplier_points())
+
+    return index
+
+
+def sync_tenant_location(tenant):
+    """
+    租户坐标或状态变更后同步索引（调用方应在提交事务之后调用）
+
+    索引尚未构建时无需处理，首次查询会从数据库全量加载。
+    """
+    index = current_app.extensions.get('supplier_index')
+    if index is None or index.loaded_at is None:
+        return
+
+    if (tenant.type == 'SUPPLIER' and tenant.is_active
+            and tenant.longitude is not None and tenant.latitude is not None):
+        index.upsert(tenant.id, tenant.longitude, tenant.latitude)
+    else:
+        index.remove(tenant.id)
@@ -0,0 +1,258 @@
+"""
+地理编码持久化缓存
+功能：按规范化的 地址+城市 缓存高德地理编码结果（含无法解析的负缓存），
+并把解析出的坐标回写到租户表，避免同一地址反复发起远程调用
+
+命中只在本进程计数，不写缓存表（读请求不产生写事务）；累计的命中次数在下一次写入缓存时一并落库
+"""
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import GeocodeCache
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存有效期：成功结果 30 天，无法解析的地址 1 天
+DEFAULT_TTL_DAYS = 30
+DEFAULT_NEGATIVE_TTL_HOURS = 24
+
+_stats_lock = threading.Lock()
+_stats = {
+    'hits': 0,            # 命中成功结果
+    'negative_hits': 0,   # 命中负缓存
+    'misses': 0,          # 未命中或已过期
+    'remote_calls': 0,    # 实际发起的远程调用
+    'stored': 0,          # 写入/刷新的缓存条目
+}
+# 尚未落库的命中次数：cache_key -> 次数
+_pending_hits = Counter()
+
+
+def _incr(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """全角转半角、去除首尾空白并合并连续空白、统一小写"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKC', value)
+    value = re.sub(r'\s+', ' ', value).strip()
+    return value.lower()
+
+
+def make_cache_key(address: str, city: Optional[str] = None) -> str:
+    raw = f"{normalize_text(city)}|{normalize_text(address)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _ttl(negative: bool) -> timedelta:
+    if negative:
+        hours = current_app.config.get('GEOCODE_CACHE_NEGATIVE_TTL_HOURS', DEFAULT_NEGATIVE_TTL_HOURS)
+        return timedelta(hours=hours)
+    days = current_app.config.get('GEOCODE_CACHE_TTL_DAYS', DEFAULT_TTL_DAYS)
+    return timedelta(days=days)
+
+
+def _entry_result(entry: GeocodeCache) -> Optional[Dict]:
+    if entry.is_negative:
+        return None
+    result = dict(entry.result or {})
+    result['longitude'] = entry.longitude
+    result['latitude'] = entry.latitude
+    return result
+
+
+def lookup_entries(keys: Iterable[str]) -> Dict[str, GeocodeCache]:
+    """批量读取缓存条目（包括已过期的，用于原地刷新），返回 cache_key -> 条目"""
+    keys = list(set(keys))
+    if not keys:
+        return {}
+    entries = GeocodeCache.query.filter(GeocodeCache.cache_key.in_(keys)).all()
+    return {entry.cache_key: entry for entry in entries}
+
+
+def is_fresh(entry: Optional[GeocodeCache]) -> bool:
+    return entry is not None and entry.expires_at > datetime.utcnow()
+
+
+def record_hit(entry: GeocodeCache) -> Optional[Dict]:
+    """记录一次缓存命中并返回缓存的结果（负缓存返回 None）"""
+    with _stats_lock:
+        _pending_hits[entry.cache_key] += 1
+    _incr('negative_hits' if entry.is_negative else 'hits')
+    return _entry_result(entry)
+
+
+def flush_hit_counts() -> int:
+    """把本进程累计的命中次数累加到缓存表（不提交事务），返回涉及的条目数"""
+    with _stats_lock:
+        pending = dict(_pending_hits)
+        _pending_hits.clear()
+    if not pending:
+        return 0
+    table = GeocodeCache.__table__
+    db.session.execute(
+        update(table).where(table.c.cache_key == bindparam('key')).values(
+            hit_count=table.c.hit_count + bindparam('hits')
+        ),
+        [{'key': key, 'hits': hits} for key, hits in pending.items()]
+    )
+    return len(pending)
+
+
+def record_miss():
+    """记录一次未命中（随后会发起远程调用）"""
+    _incr('misses')
+    _incr('remote_calls')
+
+
+def store_result(address: str, city: Optional[str], result: Optional[Dict],
+                 definitive: bool, entry: Optional[GeocodeCache] = None) -> Optional[GeocodeCache]:
+    """
+    写入或刷新缓存条目（不提交事务）
+
+    entry 为该地址已有的（过期）条目，为 None 时新建条目。
+    网络异常等非明确失败（result 为空且 definitive 为 False）不写入，下次仍会重试。
+    """
+    if result is None and not definitive:
+        return None
+
+    flush_hit_counts()
+    fields = {
+        'longitude': result['longitude'] if result else None,
+        'latitude': result['latitude'] if result else None,
+        'result': result,
+        'expires_at': datetime.utcnow() + _ttl(result is None),
+    }
+    if entry is None:
+        key = make_cache_key(address, city)
+        try:
+            # 多个 worker 同时未命中同一地址时唯一约束冲突，改为刷新已写入的条目
+            with db.session.begin_nested():
+                entry = GeocodeCache(
+                    cache_key=key,
+                    address=normalize_text(address)[:255],
+                    city=normalize_text(city)[:80],
+                    hit_count=0,
+                    **fields
+                )
+                db.session.add(entry)
+            _incr('stored')
+            return entry
+        except IntegrityError:
+            entry = GeocodeCache.query.filter_by(cache_key=key).one()
+
+    for name, value in fields.items():
+        setattr(entry, name, value)
+    _incr('stored')
+    return entry
+
+
+def geocode_with_cache(address: str, city: Optional[str],
+                       fetch: Callable[[str, Optional[str]], Tuple[Optional[Dict], bool]]) -> Optional[Dict]:
+    """
+    先查缓存，未命中或过期时调用 fetch 获取结果并写入缓存
+
+    缓存条目通过 db.session 写入但不提交，由调用方负责提交事务。
+
+    Args:
+        address: 地址字符串
+        city: 城市名称（可选）
+        fetch: 远程地理编码函数，返回 (result, definitive)
+
+    Returns:
+        地理编码结果字典，无法解析时返回 None
+    """
+    if not address or not address.strip():
+        return None
+
+    key = make_cache_key(address, city)
+
+    try:
+        entry = GeocodeCache.query.filter_by(cache_key=key).first()
+    except Exception as e:
+        # 缓存表不可用（如尚未迁移）时直接走远程调用
+        logger.warning(f'读取地理编码缓存失败: {e}')
+        _incr('remote_calls')
+        return fetch(address, city)[0]
+
+    if is_fresh(entry):
+        return record_hit(entry)
+
+    record_miss()
+    result, definitive = fetch(address, city)
+    store_result(address, city, result, definitive, entry=entry)
+    return result
+
+
+def geocode_tenant(tenant, city: Optional[str] = None) -> Optional[Dict]:
+    """
+    对租户地址进行地理编码，成功时把坐标回写到 Tenant.longitude/latitude
+
+    不提交事务，由调用方负责提交。
+    """
+    if not tenant.address:
+        return None
+
+    from amap import AmapService
+    result = AmapService.geocode_address(tenant.address, city)
+    if result:
+        tenant.longitude = result['longitude']
+        tenant.latitude = result['latitude']
+    return result
+
+
+def get_cache_stats() -> Dict:
+    """
+    获取缓存统计：本进程的命中/未命中计数，以及缓存表的持久化汇总
+
+    saved_remote_calls 为所有条目累计命中次数，即缓存节省的远程调用总数
+    （缓存表中已落库的各进程命中，加上本进程尚未落库的命中）。
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+        pending_hits = sum(_pending_hits.values())
+
+    lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+    stats['hit_rate'] = round((stats['hits'] + stats['negative_hits']) / lookups, 4) if lookups else 0.0
+
+    row = db.session.query(
+        func.count(GeocodeCache.id),
+        func.sum(db.case((GeocodeCache.longitude.is_(None), 1), else_=0)),
+        func.sum(GeocodeCache.hit_count),
+        func.sum(db.case((GeocodeCache.expires_at <= datetime.utcnow(), 1), else_=0))
+    ).one()
+    stats['entries'] = row[0] or 0
+    stats['negative_entries'] = int(row[1] or 0)
+    stats['saved_remote_calls'] = int(row[2] or 0) + pending_hits
+    stats['expired_entries'] = int(row[3] or 0)
+    return stats
+
+
+def reset_stats():
+    """重置本进程计数器（丢弃尚未落库的命中次数）"""
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+        _pending_hits.clear()
+
+
+def purge_expired() -> int:
+    """删除已过期的缓存条目，返回删除数量（不提交事务）"""
+    flush_hit_counts()
+    return GeocodeCache.query.filter(
+        GeocodeCache.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
@@ -5,9 +5,10 @@
 from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, User, Drug, SupplyInfo, Order, Tenant, Announcement
-from sqlalchemy import func, desc
+from sqlalchemy import desc
 from datetime import datetime, timedelta
 from auth import get_authenticated_user
+from order_stats import get_order_stats
 
 bp = Blueprint('home', __name__, url_prefix='/api/home')
 
@@ -38,20 +39,11 @@ def get_platform_stats():
             SupplyInfo.status == 'ACTIVE'
         ).count()
         
-        # 订单总数
-        total_orders = Order.query.count()
-        
-        # 今日新增订单数
-        today = datetime.utcnow().date()
-        today_orders = Order.query.filter(
-            func.date(Order.created_at) == today
-        ).count()
-        
-        # 本月订单数
-        first_day_of_month = today.replace(day=1)
-        month_orders = Order.query.filter(
-            Order.created_at >= first_day_of_month
-        ).count()
+        # 订单总数、今日与本月新增订单数（一条 GROUP BY 查询，短时缓存）
+        order_stats = get_order_stats('platform', now=datetime.utcnow())
+        total_orders = order_stats['total']
+        today_orders = order_stats['today']
+        month_orders = order_stats['this_month']
         
         return jsonify({
             'msg': '获取平台统计成功',
@@ -145,14 +137,9 @@ def get_user_stats():
                 SupplyInfo.tenant_id == current_user.tenant_id
             ).count()
             
-            my_orders = Order.query.filter(
-                Order.supplier_tenant_id == current_user.tenant_id
-            ).count()
-            
-            pending_orders = Order.query.filter(
-                Order.supplier_tenant_id == current_user.tenant_id,
-                Order.status == 'PENDING'
-            ).count()
+            order_stats = get_order_stats('supplier', current_user.tenant_id)
+            my_orders = order_stats['total']
+            pending_orders = order_stats['pending']
             
             stats = {
                 'my_supplies': my_supplies,
@@ -162,14 +149,9 @@ def get_user_stats():
             
         elif current_user.role == 'pharmacy':
             # 药店统计
-            my_orders = Order.query.filter(
-                Order.buyer_tenant_id == current_user.tenant_id
-            ).count()
-            
-            pending_orders = Order.query.filter(
-                Order.buyer_tenant_id == current_user.tenant_id,
-                Order.status == 'PENDING'
-            ).count()
+            order_stats = get_order_stats('buyer', current_user.tenant_id)
+            my_orders = order_stats['total']
+            pending_orders = order_stats['pending']
             
             stats = {
                 'my_orders': my_orders,
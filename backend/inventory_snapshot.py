@@ -0,0 +1,279 @@
+"""
+库存预警快照
+功能：预警扫描与预警摘要只需要每个批次的 (企业, 药品, 数量, 有效期)。
+这里把这四列装进紧凑的 array 列中常驻内存，按阈值分类后按企业汇总；
+安装了 NumPy 时用布尔掩码 + bincount 向量化计算，否则退回纯 Python 实现（结果一致）。
+
+库存数量与有效期的变更都伴随一条 InventoryTransaction，快照记录已处理的最大流水 id，
+每次读取前只重新加载新流水涉及的批次（SQLite 写入串行，流水 id 随提交顺序递增）；
+超过 max_age 后整体重载，兜住导入工具等不写流水的直接改表
+"""
+import threading
+import time
+from array import array
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import func
+
+from extensions import db
+from models import InventoryItem, InventoryTransaction
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+# 默认配置（未在 config 中设置时使用）
+DEFAULT_MAX_AGE_SECONDS = 3600
+
+# 整体加载时每批读取的行数；增量刷新时 IN 查询每批的 id 数
+LOAD_BATCH_SIZE = 10000
+REFRESH_CHUNK_SIZE = 500
+
+COUNT_KEYS = ('low_stock', 'near_expiry', 'critical', 'critical_batches', 'total')
+
+Row = Tuple[int, int, int, int, date]
+
+
+def _want_numpy(use_numpy: Optional[bool]) -> bool:
+    if use_numpy is None:
+        return HAS_NUMPY
+    if use_numpy and not HAS_NUMPY:
+        raise RuntimeError('NumPy 未安装，无法使用向量化预警统计')
+    return use_numpy
+
+
+def empty_counts() -> Dict[str, int]:
+    return dict.fromkeys(COUNT_KEYS, 0)
+
+
+class InventorySnapshot:
+    """
+    库存批次的列式快照
+
+    每个批次占各列中的同一行；删除批次时把最后一行移到空位，保持列紧凑。
+    各企业的预警计数按 (日期, 阈值, 版本) 缓存，库存未变化时重复读取不再计算
+    """
+
+    def __init__(self, max_age: int = DEFAULT_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._version = 0
+        self._reset()
+
+    def _reset(self):
+        self.item_ids = array('q')
+        self.tenant_ids = array('q')
+        self.drug_ids = array('q')
+        self.quantities = array('q')
+        self.expiry_ordinals = array('q')
+        self._rows: Dict[int, int] = {}
+        self._last_transaction_id = 0
+        self._loaded_at: Optional[float] = None
+        self._counts_key = None
+        self._counts: Dict[int, Dict[str, int]] = {}
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    @property
+    def version(self) -> int:
+        """快照内容每变化一次加一"""
+        return self._version
+
+    def invalidate(self):
+        """丢弃快照，下次读取时整体重载"""
+        with self._lock:
+            self._loaded_at = None
+
+    def _set_row(self, row: Row):
+        item_id, tenant_id, drug_id, quantity, expiry_date = row
+        index = self._rows.get(item_id)
+        if index is None:
+            self._rows[item_id] = len(self.item_ids)
+            self.item_ids.append(item_id)
+            self.tenant_ids.append(tenant_id)
+            self.drug_ids.append(drug_id)
+            self.quantities.append(quantity)
+            self.expiry_ordinals.append(expiry_date.toordinal())
+        else:
+            self.tenant_ids[index] = tenant_id
+            self.drug_ids[index] = drug_id
+            self.quantities[index] = quantity
+            self.expiry_ordinals[index] = expiry_date.toordinal()
+
+    def _remove_row(self, item_id: int):
+        index = self._rows.pop(item_id, None)
+        if index is None:
+            return
+        last = len(self.item_ids) - 1
+        for column in (self.item_ids, self.tenant_ids, self.drug_ids, self.quantities, self.expiry_ordinals):
+            column[index] = column[last]
+            column.pop()
+        if index != last:
+            self._rows[self.item_ids[index]] = index
+
+    @staticmethod
+    def _row_query():
+        return db.session.query(
+            InventoryItem.id,
+            InventoryItem.tenant_id,
+            InventoryItem.drug_id,
+            InventoryItem.quantity,
+            InventoryItem.expiry_date
+        )
+
+    def load(self):
+        """从数据库整体加载快照"""
+        with self._lock:
+            self._reset()
+            # 先取流水水位再读批次：读取期间的新流水会在下次刷新时重放，不会漏掉
+            self._last_transaction_id = db.session.query(
+                func.coalesce(func.max(InventoryTransaction.id), 0)
+            ).scalar()
+            last_id = 0
+            while True:
+                batch = self._row_query().filter(InventoryItem.id > last_id).order_by(
+                    InventoryItem.id
+                ).limit(LOAD_BATCH_SIZE).all()
+                for row in batch:
+                    self._set_row(row)
+                if len(batch) < LOAD_BATCH_SIZE:
+                    break
+                last_id = batch[-1][0]
+            self._loaded_at = time.monotonic()
+            self._version += 1
+
+    def refresh(self) -> int:
+        """
+        按新的库存流水增量刷新，快照过期或尚未加载时整体加载
+
+        Returns:
+            int: 重新读取的批次数（整体加载时为全部批次数）
+        """
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age:
+                self.load()
+                return len(self)
+
+            changes = db.session.query(
+                InventoryTransaction.id, InventoryTransaction.inventory_item_id
+            ).filter(InventoryTransaction.id > self._last_transaction_id).all()
+            if not changes:
+                return 0
+            self._last_transaction_id = max(transaction_id for transaction_id, _ in changes)
+            self._apply_changes({item_id for _, item_id in changes})
+            return len({item_id for _, item_id in changes})
+
+    def _apply_changes(self, item_ids: Iterable[int]):
+        item_ids = sorted(item_ids)
+        for start in range(0, len(item_ids), REFRESH_CHUNK_SIZE):
+            chunk = item_ids[start:start + REFRESH_CHUNK_SIZE]
+            found = set()
+            for row in self._row_query().filter(InventoryItem.id.in_(chunk)).all():
+                self._set_row(row)
+                found.add(row[0])
+            for item_id in set(chunk) - found:
+                self._remove_row(item_id)
+        self._version += 1
+
+    def tenant_counts(self, today: Optional[date] = None, low_stock_threshold: int = 10,
+                      expiry_warning_days: int = 30, use_numpy: Optional[bool] = None
+                      ) -> Dict[int, Dict[str, int]]:
+        """
+        刷新快照并按企业统计预警批次
+
+        计数含义与原逐条扫描一致：low_stock 为数量低于阈值的批次，near_expiry 为
+        距过期不超过 expiry_warning_days 天的批次，critical 分别累加零库存与已过期两种情况，
+        critical_batches 为零库存或已过期的批次数，total 为至少有一种预警的批次数。
+        只返回有预警批次的企业
+
+        Args:
+            today: 统计日期，默认当天
+            low_stock_threshold: 低库存阈值
+            expiry_warning_days: 近效期预警天数
+            use_numpy: 是否使用 NumPy，None 表示已安装时自动使用
+
+        Returns:
+            dict: 企业 ID -> 各项计数，返回的字典可能被缓存共用，调用方不要修改
+        """
+        use_numpy = _want_numpy(use_numpy)
+        today = today or datetime.now().date()
+        with self._lock:
+            self.refresh()
+            key = (today, low_stock_threshold, expiry_warning_days, self._version)
+            if key != self._counts_key:
+                compute = self._counts_numpy if use_numpy else self._counts_python
+                self._counts = compute(today.toordinal(), low_stock_threshold, expiry_warning_days)
+                self._counts_key = key
+            return self._counts
+
+    def _counts_python(self, today: int, low_threshold: int, expiry_days: int) -> Dict[int, Dict[str, int]]:
+        result: Dict[int, Dict[str, int]] = {}
+        for tenant_id, quantity, expiry in zip(self.tenant_ids, self.quantities, self.expiry_ordinals):
+            days = expiry - today
+            low = quantity < low_threshold
+            near = days <= expiry_days
+            if not (low or near):
+                continue
+            counts = result.get(tenant_id)
+            if counts is None:
+                counts = result[tenant_id] = empty_counts()
+            counts['total'] += 1
+            if low:
+                counts['low_stock'] += 1
+                if quantity == 0:
+                    counts['critical'] += 1
+            if near:
+                counts['near_expiry'] += 1
+                if days <= 0:
+                    counts['critical'] += 1
+            if quantity == 0 or days <= 0:
+                counts['critical_batches'] += 1
+        return result
+
+    def _counts_numpy(self, today: int, low_threshold: int, expiry_days: int) -> Dict[int, Dict[str, int]]:
+        if not len(self):
+            return {}
+        tenants = np.frombuffer(self.tenant_ids, dtype=np.int64)
+        quantities = np.frombuffer(self.quantities, dtype=np.int64)
+        days = np.frombuffer(self.expiry_ordinals, dtype=np.int64) - today
+
+        low = quantities < low_threshold
+        near = days <= expiry_days
+        zero = quantities == 0
+        expired = days <= 0
+        flags = {
+            'low_stock': low,
+            'near_expiry': near,
+            'critical': (low & zero).astype(np.int64) + (near & expired),
+            'critical_batches': zero | expired,
+            'total': low | near,
+        }
+
+        unique_tenants, inverse = np.unique(tenants, return_inverse=True)
+        columns = {
+            name: np.bincount(inverse, weights=values, minlength=len(unique_tenants)).astype(np.int64)
+            for name, values in flags.items()
+        }
+        result = {}
+        for position in np.flatnonzero(columns['total']):
+            result[int(unique_tenants[position])] = {
+                name: int(column[position]) for name, column in columns.items()
+            }
+        return result
+
+
+def get_inventory_snapshot() -> InventorySnapshot:
+    """获取当前应用的库存预警快照（首次访问时创建，首次读取时加载）"""
+    snapshot = current_app.extensions.get('inventory_snapshot')
+    if snapshot is None:
+        snapshot = InventorySnapshot(
+            max_age=current_app.config.get('INVENTORY_SNAPSHOT_MAX_AGE_SECONDS', DEFAULT_MAX_AGE_SECONDS)
+        )
+        current_app.extensions['inventory_snapshot'] = snapshot
+    return snapshot
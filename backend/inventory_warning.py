@@ -9,14 +9,19 @@ from sqlalchemy import and_, or_
 from extensions import db
 from models import InventoryItem, User, Drug, Tenant, InventoryTransaction
 from auth import get_authenticated_user
+from inventory_warning_engine import (
+    EXPIRY_WARNING_DAYS,
+    LOW_STOCK_THRESHOLD,
+    ensure_current,
+    evaluate_items,
+    get_counts_by_tenant,
+    get_tenant_counts,
+    reconcile,
+)
 
 # 创建蓝图
 bp = Blueprint('inventory_warning', __name__, url_prefix='/api/v1/inventory')
 
-# 预警阈值常量
-LOW_STOCK_THRESHOLD = 10  # 低库存阈值
-EXPIRY_WARNING_DAYS = 30  # 近效期预警天数
-
 
 def _get_current_inventory_user():
     """获取当前登录用户并做基础校验"""
@@ -181,6 +186,7 @@ def create_inventory_item():
         notes=(data.get('notes') or '').strip() or None
     )
     db.session.add(transaction)
+    evaluate_items([item])
     db.session.commit()
 
     return jsonify({'item': _serialize_item(item)}), 201
@@ -234,6 +240,7 @@ def adjust_inventory_item(item_id):
         notes=(data.get('notes') or '').strip() or None
     )
     db.session.add(transaction)
+    evaluate_items([item])
     db.session.commit()
 
     return jsonify({'item': _serialize_item(item)})
@@ -318,6 +325,8 @@ def get_inventory_warnings():
             error_out=False
         )
         
+        counts = _tenant_warning_counts(current_user.tenant_id)
+        
         # 构建响应数据
         warnings = []
         for item in pagination.items:
@@ -369,8 +378,8 @@ def get_inventory_warnings():
                 },
                 'statistics': {
                     'total_warnings': pagination.total,
-                    'low_stock_count': _count_low_stock(current_user.tenant_id),
-                    'near_expiry_count': _count_near_expiry(current_user.tenant_id)
+                    'low_stock_count': counts['low_stock'],
+                    'near_expiry_count': counts['near_expiry']
                 }
             }
         }), 200
@@ -415,9 +424,10 @@ def get_warning_summary():
         tenant_id = current_user.tenant_id
         
         # 统计各类预警数量
-        low_stock_count = _count_low_stock(tenant_id)
-        near_expiry_count = _count_near_expiry(tenant_id)
-        critical_count = _count_critical_warnings(tenant_id)
+        counts = _tenant_warning_counts(tenant_id)
+        low_stock_count = counts['low_stock']
+        near_expiry_count = counts['near_expiry']
+        critical_count = counts['critical_batches']
         
         # 获取最紧急的几个预警
         urgent_warnings = _get_urgent_warnings(tenant_id, limit=5)
@@ -448,39 +458,10 @@ def get_warning_summary():
         }), 500
 
 
-def _count_low_stock(tenant_id):
-    """统计低库存数量"""
-    return InventoryItem.query.filter(
-        and_(
-            InventoryItem.tenant_id == tenant_id,
-            InventoryItem.quantity < LOW_STOCK_THRESHOLD
-        )
-    ).count()
-
-
-def _count_near_expiry(tenant_id):
-    """统计近效期数量"""
-    expiry_threshold = datetime.now() + timedelta(days=EXPIRY_WARNING_DAYS)
-    return InventoryItem.query.filter(
-        and_(
-            InventoryItem.tenant_id == tenant_id,
-            InventoryItem.expiry_date <= expiry_threshold
-        )
-    ).count()
-
-
-def _count_critical_warnings(tenant_id):
-    """统计严重预警数量（库存为0或已过期）"""
-    now = datetime.now()
-    return InventoryItem.query.filter(
-        and_(
-            InventoryItem.tenant_id == tenant_id,
-            or_(
-                InventoryItem.quantity == 0,
-                InventoryItem.expiry_date <= now.date()
-            )
-        )
-    ).count()
+def _tenant_warning_counts(tenant_id):
+    """读取企业的预警计数（低库存、近效期、零库存或已过期的批次数）"""
+    ensure_current()
+    return get_tenant_counts(tenant_id)
 
 
 def _get_urgent_warnings(tenant_id, limit=5):
@@ -571,49 +552,22 @@ def manual_scan_warnings():
 def scan_inventory_warnings():
     """
     执行库存预警扫描
-    这个函数可以被定时任务调用
+    这个函数可以被定时任务调用；日常的预警计数由库存写入实时更新，
+    这里推进日期变化并校验计数，修正导入工具等绕过预警引擎的改动
     
     Returns:
         dict: 扫描结果统计
     """
     try:
         now = datetime.now()
-        expiry_threshold = now + timedelta(days=EXPIRY_WARNING_DAYS)
-        
-        # 查询所有需要预警的库存项
-        warning_items = InventoryItem.query.filter(
-            or_(
-                InventoryItem.quantity < LOW_STOCK_THRESHOLD,
-                InventoryItem.expiry_date <= expiry_threshold
-            )
-        ).all()
-        
-        # 按租户统计预警信息
-        tenant_warnings = {}
         
-        for item in warning_items:
-            tenant_id = item.tenant_id
-            if tenant_id not in tenant_warnings:
-                tenant_warnings[tenant_id] = {
-                    'low_stock': 0,
-                    'near_expiry': 0,
-                    'critical': 0,
-                    'total': 0
-                }
-            
-            # 统计预警类型
-            if item.quantity < LOW_STOCK_THRESHOLD:
-                tenant_warnings[tenant_id]['low_stock'] += 1
-                if item.quantity == 0:
-                    tenant_warnings[tenant_id]['critical'] += 1
-            
-            days_to_expiry = (item.expiry_date - now.date()).days
-            if days_to_expiry <= EXPIRY_WARNING_DAYS:
-                tenant_warnings[tenant_id]['near_expiry'] += 1
-                if days_to_expiry <= 0:
-                    tenant_warnings[tenant_id]['critical'] += 1
-            
-            tenant_warnings[tenant_id]['total'] += 1
+        # 推进到期的近效期/过期变化，并对照库存快照校验各企业的预警计数
+        reconcile(now.date())
+        db.session.commit()
+        tenant_warnings = {
+            tenant_id: {key: tenant[key] for key in ('low_stock', 'near_expiry', 'critical', 'total')}
+            for tenant_id, tenant in get_counts_by_tenant().items()
+        }
         
         # 记录扫描结果到日志（这里简化处理）
         total_warnings = sum(tenant['total'] for tenant in tenant_warnings.values())
@@ -0,0 +1,300 @@
+"""
+库存预警引擎
+功能：原先每天凌晨全表扫描一次库存批次，白天变成低库存的批次要到第二天才能看到。
+这里按批次保存预警状态（inventory_warning_states），按企业保存预警计数（inventory_warning_counters）：
+
+- 库存写入（新建、调整、发货扣减、收货入库）后调用 evaluate_items，只重新判断被改动的批次，
+  与库存写入在同一事务中更新状态和计数
+- 近效期与过期只随日期变化，每个批次记录下一次变化的日期（next_transition，带索引），
+  advance 按日期从小到大取出到期的批次重新判断
+- 预警摘要直接读取企业计数，读取前只推进日期变化（ensure_current）；
+  导入工具等绕过引擎的改动由定时扫描中的 reconcile 对照库存快照修正
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from inventory_snapshot import get_inventory_snapshot
+from models import InventoryItem, InventoryWarningCounter, InventoryWarningState
+
+# 预警阈值常量
+LOW_STOCK_THRESHOLD = 10  # 低库存阈值
+EXPIRY_WARNING_DAYS = 30  # 近效期预警天数
+
+COUNT_KEYS = ('low_stock', 'near_expiry', 'critical', 'critical_batches', 'total')
+
+# 每批处理的批次数（到期推进、重建、IN 查询）
+BATCH_SIZE = 500
+
+
+class WarningFlags(NamedTuple):
+    low_stock: bool
+    out_of_stock: bool
+    near_expiry: bool
+    expired: bool
+
+
+def today_local() -> date:
+    """预警按服务器本地日期计算，与预警列表一致"""
+    return datetime.now().date()
+
+
+def classify(quantity: int, expiry_date: date, today: date) -> WarningFlags:
+    days = (expiry_date - today).days
+    return WarningFlags(
+        low_stock=quantity < LOW_STOCK_THRESHOLD,
+        out_of_stock=quantity == 0,
+        near_expiry=days <= EXPIRY_WARNING_DAYS,
+        expired=days <= 0
+    )
+
+
+def next_transition(expiry_date: date, today: date) -> Optional[date]:
+    """批次下一次因日期推移改变预警标记的日期（先进入近效期，再过期）"""
+    near_from = expiry_date - timedelta(days=EXPIRY_WARNING_DAYS)
+    if near_from > today:
+        return near_from
+    if expiry_date > today:
+        return expiry_date
+    return None
+
+
+def contributions(flags: WarningFlags) -> Dict[str, int]:
+    """一个批次对企业各项计数的贡献，含义与原全表扫描一致"""
+    return {
+        'low_stock': int(flags.low_stock),
+        'near_expiry': int(flags.near_expiry),
+        'critical': int(flags.low_stock and flags.out_of_stock) + int(flags.near_expiry and flags.expired),
+        'critical_batches': int(flags.out_of_stock or flags.expired),
+        'total': int(flags.low_stock or flags.near_expiry),
+    }
+
+
+def _state_flags(state: InventoryWarningState) -> WarningFlags:
+    return WarningFlags(state.is_low_stock, state.is_out_of_stock, state.is_near_expiry, state.is_expired)
+
+
+def _add(deltas: Dict[int, Dict[str, int]], tenant_id: int, flags: WarningFlags, sign: int):
+    for key, value in contributions(flags).items():
+        deltas[tenant_id][key] += sign * value
+
+
+def _increment_counter(tenant_id: int, delta: Dict[str, int]) -> int:
+    counter = InventoryWarningCounter
+    values = {getattr(counter, key): getattr(counter, key) + value for key, value in delta.items()}
+    values[counter.updated_at] = datetime.utcnow()
+    return db.session.query(counter).filter(counter.tenant_id == tenant_id).update(
+        values, synchronize_session=False
+    )
+
+
+def _apply_deltas(deltas: Dict[int, Dict[str, int]]):
+    for tenant_id, delta in deltas.items():
+        delta = {key: value for key, value in delta.items() if value}
+        if not delta or _increment_counter(tenant_id, delta):
+            continue
+        try:
+            # 企业的第一个预警批次：并发写入同一企业时主键冲突，回到累加
+            with db.session.begin_nested():
+                values = dict.fromkeys(COUNT_KEYS, 0)
+                values.update(delta)
+                db.session.add(InventoryWarningCounter(tenant_id=tenant_id, **values))
+        except IntegrityError:
+            _increment_counter(tenant_id, delta)
+
+
+def evaluate_items(items: Iterable[InventoryItem], today: Optional[date] = None) -> int:
+    """
+    重新判断被改动批次的预警状态并更新企业计数（与库存写入在同一事务中，由调用方提交）
+
+    Args:
+        items: 新建或改动过的库存批次
+        today: 判断日期，默认当天
+
+    Returns:
+        int: 预警标记发生变化的批次数
+    """
+    items = list({item.id: item for item in _flushed(items)}.values())
+    if not items:
+        return 0
+    today = today or today_local()
+
+    states = {}
+    for start in range(0, len(items), BATCH_SIZE):
+        chunk = [item.id for item in items[start:start + BATCH_SIZE]]
+        for state in InventoryWarningState.query.filter(InventoryWarningState.inventory_item_id.in_(chunk)):
+            states[state.inventory_item_id] = state
+
+    deltas = defaultdict(lambda: dict.fromkeys(COUNT_KEYS, 0))
+    changed = 0
+    for item in items:
+        flags = classify(item.quantity, item.expiry_date, today)
+        state = states.get(item.id)
+        if state is None:
+            state = InventoryWarningState(inventory_item_id=item.id)
+            db.session.add(state)
+            old = None
+        else:
+            old = (state.tenant_id, _state_flags(state))
+        if old != (item.tenant_id, flags):
+            if old is not None:
+                _add(deltas, old[0], old[1], -1)
+            _add(deltas, item.tenant_id, flags, 1)
+            changed += 1
+        state.tenant_id = item.tenant_id
+        state.is_low_stock, state.is_out_of_stock, state.is_near_expiry, state.is_expired = flags
+        state.next_transition = next_transition(item.expiry_date, today)
+    _apply_deltas(deltas)
+    return changed
+
+
+def _flushed(items: Iterable[InventoryItem]):
+    items = [item for item in items if item is not None]
+    if any(item.id is None for item in items):
+        db.session.flush()
+    return items
+
+
+def advance(today: Optional[date] = None) -> int:
+    """
+    处理到期的日期变化：取出 next_transition 不晚于今天的批次重新判断（由调用方提交）
+
+    Returns:
+        int: 重新判断的批次数
+    """
+    today = today or today_local()
+    processed = 0
+    while True:
+        states = InventoryWarningState.query.filter(
+            InventoryWarningState.next_transition <= today
+        ).order_by(
+            InventoryWarningState.next_transition, InventoryWarningState.inventory_item_id
+        ).limit(BATCH_SIZE).all()
+        if not states:
+            return processed
+
+        item_ids = [state.inventory_item_id for state in states]
+        items = InventoryItem.query.filter(InventoryItem.id.in_(item_ids)).all()
+        found = {item.id for item in items}
+        # 批次已被删除：撤销它的计数并删除状态
+        deltas = defaultdict(lambda: dict.fromkeys(COUNT_KEYS, 0))
+        for state in states:
+            if state.inventory_item_id not in found:
+                _add(deltas, state.tenant_id, _state_flags(state), -1)
+                db.session.delete(state)
+        _apply_deltas(deltas)
+
+        evaluate_items(items, today)
+        db.session.flush()
+        processed += len(states)
+
+
+def rebuild_warning_states(today: Optional[date] = None) -> int:
+    """
+    按全部库存批次重建预警状态与企业计数（由调用方提交）
+
+    Returns:
+        int: 写入的批次状态数
+    """
+    today = today or today_local()
+    # 会话中已加载的状态与计数对象在批量删除后失效，先写出待提交的改动再移出会话
+    db.session.flush()
+    for obj in list(db.session.identity_map.values()):
+        if isinstance(obj, (InventoryWarningState, InventoryWarningCounter)):
+            db.session.expunge(obj)
+    db.session.query(InventoryWarningState).delete(synchronize_session=False)
+    db.session.query(InventoryWarningCounter).delete(synchronize_session=False)
+
+    totals = defaultdict(lambda: dict.fromkeys(COUNT_KEYS, 0))
+    written = 0
+    last_id = 0
+    while True:
+        batch = db.session.query(
+            InventoryItem.id, InventoryItem.tenant_id, InventoryItem.quantity, InventoryItem.expiry_date
+        ).filter(InventoryItem.id > last_id).order_by(InventoryItem.id).limit(BATCH_SIZE * 10).all()
+        mappings = []
+        for item_id, tenant_id, quantity, expiry_date in batch:
+            flags = classify(quantity, expiry_date, today)
+            _add(totals, tenant_id, flags, 1)
+            mappings.append({
+                'inventory_item_id': item_id,
+                'tenant_id': tenant_id,
+                'is_low_stock': flags.low_stock,
+                'is_out_of_stock': flags.out_of_stock,
+                'is_near_expiry': flags.near_expiry,
+                'is_expired': flags.expired,
+                'next_transition': next_transition(expiry_date, today),
+                'evaluated_at': datetime.utcnow()
+            })
+        db.session.bulk_insert_mappings(InventoryWarningState, mappings)
+        written += len(mappings)
+        if len(batch) < BATCH_SIZE * 10:
+            break
+        last_id = batch[-1][0]
+
+    db.session.bulk_insert_mappings(InventoryWarningCounter, [
+        dict(tenant_id=tenant_id, updated_at=datetime.utcnow(), **counts)
+        for tenant_id, counts in totals.items()
+    ])
+    return written
+
+
+def ensure_current(today: Optional[date] = None):
+    """
+    保证预警状态已推进到今天（每个进程每天只推进一次，读取预警前调用）
+
+    只处理到期的日期变化；整体重建由定时扫描（reconcile）或重建工具完成，不在请求中进行
+    """
+    today = today or today_local()
+    if current_app.extensions.get('inventory_warning_day') == today:
+        return
+    advance(today)
+    db.session.commit()
+    current_app.extensions['inventory_warning_day'] = today
+
+
+def get_tenant_counts(tenant_id: Optional[int]) -> Dict[str, int]:
+    """读取企业的预警计数，没有预警批次时各项为 0"""
+    counter = db.session.get(InventoryWarningCounter, tenant_id) if tenant_id else None
+    if counter is None:
+        return dict.fromkeys(COUNT_KEYS, 0)
+    return {key: getattr(counter, key) for key in COUNT_KEYS}
+
+
+def get_counts_by_tenant() -> Dict[int, Dict[str, int]]:
+    """读取所有有预警批次的企业计数"""
+    return {
+        counter.tenant_id: {key: getattr(counter, key) for key in COUNT_KEYS}
+        for counter in InventoryWarningCounter.query.filter(InventoryWarningCounter.total > 0)
+    }
+
+
+def reconcile(today: Optional[date] = None) -> bool:
+    """
+    对照库存快照校验企业计数，不一致时整体重建（由调用方提交）
+
+    快照按库存流水增量刷新；不写流水的直接改表要等快照超过 max_age 整体重载后才会被发现。
+    批次状态数与库存批次数不一致（首次上线、批量导入）时也会重建
+
+    Returns:
+        bool: 是否进行了重建
+    """
+    today = today or today_local()
+    advance(today)
+    expected = get_inventory_snapshot().tenant_counts(
+        today=today,
+        low_stock_threshold=LOW_STOCK_THRESHOLD,
+        expiry_warning_days=EXPIRY_WARNING_DAYS
+    )
+    state_count = db.session.query(func.count(InventoryWarningState.inventory_item_id)).scalar()
+    item_count = db.session.query(func.count(InventoryItem.id)).scalar()
+    if state_count == item_count and get_counts_by_tenant() == expected:
+        return False
+    current_app.logger.warning('库存预警状态与库存不一致，重建预警状态')
+    rebuild_warning_states(today)
+    return True
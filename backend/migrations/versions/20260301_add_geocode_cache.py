@@ -0,0 +1,43 @@
+"""Add geocode cache table
+
+Revision ID: b3d2e8f41c07
+Revises: a6f9cb97f3a1, add_tenant_coords
+Create Date: 2026-03-01 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d2e8f41c07'
+down_revision = ('a6f9cb97f3a1', 'add_tenant_coords')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'geocode_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('address', sa.String(length=255), nullable=False),
+        sa.Column('city', sa.String(length=80), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('hit_count', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('geocode_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_geocode_cache_cache_key'), ['cache_key'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('geocode_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_geocode_cache_cache_key'))
+
+    op.drop_table('geocode_cache')
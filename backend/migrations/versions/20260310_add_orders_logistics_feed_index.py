@@ -0,0 +1,25 @@
+"""Add index for the logistics order feed
+
+Revision ID: c5a1f7d29e44
+Revises: b3d2e8f41c07
+Create Date: 2026-03-10 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a1f7d29e44'
+down_revision = 'b3d2e8f41c07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_logistics_feed', ['logistics_tenant_id', 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_logistics_feed')
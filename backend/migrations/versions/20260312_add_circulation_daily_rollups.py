@@ -0,0 +1,43 @@
+"""Add circulation daily rollup table
+
+Revision ID: d8e3b6a0f215
+Revises: c5a1f7d29e44
+Create Date: 2026-03-12 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e3b6a0f215'
+down_revision = 'c5a1f7d29e44'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'circulation_daily_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('buyer_region', sa.String(length=255), nullable=False),
+        sa.Column('flow_region', sa.String(length=255), nullable=False),
+        sa.Column('transport_status', sa.String(length=20), nullable=False),
+        sa.Column('record_count', sa.Integer(), nullable=False),
+        sa.Column('abnormal_count', sa.Integer(), nullable=False),
+        sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'buyer_region', 'flow_region', 'transport_status',
+                            name='uq_circulation_rollup_key')
+    )
+    with op.batch_alter_table('circulation_daily_rollups', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_circulation_daily_rollups_day'), ['day'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('circulation_daily_rollups', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_circulation_daily_rollups_day'))
+
+    op.drop_table('circulation_daily_rollups')
@@ -0,0 +1,60 @@
+"""Add inventory warning state and counter tables
+
+Revision ID: e2f7c4a9b613
+Revises: d8e3b6a0f215
+Create Date: 2026-03-15 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f7c4a9b613'
+down_revision = 'd8e3b6a0f215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'inventory_warning_states',
+        sa.Column('inventory_item_id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('is_low_stock', sa.Boolean(), nullable=False),
+        sa.Column('is_out_of_stock', sa.Boolean(), nullable=False),
+        sa.Column('is_near_expiry', sa.Boolean(), nullable=False),
+        sa.Column('is_expired', sa.Boolean(), nullable=False),
+        sa.Column('next_transition', sa.Date(), nullable=True),
+        sa.Column('evaluated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['inventory_item_id'], ['inventory_items.id'], ),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('inventory_item_id')
+    )
+    with op.batch_alter_table('inventory_warning_states', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_inventory_warning_states_tenant_id'), ['tenant_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_inventory_warning_states_next_transition'), ['next_transition'],
+                              unique=False)
+
+    op.create_table(
+        'inventory_warning_counters',
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('low_stock', sa.Integer(), nullable=False),
+        sa.Column('near_expiry', sa.Integer(), nullable=False),
+        sa.Column('critical', sa.Integer(), nullable=False),
+        sa.Column('critical_batches', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('tenant_id')
+    )
+
+
+def downgrade():
+    op.drop_table('inventory_warning_counters')
+
+    with op.batch_alter_table('inventory_warning_states', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_inventory_warning_states_next_transition'))
+        batch_op.drop_index(batch_op.f('ix_inventory_warning_states_tenant_id'))
+
+    op.drop_table('inventory_warning_states')
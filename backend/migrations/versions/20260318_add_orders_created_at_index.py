@@ -0,0 +1,25 @@
+"""Add created_at index for the regulator orders overview
+
+Revision ID: f4b9d1c6e720
+Revises: e2f7c4a9b613
+Create Date: 2026-03-18 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b9d1c6e720'
+down_revision = 'e2f7c4a9b613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_created_at')
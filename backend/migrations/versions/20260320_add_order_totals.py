@@ -0,0 +1,49 @@
+"""Add denormalized order totals and backfill them from order items
+
+Revision ID: a7c3e5f18d92
+Revises: f4b9d1c6e720
+Create Date: 2026-03-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f18d92'
+down_revision = 'f4b9d1c6e720'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_amount', sa.Numeric(precision=12, scale=2), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('total_quantity', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index(batch_op.f('ix_orders_total_amount'), ['total_amount'], unique=False)
+
+    # 按现有明细回填合计
+    op.execute("""
+        UPDATE orders SET
+            total_amount = COALESCE((
+                SELECT ROUND(SUM(order_items.unit_price * order_items.quantity), 2)
+                FROM order_items WHERE order_items.order_id = orders.id
+            ), 0),
+            total_quantity = COALESCE((
+                SELECT SUM(order_items.quantity)
+                FROM order_items WHERE order_items.order_id = orders.id
+            ), 0),
+            item_count = (
+                SELECT COUNT(order_items.id)
+                FROM order_items WHERE order_items.order_id = orders.id
+            )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_orders_total_amount'))
+        batch_op.drop_column('item_count')
+        batch_op.drop_column('total_quantity')
+        batch_op.drop_column('total_amount')
@@ -0,0 +1,30 @@
+"""Add per-prefix, per-day order number sequences
+
+Revision ID: b9e4d2a7c351
+Revises: a7c3e5f18d92
+Create Date: 2026-03-22 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e4d2a7c351'
+down_revision = 'a7c3e5f18d92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'order_number_sequences',
+        sa.Column('prefix', sa.String(length=8), nullable=False),
+        sa.Column('day', sa.String(length=8), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('prefix', 'day')
+    )
+
+
+def downgrade():
+    op.drop_table('order_number_sequences')
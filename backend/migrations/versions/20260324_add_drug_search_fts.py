@@ -0,0 +1,59 @@
+"""Add FTS5 drug search index with sync triggers
+
+Revision ID: c5a8f3e1d024
+Revises: b9e4d2a7c351
+Create Date: 2026-03-24 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a8f3e1d024'
+down_revision = 'b9e4d2a7c351'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'generic_name, brand_name, approval_number, manufacturer'
+NEW_VALUES = 'new.generic_name, new.brand_name, new.approval_number, new.manufacturer'
+OLD_VALUES = 'old.generic_name, old.brand_name, old.approval_number, old.manufacturer'
+
+
+def upgrade():
+    # FTS5 仅用于 SQLite，其他数据库使用进程内搜索索引
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS drugs_fts USING fts5(
+            {COLUMNS}, content='drugs', content_rowid='id', tokenize='trigram'
+        )
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS drugs_fts_ai AFTER INSERT ON drugs BEGIN
+            INSERT INTO drugs_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS drugs_fts_ad AFTER DELETE ON drugs BEGIN
+            INSERT INTO drugs_fts(drugs_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS drugs_fts_au AFTER UPDATE OF {COLUMNS} ON drugs BEGIN
+            INSERT INTO drugs_fts(drugs_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES});
+            INSERT INTO drugs_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES});
+        END
+    """)
+    # 按现有药品回填索引
+    op.execute("INSERT INTO drugs_fts(drugs_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS drugs_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS drugs_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS drugs_fts_ai')
+    op.execute('DROP TABLE IF EXISTS drugs_fts')
@@ -0,0 +1,29 @@
+"""Add shared cache generation counters
+
+Revision ID: d2f7b4c9e815
+Revises: c5a8f3e1d024
+Create Date: 2026-03-26 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7b4c9e815'
+down_revision = 'c5a8f3e1d024'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'cache_generations',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('generation', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_generations')
@@ -0,0 +1,27 @@
+"""Key the logistics order feed index on id
+
+Revision ID: e6b3c8d1f207
+Revises: d2f7b4c9e815
+Create Date: 2026-03-28 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b3c8d1f207'
+down_revision = 'd2f7b4c9e815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_logistics_feed')
+        batch_op.create_index('ix_orders_logistics_feed', ['logistics_tenant_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_logistics_feed')
+        batch_op.create_index('ix_orders_logistics_feed', ['logistics_tenant_id', 'updated_at', 'id'], unique=False)
@@ -1,4 +1,6 @@
 from datetime import datetime
+from itertools import chain
+from sqlalchemy import event, inspect
 from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db
 
@@ -391,6 +393,12 @@ class InventoryItem(db.Model):
 class Order(db.Model):
     """订单模型"""
     __tablename__ = 'orders'
+    __table_args__ = (
+        # 物流订单列表按 id 游标分页（id 不随订单更新变化）
+        db.Index('ix_orders_logistics_feed', 'logistics_tenant_id', 'id'),
+        # 监管订单概览按创建时间排序分页、按日期统计趋势
+        db.Index('ix_orders_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(50), unique=True, nullable=False)  # 业务订单号
@@ -412,6 +420,10 @@ class Order(db.Model):
     cancelled_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     cancelled_at = db.Column(db.DateTime, nullable=True)
     cancel_reason = db.Column(db.Text, nullable=True)
+    # 明细合计：明细写入后由 sync_order_totals（本模块）同步维护，可直接用于排序与筛选
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0, index=True)
+    total_quantity = db.Column(db.Integer, nullable=False, default=0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -428,41 +440,31 @@ class Order(db.Model):
     # 订单明细项
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
 
-    def __init__(self, **kwargs):
-        super(Order, self).__init__(**kwargs)
-        if not self.order_number:
-            self.order_number = self.generate_order_number()
+    def order_number_prefix(self):
+        """订单号前缀：按买方类型区分，PH 药店（默认）、SP 供应商、LG 物流"""
+        buyer_tenant = self.buyer_tenant
+        if buyer_tenant is None and self.buyer_tenant_id:
+            buyer_tenant = db.session.get(Tenant, self.buyer_tenant_id)
+        if buyer_tenant is not None:
+            if buyer_tenant.type == 'SUPPLIER':
+                return 'SP'
+            if buyer_tenant.type == 'LOGISTICS':
+                return 'LG'
+        return 'PH'
+
+    # 订单列表可通过 fields 参数选择输出的字段（关联对象字段需 include_relations）
+    RELATION_FIELDS = ('buyer_tenant', 'supplier_tenant', 'logistics_tenant',
+                       'created_by_user', 'confirmed_by_user', 'items')
+
+    def to_dict(self, include_relations=False, fields=None):
+        """
+        Args:
+            include_relations: 是否包含关联对象
+            fields: 只输出这些字段（集合），None 表示全部；id 总是输出
+        """
+        def wanted(name):
+            return fields is None or name in fields
 
-    def generate_order_number(self):
-        """生成订单号：PH/SP + YYYYMMDD + 3位序号"""
-        from datetime import date
-        import random
-        
-        # 根据买方类型生成前缀
-        prefix = 'PH'  # 默认药店
-        if hasattr(self, 'buyer_tenant') and self.buyer_tenant:
-            if self.buyer_tenant.type == 'SUPPLIER':
-                prefix = 'SP'
-            elif self.buyer_tenant.type == 'LOGISTICS':
-                prefix = 'LG'
-        
-        today = date.today().strftime('%Y%m%d')
-        # 生成3位随机数序号（实际项目中应该从数据库序列获取）
-        sequence = str(random.randint(1, 999)).zfill(3)
-        
-        return f"{prefix}{today}{sequence}"
-
-    @property
-    def total_amount(self):
-        """计算订单总金额"""
-        return sum(item.total_amount for item in self.items)
-    
-    @property
-    def total_quantity(self):
-        """计算订单总数量"""
-        return sum(item.quantity for item in self.items)
-
-    def to_dict(self, include_relations=False):
         result = {
             'id': self.id,
             'order_number': self.order_number,
@@ -485,23 +487,53 @@ class Order(db.Model):
             'cancel_reason': self.cancel_reason,
             'created_at': to_iso(self.created_at),
             'updated_at': to_iso(self.updated_at),
-            'total_amount': self.total_amount,
-            'total_quantity': self.total_quantity
+            'total_amount': float(self.total_amount or 0),
+            'total_quantity': self.total_quantity or 0,
+            'item_count': self.item_count or 0
         }
         
         if include_relations:
-            result.update({
-                'buyer_tenant': self.buyer_tenant.to_dict() if self.buyer_tenant else None,
-                'supplier_tenant': self.supplier_tenant.to_dict() if self.supplier_tenant else None,
-                'logistics_tenant': self.logistics_tenant.to_dict() if self.logistics_tenant else None,
-                'created_by_user': self.created_by_user.to_dict() if self.created_by_user else None,
-                'confirmed_by_user': self.confirmed_by_user.to_dict() if self.confirmed_by_user else None,
-                'items': [item.to_dict(include_relations=True) for item in self.items]
-            })
+            for name in self.RELATION_FIELDS:
+                if not wanted(name):
+                    continue
+                if name == 'items':
+                    result['items'] = [item.to_dict(include_relations=True) for item in self.items]
+                else:
+                    related = getattr(self, name)
+                    result[name] = related.to_dict() if related else None
+        
+        if fields is not None:
+            result = {key: value for key, value in result.items() if key == 'id' or key in fields}
         
         return result
 
 
+class OrderNumberSequence(db.Model):
+    """订单号序列：每个前缀每天一个计数器，分配订单号时原子递增（见 order_numbers.py）"""
+    __tablename__ = 'order_number_sequences'
+
+    prefix = db.Column(db.String(8), primary_key=True)
+    day = db.Column(db.String(8), primary_key=True)  # YYYYMMDD
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _assign_pending_order_numbers(session, flush_context, instances):
+    """订单写入前统一分配订单号；在模型模块中注册，导入模型即生效"""
+    pending = [obj for obj in session.new if isinstance(obj, Order) and not obj.order_number]
+    if pending:
+        from order_numbers import assign_order_numbers
+        assign_order_numbers(pending)
+
+
+class CacheGeneration(db.Model):
+    """缓存版本号：相关数据变更时在同一事务内递增，各进程据此清空过期的进程内缓存（见 cache_generations.py）"""
+    __tablename__ = 'cache_generations'
+
+    name = db.Column(db.String(64), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+
 class OrderItem(db.Model):
     """订单明细模型"""
     __tablename__ = 'order_items'
@@ -540,6 +572,30 @@ class OrderItem(db.Model):
         return result
 
 
+def _touched_order_ids(session):
+    order_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, OrderItem):
+            # 明细改挂到其他订单时，原订单也要刷新
+            history = inspect(obj).attrs.order_id.history
+            order_ids.update(value for value in chain(history.added, history.unchanged, history.deleted) if value)
+    return order_ids
+
+
+@event.listens_for(db.session, 'after_flush')
+def sync_order_totals(session, flush_context):
+    """
+    明细新增、修改、删除后，在同一事务中刷新所属订单的合计列；在模型模块中注册，导入模型即生效
+
+    明细行已经写入，直接按 order_items 汇总，无论明细是挂在 order.items 上
+    还是只设置了 order_id 都能算对；绕过会话的批量写入由 tools/check_order_totals.py 校验修正
+    """
+    order_ids = _touched_order_ids(session)
+    if order_ids:
+        from order_utils import find_stale_order_totals, write_order_totals
+        write_order_totals(find_stale_order_totals(order_ids))
+
+
 class InventoryTransaction(db.Model):
     """库存流水模型"""
     __tablename__ = 'inventory_transactions'
@@ -584,6 +640,43 @@ class InventoryTransaction(db.Model):
         return result
 
 
+class InventoryWarningState(db.Model):
+    """库存批次预警状态 - 预警引擎记录每个批次当前的预警标记，以及标记随日期变化的下一个日期"""
+    __tablename__ = 'inventory_warning_states'
+    
+    inventory_item_id = db.Column(db.Integer, db.ForeignKey('inventory_items.id'), primary_key=True)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False, index=True)
+    is_low_stock = db.Column(db.Boolean, nullable=False, default=False)
+    is_out_of_stock = db.Column(db.Boolean, nullable=False, default=False)
+    is_near_expiry = db.Column(db.Boolean, nullable=False, default=False)
+    is_expired = db.Column(db.Boolean, nullable=False, default=False)
+    next_transition = db.Column(db.Date, nullable=True, index=True)  # 进入近效期或过期的日期，之后不再变化时为空
+    evaluated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class InventoryWarningCounter(db.Model):
+    """企业库存预警计数 - 由预警引擎随批次状态变化增减，预警摘要直接读取"""
+    __tablename__ = 'inventory_warning_counters'
+    
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), primary_key=True)
+    low_stock = db.Column(db.Integer, nullable=False, default=0)
+    near_expiry = db.Column(db.Integer, nullable=False, default=0)
+    critical = db.Column(db.Integer, nullable=False, default=0)  # 零库存与已过期分别计数
+    critical_batches = db.Column(db.Integer, nullable=False, default=0)  # 零库存或已过期的批次数
+    total = db.Column(db.Integer, nullable=False, default=0)  # 至少有一种预警的批次数
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'tenant_id': self.tenant_id,
+            'low_stock': self.low_stock,
+            'near_expiry': self.near_expiry,
+            'critical': self.critical,
+            'critical_batches': self.critical_batches,
+            'total': self.total
+        }
+
+
 class CirculationRecord(db.Model):
     """流通记录模型 - 用于记录药品在运输过程中的状态变化"""
     __tablename__ = 'circulation_records'
@@ -630,6 +723,36 @@ class CirculationRecord(db.Model):
         return result
 
 
+class CirculationDailyRollup(db.Model):
+    """流通记录按日汇总 - 监管看板按 日期 × 区域 × 运输状态 读取预聚合计数"""
+    __tablename__ = 'circulation_daily_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'buyer_region', 'flow_region', 'transport_status',
+                            name='uq_circulation_rollup_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)  # 上报日期（UTC）
+    buyer_region = db.Column(db.String(255), nullable=False, default='')  # 收货药店所在区域，用于区域筛选
+    flow_region = db.Column(db.String(255), nullable=False, default='')  # 流向区域（上报位置，缺省为药店区域）
+    transport_status = db.Column(db.String(20), nullable=False)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    abnormal_count = db.Column(db.Integer, nullable=False, default=0)  # 备注中含异常关键词的记录数
+    last_timestamp = db.Column(db.DateTime, nullable=True)  # 该组最近一条记录的上报时间
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'day': to_iso(self.day),
+            'buyer_region': self.buyer_region,
+            'flow_region': self.flow_region,
+            'transport_status': self.transport_status,
+            'record_count': self.record_count,
+            'abnormal_count': self.abnormal_count,
+            'last_timestamp': to_iso(self.last_timestamp)
+        }
+
+
 class MedicationReminder(db.Model):
     """用药提醒模型"""
     __tablename__ = 'medication_reminders'
@@ -703,4 +826,38 @@ class Announcement(db.Model):
             'status': self.status,
             'created_at': to_iso(self.created_at),
             'updated_at': to_iso(self.updated_at)
-        }
\ No newline at end of file
+        }
+
+class GeocodeCache(db.Model):
+    """地理编码缓存 - 按规范化的 地址+城市 缓存高德地理编码结果"""
+    __tablename__ = 'geocode_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False, index=True)  # 规范化地址+城市的哈希
+    address = db.Column(db.String(255), nullable=False)  # 规范化后的地址
+    city = db.Column(db.String(80), nullable=False, default='')
+    longitude = db.Column(db.Float, nullable=True)  # 为空表示地址无法解析（负缓存）
+    latitude = db.Column(db.Float, nullable=True)
+    result = db.Column(db.JSON, nullable=True)  # 完整的地理编码结果
+    hit_count = db.Column(db.Integer, nullable=False, default=0)  # 命中次数（即节省的远程调用次数）
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def is_negative(self):
+        return self.longitude is None or self.latitude is None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'address': self.address,
+            'city': self.city,
+            'longitude': self.longitude,
+            'latitude': self.latitude,
+            'is_negative': self.is_negative,
+            'hit_count': self.hit_count,
+            'expires_at': to_iso(self.expires_at),
+            'created_at': to_iso(self.created_at),
+            'updated_at': to_iso(self.updated_at)
+        }
@@ -5,12 +5,39 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Tenant, User
+from drug_search import NAME_FIELDS, filter_drugs_by_keyword
+from drug_suggestions import get_drug_suggestion_index
 from amap import AmapService, find_nearby_suppliers
 from extensions import db
+from geo_index import get_supplier_index, sync_tenant_location
+from geocode_cache import geocode_tenant
 
 bp = Blueprint('nearby', __name__, url_prefix='/api/nearby')
 
 
+def _build_supplier_dict(tenant, best_supply, drug_map):
+    """构建就近推荐结果中的供应商信息，附加最优供应信息"""
+    supplier_dict = tenant.to_dict()
+    supplier_dict['inventory'] = {
+        'supply_id': best_supply.id,
+        'drug_id': best_supply.drug_id,
+        'quantity': best_supply.available_quantity,
+        'unit_price': float(best_supply.unit_price),
+        'min_order_quantity': best_supply.min_order_quantity,
+        'valid_until': best_supply.valid_until.isoformat() if best_supply.valid_until else None
+    }
+    # 药品详细信息
+    drug = drug_map.get(best_supply.drug_id)
+    if drug:
+        supplier_dict['inventory']['drug_info'] = {
+            'generic_name': drug.generic_name,
+            'brand_name': drug.brand_name,
+            'specification': drug.specification,
+            'manufacturer': drug.manufacturer
+        }
+    return supplier_dict
+
+
 @bp.route('/suppliers', methods=['POST'])
 @jwt_required()
 def get_nearby_suppliers():
@@ -92,6 +119,7 @@ def get_nearby_suppliers():
             city = data.get('city')
             
             geocode_result = AmapService.geocode_address(address, city)
+            db.session.commit()  # 保存地理编码缓存
             
             if not geocode_result:
                 return jsonify({
@@ -114,12 +142,7 @@ def get_nearby_suppliers():
         
         # 查找匹配的药品（支持模糊搜索：通用名或商品名）
         from models import Drug, SupplyInfo
-        drugs = Drug.query.filter(
-            db.or_(
-                Drug.generic_name.like(f'%{drug_name}%'),
-                Drug.brand_name.like(f'%{drug_name}%')
-            )
-        ).all()
+        drugs = filter_drugs_by_keyword(Drug.query, drug_name, NAME_FIELDS).all()
         
         if not drugs:
             return jsonify({
@@ -156,69 +179,43 @@ def get_nearby_suppliers():
                 'message': f'没有供应商有 {drug_name} 的库存'
             })
         
-        # 获取供应商租户信息，并附加库存信息
-        tenant_ids = list(set([si.tenant_id for si in supply_infos]))
-        tenants = Tenant.query.filter(
+        # 每个供应商选择价格最低的供应信息
+        best_supplies = {}
+        for si in supply_infos:
+            current = best_supplies.get(si.tenant_id)
+            if current is None or float(si.unit_price) < float(current.unit_price):
+                best_supplies[si.tenant_id] = si
+        tenant_ids = set(best_supplies.keys())
+        drug_map = {drug.id: drug for drug in drugs}
+        
+        # 没有坐标的供应商不在空间索引中，需要通过地址获取坐标
+        unlocated_tenants = Tenant.query.filter(
             Tenant.id.in_(tenant_ids),
             Tenant.type == 'SUPPLIER',
-            Tenant.is_active == True
-            # 不再要求必须有坐标，将通过地址动态获取坐标
+            Tenant.is_active == True,
+            db.or_(Tenant.longitude.is_(None), Tenant.latitude.is_(None))
         ).all()
         
-        # 构建供应商列表，包含库存信息
-        suppliers = []
+        geocoded_ids = set()
         geocode_failed_count = 0
         
-        for tenant in tenants:
-            # 获取该供应商的库存信息（选择价格最低的）
-            tenant_supplies = [si for si in supply_infos if si.tenant_id == tenant.id]
-            if not tenant_supplies:
-                continue
-                
-            # 按价格排序，选择最优的供应信息
-            best_supply = min(tenant_supplies, key=lambda x: float(x.unit_price))
-            
-            supplier_dict = tenant.to_dict()
-            
-            # 如果供应商没有坐标，尝试通过地址获取坐标
-            if tenant.longitude is None or tenant.latitude is None:
-                if tenant.address:
-                    # 使用高德API进行地理编码
-                    geocode_result = AmapService.geocode_address(tenant.address)
-                    if geocode_result:
-                        supplier_dict['longitude'] = geocode_result['longitude']
-                        supplier_dict['latitude'] = geocode_result['latitude']
-                        supplier_dict['geocoded'] = True  # 标记为动态获取的坐标
-                    else:
-                        # 地理编码失败，跳过该供应商
-                        geocode_failed_count += 1
-                        continue
-                else:
-                    # 没有地址信息，跳过该供应商
-                    geocode_failed_count += 1
-                    continue
-            
-            supplier_dict['inventory'] = {
-                'supply_id': best_supply.id,
-                'drug_id': best_supply.drug_id,
-                'quantity': best_supply.available_quantity,
-                'unit_price': float(best_supply.unit_price),
-                'min_order_quantity': best_supply.min_order_quantity,
-                'valid_until': best_supply.valid_until.isoformat() if best_supply.valid_until else None
-            }
-            # 获取药品详细信息
-            drug = Drug.query.get(best_supply.drug_id)
-            if drug:
-                supplier_dict['inventory']['drug_info'] = {
-                    'generic_name': drug.generic_name,
-                    'brand_name': drug.brand_name,
-                    'specification': drug.specification,
-                    'manufacturer': drug.manufacturer
-                }
-            
-            suppliers.append(supplier_dict)
+        for tenant in unlocated_tenants:
+            # 使用高德API（经持久化缓存）进行地理编码，并将坐标回写到租户
+            if geocode_tenant(tenant):
+                geocoded_ids.add(tenant.id)
+            else:
+                # 地址缺失或地理编码失败，跳过该供应商
+                geocode_failed_count += 1
         
-        if not suppliers:
+        # 保存回写的坐标和地理编码缓存，并同步空间索引
+        db.session.commit()
+        for tenant in unlocated_tenants:
+            sync_tenant_location(tenant)
+        
+        supplier_index = get_supplier_index()
+        total = supplier_index.count(tenant_ids)
+        
+        if total == 0:
             # 检查是否有地理编码失败的情况
             if geocode_failed_count > 0:
                 message = f'有 {drug_name} 库存的供应商中，{geocode_failed_count} 个无法获取位置信息（地址缺失或地理编码失败）'
@@ -244,6 +241,32 @@ def get_nearby_suppliers():
                 'message': message
             })
         
+        if use_api:
+            # 驾车距离需要逐个调用 API，只能对全部候选供应商计算
+            located_ids = [tid for tid in tenant_ids if tid in supplier_index]
+        else:
+            # 直线距离：空间索引只访问附近网格，返回最近的 limit 个
+            hits = supplier_index.nearest(
+                pharmacy_location[0], pharmacy_location[1],
+                limit=limit,
+                max_distance=max_distance,
+                candidate_ids=tenant_ids
+            )
+            located_ids = [tenant_id for _, tenant_id in hits]
+        
+        suppliers = []
+        if located_ids:
+            located_tenants = Tenant.query.filter(Tenant.id.in_(located_ids)).all()
+            for tenant in located_tenants:
+                # 索引可能尚未刷新，以数据库中的最新状态为准
+                if (tenant.type != 'SUPPLIER' or not tenant.is_active
+                        or tenant.longitude is None or tenant.latitude is None):
+                    continue
+                supplier_dict = _build_supplier_dict(tenant, best_supplies[tenant.id], drug_map)
+                if tenant.id in geocoded_ids:
+                    supplier_dict['geocoded'] = True  # 标记为本次通过地址获取的坐标
+                suppliers.append(supplier_dict)
+        
         # 查找就近供应商
         nearby_suppliers = find_nearby_suppliers(
             pharmacy_location=pharmacy_location,
@@ -261,7 +284,7 @@ def get_nearby_suppliers():
                 'latitude': pharmacy_location[1]
             },
             'suppliers': nearby_suppliers,
-            'total': len(suppliers),
+            'total': total,
             'filtered': len(nearby_suppliers),
             'geocode_failed': geocode_failed_count,
             'params': {
@@ -319,6 +342,7 @@ def geocode():
         city = data.get('city')
         
         result = AmapService.geocode_address(address, city)
+        db.session.commit()  # 保存地理编码缓存
         
         if not result:
             return jsonify({
@@ -525,31 +549,32 @@ def get_all_suppliers():
         ).all()
         
         supplier_list = []
+        geocoded = []
         geocode_failed_count = 0
         
         for supplier in suppliers:
             supplier_dict = supplier.to_dict()
             
-            # 如果供应商没有坐标，尝试通过地址获取坐标
+            # 如果供应商没有坐标，尝试通过地址获取坐标并回写到租户
             if supplier.longitude is None or supplier.latitude is None:
-                if supplier.address:
-                    # 使用高德API进行地理编码
-                    geocode_result = AmapService.geocode_address(supplier.address)
-                    if geocode_result:
-                        supplier_dict['longitude'] = geocode_result['longitude']
-                        supplier_dict['latitude'] = geocode_result['latitude']
-                        supplier_dict['geocoded'] = True  # 标记为动态获取的坐标
-                    else:
-                        # 地理编码失败，跳过该供应商
-                        geocode_failed_count += 1
-                        continue
+                geocode_result = geocode_tenant(supplier)
+                if geocode_result:
+                    supplier_dict['longitude'] = geocode_result['longitude']
+                    supplier_dict['latitude'] = geocode_result['latitude']
+                    supplier_dict['geocoded'] = True  # 标记为动态获取的坐标
+                    geocoded.append(supplier)
                 else:
-                    # 没有地址信息，跳过该供应商
+                    # 地址缺失或地理编码失败，跳过该供应商
                     geocode_failed_count += 1
                     continue
             
             supplier_list.append(supplier_dict)
         
+        # 保存回写的坐标和地理编码缓存
+        db.session.commit()
+        for supplier in geocoded:
+            sync_tenant_location(supplier)
+        
         return jsonify({
             'success': True,
             'suppliers': supplier_list,
@@ -656,6 +681,7 @@ def update_my_location():
             }), 400
         
         db.session.commit()
+        sync_tenant_location(tenant)
         
         return jsonify({
             'success': True,
@@ -683,7 +709,7 @@ def get_drug_suggestions():
     获取药品候选项（根据关键词搜索有位置的供应商供应的药品）
     
     查询参数:
-    - keyword: 搜索关键词（药品通用名或商品名）
+    - keyword: 搜索关键词（药品通用名或商品名的一部分，安装 pypinyin 时也可输入全拼或首字母）
     - limit: 返回结果数量限制（默认10）
     
     返回:
@@ -710,88 +736,8 @@ def get_drug_suggestions():
                 'drugs': []
             })
         
-        # 导入所需模型
-        from models import Drug, InventoryItem, SupplyInfo
-        from sqlalchemy import func, or_
-        
-        # 查询有位置且有库存的供应商的药品
-        # 方式1: 通过 InventoryItem 查询（库存管理）
-        inventory_query = db.session.query(
-            Drug.generic_name,
-            Drug.brand_name,
-            Drug.specification,
-            func.count(func.distinct(Tenant.id)).label('supplier_count')
-        ).join(
-            InventoryItem, Drug.id == InventoryItem.drug_id
-        ).join(
-            Tenant, InventoryItem.tenant_id == Tenant.id
-        ).filter(
-            or_(
-                Drug.generic_name.like(f'%{keyword}%'),
-                Drug.brand_name.like(f'%{keyword}%')
-            ),
-            Tenant.longitude.isnot(None),
-            Tenant.latitude.isnot(None),
-            InventoryItem.quantity > 0
-        ).group_by(
-            Drug.generic_name,
-            Drug.brand_name,
-            Drug.specification
-        )
-        
-        # 方式2: 通过 SupplyInfo 查询（B2B平台）
-        supply_query = db.session.query(
-            Drug.generic_name,
-            Drug.brand_name,
-            Drug.specification,
-            func.count(func.distinct(Tenant.id)).label('supplier_count')
-        ).join(
-            SupplyInfo, Drug.id == SupplyInfo.drug_id
-        ).join(
-            Tenant, SupplyInfo.tenant_id == Tenant.id
-        ).filter(
-            or_(
-                Drug.generic_name.like(f'%{keyword}%'),
-                Drug.brand_name.like(f'%{keyword}%')
-            ),
-            Tenant.longitude.isnot(None),
-            Tenant.latitude.isnot(None),
-            SupplyInfo.available_quantity > 0,
-            SupplyInfo.status == 'ACTIVE'
-        ).group_by(
-            Drug.generic_name,
-            Drug.brand_name,
-            Drug.specification
-        )
-        
-        # 合并两个查询结果
-        inventory_results = inventory_query.limit(limit).all()
-        supply_results = supply_query.limit(limit).all()
-        
-        # 去重并合并供应商数量
-        drug_map = {}
-        for result in inventory_results + supply_results:
-            key = f"{result.generic_name}|{result.brand_name}|{result.specification}"
-            if key in drug_map:
-                # 如果已存在，累加供应商数量（去重）
-                drug_map[key]['supplier_count'] = max(
-                    drug_map[key]['supplier_count'],
-                    result.supplier_count
-                )
-            else:
-                drug_map[key] = {
-                    'generic_name': result.generic_name,
-                    'brand_name': result.brand_name,
-                    'specification': result.specification,
-                    'supplier_count': result.supplier_count
-                }
-        
-        # 转换为列表并按供应商数量排序
-        drugs = sorted(
-            drug_map.values(),
-            key=lambda x: x['supplier_count'],
-            reverse=True
-        )[:limit]
+        # 内存索引中按名称子串/拼音前缀匹配，按有货企业数排序，不访问数据库
+        drugs = get_drug_suggestion_index().suggest(keyword, limit)
         
         return jsonify({
             'success': True,
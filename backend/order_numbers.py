@@ -0,0 +1,69 @@
+"""
+订单号分配
+功能：原先订单号为 前缀 + 日期 + 3 位随机数，每天几百单后就会撞上 order_number 唯一约束。
+现在按 (前缀, 日期) 在 order_number_sequences 中保存计数器：
+
+- 订单写入（flush）前统一分配（事件注册在 models.py，任何创建订单的进程都会生效），同一次 flush 中同前缀同日期的订单只递增一次计数器，拿到一段连续序号
+- 计数器的递增与订单插入在同一事务中：事务回滚时计数器一起回滚，已提交的订单号不会被再次分配
+- 序号至少 6 位，超过 999999 后自然变长，单日可分配的订单号没有上限
+
+订单号格式：PH/SP/LG + YYYYMMDD + 序号，如 PH20260320000042
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import OrderNumberSequence
+
+# 序号最少位数
+SEQUENCE_WIDTH = 6
+
+
+def allocate_sequence(prefix: str, day: str, count: int = 1) -> int:
+    """
+    为 (前缀, 日期) 原子地分配 count 个连续序号（在当前事务中，由调用方提交）
+
+    Returns:
+        int: 第一个序号
+    """
+    sequence = OrderNumberSequence.__table__
+    key = (sequence.c.prefix == prefix) & (sequence.c.day == day)
+    increment = update(sequence).where(key).values(last_value=sequence.c.last_value + count)
+
+    if db.session.execute(increment).rowcount == 0:
+        try:
+            # 当天第一单：并发创建同一计数器时主键冲突，回到递增
+            with db.session.begin_nested():
+                db.session.execute(insert(sequence).values(prefix=prefix, day=day, last_value=count))
+        except IntegrityError:
+            db.session.execute(increment)
+    last_value = db.session.execute(select(sequence.c.last_value).where(key)).scalar_one()
+    return last_value - count + 1
+
+
+def format_order_number(prefix: str, day: str, value: int) -> str:
+    return f'{prefix}{day}{value:0{SEQUENCE_WIDTH}d}'
+
+
+def assign_order_numbers(orders, today: Optional[date] = None) -> int:
+    """
+    为没有订单号的订单分配订单号（同前缀的订单一次分配一段序号）
+
+    Returns:
+        int: 分配的订单号个数
+    """
+    day = (today or date.today()).strftime('%Y%m%d')
+    groups = defaultdict(list)
+    for order in orders:
+        if not order.order_number:
+            groups[order.order_number_prefix()].append(order)
+    for prefix, group in groups.items():
+        first = allocate_sequence(prefix, day, len(group))
+        for offset, order in enumerate(group):
+            order.order_number = format_order_number(prefix, day, first + offset)
+    return sum(len(group) for group in groups.values())
+
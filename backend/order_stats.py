@@ -0,0 +1,193 @@
+"""
+订单统计聚合
+功能：订单统计与主页统计原先对同一批订单逐个状态发 COUNT 查询，
+这里用一条 GROUP BY status（附带本月、今日的条件求和）算出全部状态桶，
+并按统计范围（买方/供方/物流企业/全平台）做短时缓存。
+订单新增、删除或状态变更提交后，本进程中相关企业和全平台的缓存随即失效；
+其他进程通过同一事务内递增的缓存版本号（cache_generations）在下一次读取时清空缓存
+"""
+from datetime import datetime
+from typing import Dict, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import case, event, func, inspect
+
+from cache_generations import GenerationCache, current_generations, mark_generations_stale
+from extensions import db
+from models import Order
+
+# 统计缓存有效期（秒）
+DEFAULT_CACHE_TTL_SECONDS = 30
+
+# 跨进程失效使用的缓存版本号
+GENERATION_NAME = 'order_stats'
+
+CANCELLED_STATUSES = ('CANCELLED_BY_PHARMACY', 'CANCELLED_BY_SUPPLIER', 'EXPIRED_CANCELLED')
+LOGISTICS_STATUSES = ('SHIPPED', 'IN_TRANSIT', 'DELIVERED')
+
+# 统计范围 -> 过滤该范围订单的租户字段
+SCOPE_COLUMNS = {
+    'buyer': 'buyer_tenant_id',
+    'supplier': 'supplier_tenant_id',
+    'logistics': 'logistics_tenant_id',
+}
+
+# 这些字段变化会影响统计结果
+_TRACKED_ATTRS = ('status', 'buyer_tenant_id', 'supplier_tenant_id', 'logistics_tenant_id', 'created_at')
+
+
+def aggregate_order_stats(*criteria, now: Optional[datetime] = None) -> Dict:
+    """
+    一条 GROUP BY 查询统计订单各状态数量
+
+    Args:
+        criteria: 订单过滤条件
+        now: 计算本月、今日起点的当前时间，默认 datetime.now()
+
+    Returns:
+        dict: total、pending ... completed、cancelled（三种取消状态合计）、
+              this_month、today 以及 by_status（原始状态 -> 数量）
+    """
+    now = now or datetime.now()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = today_start.replace(day=1)
+
+    rows = db.session.query(
+        Order.status,
+        func.count(Order.id),
+        func.sum(case((Order.created_at >= month_start, 1), else_=0)),
+        func.sum(case((Order.created_at >= today_start, 1), else_=0))
+    ).filter(*criteria).group_by(Order.status).all()
+
+    by_status = {}
+    this_month = today = 0
+    for status, count, month_count, today_count in rows:
+        by_status[status] = count
+        this_month += int(month_count or 0)
+        today += int(today_count or 0)
+
+    return {
+        'total': sum(by_status.values()),
+        'pending': by_status.get('PENDING', 0),
+        'confirmed': by_status.get('CONFIRMED', 0),
+        'shipped': by_status.get('SHIPPED', 0),
+        'in_transit': by_status.get('IN_TRANSIT', 0),
+        'delivered': by_status.get('DELIVERED', 0),
+        'completed': by_status.get('COMPLETED', 0),
+        'cancelled': sum(by_status.get(status, 0) for status in CANCELLED_STATUSES),
+        'this_month': this_month,
+        'today': today,
+        'by_status': by_status
+    }
+
+
+class OrderStatsCache(GenerationCache):
+    """统计结果缓存，键为 (统计范围, 租户ID)；所有键共用一个版本号"""
+
+    def group(self, key) -> str:
+        return GENERATION_NAME
+
+    def get(self, scope: str, tenant_id: Optional[int] = None) -> Optional[Dict]:
+        return super().get((scope, tenant_id))
+
+    def set(self, scope: str, tenant_id: Optional[int], stats: Dict):
+        super().set((scope, tenant_id), stats)
+
+    def invalidate_tenants(self, tenant_ids):
+        """使这些企业各统计范围以及全平台的缓存失效"""
+        tenant_ids = set(tenant_ids)
+        with self._lock:
+            for key in [k for k in self._data if k[0] == 'platform' or k[1] in tenant_ids]:
+                del self._data[key]
+
+
+def get_stats_cache() -> OrderStatsCache:
+    """获取当前应用的订单统计缓存（首次访问时创建）"""
+    cache = current_app.extensions.get('order_stats_cache')
+    if cache is None:
+        cache = OrderStatsCache(
+            ttl=current_app.config.get('ORDER_STATS_CACHE_TTL_SECONDS', DEFAULT_CACHE_TTL_SECONDS)
+        )
+        current_app.extensions['order_stats_cache'] = cache
+    return cache
+
+
+def get_order_stats(scope: str, tenant_id: Optional[int] = None, now: Optional[datetime] = None) -> Dict:
+    """
+    获取某一范围的订单统计（优先读缓存）
+
+    Args:
+        scope: buyer / supplier / logistics / platform
+        tenant_id: 企业ID，platform 范围不需要
+        now: 计算本月、今日起点的当前时间
+    """
+    if scope != 'platform' and scope not in SCOPE_COLUMNS:
+        raise ValueError(f'未知的统计范围: {scope}')
+
+    cache = get_stats_cache()
+    cache.sync(current_generations([GENERATION_NAME]))
+    stats = cache.get(scope, tenant_id)
+    if stats is not None:
+        return stats
+
+    criteria = []
+    if scope in SCOPE_COLUMNS:
+        criteria.append(getattr(Order, SCOPE_COLUMNS[scope]) == tenant_id)
+    if scope == 'logistics':
+        # 物流企业只统计物流相关状态
+        criteria.append(Order.status.in_(LOGISTICS_STATUSES))
+
+    stats = aggregate_order_stats(*criteria, now=now)
+    cache.set(scope, tenant_id, stats)
+    return stats
+
+
+def _affected_tenants(order, deleted=False):
+    """订单变更涉及的企业（包括被改掉的旧值）；与统计无关的变更返回空集合"""
+    state = inspect(order)
+    tenant_ids = set()
+    changed = deleted or state.pending or state.deleted
+    for name in _TRACKED_ATTRS:
+        history = state.attrs[name].history
+        if history.has_changes():
+            changed = True
+        if name.endswith('tenant_id'):
+            tenant_ids.update(history.sum())
+    if not changed:
+        return set()
+    tenant_ids.discard(None)
+    # 全平台统计不依赖企业，用 None 占位保证至少触发一次失效
+    return tenant_ids or {None}
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_orders(session, flush_context):
+    """flush 时记录受影响的企业，等事务提交后再让缓存失效"""
+    tenant_ids = set()
+    for obj in session.new:
+        if isinstance(obj, Order):
+            tenant_ids |= _affected_tenants(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            tenant_ids |= _affected_tenants(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            tenant_ids |= _affected_tenants(obj, deleted=True)
+    if tenant_ids:
+        session.info.setdefault('order_stats_tenants', set()).update(tenant_ids)
+        mark_generations_stale(session, [GENERATION_NAME])
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    tenant_ids = session.info.pop('order_stats_tenants', None)
+    if not tenant_ids or not has_app_context():
+        return
+    cache = current_app.extensions.get('order_stats_cache')
+    if cache is not None:
+        cache.invalidate_tenants(tenant_ids)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('order_stats_tenants', None)
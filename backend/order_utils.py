@@ -2,8 +2,21 @@
 订单状态管理工具函数
 """
 
+import base64
+import binascii
+import json
 from datetime import datetime
-from models import Order, SupplyInfo
+from decimal import Decimal
+from sqlalchemy import bindparam, func
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from extensions import db
+from models import Order, OrderItem, SupplyInfo
+
+# 校验订单合计时每批处理的订单数
+TOTALS_BATCH_SIZE = 500
 
 
 class OrderStatus:
@@ -82,6 +95,120 @@ class OrderStatusTransition:
         return cls.STATUS_DESCRIPTIONS.get(status, status)
 
 
+def order_load_options(include_items=True):
+    """
+    订单列表的预加载方案：多对一关联随主查询 JOIN 取回，明细与药品各用一条 IN 查询，
+    查询条数与每页订单数无关
+
+    Args:
+        include_items: 是否预加载订单明细及其药品
+    """
+    options = [
+        joinedload(Order.buyer_tenant),
+        joinedload(Order.supplier_tenant),
+        joinedload(Order.logistics_tenant),
+        joinedload(Order.created_by_user),
+        joinedload(Order.confirmed_by_user),
+    ]
+    if include_items:
+        options.append(selectinload(Order.items).joinedload(OrderItem.drug))
+    return options
+
+
+def _item_totals_query(order_ids):
+    """订单当前的合计列与按明细重新汇总的合计（一条 LEFT JOIN + GROUP BY）"""
+    return db.session.query(
+        Order.id,
+        Order.total_amount,
+        Order.total_quantity,
+        Order.item_count,
+        func.sum(OrderItem.unit_price * OrderItem.quantity),
+        func.sum(OrderItem.quantity),
+        func.count(OrderItem.id)
+    ).outerjoin(OrderItem, OrderItem.order_id == Order.id).filter(
+        Order.id.in_(order_ids)
+    ).group_by(Order.id)
+
+
+def _to_amount(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def find_stale_order_totals(order_ids):
+    """
+    找出合计列与明细不一致的订单
+
+    Returns:
+        dict: {order_id: (总金额, 总数量, 明细数)}，值为按明细重新汇总的结果
+    """
+    stale = {}
+    order_ids = list(order_ids)
+    for start in range(0, len(order_ids), TOTALS_BATCH_SIZE):
+        for row in _item_totals_query(order_ids[start:start + TOTALS_BATCH_SIZE]):
+            order_id, amount, quantity, count, item_amount, item_quantity, item_count = row
+            expected = (_to_amount(item_amount), int(item_quantity or 0), item_count)
+            if (_to_amount(amount), quantity, count) != expected:
+                stale[order_id] = expected
+    return stale
+
+
+def write_order_totals(totals):
+    """
+    把重新汇总的合计写回订单（不经过 ORM 对象），并同步会话中已加载的订单
+
+    Args:
+        totals: find_stale_order_totals 的返回值
+    """
+    if not totals:
+        return
+    now = datetime.utcnow()
+    db.session.execute(
+        Order.__table__.update().where(Order.__table__.c.id == bindparam('order_id')).values(
+            total_amount=bindparam('amount'),
+            total_quantity=bindparam('quantity'),
+            item_count=bindparam('count'),
+            updated_at=now
+        ),
+        [
+            {'order_id': order_id, 'amount': amount, 'quantity': quantity, 'count': count}
+            for order_id, (amount, quantity, count) in totals.items()
+        ]
+    )
+    for order_id, (amount, quantity, count) in totals.items():
+        order = db.session.identity_map.get(identity_key(Order, order_id))
+        if order is not None:
+            set_committed_value(order, 'total_amount', amount)
+            set_committed_value(order, 'total_quantity', quantity)
+            set_committed_value(order, 'item_count', count)
+            set_committed_value(order, 'updated_at', now)
+
+
+def encode_cursor(order_id):
+    """把上一页最后一条订单的 id 编码成不透明的分页游标"""
+    payload = json.dumps([order_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    解析 encode_cursor 生成的游标
+
+    Returns:
+        int: 上一页最后一条订单的 id
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        (order_id,) = json.loads(raw)
+        if not isinstance(order_id, int) or isinstance(order_id, bool):
+            raise ValueError(order_id)
+        return order_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f'无效的分页游标: {cursor}') from e
+
+
 def validate_order_status_change(order, new_status):
     """
     验证订单状态变更是否合法
@@ -1,5 +1,6 @@
 from datetime import datetime, date, timedelta
-from flask import Blueprint, request, jsonify, current_app
+import json
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import or_, and_, desc, asc
 from sqlalchemy.exc import IntegrityError
@@ -8,6 +9,10 @@ from decimal import Decimal
 from extensions import db
 from models import User, Order, OrderItem, SupplyInfo, Drug, Tenant, InventoryItem, InventoryTransaction
 from supply_utils import update_supply_info_quantity
+from db_utils import retry_on_busy
+from order_utils import order_load_options, encode_cursor, decode_cursor
+from order_stats import get_order_stats as aggregated_order_stats
+from inventory_warning_engine import evaluate_items
 
 bp = Blueprint('orders', __name__, url_prefix='/api/orders')
 
@@ -101,6 +106,7 @@ def _sync_inventory_for_receipt(order, current_user):
     base_date = _coerce_to_date(order.delivered_at or order.shipped_at or order.confirmed_at or order.created_at)
     default_expiry = base_date + timedelta(days=365)
     order_identifier = order.order_number or f'ORDER-{order.id}'
+    touched = []
 
     for item in order.items:
         if not item.quantity or item.quantity <= 0:
@@ -151,6 +157,9 @@ def _sync_inventory_for_receipt(order, current_user):
             created_by=current_user.id
         )
         db.session.add(transaction)
+        touched.append(inventory_item)
+
+    evaluate_items(touched)
 
 
 def _deduct_inventory_for_shipment(order, current_user):
@@ -163,6 +172,7 @@ def _deduct_inventory_for_shipment(order, current_user):
         return
 
     order_identifier = order.order_number or f'ORDER-{order.id}'
+    touched = []
 
     for item in order.items:
         required_qty = int(item.quantity or 0)
@@ -210,12 +220,15 @@ def _deduct_inventory_for_shipment(order, current_user):
                 created_by=current_user.id
             )
             db.session.add(transaction)
+            touched.append(inventory_item)
 
             remaining -= deduction
 
         if remaining > 0:
             raise ValueError('库存不足，无法完成此次发货')
 
+    evaluate_items(touched)
+
 
 @bp.route('', methods=['POST'])
 @jwt_required()
@@ -297,44 +310,50 @@ def create_order(current_user):
         if current_user.tenant_id == supply_info.tenant_id:
             return jsonify({'msg': '不能向自己的企业下单'}), 400
         
-        # 创建订单
-        order = Order(
-            buyer_tenant_id=current_user.tenant_id,
-            supplier_tenant_id=supply_info.tenant_id,
-            supply_info_id=supply_info_id,  # 关联供应信息ID
-            expected_delivery_date=expected_delivery_date,
-            notes=notes,
-            status='PENDING',
-            created_by=current_user.id
-        )
-        
-        # 创建订单明细
-        order_item = OrderItem(
-            drug_id=supply_info.drug_id,
-            unit_price=supply_info.unit_price,
-            quantity=quantity
-        )
-        
-        order.items.append(order_item)
-        
-        db.session.add(order)
-        db.session.flush()  # 获取订单ID
-        
-        # 更新供应信息的可用数量（预占库存）
-        updated_supply_info = update_supply_info_quantity(
-            supply_info.tenant_id, 
-            supply_info.drug_id, 
-            -quantity,
-            f"订单{order.order_number}创建，预占库存",
-            supply_info_id=supply_info.id
-        )
+        def place_order():
+            # 创建订单
+            order = Order(
+                buyer_tenant_id=current_user.tenant_id,
+                supplier_tenant_id=supply_info.tenant_id,
+                supply_info_id=supply_info_id,  # 关联供应信息ID
+                expected_delivery_date=expected_delivery_date,
+                notes=notes,
+                status='PENDING',
+                created_by=current_user.id
+            )
+            
+            # 创建订单明细
+            order_item = OrderItem(
+                drug_id=supply_info.drug_id,
+                unit_price=supply_info.unit_price,
+                quantity=quantity
+            )
+            
+            order.items.append(order_item)
+            
+            db.session.add(order)
+            db.session.flush()  # 获取订单ID与订单号
+            
+            # 原子地预占库存（条件 UPDATE，数量不足时不会扣减）
+            updated_supply_info = update_supply_info_quantity(
+                supply_info.tenant_id, 
+                supply_info.drug_id, 
+                -quantity,
+                f"订单{order.order_number}创建，预占库存",
+                supply_info_id=supply_info.id
+            )
+            if not updated_supply_info:
+                db.session.rollback()
+                return None
+            
+            db.session.commit()
+            return order
         
-        if not updated_supply_info:
-            db.session.rollback()
+        # 多个 worker 同时写入时 SQLite 可能报写锁冲突，整单回滚后重试
+        order = retry_on_busy(place_order)
+        if order is None:
             return jsonify({'msg': '供应信息数量不足，无法创建订单'}), 400
         
-        db.session.commit()
-        
         return jsonify({
             'msg': '订单创建成功',
             'data': order.to_dict(include_relations=True)
@@ -362,6 +381,9 @@ def get_orders():
     - role_filter: 角色筛选 (my_purchases: 我的采购, my_sales: 我的销售)
     - order_number: 订单号搜索
     - drug_name: 药品名称搜索
+    - min_amount / max_amount: 订单总金额范围
+    - sort: 排序方式（created_desc/amount_desc/amount_asc），默认 created_desc
+    - fields: 只返回这些字段，逗号分隔 (如 order_number,status,total_amount,buyer_tenant)
     """
     try:
         current_user = get_authenticated_user()
@@ -378,9 +400,15 @@ def get_orders():
         role_filter = request.args.get('role_filter', '').strip()
         order_number = request.args.get('order_number', '').strip()
         drug_name = request.args.get('drug_name', '').strip()
+        min_amount = request.args.get('min_amount', type=float)
+        max_amount = request.args.get('max_amount', type=float)
+        sort = request.args.get('sort', 'created_desc').strip()
+        fields_param = request.args.get('fields', '').strip()
+        fields = {f.strip() for f in fields_param.split(',') if f.strip()} if fields_param else None
+        include_items = fields is None or 'items' in fields
         
-        # 构建查询
-        query = db.session.query(Order)
+        # 构建查询：关联对象与明细批量预加载，避免逐条懒加载
+        query = db.session.query(Order).options(*order_load_options(include_items=include_items))
         
         # 权限控制
         current_app.logger.info(f'get_orders - 用户权限检查: 用户ID={current_user.id}, 角色={current_user.role}, 租户ID={current_user.tenant_id}')
@@ -427,17 +455,28 @@ def get_orders():
         if order_number:
             query = query.filter(Order.order_number.ilike(f'%{order_number}%'))
         
-        # 药品名称搜索
+        # 药品名称搜索（EXISTS 子查询，多个明细命中时订单不会重复）
         if drug_name:
-            query = query.join(OrderItem).join(Drug).filter(
+            query = query.filter(Order.items.any(OrderItem.drug.has(
                 or_(
                     Drug.generic_name.ilike(f'%{drug_name}%'),
                     Drug.brand_name.ilike(f'%{drug_name}%')
                 )
-            )
+            )))
+        
+        # 金额筛选（订单合计列，不需要关联明细）
+        if min_amount is not None:
+            query = query.filter(Order.total_amount >= min_amount)
+        if max_amount is not None:
+            query = query.filter(Order.total_amount <= max_amount)
         
         # 排序
-        query = query.order_by(desc(Order.created_at))
+        if sort == 'amount_desc':
+            query = query.order_by(desc(Order.total_amount), desc(Order.id))
+        elif sort == 'amount_asc':
+            query = query.order_by(Order.total_amount, Order.id)
+        else:
+            query = query.order_by(desc(Order.created_at), desc(Order.id))
         
         # 分页
         pagination = query.paginate(
@@ -446,8 +485,11 @@ def get_orders():
             error_out=False
         )
         
-        # 格式化数据
-        orders_list = [order.to_dict(include_relations=True) for order in pagination.items]
+        # 格式化数据：合计直接取订单上的合计列
+        orders_list = [
+            order.to_dict(include_relations=True, fields=fields)
+            for order in pagination.items
+        ]
         
         return jsonify({
             'msg': '获取订单列表成功',
@@ -760,41 +802,26 @@ def get_order_stats():
 
         if current_user.role == 'pharmacy':
             # 药店统计采购订单
-            query = Order.query.filter_by(buyer_tenant_id=current_user.tenant_id)
+            scope = 'buyer'
             current_app.logger.info(f'get_order_stats - 药店统计: buyer_tenant_id={current_user.tenant_id}')
         elif current_user.role == 'supplier':
             # 供应商统计供应订单
-            query = Order.query.filter_by(supplier_tenant_id=current_user.tenant_id)
+            scope = 'supplier'
             current_app.logger.info(f'get_order_stats - 供应商统计: supplier_tenant_id={current_user.tenant_id}')
         elif current_user.role == 'logistics':
             # 物流公司统计分配给自己的订单，且只统计物流相关状态
-            query = Order.query.filter(
-                Order.logistics_tenant_id == current_user.tenant_id,
-                Order.status.in_(['SHIPPED', 'IN_TRANSIT', 'DELIVERED'])
-            )
+            scope = 'logistics'
             current_app.logger.info(f'get_order_stats - 物流统计: logistics_tenant_id={current_user.tenant_id}')
         else:
             current_app.logger.warning(f'get_order_stats - 权限不足: 角色={current_user.role}')
             return jsonify({'msg': '权限不足'}), 403
         
-        # 统计各状态订单数量
-        stats = {
-            'total': query.count(),
-            'pending': query.filter_by(status='PENDING').count(),
-            'confirmed': query.filter_by(status='CONFIRMED').count(),
-            'shipped': query.filter_by(status='SHIPPED').count(),
-            'in_transit': query.filter_by(status='IN_TRANSIT').count(),
-            'delivered': query.filter_by(status='DELIVERED').count(),
-            'completed': query.filter_by(status='COMPLETED').count(),
-            'cancelled': query.filter(
-                Order.status.in_(['CANCELLED_BY_PHARMACY', 'CANCELLED_BY_SUPPLIER', 'EXPIRED_CANCELLED'])
-            ).count()
-        }
-        
-        # 计算本月订单数量
-        from datetime import datetime
-        this_month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        stats['this_month'] = query.filter(Order.created_at >= this_month_start).count()
+        # 一条 GROUP BY 统计各状态订单数量与本月订单数（短时缓存，订单变更提交后失效）
+        result = aggregated_order_stats(scope, current_user.tenant_id)
+        stats = {key: result[key] for key in (
+            'total', 'pending', 'confirmed', 'shipped', 'in_transit',
+            'delivered', 'completed', 'cancelled', 'this_month'
+        )}
         
         return jsonify({
             'msg': '获取订单统计成功',
@@ -943,6 +970,9 @@ def get_logistics_orders():
     - status: 订单状态（精确匹配）
     - start_date: 开始日期（按更新时间过滤）
     - end_date: 结束日期（按更新时间过滤）
+    - limit: 每页数量（默认 LOGISTICS_ORDERS_PAGE_SIZE）
+    - cursor: 上一页返回的 next_cursor，按 id 倒序继续翻页（订单更新不会改变其位置，翻页时不会漏掉或重复）
+    - format: 传 ndjson 时逐行流式返回全部符合条件的订单（用于批量导出），忽略 limit
     """
     try:
         current_user = get_authenticated_user()
@@ -997,71 +1027,42 @@ def get_logistics_orders():
             except Exception as e:
                 current_app.logger.warning(f'解析结束日期失败: {e}')
         
-        # 按更新时间倒序排列
-        query = query.order_by(desc(Order.updated_at))
-        
-        orders = query.all()
+        config = current_app.config
+        try:
+            after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        orders_data = []
-        for order in orders:
-            # 获取药房信息（买方租户）
-            pharmacy = Tenant.query.get(order.buyer_tenant_id)
-            pharmacy_name = pharmacy.name if pharmacy else 'Unknown'
-            pharmacy_address = pharmacy.address if pharmacy else None
+        # 批量导出：按批次游标翻页并逐行输出，不在内存中拼装整个列表
+        if request.args.get('format') == 'ndjson':
+            batch_size = config.get('LOGISTICS_ORDERS_STREAM_BATCH', 500)
             
-            # 获取供应商名称
-            supplier = Tenant.query.get(order.supplier_tenant_id)
-            supplier_name = supplier.name if supplier else 'Unknown'
+            def generate(key):
+                while True:
+                    batch, has_more = _fetch_logistics_page(query, key, batch_size)
+                    for order in batch:
+                        yield json.dumps(_logistics_order_row(order), ensure_ascii=False) + '\n'
+                    if not has_more:
+                        break
+                    key = batch[-1].id
             
-            # 收集批号（从订单明细中获取第一个批号）
-            batch_numbers = []
-            drug_names = []
-            total_quantity = 0
-            
-            for item in order.items:
-                if item.batch_number:
-                    batch_numbers.append(item.batch_number)
-                
-                drug = Drug.query.get(item.drug_id)
-                if drug:
-                    drug_names.append(f"{drug.generic_name or drug.brand_name}")
-                
-                total_quantity += item.quantity
-            
-            drug_name = ', '.join(drug_names) if drug_names else 'Unknown'
-            batch_number = batch_numbers[0] if batch_numbers else None
-            
-            # 获取物流公司名称
-            logistics_company_name = None
-            if order.logistics_tenant_id:
-                logistics_company = Tenant.query.get(order.logistics_tenant_id)
-                if logistics_company:
-                    logistics_company_name = logistics_company.name
-            
-            # 返回前端需要的字段格式
-            orders_data.append({
-                'id': order.id,
-                'order_no': order.order_number,  # 前端使用 order_no
-                'tracking_number': order.tracking_number,  # 运单号
-                'batch_number': batch_number,  # 批号
-                'status': order.status,
-                'address': pharmacy_address,  # 收货地址（药房地址）
-                'updated_at': order.updated_at.isoformat() if order.updated_at else None,
-                # 额外的字段（可选）
-                'pharmacy_name': pharmacy_name,
-                'supplier_name': supplier_name,
-                'drug_name': drug_name,
-                'quantity': total_quantity,
-                'total_amount': str(order.total_amount),
-                'logistics_company_name': logistics_company_name,
-                'created_at': order.created_at.isoformat() if order.created_at else None
-            })
+            return Response(stream_with_context(generate(after)), mimetype='application/x-ndjson')
+        
+        default_limit = config.get('LOGISTICS_ORDERS_PAGE_SIZE', 100)
+        limit = request.args.get('limit', default_limit, type=int) or default_limit
+        limit = max(1, min(limit, config.get('LOGISTICS_ORDERS_MAX_PAGE_SIZE', 500)))
+        
+        orders, has_more = _fetch_logistics_page(query, after, limit)
+        orders_data = [_logistics_order_row(order) for order in orders]
+        next_cursor = encode_cursor(orders[-1].id) if has_more else None
         
         return jsonify({
             'success': True,
             'message': '获取物流订单列表成功',
             'data': orders_data,
-            'total': len(orders_data)
+            'total': len(orders_data),
+            'has_more': has_more,
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
@@ -1075,6 +1076,54 @@ def get_logistics_orders():
         }), 500
 
 
+def _fetch_logistics_page(query, after, limit):
+    """
+    按 id 倒序（最新创建的在前）取一页物流订单，关联企业与明细药品批量预加载
+
+    游标用不会变化的 id：updated_at 随状态变更与合计刷新而改变，
+    用它做游标时翻页期间被更新的订单会跳到游标之前而漏掉或重复
+
+    Args:
+        query: 已应用权限与筛选条件的订单查询
+        after: 上一页最后一条的 id，None 表示第一页
+        limit: 每页数量
+
+    Returns:
+        tuple: (订单列表, 是否还有下一页)
+    """
+    if after is not None:
+        query = query.filter(Order.id < after)
+    orders = query.options(*order_load_options()).order_by(desc(Order.id)).limit(limit + 1).all()
+    return orders[:limit], len(orders) > limit
+
+
+def _logistics_order_row(order):
+    """物流订单列表的一行（前端需要的字段格式）"""
+    pharmacy = order.buyer_tenant
+    supplier = order.supplier_tenant
+    
+    # 收集批号（取第一个批号）与药品名称
+    batch_numbers = [item.batch_number for item in order.items if item.batch_number]
+    drug_names = [f"{item.drug.generic_name or item.drug.brand_name}" for item in order.items if item.drug]
+    return {
+        'id': order.id,
+        'order_no': order.order_number,  # 前端使用 order_no
+        'tracking_number': order.tracking_number,  # 运单号
+        'batch_number': batch_numbers[0] if batch_numbers else None,  # 批号
+        'status': order.status,
+        'address': pharmacy.address if pharmacy else None,  # 收货地址（药房地址）
+        'updated_at': order.updated_at.isoformat() if order.updated_at else None,
+        # 额外的字段（可选）
+        'pharmacy_name': pharmacy.name if pharmacy else 'Unknown',
+        'supplier_name': supplier.name if supplier else 'Unknown',
+        'drug_name': ', '.join(drug_names) if drug_names else 'Unknown',
+        'quantity': order.total_quantity,
+        'total_amount': str(float(order.total_amount)),
+        'logistics_company_name': order.logistics_tenant.name if order.logistics_tenant else None,
+        'created_at': order.created_at.isoformat() if order.created_at else None
+    }
+
+
 def register_logistics_blueprint(app):
     """注册物流蓝图"""
     app.register_blueprint(logistics_bp)
@@ -0,0 +1,197 @@
+"""
+平台统计快照
+功能：监管仪表盘与系统状态原先每次加载都对企业、订单、供应信息、用户等表
+逐项发 COUNT 查询（合计二十多条）。这里每张表用一条聚合查询（分组或条件求和）算出全部计数，
+结果保存为带时间戳的快照，由后台线程按配置的间隔刷新，两个接口都直接读取快照并返回 as_of
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import case, func
+
+from extensions import db
+from models import EnterpriseCertification, InventoryItem, SupplyInfo, Tenant, User
+from order_stats import aggregate_order_stats
+
+# 默认配置（未在 config 中设置时使用）
+DEFAULT_REFRESH_SECONDS = 60
+
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def compute_platform_stats(now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    统计全平台的企业、订单、供应信息、用户、企业认证与库存计数（每张表一条查询）
+
+    Args:
+        now: 统计时间（UTC），默认当前时间
+
+    Returns:
+        dict: as_of 以及 tenants、orders、supply、users、certifications、inventory 各项计数
+    """
+    now = now or datetime.utcnow()
+    # 今日订单按服务器本地日期统计，与原仪表盘一致；其余按 UTC，与原系统状态一致
+    local_now = now + (datetime.now() - datetime.utcnow())
+    today = now.date()
+
+    tenants_by_type = dict(db.session.query(Tenant.type, func.count(Tenant.id)).group_by(Tenant.type).all())
+
+    orders = aggregate_order_stats(now=local_now)
+
+    supply = db.session.query(
+        func.count(SupplyInfo.id),
+        _count_if(SupplyInfo.status == 'ACTIVE'),
+        _count_if(SupplyInfo.status != 'ACTIVE'),
+        _count_if((SupplyInfo.status == 'ACTIVE') & (SupplyInfo.available_quantity < 10))
+    ).one()
+
+    users = db.session.query(
+        func.count(User.id),
+        _count_if(User.is_active.is_(True)),
+        _count_if(User.is_active.is_(False)),
+        _count_if(User.is_authenticated.is_(True)),
+        _count_if(User.created_at >= now - timedelta(days=7))
+    ).one()
+
+    certifications = dict(db.session.query(
+        EnterpriseCertification.status, func.count(EnterpriseCertification.id)
+    ).group_by(EnterpriseCertification.status).all())
+
+    inventory = db.session.query(
+        func.count(InventoryItem.id),
+        _count_if(InventoryItem.quantity < 10),
+        _count_if(InventoryItem.expiry_date <= today + timedelta(days=30)),
+        _count_if(InventoryItem.expiry_date < today)
+    ).one()
+
+    return {
+        'as_of': now.isoformat(),
+        'tenants': {
+            'total': sum(tenants_by_type.values()),
+            'by_type': tenants_by_type
+        },
+        'orders': {
+            'total': orders['total'],
+            'today': orders['today'],
+            'by_status': orders['by_status']
+        },
+        'supply': {
+            'total': supply[0] or 0,
+            'active': int(supply[1] or 0),
+            'inactive': int(supply[2] or 0),
+            'active_low_stock': int(supply[3] or 0)
+        },
+        'users': {
+            'total': users[0] or 0,
+            'active': int(users[1] or 0),
+            'disabled': int(users[2] or 0),
+            'authenticated': int(users[3] or 0),
+            'new_last_7_days': int(users[4] or 0)
+        },
+        'certifications': {
+            'pending': certifications.get('pending', 0),
+            'approved': certifications.get('approved', 0),
+            'rejected': certifications.get('rejected', 0)
+        },
+        'inventory': {
+            'total_items': inventory[0] or 0,
+            'low_stock': int(inventory[1] or 0),
+            'near_expiry': int(inventory[2] or 0),
+            'expired': int(inventory[3] or 0)
+        }
+    }
+
+
+class PlatformStatsService:
+    """
+    平台统计快照
+
+    后台线程每隔 interval 秒刷新一次；线程未启动或停止工作时，
+    读取发现快照过期（超过 interval，线程运行时放宽到两倍）会在当前请求内刷新
+    """
+
+    def __init__(self, app: Flask, interval: int = DEFAULT_REFRESH_SECONDS):
+        self.app = app
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._refreshed_at: Optional[float] = None
+        self._worker: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.refreshes = 0
+
+    def get(self) -> Dict[str, Any]:
+        """读取快照，过期时先刷新；返回的字典由各请求共用，调用方不要修改"""
+        max_age = self.interval * (2 if self.worker_alive else 1)
+        snapshot, refreshed_at = self._snapshot, self._refreshed_at
+        if snapshot is not None and time.monotonic() - refreshed_at < max_age:
+            return snapshot
+        with self._lock:
+            # 等锁期间其他请求可能已经刷新
+            if self._snapshot is not None and time.monotonic() - self._refreshed_at < max_age:
+                return self._snapshot
+            return self._refresh_locked()
+
+    def refresh(self) -> Dict[str, Any]:
+        """立即重新统计并替换快照"""
+        with self._lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> Dict[str, Any]:
+        snapshot = compute_platform_stats()
+        self._snapshot, self._refreshed_at = snapshot, time.monotonic()
+        self.refreshes += 1
+        return snapshot
+
+    @property
+    def worker_alive(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def start_worker(self):
+        """启动后台刷新线程（守护线程，随进程退出）"""
+        if self.worker_alive:
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name='platform-stats-refresh', daemon=True)
+        self._worker.start()
+
+    def stop_worker(self):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.refresh()
+                except Exception as exc:  # pragma: no cover - 刷新失败时下次请求会在线统计
+                    self.app.logger.exception('Failed to refresh platform statistics: %s', exc)
+                finally:
+                    db.session.remove()
+
+
+def get_platform_stats_service() -> PlatformStatsService:
+    """获取当前应用的平台统计服务（首次访问时创建，按配置启动后台刷新线程）"""
+    service = current_app.extensions.get('platform_stats')
+    if service is None:
+        service = PlatformStatsService(
+            current_app._get_current_object(),
+            interval=current_app.config.get('PLATFORM_STATS_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+        )
+        current_app.extensions['platform_stats'] = service
+        # 测试使用的内存数据库不能跨线程共享，不启动后台线程
+        if current_app.config.get('PLATFORM_STATS_WORKER', True) and not current_app.testing:
+            service.start_worker()
+    return service
+
+
+def get_platform_stats() -> Dict[str, Any]:
+    """读取平台统计快照"""
+    return get_platform_stats_service().get()
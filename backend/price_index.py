@@ -0,0 +1,312 @@
+"""
+药品价格索引
+功能：价格对比接口原先每次都 join 药品与企业加载全部有效供应信息、在 SQL 中排序并整体返回。
+这里在内存中按药品维护有效报价（上架且可供数量 > 0），每个药品一份按 (单价, 供应信息ID) 排序的数组：
+
+- 多个药品的报价用归并取前 k 条，价格区间用二分查找定位，分页只切片，查询不访问数据库
+- 有效期（valid_until）到期的报价按到期日小顶堆在查询时剔除
+- 供应信息的新增、修改、删除与下单占用在事务提交后增量更新；超过 PRICE_INDEX_REFRESH_SECONDS 后
+  全量刷新（同步其他 worker 进程的写入）
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from extensions import db
+from models import Drug, SupplyInfo, Tenant
+
+# 默认全量刷新间隔（秒）
+DEFAULT_REFRESH_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class Offer:
+    """一条有效报价"""
+    supply_id: int
+    drug_id: int
+    tenant_id: int
+    unit_price: float
+    available_quantity: int
+    min_order_quantity: int
+    valid_until: Optional[date]
+
+    @property
+    def key(self) -> Tuple[float, int]:
+        return (self.unit_price, self.supply_id)
+
+    @classmethod
+    def from_supply(cls, supply: SupplyInfo) -> Optional['Offer']:
+        """上架且有可供数量的供应信息转换为报价，否则返回 None"""
+        if supply.status != 'ACTIVE' or not supply.available_quantity or supply.available_quantity <= 0:
+            return None
+        return cls(
+            supply_id=supply.id,
+            drug_id=supply.drug_id,
+            tenant_id=supply.tenant_id,
+            unit_price=float(supply.unit_price or 0),
+            available_quantity=supply.available_quantity,
+            min_order_quantity=supply.min_order_quantity,
+            valid_until=supply.valid_until
+        )
+
+
+def _drug_fields(drug: Drug) -> dict:
+    return {
+        'drug_name': drug.generic_name,
+        'brand_name': drug.brand_name,
+        'specification': drug.specification,
+        'manufacturer': drug.manufacturer,
+    }
+
+
+def _tenant_fields(tenant: Tenant) -> dict:
+    return {'supplier_name': tenant.name, 'supplier_type': tenant.type}
+
+
+def _walk(keys: List[Tuple[float, int]], start: int, end: int, reverse: bool = False):
+    """按顺序遍历 keys[start:end]（不复制数组）"""
+    positions = range(end - 1, start - 1, -1) if reverse else range(start, end)
+    for position in positions:
+        yield keys[position]
+
+
+class DrugPriceIndex:
+    """按药品分组、按单价排序的报价索引"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._offers: Dict[int, Offer] = {}
+        self._keys: Dict[int, List[Tuple[float, int]]] = defaultdict(list)
+        self._expiry: List[Tuple[date, int]] = []
+        self._drugs: Dict[int, dict] = {}
+        self._tenants: Dict[int, dict] = {}
+        self.loaded_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._offers)
+
+    def rebuild(self):
+        """从数据库全量构建"""
+        supplies = SupplyInfo.query.filter(
+            SupplyInfo.status == 'ACTIVE',
+            SupplyInfo.available_quantity > 0,
+            SupplyInfo.valid_until > date.today()
+        ).all()
+        offers = [offer for offer in map(Offer.from_supply, supplies) if offer]
+        drug_ids = {offer.drug_id for offer in offers}
+        tenant_ids = {offer.tenant_id for offer in offers}
+        drugs = {drug.id: _drug_fields(drug) for drug in Drug.query.filter(Drug.id.in_(drug_ids))} if drug_ids else {}
+        tenants = ({tenant.id: _tenant_fields(tenant) for tenant in Tenant.query.filter(Tenant.id.in_(tenant_ids))}
+                   if tenant_ids else {})
+
+        with self._lock:
+            self._offers = {}
+            self._keys = defaultdict(list)
+            self._expiry = []
+            self._drugs = drugs
+            self._tenants = tenants
+            for offer in offers:
+                self._offers[offer.supply_id] = offer
+                self._keys[offer.drug_id].append(offer.key)
+                if offer.valid_until:
+                    self._expiry.append((offer.valid_until, offer.supply_id))
+            for keys in self._keys.values():
+                keys.sort()
+            heapq.heapify(self._expiry)
+            self.loaded_at = time.time()
+
+    def _discard(self, supply_id: int):
+        offer = self._offers.pop(supply_id, None)
+        if offer is None:
+            return
+        keys = self._keys.get(offer.drug_id)
+        if keys:
+            position = bisect_left(keys, offer.key)
+            if position < len(keys) and keys[position] == offer.key:
+                del keys[position]
+            if not keys:
+                del self._keys[offer.drug_id]
+
+    def upsert(self, supply_id: int, offer: Optional[Offer]):
+        """写入一条供应信息的最新状态（offer 为 None 表示不再是有效报价）"""
+        with self._lock:
+            self._discard(supply_id)
+            if offer is None:
+                return
+            self._offers[supply_id] = offer
+            insort(self._keys[offer.drug_id], offer.key)
+            if offer.valid_until:
+                heapq.heappush(self._expiry, (offer.valid_until, supply_id))
+
+    def set_drug(self, drug_id: int, fields: dict):
+        with self._lock:
+            self._drugs[drug_id] = fields
+
+    def set_tenant(self, tenant_id: int, fields: dict):
+        with self._lock:
+            self._tenants[tenant_id] = fields
+
+    def expire(self, today: Optional[date] = None) -> int:
+        """剔除有效期已到的报价（valid_until <= today），返回剔除条数"""
+        today = today or date.today()
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= today:
+                valid_until, supply_id = heapq.heappop(self._expiry)
+                offer = self._offers.get(supply_id)
+                # 报价更新过有效期时堆里会留下旧条目，只按当前有效期剔除
+                if offer is not None and offer.valid_until == valid_until:
+                    self._discard(supply_id)
+                    removed += 1
+        return removed
+
+    def _ranges(self, drug_ids: Iterable[int], min_price: Optional[float],
+                max_price: Optional[float]) -> List[Tuple[List[Tuple[float, int]], int, int]]:
+        """各药品在价格区间内的报价位置 (keys, start, end)"""
+        ranges = []
+        for drug_id in dict.fromkeys(drug_ids):
+            keys = self._keys.get(drug_id)
+            if not keys:
+                continue
+            start = 0 if min_price is None else bisect_left(keys, (min_price, 0))
+            end = len(keys) if max_price is None else bisect_right(keys, (max_price, float('inf')))
+            if start < end:
+                ranges.append((keys, start, end))
+        return ranges
+
+    def query(self, drug_ids: Iterable[int], sort: str = 'price_asc', min_price: Optional[float] = None,
+              max_price: Optional[float] = None, offset: int = 0,
+              limit: Optional[int] = None) -> Tuple[List[dict], int]:
+        """
+        查询若干药品的有效报价
+
+        Args:
+            sort: price_asc / price_desc（同价时按供应信息 ID 同向排序）
+            min_price, max_price: 单价区间（含边界）
+            offset, limit: 分页（limit 为 None 时返回 offset 之后的全部）
+
+        Returns:
+            (报价列表, 符合条件的报价总数)
+        """
+        self.expire()
+        with self._lock:
+            ranges = self._ranges(drug_ids, min_price, max_price)
+            total = sum(end - start for _, start, end in ranges)
+            if sort == 'price_desc':
+                merged = heapq.merge(*(_walk(keys, start, end, reverse=True) for keys, start, end in ranges),
+                                     key=lambda key: (-key[0], -key[1]))
+            else:
+                merged = heapq.merge(*(_walk(keys, start, end) for keys, start, end in ranges))
+            stop = None if limit is None else offset + limit
+            offers = [self._offers[supply_id] for _, supply_id in islice(merged, offset, stop)]
+            return [self._serialize(offer) for offer in offers], total
+
+    def _serialize(self, offer: Offer) -> dict:
+        drug = self._drugs.get(offer.drug_id, {})
+        tenant = self._tenants.get(offer.tenant_id, {})
+        return {
+            'supply_id': offer.supply_id,
+            'drug_id': offer.drug_id,
+            'drug_name': drug.get('drug_name', ''),
+            'brand_name': drug.get('brand_name', ''),
+            'specification': drug.get('specification', ''),
+            'manufacturer': drug.get('manufacturer', ''),
+            'supplier_id': offer.tenant_id,
+            'supplier_name': tenant.get('supplier_name', ''),
+            'supplier_type': tenant.get('supplier_type', ''),
+            'unit_price': offer.unit_price,
+            'available_quantity': offer.available_quantity,
+            'min_order_quantity': offer.min_order_quantity,
+            'valid_until': offer.valid_until.isoformat() if offer.valid_until else None
+        }
+
+
+def get_price_index() -> DrugPriceIndex:
+    """
+    获取当前应用的价格索引
+
+    首次访问时从数据库构建；超过 PRICE_INDEX_REFRESH_SECONDS 后全量刷新。
+    """
+    index = current_app.extensions.get('price_index')
+    if index is None:
+        index = DrugPriceIndex()
+        current_app.extensions['price_index'] = index
+
+    refresh_seconds = current_app.config.get('PRICE_INDEX_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+    if index.loaded_at is None or time.time() - index.loaded_at > refresh_seconds:
+        index.rebuild()
+    return index
+
+
+def _index_loaded() -> bool:
+    if not has_app_context():
+        return False
+    index = current_app.extensions.get('price_index')
+    return index is not None and index.loaded_at is not None
+
+
+def _pending(session) -> dict:
+    return session.info.setdefault('price_index', {'offers': {}, 'drugs': {}, 'tenants': {}})
+
+
+def _stage_supply(session, supply: SupplyInfo, deleted: bool = False):
+    pending = _pending(session)
+    offer = None if deleted else Offer.from_supply(supply)
+    pending['offers'][supply.id] = offer
+    if offer is not None:
+        # 报价引用的药品与企业信息一起暂存，新药品/新企业不必回库查询
+        if supply.drug is not None:
+            pending['drugs'][supply.drug_id] = _drug_fields(supply.drug)
+        if supply.tenant is not None:
+            pending['tenants'][supply.tenant_id] = _tenant_fields(supply.tenant)
+
+
+def mark_supply_changed(supply: SupplyInfo):
+    """
+    绕过 ORM 修改了供应信息（如 Core UPDATE 后 refresh）时调用，使价格索引在提交后更新
+
+    ORM 对象的增删改由 flush 事件自动处理。
+    """
+    if _index_loaded():
+        _stage_supply(db.session(), supply)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _track_price_changes(session, flush_context):
+    if not _index_loaded():
+        return
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SupplyInfo):
+            _stage_supply(session, obj, deleted=obj in session.deleted)
+        elif isinstance(obj, Drug) and obj not in session.deleted:
+            _pending(session)['drugs'][obj.id] = _drug_fields(obj)
+        elif isinstance(obj, Tenant) and obj not in session.deleted:
+            _pending(session)['tenants'][obj.id] = _tenant_fields(obj)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_price_changes(session):
+    pending = session.info.pop('price_index', None)
+    if not pending or not _index_loaded():
+        return
+    index = current_app.extensions['price_index']
+    for drug_id, fields in pending['drugs'].items():
+        index.set_drug(drug_id, fields)
+    for tenant_id, fields in pending['tenants'].items():
+        index.set_tenant(tenant_id, fields)
+    for supply_id, offer in pending['offers'].items():
+        index.upsert(supply_id, offer)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_price_changes(session):
+    session.info.pop('price_index', None)
@@ -5,16 +5,23 @@
 
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from db_utils import read_replica
 from extensions import db
 from models import Tenant, SupplyInfo, Drug, Order, OrderItem, User, InventoryItem
+from platform_stats import get_platform_stats
 from sqlalchemy import func, desc
+from sqlalchemy.orm import aliased, contains_eager
 from datetime import datetime, timedelta
 
 bp = Blueprint('regulator', __name__, url_prefix='/api/regulator')
 
+# 订单趋势最多统计的天数
+MAX_TREND_DAYS = 90
+
 
 @bp.route('/enterprises', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_all_enterprises():
     """获取所有企业列表"""
     user_id = get_jwt_identity()
@@ -62,6 +69,7 @@ def get_all_enterprises():
 
 @bp.route('/inventory/overview', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_inventory_overview():
     """获取所有企业的库存概览"""
     user_id = get_jwt_identity()
@@ -151,8 +159,32 @@ def get_inventory_overview():
         return jsonify({'error': str(e)}), 500
 
 
+def _daily_trend(days):
+    """
+    最近 days 天（含今天）每天的订单数，没有订单的日期计为 0
+
+    按 created_at 范围过滤（走 ix_orders_created_at 索引）后按日期分组
+    """
+    today = datetime.now().date()
+    first_day = today - timedelta(days=days - 1)
+    rows = db.session.query(
+        func.date(Order.created_at),
+        func.count(Order.id)
+    ).filter(
+        Order.created_at >= datetime.combine(first_day, datetime.min.time())
+    ).group_by(
+        func.date(Order.created_at)
+    ).all()
+    counts = {str(day): count for day, count in rows}
+    return [
+        {'date': str(day), 'count': counts.get(str(day), 0)}
+        for day in (first_day + timedelta(days=offset) for offset in range(days))
+    ]
+
+
 @bp.route('/orders/overview', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_orders_overview():
     """获取所有订单概览"""
     user_id = get_jwt_identity()
@@ -170,8 +202,17 @@ def get_orders_overview():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        # 构建查询 - 直接查询Order对象
-        query = Order.query
+        trend_days = min(max(request.args.get('trend_days', 7, type=int), 1), MAX_TREND_DAYS)
+        
+        # 构建查询 - 买方、卖方企业在同一条查询中连接
+        buyer = aliased(Tenant)
+        supplier = aliased(Tenant)
+        query = Order.query.outerjoin(buyer, Order.buyer_tenant).outerjoin(
+            supplier, Order.supplier_tenant
+        ).options(
+            contains_eager(Order.buyer_tenant.of_type(buyer)),
+            contains_eager(Order.supplier_tenant.of_type(supplier))
+        )
         
         # 应用过滤
         if status:
@@ -192,14 +233,8 @@ def get_orders_overview():
         
         orders_list = []
         for order in pagination.items:
-            # 获取订单关联的企业信息
-            buyer_tenant = Tenant.query.get(order.buyer_tenant_id)
-            supplier_tenant = Tenant.query.get(order.supplier_tenant_id)
-            
-            # 获取订单项
-            order_items = OrderItem.query.filter_by(order_id=order.id).all()
-            total_amount = sum(float(item.unit_price) * item.quantity for item in order_items)
-            total_quantity = sum(item.quantity for item in order_items)
+            buyer_tenant = order.buyer_tenant
+            supplier_tenant = order.supplier_tenant
             
             orders_list.append({
                 'id': order.id,
@@ -215,9 +250,9 @@ def get_orders_overview():
                     'type': supplier_tenant.type
                 } if supplier_tenant else None,
                 'status': order.status,
-                'total_amount': total_amount,
-                'total_quantity': total_quantity,
-                'items_count': len(order_items),
+                'total_amount': float(order.total_amount),
+                'total_quantity': order.total_quantity,
+                'items_count': order.item_count,
                 'created_at': order.created_at.isoformat() if order.created_at else None,
                 'updated_at': order.updated_at.isoformat() if order.updated_at else None,
                 'expected_delivery_date': order.expected_delivery_date.isoformat() if order.expected_delivery_date else None
@@ -231,18 +266,8 @@ def get_orders_overview():
         
         status_distribution = {status: count for status, count in status_stats}
         
-        # 最近7天订单趋势
-        seven_days_ago = datetime.now() - timedelta(days=7)
-        recent_orders = db.session.query(
-            func.date(Order.created_at).label('date'),
-            func.count(Order.id).label('count')
-        ).filter(
-            Order.created_at >= seven_days_ago
-        ).group_by(
-            func.date(Order.created_at)
-        ).all()
-        
-        daily_trend = [{'date': str(date), 'count': count} for date, count in recent_orders]
+        # 最近 trend_days 天订单趋势
+        daily_trend = _daily_trend(trend_days)
         
         return jsonify({
             'orders': orders_list,
@@ -317,6 +342,7 @@ def get_order_detail(order_id):
 
 @bp.route('/statistics/dashboard', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_dashboard_statistics():
     """获取监管仪表盘统计数据"""
     user_id = get_jwt_identity()
@@ -326,67 +352,22 @@ def get_dashboard_statistics():
         return jsonify({'error': '权限不足，仅监管用户可访问'}), 403
     
     try:
-        # 企业统计
-        total_enterprises = Tenant.query.count()
-        enterprises_by_type = db.session.query(
-            Tenant.type,
-            func.count(Tenant.id)
-        ).group_by(Tenant.type).all()
-        
-        enterprise_stats = {
-            'total': total_enterprises,
-            'by_type': {tenant_type: count for tenant_type, count in enterprises_by_type}
-        }
-        
-        # 订单统计
-        total_orders = Order.query.count()
-        orders_by_status = db.session.query(
-            Order.status,
-            func.count(Order.id)
-        ).group_by(Order.status).all()
-        
-        # 今日订单
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_orders = Order.query.filter(Order.created_at >= today_start).count()
-        
-        order_stats = {
-            'total': total_orders,
-            'today': today_orders,
-            'by_status': {status: count for status, count in orders_by_status}
-        }
-        
-        # 库存统计
-        total_supply_records = SupplyInfo.query.count()
-        active_supply = SupplyInfo.query.filter_by(status='ACTIVE').count()
-        
-        # 低库存预警（库存数量小于10）
-        low_stock_count = SupplyInfo.query.filter(
-            SupplyInfo.available_quantity < 10,
-            SupplyInfo.status == 'ACTIVE'
-        ).count()
-        
-        inventory_stats = {
-            'total_records': total_supply_records,
-            'active_supply': active_supply,
-            'low_stock_alerts': low_stock_count
-        }
-        
-        # 用户统计
-        total_users = User.query.count()
-        active_users = User.query.filter_by(is_active=True).count()
-        authenticated_users = User.query.filter_by(is_authenticated=True).count()
-        
-        user_stats = {
-            'total': total_users,
-            'active': active_users,
-            'authenticated': authenticated_users
-        }
-        
+        # 统计来自平台统计快照（后台定时刷新），as_of 为快照的统计时间
+        stats = get_platform_stats()
         return jsonify({
-            'enterprises': enterprise_stats,
-            'orders': order_stats,
-            'inventory': inventory_stats,
-            'users': user_stats
+            'as_of': stats['as_of'],
+            'enterprises': stats['tenants'],
+            'orders': stats['orders'],
+            'inventory': {
+                'total_records': stats['supply']['total'],
+                'active_supply': stats['supply']['active'],
+                'low_stock_alerts': stats['supply']['active_low_stock']
+            },
+            'users': {
+                'total': stats['users']['total'],
+                'active': stats['users']['active'],
+                'authenticated': stats['users']['authenticated']
+            }
         }), 200
         
     except Exception as e:
@@ -0,0 +1,354 @@
+"""
+配送路径优化算法
+功能：求解从起点出发、依次访问全部目的地（不返回起点）的开放路径 TSP
+
+- nearest_neighbor：贪心最近邻
+- held_karp：位掩码 + 扁平数组的动态规划精确解，只对目的地建状态，适合目的地较少时
+- local_search：在最近邻初始解上做 2-opt / Or-opt 局部搜索，受时间预算约束
+
+距离矩阵约定与 amap.calculate_distance_matrix 一致：索引 0 为起点，1~n 为目的地，
+可以不对称。安装了 NumPy 时按数组计算，2-opt / Or-opt 的候选移动与 Held-Karp
+的每一层状态一次向量化求值；否则使用纯 Python 实现，结果相同。
+"""
+import math
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+# 默认局部搜索时间预算（秒）
+DEFAULT_TIME_BUDGET = 1.0
+
+# Held-Karp 精确解支持的最大目的地数量
+EXACT_LIMIT = 15
+
+ALGORITHMS = ('greedy', 'dp', 'local_search')
+
+# 改进量小于该值视为没有改进，避免浮点误差导致来回移动
+_EPS = 1e-7
+
+Matrix = Sequence[Sequence[float]]
+
+
+def tour_length(distance_matrix: Matrix, order: Sequence[int]) -> float:
+    """从起点出发按 order 访问目的地的总距离"""
+    total = 0.0
+    prev = 0
+    for node in order:
+        total += distance_matrix[prev][node]
+        prev = node
+    return total
+
+
+def solve(distance_matrix: Matrix, algorithm: str = 'greedy',
+          time_budget: float = DEFAULT_TIME_BUDGET,
+          use_numpy: Optional[bool] = None) -> Dict:
+    """
+    求解访问顺序
+
+    Args:
+        distance_matrix: 距离矩阵，matrix[0] 是起点
+        algorithm: 'greedy'、'dp'（目的地超过 EXACT_LIMIT 时改用 local_search）或 'local_search'
+        time_budget: local_search 的时间预算（秒）
+        use_numpy: 是否使用 NumPy，None 表示已安装时自动使用
+
+    Returns:
+        {
+            'order': 访问顺序（不含起点）,
+            'length': 总距离（米）,
+            'iterations': 局部搜索应用的改进次数（其他算法为 0）,
+            'algorithm': 实际使用的算法,
+            'elapsed': 耗时（秒）
+        }
+    """
+    started = time.perf_counter()
+    use_numpy = HAS_NUMPY if use_numpy is None else use_numpy
+    destinations = len(distance_matrix) - 1
+
+    if algorithm == 'dp' and destinations > EXACT_LIMIT:
+        algorithm = 'local_search'
+
+    iterations = 0
+    if algorithm == 'dp':
+        order = held_karp(distance_matrix, use_numpy=use_numpy)
+    elif algorithm == 'local_search':
+        order, iterations = local_search(distance_matrix, time_budget, use_numpy=use_numpy)
+    else:
+        algorithm = 'greedy'
+        order = nearest_neighbor(distance_matrix)
+
+    return {
+        'order': order,
+        'length': round(tour_length(distance_matrix, order), 2),
+        'iterations': iterations,
+        'algorithm': algorithm,
+        'elapsed': round(time.perf_counter() - started, 4)
+    }
+
+
+def nearest_neighbor(distance_matrix: Matrix) -> List[int]:
+    """
+    贪心最近邻（从起点开始，每次选择最近的未访问点）
+
+    Returns:
+        访问顺序列表（不包括起点 0），如 [2, 1, 3] 表示访问顺序是点 2 -> 点 1 -> 点 3
+    """
+    n = len(distance_matrix)
+    if n <= 1:
+        return []
+
+    unvisited = set(range(1, n))
+    current = 0
+    route = []
+    while unvisited:
+        row = distance_matrix[current]
+        # 距离相同时取编号较小的点，与原实现一致
+        nearest = min(unvisited, key=lambda i: (row[i], i))
+        unvisited.remove(nearest)
+        route.append(nearest)
+        current = nearest
+    return route
+
+
+def held_karp(distance_matrix: Matrix, use_numpy: Optional[bool] = None) -> List[int]:
+    """
+    动态规划精确求解（时间 O(2^m · m^2)，m 为目的地数量）
+
+    dp[mask · m + v] 为从起点出发、恰好访问 mask 中的目的地并停在 v 的最短距离。
+    起点不进入位掩码，状态数比 2^(m+1) · (m+1) 少一半以上；
+    不保存前驱表，结束后按 dp 值反推路径。
+    """
+    m = len(distance_matrix) - 1
+    if m <= 0:
+        return []
+    if m == 1:
+        return [1]
+
+    use_numpy = HAS_NUMPY if use_numpy is None else use_numpy
+    if use_numpy:
+        dp, dist = _held_karp_numpy(distance_matrix, m)
+    else:
+        dp, dist = _held_karp_python(distance_matrix, m)
+
+    # 反推：从全集中距离最短的终点开始，逐步找出使 dp 值成立的前驱
+    mask = (1 << m) - 1
+    last = min(range(m), key=lambda v: dp[mask * m + v])
+    route = [last]
+    while mask & (mask - 1):
+        prev_mask = mask ^ (1 << last)
+        members = [u for u in range(m) if prev_mask >> u & 1]
+        last = min(members, key=lambda u: dp[prev_mask * m + u] + dist[u][last])
+        route.append(last)
+        mask = prev_mask
+
+    route.reverse()
+    return [v + 1 for v in route]
+
+
+def _held_karp_python(distance_matrix, m):
+    dist = [list(row[1:]) for row in distance_matrix[1:]]
+    size = 1 << m
+    dp = array('d', [math.inf]) * (size * m)
+    for v in range(m):
+        dp[(1 << v) * m + v] = distance_matrix[0][v + 1]
+
+    for mask in range(1, size):
+        base = mask * m
+        members = []
+        free = []
+        for v in range(m):
+            (members if mask >> v & 1 else free).append(v)
+        if not free:
+            continue
+        for u in members:
+            cost = dp[base + u]
+            row = dist[u]
+            for v in free:
+                index = (mask | (1 << v)) * m + v
+                candidate = cost + row[v]
+                if candidate < dp[index]:
+                    dp[index] = candidate
+    return dp, dist
+
+
+def _held_karp_numpy(distance_matrix, m):
+    matrix = np.asarray(distance_matrix, dtype=float)
+    dist = matrix[1:, 1:]
+    size = 1 << m
+    nodes = np.arange(m)
+    bits = 1 << nodes
+
+    dp = np.full((size, m), np.inf)
+    dp[bits, nodes] = matrix[0, 1:]
+
+    # 按已访问数量分层，同一层的所有状态一次求值
+    popcount = np.zeros(size, dtype=np.int64)
+    for v in range(m):
+        popcount += (np.arange(size) >> v) & 1
+    for k in range(1, m):
+        masks = np.nonzero(popcount == k)[0]
+        # best[i, v]：停在 masks[i] 中某点后再走到 v 的最短距离
+        best = (dp[masks][:, :, None] + dist[None, :, :]).min(axis=1)
+        free = (masks[:, None] & bits[None, :]) == 0
+        rows, cols = np.nonzero(free)
+        dp[masks[rows] | bits[cols], cols] = best[rows, cols]
+
+    return dp.ravel(), dist.tolist()
+
+
+def local_search(distance_matrix: Matrix, time_budget: float = DEFAULT_TIME_BUDGET,
+                 initial: Optional[List[int]] = None,
+                 use_numpy: Optional[bool] = None):
+    """
+    最近邻初始解 + 2-opt / Or-opt 局部搜索
+
+    在路径末尾追加一个到所有点距离为 0 的虚拟终点，开放路径即可按首尾固定的路径处理。
+    2-opt 反转一段路径（不对称矩阵下计入段内方向反转的代价），
+    Or-opt 把长度 1~3 的一段原样移动到其他位置，交替执行直到没有改进或超出时间预算。
+
+    Returns:
+        (访问顺序, 应用的改进次数)
+    """
+    deadline = time.perf_counter() + max(0.0, time_budget)
+    n = len(distance_matrix)
+    order = list(initial) if initial is not None else nearest_neighbor(distance_matrix)
+    if n <= 2:
+        return order, 0
+
+    use_numpy = HAS_NUMPY if use_numpy is None else use_numpy
+    if use_numpy:
+        matrix = np.zeros((n + 1, n + 1))
+        matrix[:n, :n] = np.asarray(distance_matrix, dtype=float)
+        two_opt, or_opt = _two_opt_numpy, _or_opt_numpy
+    else:
+        matrix = [list(row) + [0.0] for row in distance_matrix] + [[0.0] * (n + 1)]
+        two_opt, or_opt = _two_opt_python, _or_opt_python
+
+    tour = [0] + order + [n]
+    iterations = 0
+    while time.perf_counter() < deadline:
+        moves = two_opt(matrix, tour, deadline)
+        moves += or_opt(matrix, tour, deadline)
+        iterations += moves
+        if not moves:
+            break
+
+    return tour[1:-1], iterations
+
+
+def _two_opt_python(d, tour, deadline):
+    moves = 0
+    last = len(tour) - 2
+    i = 1
+    while i < last:
+        if time.perf_counter() >= deadline:
+            break
+        a, b = tour[i - 1], tour[i]
+        base = d[a][b]
+        internal = 0.0
+        best, best_j = -_EPS, 0
+        for j in range(i + 1, last + 1):
+            prev, c, nxt = tour[j - 1], tour[j], tour[j + 1]
+            # 反转 tour[i..j] 后段内各边方向相反
+            internal += d[c][prev] - d[prev][c]
+            delta = d[a][c] + d[b][nxt] - base - d[c][nxt] + internal
+            if delta < best:
+                best, best_j = delta, j
+        if best_j:
+            tour[i:best_j + 1] = tour[i:best_j + 1][::-1]
+            moves += 1
+        else:
+            i += 1
+    return moves
+
+
+def _two_opt_numpy(d, tour, deadline):
+    moves = 0
+    last = len(tour) - 2
+    t = np.asarray(tour)
+    i = 1
+    while i < last:
+        if time.perf_counter() >= deadline:
+            break
+        a, b = t[i - 1], t[i]
+        js = np.arange(i + 1, last + 1)
+        prev, c, nxt = t[js - 1], t[js], t[js + 1]
+        internal = np.cumsum(d[c, prev] - d[prev, c])
+        delta = d[a, c] + d[b, nxt] - d[a, b] - d[c, nxt] + internal
+        k = int(np.argmin(delta))
+        if delta[k] < -_EPS:
+            j = int(js[k])
+            t[i:j + 1] = t[i:j + 1][::-1].copy()
+            moves += 1
+        else:
+            i += 1
+    tour[:] = t.tolist()
+    return moves
+
+
+def _or_opt_python(d, tour, deadline):
+    moves = 0
+    for seg_len in (1, 2, 3):
+        i = 1
+        while i + seg_len - 1 <= len(tour) - 2:
+            if time.perf_counter() >= deadline:
+                return moves
+            e = i + seg_len - 1
+            p, s0, s1, nx = tour[i - 1], tour[i], tour[e], tour[e + 1]
+            removal_gain = d[p][s0] + d[s1][nx] - d[p][nx]
+            best, best_k = _EPS, -1
+            for k in range(len(tour) - 1):
+                if i - 1 <= k <= e:
+                    continue
+                x, y = tour[k], tour[k + 1]
+                gain = removal_gain - (d[x][s0] + d[s1][y] - d[x][y])
+                if gain > best:
+                    best, best_k = gain, k
+            if best_k >= 0:
+                _move_segment(tour, i, e, best_k)
+                moves += 1
+            else:
+                i += 1
+    return moves
+
+
+def _or_opt_numpy(d, tour, deadline):
+    moves = 0
+    t = np.asarray(tour)
+    ks = np.arange(len(t) - 1)
+    for seg_len in (1, 2, 3):
+        i = 1
+        while i + seg_len - 1 <= len(t) - 2:
+            if time.perf_counter() >= deadline:
+                tour[:] = t.tolist()
+                return moves
+            e = i + seg_len - 1
+            p, s0, s1, nx = t[i - 1], t[i], t[e], t[e + 1]
+            xs, ys = t[:-1], t[1:]
+            gain = d[p, s0] + d[s1, nx] - d[p, nx] - (d[xs, s0] + d[s1, ys] - d[xs, ys])
+            gain[(ks >= i - 1) & (ks <= e)] = -np.inf
+            k = int(np.argmax(gain))
+            if gain[k] > _EPS:
+                order = t.tolist()
+                _move_segment(order, i, e, k)
+                t = np.asarray(order)
+                moves += 1
+            else:
+                i += 1
+    tour[:] = t.tolist()
+    return moves
+
+
+def _move_segment(tour, i, e, k):
+    """把 tour[i..e] 移到原位置 k 与 k+1 之间（k 不在 i-1..e 内）"""
+    segment = tour[i:e + 1]
+    del tour[i:e + 1]
+    if k > e:
+        k -= len(segment)
+    tour[k + 1:k + 1] = segment
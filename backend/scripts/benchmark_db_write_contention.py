@@ -0,0 +1,152 @@
+"""
+SQLite 写入争用基准测试
+模拟多个 gunicorn worker 进程（每个进程若干线程）同时读写同一个 SQLite 文件：
+写操作为短事务（插入一条流水并更新计数器，类似下单/审计日志），读操作为聚合查询（类似流通报表）。
+分别使用默认连接（rollback 日志、驱动默认等锁）与 db_utils 的调优连接（WAL 等 PRAGMA）运行，
+对比吞吐量、"database is locked" 失败数与写事务延迟
+
+用法：
+  cd backend
+  python scripts/benchmark_db_write_contention.py --workers 4 --threads 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from db_utils import engine_options, install_sqlite_pragmas, is_database_busy
+
+MODES = ('default', 'tuned')
+
+
+def build_engine(db_path, mode, busy_timeout_ms):
+    url = f'sqlite:///{db_path}'
+    if mode == 'default':
+        return create_engine(url)
+    config = {'SQLITE_BUSY_TIMEOUT_MS': busy_timeout_ms}
+    engine = create_engine(url, **engine_options(url, config))
+    install_sqlite_pragmas(engine, config)
+    return engine
+
+
+def prepare(db_path, mode, busy_timeout_ms):
+    engine = build_engine(db_path, mode, busy_timeout_ms)
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE events (id INTEGER PRIMARY KEY, worker INTEGER, amount REAL, created_at REAL)'
+        ))
+        connection.execute(text('CREATE INDEX ix_events_worker ON events (worker)'))
+        connection.execute(text('CREATE TABLE counters (id INTEGER PRIMARY KEY, total INTEGER)'))
+        connection.execute(text('INSERT INTO counters (id, total) VALUES (1, 0)'))
+    engine.dispose()
+
+
+def run_worker(db_path, mode, worker_id, threads, seconds, write_ratio, busy_timeout_ms, results):
+    engine = build_engine(db_path, mode, busy_timeout_ms)
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    stats = {'reads': 0, 'writes': 0, 'locked': 0, 'write_latencies': []}
+
+    def loop():
+        rng = random.Random(worker_id * 1000 + threading.get_ident())
+        local = {'reads': 0, 'writes': 0, 'locked': 0, 'write_latencies': []}
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    with engine.begin() as connection:
+                        connection.execute(text(
+                            'INSERT INTO events (worker, amount, created_at) VALUES (:worker, :amount, :now)'
+                        ), {'worker': worker_id, 'amount': rng.random() * 100, 'now': time.time()})
+                        connection.execute(text('UPDATE counters SET total = total + 1 WHERE id = 1'))
+                    local['writes'] += 1
+                    local['write_latencies'].append(time.perf_counter() - started)
+                else:
+                    with engine.connect() as connection:
+                        connection.execute(text(
+                            'SELECT worker, COUNT(*), SUM(amount) FROM events GROUP BY worker'
+                        )).all()
+                    local['reads'] += 1
+            except OperationalError as exc:
+                if not is_database_busy(exc):
+                    raise
+                local['locked'] += 1
+        with lock:
+            for key in ('reads', 'writes', 'locked'):
+                stats[key] += local[key]
+            stats['write_latencies'].extend(local['write_latencies'])
+
+    pool = [threading.Thread(target=loop) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    engine.dispose()
+    results.put(stats)
+
+
+def benchmark(mode, args):
+    fd, db_path = tempfile.mkstemp(suffix='.db', prefix=f'contention_{mode}_')
+    os.close(fd)
+    os.remove(db_path)
+    try:
+        prepare(db_path, mode, args.busy_timeout_ms)
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        processes = [
+            context.Process(target=run_worker, args=(
+                db_path, mode, worker_id, args.threads, args.seconds, args.write_ratio,
+                args.busy_timeout_ms, results
+            ))
+            for worker_id in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    latencies = sorted(latency for stats in collected for latency in stats['write_latencies'])
+    return {
+        'reads': sum(stats['reads'] for stats in collected),
+        'writes': sum(stats['writes'] for stats in collected),
+        'locked': sum(stats['locked'] for stats in collected),
+        'p50': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 写入争用基准测试')
+    parser.add_argument('--workers', type=int, default=4, help='进程数（模拟 gunicorn worker）')
+    parser.add_argument('--threads', type=int, default=4, help='每个进程的线程数')
+    parser.add_argument('--seconds', type=float, default=10, help='每种模式的运行时间（秒）')
+    parser.add_argument('--write-ratio', type=float, default=0.3, help='写操作占比')
+    parser.add_argument('--busy-timeout-ms', type=int, default=5000, help='调优模式的 busy_timeout（毫秒）')
+    parser.add_argument('--mode', choices=MODES, help='只运行一种模式')
+    args = parser.parse_args()
+
+    print(f'进程 {args.workers} × 线程 {args.threads}，每种模式 {args.seconds}s，写操作占比 {args.write_ratio:.0%}')
+    print(f"{'模式':<8}{'读/秒':>10}{'写/秒':>10}{'锁失败':>8}{'写 p50(ms)':>12}{'写 p95(ms)':>12}")
+    for mode in ([args.mode] if args.mode else MODES):
+        result = benchmark(mode, args)
+        print(f"{mode:<8}{result['reads'] / args.seconds:>10.1f}{result['writes'] / args.seconds:>10.1f}"
+              f"{result['locked']:>8}{result['p50']:>12.1f}{result['p95']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+直线距离计算基准测试
+对比逐个调用 AmapService.calculate_distance_haversine 与 geo_distance 批量计算
+（NumPy 向量化 / 纯 Python 回退）在一点到多点、距离矩阵两种场景下的耗时
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geo_distance
+from amap import AmapService
+
+
+def _timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def scalar_one_to_many(origin, points):
+    return [AmapService.calculate_distance_haversine(origin[0], origin[1], lon, lat)
+            for lon, lat in points]
+
+
+def scalar_matrix(points):
+    n = len(points)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            distance = AmapService.calculate_distance_haversine(
+                points[i][0], points[i][1], points[j][0], points[j][1]
+            )
+            matrix[i][j] = matrix[j][i] = distance
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description='直线距离计算基准测试')
+    parser.add_argument('--suppliers', type=int, default=10000, help='一点到多点场景的供应商数量')
+    parser.add_argument('--matrix', type=int, default=200, help='距离矩阵场景的点数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    origin = (121.47, 31.23)
+    suppliers = [(121.0 + rng.random(), 30.8 + rng.random()) for _ in range(args.suppliers)]
+    matrix_points = suppliers[:args.matrix]
+
+    cases = [
+        (f'一点到 {args.suppliers} 点',
+         lambda: scalar_one_to_many(origin, suppliers),
+         lambda use_numpy: geo_distance.haversine_one_to_many(*origin, suppliers, use_numpy=use_numpy)),
+        (f'{args.matrix}x{args.matrix} 矩阵',
+         lambda: scalar_matrix(matrix_points),
+         lambda use_numpy: geo_distance.haversine_matrix(matrix_points, use_numpy=use_numpy)),
+    ]
+
+    print(f"NumPy: {'已安装' if geo_distance.HAS_NUMPY else '未安装（仅测试纯 Python 回退）'}")
+    for name, scalar, batch in cases:
+        baseline = _timeit(scalar, args.repeat)
+        print(f"\n{name}")
+        print(f"  逐个标量调用: {baseline * 1000:8.2f} ms")
+        backends = [('纯 Python', False)]
+        if geo_distance.HAS_NUMPY:
+            backends.append(('NumPy', True))
+        for label, use_numpy in backends:
+            elapsed = _timeit(lambda: batch(use_numpy), args.repeat)
+            print(f"  {label:<10}: {elapsed * 1000:8.2f} ms ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
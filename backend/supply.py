@@ -6,6 +6,7 @@ from sqlalchemy.exc import IntegrityError
 
 from extensions import db
 from models import User, SupplyInfo, Drug, Tenant, InventoryItem
+from drug_search import filter_drugs_by_keyword
 
 bp = Blueprint('supply', __name__, url_prefix='/api/supply')
 
@@ -497,15 +498,9 @@ def get_drugs_list():
         
         # 搜索功能
         if search:
-            query = query.filter(
-                or_(
-                    Drug.generic_name.ilike(f'%{search}%'),
-                    Drug.brand_name.ilike(f'%{search}%'),
-                    Drug.approval_number.ilike(f'%{search}%')
-                )
-            )
+            query = filter_drugs_by_keyword(query, search, ('generic_name', 'brand_name', 'approval_number'))
         
-        # 按通用名称排序
+        # 相关度相同时按通用名称排序
         query = query.order_by(Drug.generic_name)
         
         # 分页
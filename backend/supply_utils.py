@@ -4,8 +4,11 @@
 
 from datetime import datetime
 from flask import current_app
+from sqlalchemy import and_, case, update
 from extensions import db
 from models import SupplyInfo
+from drug_suggestions import mark_drug_holdings_changed
+from price_index import mark_supply_changed
 
 
 def update_supply_info_quantity(tenant_id, drug_id, quantity_delta, operation_desc="", supply_info_id=None):
@@ -62,50 +65,56 @@ def update_supply_info_quantity(tenant_id, drug_id, quantity_delta, operation_de
             print(f'WARNING: 未找到供应商{tenant_id}的药品{drug_id}的供应信息')
         return None
     
-    old_quantity = supply_info.available_quantity
-    new_quantity = old_quantity + quantity_delta
+    # 条件 UPDATE 原子地检查并变更数量：并发下单时不会出现两个请求都读到旧数量、都通过检查而超卖。
+    # 上下架状态按变更前的数量在同一条语句中判断
+    column = SupplyInfo.available_quantity
+    result = db.session.execute(
+        update(SupplyInfo).where(
+            SupplyInfo.id == supply_info.id,
+            column + quantity_delta >= 0
+        ).values(
+            available_quantity=column + quantity_delta,
+            status=case(
+                (and_(column == 0, column + quantity_delta > 0), 'ACTIVE'),
+                (and_(column > 0, column + quantity_delta == 0), 'INACTIVE'),
+                else_=SupplyInfo.status
+            ),
+            updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+    )
     
     # 防止数量变为负数
-    if new_quantity < 0:
+    if result.rowcount == 0:
+        db.session.refresh(supply_info)
         if current_app:
-            current_app.logger.error(f'供应信息{supply_info.id}的可用数量不足，当前{old_quantity}，尝试变更{quantity_delta}')
+            current_app.logger.error(f'供应信息{supply_info.id}的可用数量不足，当前{supply_info.available_quantity}，尝试变更{quantity_delta}')
         else:
-            print(f'ERROR: 供应信息{supply_info.id}的可用数量不足，当前{old_quantity}，尝试变更{quantity_delta}')
+            print(f'ERROR: 供应信息{supply_info.id}的可用数量不足，当前{supply_info.available_quantity}，尝试变更{quantity_delta}')
         return None
     
-    supply_info.available_quantity = new_quantity
-    supply_info.updated_at = datetime.utcnow()
+    db.session.refresh(supply_info, ['available_quantity', 'status', 'updated_at'])
+    # Core UPDATE 不经过 ORM 的变更跟踪，需要通知候选项索引与价格索引
+    mark_drug_holdings_changed(supply_info.tenant_id, supply_info.drug_id)
+    mark_supply_changed(supply_info)
+    new_quantity = supply_info.available_quantity
+    old_quantity = new_quantity - quantity_delta
     
-    # 状态管理逻辑
+    # 状态变化日志
     if old_quantity == 0 and new_quantity > 0:
         # 从0恢复到大于0，自动上架
-        supply_info.status = 'ACTIVE'
         log_msg = f'供应信息{supply_info.id}可供数量从0恢复到{new_quantity}，自动上架。{operation_desc}'
-        if current_app:
-            current_app.logger.info(log_msg)
-        else:
-            print(f'INFO: {log_msg}')
     elif old_quantity > 0 and new_quantity == 0:
         # 从大于0变为0，自动下架
-        supply_info.status = 'INACTIVE'
         log_msg = f'供应信息{supply_info.id}可供数量从{old_quantity}变为0，自动下架。{operation_desc}'
-        if current_app:
-            current_app.logger.info(log_msg)
-        else:
-            print(f'INFO: {log_msg}')
     elif new_quantity > 0 and supply_info.status == 'INACTIVE':
         # 如果数量大于0但状态是INACTIVE（可能是手动下架），保持INACTIVE状态
         log_msg = f'供应信息{supply_info.id}数量{old_quantity}->{new_quantity}，但保持INACTIVE状态。{operation_desc}'
-        if current_app:
-            current_app.logger.info(log_msg)
-        else:
-            print(f'INFO: {log_msg}')
     else:
         log_msg = f'供应信息{supply_info.id}数量{old_quantity}->{new_quantity}。{operation_desc}'
-        if current_app:
-            current_app.logger.info(log_msg)
-        else:
-            print(f'INFO: {log_msg}')
+    if current_app:
+        current_app.logger.info(log_msg)
+    else:
+        print(f'INFO: {log_msg}')
     
     # 不在这里提交，让调用方管理事务
     return supply_info
@@ -1,12 +1,15 @@
 """
 库存预警定时任务
-实现每日凌晨执行库存预警扫描
+预警计数由库存写入实时更新；这里每隔几分钟推进近效期/过期的日期变化，
+每日凌晨再对照库存做一次校验扫描
 """
 import schedule
 import time
 import logging
 from datetime import datetime
+from extensions import db
 from inventory_warning import scan_inventory_warnings
+from inventory_warning_engine import advance
 
 # 设置日志
 logging.basicConfig(
@@ -20,6 +23,34 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# 推进日期变化的间隔（分钟）
+ADVANCE_INTERVAL_MINUTES = 10
+
+_app = None
+
+
+def _app_context():
+    """定时任务在独立进程中运行，按需创建应用以访问数据库"""
+    global _app
+    if _app is None:
+        from app import create_app
+        _app = create_app()
+    return _app.app_context()
+
+
+def advance_warnings():
+    """
+    推进预警的日期变化：跨过零点后让新进入近效期或过期的批次尽快计入预警
+    """
+    try:
+        with _app_context():
+            processed = advance()
+            db.session.commit()
+        if processed:
+            logger.info(f"预警日期推进完成，重新判断 {processed} 个批次")
+    except Exception as e:
+        logger.error(f"预警日期推进失败: {str(e)}")
+
 
 def daily_warning_scan():
     """
@@ -29,7 +60,8 @@ def daily_warning_scan():
         logger.info("开始执行库存预警扫描")
         
         # 执行扫描
-        result = scan_inventory_warnings()
+        with _app_context():
+            result = scan_inventory_warnings()
         
         logger.info(f"预警扫描完成: {result}")
         
@@ -47,10 +79,11 @@ def start_scheduler():
     """
     启动定时任务调度器
     """
-    # 每天凌晨2点执行预警扫描
+    # 每天凌晨2点执行预警校验扫描，日期变化每隔几分钟推进一次
     schedule.every().day.at("02:00").do(daily_warning_scan)
+    schedule.every(ADVANCE_INTERVAL_MINUTES).minutes.do(advance_warnings)
     
-    logger.info("库存预警定时任务已启动，每日02:00执行扫描")
+    logger.info(f"库存预警定时任务已启动，每 {ADVANCE_INTERVAL_MINUTES} 分钟推进日期变化，每日02:00执行校验扫描")
     
     while True:
         try:
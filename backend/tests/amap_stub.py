@@ -0,0 +1,152 @@
+"""
+高德地理编码 / 距离测量 API 本地模拟服务
+用于离线测试批量地理编码与距离矩阵，以及在无网络环境下进行吞吐量基准测试
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from amap import AmapService
+
+
+class AmapStubServer:
+    """
+    模拟 /v3/geocode/geo 与 /v3/distance 接口
+
+    距离测量接口返回直线距离乘以 detour 系数作为“驾车距离”。
+
+    Args:
+        locations: 地址 -> (longitude, latitude)，不在其中的地址返回空结果
+        latency: 每个请求的模拟延迟（秒）
+        failures: 地址（距离接口为 destination 参数）-> 前 N 次请求返回的错误类型（'500' 或 'qps'）
+        detour: 距离接口的绕路系数
+    """
+
+    def __init__(self, locations=None, latency=0.0, failures=None, detour=1.3):
+        self.locations = locations or {}
+        self.detour = detour
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.request_count = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/v3/geocode/geo'
+
+    @property
+    def distance_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}/v3/distance'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _respond(self, path, query):
+        if path.endswith('/distance'):
+            key = query.get('destination', [''])[0]
+            return self._with_failures(key, lambda: self._distance(query))
+        address = query.get('address', [''])[0]
+        return self._with_failures(address, lambda: self._geocode(address))
+
+    def _with_failures(self, key, handler):
+        with self._lock:
+            self.request_count += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            remaining = self.failures.get(key)
+            failure = None
+            if remaining:
+                failure, count = remaining
+                self.failures[key] = (failure, count - 1) if count > 1 else None
+
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if failure == '500':
+                return 500, {'status': '0', 'info': 'SERVER_ERROR'}
+            if failure == 'qps':
+                return 200, {'status': '0', 'info': 'CUQPS_HAS_EXCEEDED_THE_LIMIT', 'infocode': '10020'}
+
+            return handler()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _geocode(self, address):
+        location = self.locations.get(address)
+        if location is None:
+            return 200, {'status': '1', 'info': 'OK', 'infocode': '10000', 'count': '0', 'geocodes': []}
+        return 200, {
+            'status': '1',
+            'info': 'OK',
+            'infocode': '10000',
+            'count': '1',
+            'geocodes': [{
+                'formatted_address': address,
+                'province': '上海市',
+                'city': '上海市',
+                'district': '',
+                'adcode': '310000',
+                'location': f'{location[0]},{location[1]}'
+            }]
+        }
+
+    def _distance(self, query):
+        def parse(value):
+            lon, lat = value.split(',')
+            return float(lon), float(lat)
+
+        destination = parse(query['destination'][0])
+        origins = [parse(item) for item in query['origins'][0].split('|')]
+        results = []
+        for i, origin in enumerate(origins, 1):
+            distance = AmapService.calculate_distance_haversine(*origin, *destination) * self.detour
+            results.append({
+                'origin_id': str(i),
+                'dest_id': '1',
+                'distance': str(int(round(distance))),
+                'duration': str(int(distance / 10))
+            })
+        return 200, {'status': '1', 'info': 'OK', 'infocode': '10000', 'results': results}
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                status, payload = stub._respond(parsed.path, parse_qs(parsed.query))
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -4,6 +4,42 @@
 import json
 from flask import url_for
 
+from models import Drug, Tenant
+
+
+def make_tenant(code, tenant_type='SUPPLIER', **fields):
+    """测试用企业：code 在同一个测试内唯一，其余字段可覆盖（如 address、longitude）"""
+    values = {
+        'name': f'{tenant_type}-{code}',
+        'type': tenant_type,
+        'unified_social_credit_code': f'TEST-{code}',
+        'legal_representative': '负责人',
+        'contact_person': '联系人',
+        'contact_phone': '13800000000',
+        'contact_email': f'{code}@tenant.test',
+        'address': f'上海市测试路{code}号',
+        'business_scope': '测试',
+    }
+    values.update(fields)
+    return Tenant(**values)
+
+
+def make_drug(approval_number, generic_name='阿莫西林', brand_name='阿莫西林胶囊', **fields):
+    """测试用药品：批准文号在同一个测试内唯一，其余字段可覆盖"""
+    values = {
+        'generic_name': generic_name,
+        'brand_name': brand_name,
+        'approval_number': approval_number,
+        'dosage_form': '胶囊',
+        'specification': '0.25g*24粒',
+        'manufacturer': '测试制药厂',
+        'category': '测试',
+        'prescription_type': '处方药',
+    }
+    values.update(fields)
+    return Drug(**values)
+
+
 class BaseTestCase:
     """基础测试类，提供通用的测试方法"""
 
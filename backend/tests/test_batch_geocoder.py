@@ -0,0 +1,106 @@
+"""
+批量地理编码测试（使用本地模拟的高德服务）
+"""
+import time
+
+import pytest
+
+from amap_client import TokenBucket
+from batch_geocoder import BatchGeocoder, batch_geocode_tenants
+from extensions import db
+from models import GeocodeCache, Tenant
+from tests.amap_stub import AmapStubServer
+
+
+def _make_tenant(i, address):
+    return Tenant(
+        name=f'批量供应商{i}',
+        type='SUPPLIER',
+        unified_social_credit_code=f'BATCH-GEO-{i:04d}',
+        legal_representative='负责人',
+        contact_person='联系人',
+        contact_phone=f'1380000{i:04d}',
+        contact_email=f'batch{i}@geo.test',
+        address=address,
+        business_scope='药品批发'
+    )
+
+
+class TestTokenBucket:
+    """测试令牌桶限流"""
+
+    def test_rate_limit(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+        started = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        # 首个令牌立即可用，其余 10 个按 20/s 发放
+        assert time.monotonic() - started >= 0.45
+
+
+class TestBatchGeocoder:
+    """测试并发地理编码器"""
+
+    def test_concurrent_requests_with_retries(self):
+        locations = {f'上海市测试路{i}号': (121.4 + i / 1000, 31.2) for i in range(20)}
+        failures = {'上海市测试路3号': ('500', 2), '上海市测试路7号': ('qps', 1)}
+
+        with AmapStubServer(locations, latency=0.02, failures=failures) as stub:
+            geocoder = BatchGeocoder('test-key', url=stub.url, qps=1000,
+                                     concurrency=5, backoff=0.01)
+            items = {address: (address, None) for address in locations}
+            items['无法解析的地址'] = ('无法解析的地址', None)
+            results = geocoder.geocode_many(items)
+            geocoder.close()
+
+        assert results['上海市测试路3号'][0]['longitude'] == pytest.approx(121.403)
+        assert results['上海市测试路7号'][0] is not None
+        assert results['无法解析的地址'] == (None, True)
+        assert geocoder.stats['retries'] == 3
+        assert stub.request_count == 21 + 3
+        assert 1 < stub.max_in_flight <= 5
+
+    def test_exhausted_retries_are_not_definitive(self):
+        with AmapStubServer({}, failures={'地址': ('500', 10)}) as stub:
+            geocoder = BatchGeocoder('test-key', url=stub.url, qps=1000,
+                                     max_retries=2, backoff=0.01)
+            assert geocoder.geocode('地址') == (None, False)
+            geocoder.close()
+        assert stub.request_count == 3
+
+    def test_batch_geocode_tenants(self, app):
+        """批量写回坐标，重复地址只请求一次，结果进入缓存"""
+        tenants = [
+            _make_tenant(1, '上海市黄浦区四牌楼路88号'),
+            _make_tenant(2, '上海市黄浦区四牌楼路88号'),
+            _make_tenant(3, '上海市黄浦区人民路905号'),
+            _make_tenant(4, '无法解析的地址'),
+        ]
+        db.session.add_all(tenants)
+        db.session.commit()
+
+        locations = {
+            '上海市黄浦区四牌楼路88号': (121.4737, 31.2304),
+            '上海市黄浦区人民路905号': (121.4890, 31.2156),
+        }
+        with AmapStubServer(locations) as stub:
+            geocoder = BatchGeocoder('test-key', url=stub.url, qps=1000)
+            report = batch_geocode_tenants(tenants, geocoder=geocoder)
+            db.session.commit()
+
+            assert stub.request_count == 3
+            assert report['updated'] == 3
+            assert report['failed'] == 1
+            assert report['remote_calls'] == 3
+
+            # 再次执行全部命中缓存
+            report = batch_geocode_tenants(tenants, geocoder=geocoder)
+            geocoder.close()
+            assert stub.request_count == 3
+            assert report['cache_hits'] == 3
+
+        db.session.expire_all()
+        assert db.session.get(Tenant, tenants[1].id).longitude == 121.4737
+        assert db.session.get(Tenant, tenants[2].id).latitude == 31.2156
+        assert db.session.get(Tenant, tenants[3].id).longitude is None
+        assert GeocodeCache.query.count() == 3
@@ -0,0 +1,173 @@
+"""
+流通看板按日汇总测试
+"""
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from circulation_rollup import extract_region, rebuild_rollups, summarize
+from extensions import db
+from models import CirculationDailyRollup, CirculationRecord, Order, User
+from tests.base import BaseTestCase, make_tenant
+
+NOW = datetime(2026, 3, 20, 15, 30)
+LOCATIONS = ['上海市浦东新区张江仓库', '上海市徐汇区漕河泾配送中心', '南京路', None]
+REMARKS = [None, '正常', '车辆延迟', '温度异常告警']
+
+
+def _brute_force(start_time, end_time, region_filter=None):
+    """原看板的逐条统计逻辑，作为对照"""
+    records = CirculationRecord.query.filter(
+        CirculationRecord.timestamp >= start_time,
+        CirculationRecord.timestamp <= end_time
+    ).all()
+    if region_filter and region_filter != 'all':
+        records = [r for r in records if r.order and r.order.buyer_tenant
+                   and region_filter in extract_region(r.order.buyer_tenant.address or '')]
+
+    region_flow = defaultdict(int)
+    trend = defaultdict(lambda: {'shipped': 0, 'in_transit': 0, 'delivered': 0})
+    for record in records:
+        if record.current_location:
+            region_flow[extract_region(record.current_location)] += 1
+        elif record.order and record.order.buyer_tenant:
+            region_flow[extract_region(record.order.buyer_tenant.address or '')] += 1
+        trend[record.timestamp.strftime('%Y-%m-%d')][record.transport_status.lower()] += 1
+    return {
+        'in_transit': sum(1 for r in records if r.transport_status == 'IN_TRANSIT'),
+        'abnormal': sum(1 for r in records if r.remarks and any(k in r.remarks for k in ('异常', '延迟', '告警', '超时'))),
+        'region_flow': dict(region_flow),
+        'trend': dict(trend),
+        'last_activity': max((r.timestamp for r in records), default=None)
+    }
+
+
+class TestCirculationRollup(BaseTestCase):
+    """测试汇总重建、增量累加与看板读取"""
+
+    @pytest.fixture
+    def rollup_data(self, app):
+        pharmacies = [
+            make_tenant('PH1', 'PHARMACY', address='上海市黄浦区人民广场1号'),
+            make_tenant('PH2', 'PHARMACY', address='上海市闵行区莘庄2号'),
+            make_tenant('PH3', 'PHARMACY', address=''),
+        ]
+        supplier = make_tenant('SP', 'SUPPLIER', address='上海市静安区供应路3号')
+        logistics = make_tenant('LG', 'LOGISTICS', address='上海市普陀区物流路4号')
+        db.session.add_all(pharmacies + [supplier, logistics])
+        db.session.flush()
+
+        reporter = User(username='logisticsuser', email='logistics@rollup.test', role='logistics',
+                        tenant_id=logistics.id)
+        reporter.set_password('password123')
+        regulator = User(username='testuser', email='regulator@rollup.test', role='regulator')
+        regulator.set_password('password123')
+        db.session.add_all([reporter, regulator])
+        db.session.flush()
+
+        orders = []
+        for i, pharmacy in enumerate(pharmacies * 2):
+            orders.append(Order(
+                order_number=f'ROLL{i:04d}',
+                buyer_tenant_id=pharmacy.id,
+                supplier_tenant_id=supplier.id,
+                logistics_tenant_id=logistics.id,
+                status='SHIPPED',
+                tracking_number=f'YT{i:06d}',
+                expected_delivery_date=date(2026, 3, 25),
+                created_by=reporter.id
+            ))
+        db.session.add_all(orders)
+        db.session.flush()
+
+        rng = random.Random(4)
+        records = []
+        for i in range(400):
+            order = rng.choice(orders + [None])
+            records.append(CirculationRecord(
+                tracking_number=order.tracking_number if order else 'ORPHAN',
+                order_id=order.id if order else None,
+                transport_status=rng.choice(['SHIPPED', 'IN_TRANSIT', 'DELIVERED']),
+                reported_by=reporter.id,
+                timestamp=NOW - timedelta(minutes=rng.randint(0, 12 * 24 * 60)),
+                current_location=rng.choice(LOCATIONS),
+                remarks=rng.choice(REMARKS)
+            ))
+        db.session.add_all(records)
+        db.session.commit()
+        return {'orders': orders}
+
+    @pytest.mark.parametrize('start_time,end_time', [
+        (NOW - timedelta(days=7), NOW),
+        (datetime(2026, 3, 10), datetime(2026, 3, 18)),
+        (NOW - timedelta(hours=5), NOW),
+        (datetime(2026, 3, 9, 23, 59), datetime(2026, 3, 12, 0, 1)),
+    ])
+    @pytest.mark.parametrize('region', [None, '黄浦', '上海市闵行区'])
+    def test_summary_matches_raw_scan(self, app, rollup_data, start_time, end_time, region):
+        rebuild_rollups()
+        db.session.commit()
+        assert summarize(start_time, end_time, region) == _brute_force(start_time, end_time, region)
+
+    def test_rebuild_partial_range(self, app, rollup_data):
+        rebuild_rollups()
+        db.session.commit()
+        full = {(r.day, r.buyer_region, r.flow_region, r.transport_status): r.record_count
+                for r in CirculationDailyRollup.query.all()}
+
+        rebuild_rollups(date(2026, 3, 12), date(2026, 3, 14))
+        db.session.commit()
+        rebuilt = {(r.day, r.buyer_region, r.flow_region, r.transport_status): r.record_count
+                   for r in CirculationDailyRollup.query.all()}
+        assert rebuilt == full
+        assert sum(full.values()) == 400
+
+    def test_report_updates_rollups(self, client, rollup_data):
+        rebuild_rollups()
+        db.session.commit()
+        headers = self.get_auth_headers(self.login_user(client, username='logisticsuser'))
+        order = rollup_data['orders'][0]
+        order.tracking_number = 'YT-NEW-001'
+        db.session.commit()
+
+        for status, remarks in [('SHIPPED', None), ('IN_TRANSIT', '路况延迟'), ('IN_TRANSIT', None)]:
+            response = client.post('/api/circulation/report', headers=headers, json={
+                'tracking_number': 'YT-NEW-001',
+                'transport_status': status,
+                'timestamp': datetime.utcnow().isoformat(),
+                'current_location': '上海市长宁区中山公园',
+                'latitude': 31.22,
+                'longitude': 121.42,
+                'remarks': remarks
+            })
+            assert response.status_code == 200, response.get_json()
+
+        rows = CirculationDailyRollup.query.filter_by(flow_region='上海市长宁区').all()
+        assert sorted((r.transport_status, r.record_count, r.abnormal_count) for r in rows) == [
+            ('IN_TRANSIT', 2, 1), ('SHIPPED', 1, 0)
+        ]
+
+        # 增量结果与重建结果一致
+        incremental = {(r.day, r.buyer_region, r.flow_region, r.transport_status): (r.record_count, r.abnormal_count)
+                       for r in CirculationDailyRollup.query.all()}
+        rebuild_rollups()
+        db.session.commit()
+        rebuilt = {(r.day, r.buyer_region, r.flow_region, r.transport_status): (r.record_count, r.abnormal_count)
+                   for r in CirculationDailyRollup.query.all()}
+        assert incremental == rebuilt
+
+    def test_dashboard_reads_rollups(self, client, rollup_data):
+        rebuild_rollups()
+        db.session.commit()
+        headers = self.get_auth_headers(self.login_user(client))
+
+        data = self.assert_success_response(client.get(
+            '/api/circulation/dashboard?start_date=2026-03-09T00:00:00Z&end_date=2026-03-20T15:30:00Z',
+            headers=headers))
+        expected = _brute_force(datetime(2026, 3, 9), NOW)
+        assert data['metrics']['in_transit'] == expected['in_transit']
+        assert data['metrics']['abnormal_reports'] == expected['abnormal']
+        assert {r['region']: r['count'] for r in data['region_flow']} == expected['region_flow']
+        assert [t['date'] for t in data['trend']] == sorted(expected['trend'])
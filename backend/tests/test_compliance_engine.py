@@ -0,0 +1,174 @@
+"""
+合规分析报告引擎测试
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete
+
+from cache_generations import bump_generations, current_generations
+from compliance_engine import SECTION_GENERATIONS, build_report, get_section_cache
+from extensions import db
+from models import CirculationRecord, InventoryItem, Order, User
+from tests.base import BaseTestCase, make_drug, make_tenant
+from tests.test_order_listing import count_queries
+
+START = datetime(2026, 3, 1)
+END = datetime(2026, 3, 31)
+
+
+class TestComplianceEngine(BaseTestCase):
+    """测试分段聚合、缓存共用与失效"""
+
+    @pytest.fixture
+    def compliance_data(self, app):
+        pharmacy = make_tenant('PH', 'PHARMACY', address='上海市黄浦区人民路1号')
+        supplier = make_tenant('SP', 'SUPPLIER', address='上海市闵行区供应路2号')
+        logistics = make_tenant('LG', 'LOGISTICS', address='上海市黄浦区物流路3号')
+        drug = make_drug('H-COMP-001')
+        db.session.add_all([pharmacy, supplier, logistics, drug])
+        db.session.flush()
+
+        regulator = User(username='testuser', email='regulator@compliance.test', role='regulator')
+        regulator.set_password('password123')
+        db.session.add(regulator)
+        db.session.flush()
+
+        today = datetime.utcnow().date()
+        # 药店：正常、缺货、低库存+近效期、过期；供应商：两批正常；物流公司的库存不参与统计
+        batches = [
+            (pharmacy, 50, 200), (pharmacy, 0, 200), (pharmacy, 5, 10), (pharmacy, 20, -1),
+            (supplier, 100, 300), (supplier, 80, 300), (logistics, 0, -5),
+        ]
+        for i, (owner, quantity, expiry_days) in enumerate(batches):
+            db.session.add(InventoryItem(
+                tenant_id=owner.id, drug_id=drug.id, batch_number=f'COMP{i:03d}',
+                production_date=today - timedelta(days=365), expiry_date=today + timedelta(days=expiry_days),
+                quantity=quantity, unit_price=10.0
+            ))
+
+        # 运单 A 准时（2 小时后在途），B 延迟（30 小时后在途），C 一直没有在途
+        timelines = {
+            'A': [('SHIPPED', datetime(2026, 3, 5, 8)), ('IN_TRANSIT', datetime(2026, 3, 5, 10)),
+                  ('DELIVERED', datetime(2026, 3, 6, 9))],
+            'B': [('SHIPPED', datetime(2026, 3, 5, 9)), ('IN_TRANSIT', datetime(2026, 3, 6, 15))],
+            'C': [('SHIPPED', datetime(2026, 3, 7, 9))],
+        }
+        for code, events in timelines.items():
+            order = Order(order_number=f'COMP-{code}', buyer_tenant_id=pharmacy.id,
+                          supplier_tenant_id=supplier.id, logistics_tenant_id=logistics.id,
+                          status='SHIPPED', tracking_number=f'TRACK-{code}', created_by=regulator.id)
+            db.session.add(order)
+            db.session.flush()
+            for status, timestamp in events:
+                db.session.add(CirculationRecord(
+                    tracking_number=order.tracking_number, order_id=order.id, transport_status=status,
+                    reported_by=regulator.id, timestamp=timestamp
+                ))
+        db.session.commit()
+        get_section_cache().clear()
+        return {'pharmacy': pharmacy, 'supplier': supplier, 'regulator': regulator}
+
+    def test_sections(self, app, compliance_data):
+        report = build_report(START, END, None)
+
+        inventory = report['inventory']
+        assert inventory['summary'] == {'total_batches': 6, 'total_abnormal_batches': 4, 'abnormal_ratio': 0.6667}
+        pharmacy = inventory['by_tenant'][0]
+        assert (pharmacy['tenant_id'], pharmacy['low_stock'], pharmacy['out_of_stock'],
+                pharmacy['near_expiry'], pharmacy['expired']) == (compliance_data['pharmacy'].id, 1, 1, 1, 1)
+        assert pharmacy['risk_level'] == 'high'
+
+        circulation = report['circulation']['summary']
+        assert circulation['total_records'] == 6
+        assert circulation['status_counts'] == {'SHIPPED': 3, 'IN_TRANSIT': 2, 'DELIVERED': 1}
+        assert (circulation['total_shipments'], circulation['delayed_shipments']) == (3, 2)
+        assert report['circulation']['timeliness_trend'] == [
+            {'date': '2026-03-05', 'total_shipments': 2, 'on_time': 1, 'on_time_ratio': 0.5},
+            {'date': '2026-03-07', 'total_shipments': 1, 'on_time': 0, 'on_time_ratio': 0.0},
+        ]
+
+        enterprise = {row['tenant_id']: row for row in report['enterprise']['items']}
+        pharmacy_row = enterprise[compliance_data['pharmacy'].id]
+        assert (pharmacy_row['inventory_violations'], pharmacy_row['circulation_violations']) == (4, 2)
+        assert pharmacy_row['compliance_rate'] == round(1 - 6 / 6, 4)
+        assert enterprise[compliance_data['supplier'].id]['circulation_violations'] == 2
+
+    def test_region_filter(self, app, compliance_data):
+        report = build_report(START, END, '黄浦')
+        assert [t['tenant_id'] for t in report['inventory']['by_tenant']] == [compliance_data['pharmacy'].id]
+        assert report['circulation']['summary']['total_shipments'] == 3
+        assert compliance_data['supplier'].id not in {r['tenant_id'] for r in report['enterprise']['items']}
+
+        report = build_report(START, END, '闵行')
+        assert report['circulation']['summary']['total_records'] == 0
+
+    def test_cached_sections_are_shared_and_invalidated(self, app, compliance_data):
+        with count_queries() as first:
+            build_report(START, END, None)
+        with count_queries() as second:
+            build_report(START, END, None)
+        assert 0 < len(first) <= 7
+        # 命中缓存时只查询一次分段版本号
+        assert len(second) == 1
+        assert get_section_cache().stats()['hits'] == 3
+
+        # 新的流通记录只让依赖它的分段失效
+        db.session.add(CirculationRecord(
+            tracking_number='TRACK-C', order_id=Order.query.filter_by(order_number='COMP-C').one().id,
+            transport_status='IN_TRANSIT', reported_by=compliance_data['regulator'].id,
+            timestamp=datetime(2026, 3, 7, 12)
+        ))
+        db.session.commit()
+
+        with count_queries() as third:
+            report = build_report(START, END, None)
+        assert 0 < len(third) < len(first)
+        assert report['circulation']['summary']['delayed_shipments'] == 1
+
+    def test_other_process_commit_invalidates_sections(self, app, compliance_data):
+        """其他进程提交的变更（本进程收不到会话事件）通过分段版本号失效"""
+        assert build_report(START, END, None)['circulation']['summary']['total_records'] == 6
+
+        # 模拟另一个 worker：绕过本进程的 ORM 事件删除运单 C 的流通记录
+        db.session.execute(delete(CirculationRecord).where(CirculationRecord.tracking_number == 'TRACK-C'))
+        db.session.commit()
+        assert build_report(START, END, None)['circulation']['summary']['total_records'] == 6
+
+        bump_generations(db.session, [SECTION_GENERATIONS['circulation']])
+        db.session.commit()
+        cache = get_section_cache()
+        hits = cache.stats()['hits']
+        report = build_report(START, END, None)
+        assert report['circulation']['summary']['total_records'] == 5
+        # 库存、企业分段不依赖该版本号，仍然命中缓存
+        assert cache.stats()['hits'] == hits + 2
+
+    def test_section_generations_bumped_once_per_commit(self, app, compliance_data):
+        """多次 flush 库存与流通记录变更，提交时各分段版本号只递增一次，与订单统计共用一条 UPDATE"""
+        names = list(SECTION_GENERATIONS.values())
+        before = current_generations(names)
+        with count_queries() as statements:
+            item = InventoryItem.query.filter_by(batch_number='COMP000').one()
+            item.quantity = 1
+            db.session.flush()
+            record = CirculationRecord.query.filter_by(tracking_number='TRACK-C').one()
+            record.transport_status = 'IN_TRANSIT'
+            db.session.flush()
+            Order.query.filter_by(order_number='COMP-C').one().status = 'IN_TRANSIT'
+            db.session.commit()
+        assert len([s for s in statements if 'UPDATE cache_generations' in s]) == 1
+        assert current_generations(names) == {name: before[name] + 1 for name in names}
+
+    def test_preview_and_export_share_work(self, client, compliance_data):
+        pytest.importorskip('openpyxl')
+        headers = self.get_auth_headers(self.login_user(client))
+        query = 'start=2026-03-01T00:00:00Z&end=2026-03-31T00:00:00Z'
+
+        preview = self.assert_success_response(client.get(f'/api/compliance/report/preview?{query}', headers=headers))
+        assert preview['data']['circulation']['summary']['total_shipments'] == 3
+
+        response = client.get(f'/api/compliance/report/export?{query}&format=excel', headers=headers)
+        assert response.status_code == 200
+        # 导出写审计日志的提交不涉及报告依赖的数据，分段仍然命中缓存
+        assert get_section_cache().stats()['hits'] == 3
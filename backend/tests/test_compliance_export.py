@@ -0,0 +1,162 @@
+"""
+合规分析报告导出任务测试
+"""
+import os
+import time
+from io import BytesIO
+
+import pytest
+
+from compliance_export import ExportJobQueue, ExportQueueFull, render_excel
+from extensions import db
+from models import AdminAuditLog, Tenant, User
+from tests.base import BaseTestCase
+
+QUERY = 'start=2026-03-01T00:00:00Z&end=2026-03-31T00:00:00Z'
+
+
+def _payload(tenants=3):
+    return {
+        'range': {'start': '2026-03-01T00:00:00', 'end': '2026-03-31T00:00:00', 'region': None},
+        'inventory': {
+            'summary': {'total_batches': 0, 'total_abnormal_batches': 0, 'abnormal_ratio': 0.0},
+            'by_tenant': [
+                {'tenant_id': i, 'tenant_name': f'药店{i}', 'total_batches': 1, 'low_stock': 0,
+                 'out_of_stock': 0, 'near_expiry': 0, 'expired': 0, 'abnormal_batches': 0,
+                 'abnormal_ratio': 0.0, 'risk_level': 'low'}
+                for i in range(tenants)
+            ],
+        },
+        'circulation': {
+            'summary': {'total_records': 0, 'total_shipments': 0, 'delayed_shipments': 0, 'delayed_ratio': 0.0},
+            'timeliness_trend': [],
+        },
+        'enterprise': {'items': []},
+    }
+
+
+class TestComplianceExportJobs(BaseTestCase):
+    """测试导出任务的提交、轮询、下载与清理"""
+
+    @pytest.fixture
+    def export_app(self, app, tmp_path):
+        app.config['COMPLIANCE_EXPORT_DIR'] = str(tmp_path)
+        app.config['COMPLIANCE_EXPORT_WORKERS'] = 0
+        app.extensions.pop('compliance_export_queue', None)
+
+        pharmacy = Tenant(name='导出药店', type='PHARMACY', unified_social_credit_code='EXPORT-PH',
+                          legal_representative='负责人', contact_person='联系人', contact_phone='13800000000',
+                          contact_email='ph@export.test', address='上海市黄浦区人民路1号', business_scope='测试')
+        db.session.add(pharmacy)
+        for username in ('testuser', 'otherregulator'):
+            user = User(username=username, email=f'{username}@export.test', role='regulator')
+            user.set_password('password123')
+            db.session.add(user)
+        db.session.commit()
+        yield app
+        queue = app.extensions.pop('compliance_export_queue', None)
+        if queue is not None and queue._pool is not None:
+            queue._pool.shutdown()
+
+    def _submit(self, client, headers, fmt):
+        response = client.post(f'/api/compliance/report/exports?{QUERY}&format={fmt}', headers=headers)
+        assert response.status_code == 202, response.get_json()
+        return response.get_json()['data']
+
+    def _wait(self, client, headers, job_id, timeout=30):
+        deadline = time.time() + timeout
+        while True:
+            data = self.assert_success_response(
+                client.get(f'/api/compliance/report/exports/{job_id}', headers=headers))['data']
+            if data['status'] in ('done', 'failed') or time.time() > deadline:
+                return data
+            time.sleep(0.05)
+
+    def test_excel_job_inline(self, client, export_app, tmp_path):
+        openpyxl = pytest.importorskip('openpyxl')
+        headers = self.get_auth_headers(self.login_user(client))
+
+        job = self._submit(client, headers, 'excel')
+        assert job['status'] == 'done' and job['progress'] == 100
+        assert job['filename'] == 'compliance-report-2026-03-01_2026-03-31.xlsx'
+
+        response = client.get(job['download_url'], headers=headers)
+        assert response.status_code == 200
+        workbook = openpyxl.load_workbook(BytesIO(response.data))
+        assert workbook.sheetnames == ['库存合规', '流通时效', '企业合规']
+        assert [cell.value for cell in workbook['流通时效'][1]] == ['日期', '发运批次', '按时批次', '按时比例']
+        assert '导出药店' in [row[1] for row in workbook['企业合规'].iter_rows(min_row=2, values_only=True)]
+        response.close()
+        # 只留下状态文件和导出文件，没有残留的临时文件
+        assert sorted(name.split('.', 1)[1] for name in os.listdir(tmp_path)) == ['json', 'xlsx']
+
+        # 其他监管用户看不到这个任务
+        other = self.get_auth_headers(self.login_user(client, username='otherregulator'))
+        assert client.get(f"/api/compliance/report/exports/{job['job_id']}", headers=other).status_code == 404
+        assert client.get('/api/compliance/report/exports/../../etc', headers=headers).status_code == 404
+
+    def test_pdf_job_in_process_pool(self, client, export_app):
+        pytest.importorskip('reportlab')
+        export_app.config['COMPLIANCE_EXPORT_WORKERS'] = 1
+        headers = self.get_auth_headers(self.login_user(client))
+
+        job = self._submit(client, headers, 'pdf')
+        assert job['status'] == 'queued' and job['download_url'] is None
+        data = self._wait(client, headers, job['job_id'])
+        assert data['status'] == 'done', data
+
+        response = client.get(data['download_url'], headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/pdf'
+        assert response.data.startswith(b'%PDF')
+        response.close()
+
+    def test_full_queue_skips_report_and_audit(self, client, export_app, monkeypatch):
+        export_app.config['COMPLIANCE_EXPORT_MAX_PENDING'] = 0
+        export_app.extensions.pop('compliance_export_queue', None)
+        headers = self.get_auth_headers(self.login_user(client))
+
+        def fail_build(*args):
+            raise AssertionError('队列已满时不应生成报告数据')
+        monkeypatch.setattr('compliance.build_report', fail_build)
+        response = client.post(f'/api/compliance/report/exports?{QUERY}&format=excel', headers=headers)
+        assert response.status_code == 429
+        assert AdminAuditLog.query.filter_by(action='export_compliance_report').count() == 0
+
+    def test_submitted_job_is_audited(self, client, export_app):
+        pytest.importorskip('openpyxl')
+        headers = self.get_auth_headers(self.login_user(client))
+        job = self._submit(client, headers, 'excel')
+        logs = AdminAuditLog.query.filter_by(action='export_compliance_report').all()
+        assert [log.details['job_id'] for log in logs] == [job['job_id']]
+
+    def test_failed_job_and_cleanup(self, tmp_path):
+        queue = ExportJobQueue(str(tmp_path), workers=0, ttl=60)
+        state = queue.submit(1, 'excel', {'range': {}}, 'broken.xlsx')
+        assert state['status'] == 'failed' and state['error']
+        assert queue.output_path(state) is None
+        assert os.listdir(tmp_path) == [f"{state['job_id']}.json"]
+
+        # 超过有效期的任务文件在下次提交时清理
+        old = time.time() - 120
+        os.utime(tmp_path / f"{state['job_id']}.json", (old, old))
+        (tmp_path / 'notes.txt').write_text('keep')
+        assert queue.cleanup_expired() == 1
+        assert queue.get(state['job_id']) is None
+        assert os.listdir(tmp_path) == ['notes.txt']
+
+    def test_pending_limit(self, tmp_path):
+        queue = ExportJobQueue(str(tmp_path), workers=1, max_pending=0)
+        assert queue.is_full()
+        with pytest.raises(ExportQueueFull):
+            queue.submit(1, 'excel', _payload(), 'report.xlsx')
+        with pytest.raises(ValueError):
+            queue.submit(1, 'csv', _payload(), 'report.csv')
+
+
+def test_render_excel_reports_progress():
+    pytest.importorskip('openpyxl')
+    seen = []
+    render_excel(_payload(tenants=50), BytesIO(), seen.append)
+    assert seen == sorted(seen)
+    assert seen[-1] == 1.0 and len(seen) > 50
@@ -0,0 +1,60 @@
+"""
+数据库连接调优测试：连接池参数与 SQLite PRAGMA
+"""
+from flask import Flask
+from sqlalchemy import text
+
+from db_utils import configure_database, engine_options, install_database_hooks
+from extensions import db
+
+
+def _pragma(name):
+    return db.session.execute(text(f'PRAGMA {name}')).scalar()
+
+
+def _file_app(path, **config):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}', **config)
+    configure_database(app)
+    db.init_app(app)
+    return app, install_database_hooks(app)
+
+
+def test_engine_options_per_backend():
+    config = {'SQLITE_BUSY_TIMEOUT_MS': 8000, 'DB_POOL_SIZE': 3}
+    assert engine_options('sqlite:///:memory:', config) == {}
+    assert engine_options('sqlite:////tmp/data.db', config) == {
+        'connect_args': {'timeout': 8.0}, 'pool_size': 3, 'max_overflow': 10
+    }
+    options = engine_options('postgresql://user@localhost/drugs', config)
+    assert options['pool_pre_ping'] and options['pool_size'] == 3 and options['pool_recycle'] == 1800
+
+
+def test_file_database_pragmas(tmp_path):
+    app, pragmas = _file_app(tmp_path / 'tuned.db', SQLALCHEMY_ENGINE_OPTIONS={'max_overflow': 2})
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS']['max_overflow'] == 2
+    assert pragmas['journal_mode'] == 'WAL'
+    with app.app_context():
+        assert _pragma('journal_mode') == 'wal'
+        assert _pragma('synchronous') == 1  # NORMAL
+        assert _pragma('busy_timeout') == 5000
+        assert _pragma('cache_size') == -20000
+        assert _pragma('temp_store') == 2  # MEMORY
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_tuning_can_be_disabled(tmp_path):
+    app, pragmas = _file_app(tmp_path / 'plain.db', SQLITE_TUNING=False)
+    assert pragmas == {}
+    with app.app_context():
+        assert _pragma('journal_mode') == 'delete'
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_memory_database_skips_wal(app):
+    # create_app 已为测试用的内存库注册 PRAGMA，内存库不支持 WAL 与 mmap
+    assert _pragma('journal_mode') == 'memory'
+    assert _pragma('busy_timeout') == 5000
+    assert _pragma('temp_store') == 2
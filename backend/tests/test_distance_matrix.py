@@ -0,0 +1,112 @@
+"""
+驾车距离矩阵测试（使用本地模拟的高德服务）
+"""
+import time
+
+import pytest
+
+from amap import AmapService, calculate_distance_matrix
+from distance_matrix import DistanceMatrixService, PairDistanceCache
+from tests.amap_stub import AmapStubServer
+
+POINTS = [
+    (121.4737, 31.2304),
+    (121.4890, 31.2156),
+    (121.5056, 31.2453),
+    (121.4450, 31.1980),
+    (121.4001, 31.2230),
+]
+
+
+def _expected(i, j, detour=1.3):
+    return round(AmapService.calculate_distance_haversine(*POINTS[i], *POINTS[j]) * detour)
+
+
+class TestPairDistanceCache:
+    """测试点对距离缓存"""
+
+    def test_rounded_key_and_ttl(self):
+        cache = PairDistanceCache(ttl=0.05, precision=4)
+        cache.set((121.47371, 31.23041), (121.4890, 31.2156), 1500.0)
+        assert cache.get((121.473712, 31.230408), (121.4890, 31.2156)) == 1500.0
+        # 方向不同视为不同点对
+        assert cache.get((121.4890, 31.2156), (121.4737, 31.2304)) is None
+
+        time.sleep(0.06)
+        assert cache.get((121.4737, 31.2304), (121.4890, 31.2156)) is None
+        assert cache.stats()['entries'] == 0
+
+    def test_evicts_least_recently_used(self):
+        cache = PairDistanceCache(max_entries=2)
+        cache.set(POINTS[0], POINTS[1], 1.0)
+        cache.set(POINTS[0], POINTS[2], 2.0)
+        cache.get(POINTS[0], POINTS[1])
+        cache.set(POINTS[0], POINTS[3], 3.0)
+
+        assert cache.get(POINTS[0], POINTS[1]) == 1.0
+        assert cache.get(POINTS[0], POINTS[2]) is None
+
+
+class TestDistanceMatrixService:
+    """测试批量驾车距离矩阵"""
+
+    def test_one_request_per_destination(self):
+        with AmapStubServer(latency=0.01) as stub:
+            with DistanceMatrixService('test-key', url=stub.distance_url, qps=1000,
+                                       cache=PairDistanceCache()) as service:
+                matrix = service.matrix(POINTS)
+
+            assert stub.request_count == len(POINTS)
+            assert stub.max_in_flight > 1
+
+        for i in range(len(POINTS)):
+            assert matrix[i][i] == 0.0
+            for j in range(len(POINTS)):
+                if i != j:
+                    assert matrix[i][j] == _expected(i, j)
+
+    def test_cached_pairs_skip_requests(self):
+        cache = PairDistanceCache()
+        with AmapStubServer() as stub:
+            with DistanceMatrixService('test-key', url=stub.distance_url, qps=1000, cache=cache) as service:
+                first = service.matrix(POINTS)
+                second = service.matrix(POINTS[:3])
+
+            assert stub.request_count == len(POINTS)
+            assert service.stats['cache_hits'] == 6
+        assert second == [row[:3] for row in first[:3]]
+
+    def test_origins_are_batched(self):
+        with AmapStubServer() as stub:
+            with DistanceMatrixService('test-key', url=stub.distance_url, qps=1000,
+                                       batch_size=2) as service:
+                service.matrix(POINTS)
+            # 每列 4 个起点，分 2 批
+            assert stub.request_count == len(POINTS) * 2
+
+    def test_failed_requests_fall_back_to_haversine(self):
+        destination = f"{POINTS[0][0]},{POINTS[0][1]}"
+        cache = PairDistanceCache()
+        with AmapStubServer(failures={destination: ('500', 10)}) as stub:
+            with DistanceMatrixService('test-key', url=stub.distance_url, qps=1000,
+                                       max_retries=1, backoff=0.01, cache=cache) as service:
+                matrix = service.matrix(POINTS)
+
+            assert service.stats['fallbacks'] == len(POINTS) - 1
+            assert service.stats['retries'] == 1
+
+        assert matrix[1][0] == AmapService.calculate_distance_haversine(*POINTS[1], *POINTS[0])
+        assert matrix[0][1] == _expected(0, 1)
+        assert cache.get(POINTS[1], POINTS[0]) is None
+
+    def test_calculate_distance_matrix_uses_app_config(self, app):
+        with AmapStubServer() as stub:
+            app.config['AMAP_DISTANCE_URL'] = stub.distance_url
+            app.config['AMAP_DISTANCE_QPS'] = 1000
+
+            matrix = calculate_distance_matrix(POINTS[0], POINTS[1:], use_api=True)
+            again = calculate_distance_matrix(POINTS[0], POINTS[1:], use_api=True)
+
+            assert stub.request_count == len(POINTS)
+        assert matrix == again
+        assert matrix[2][0] == pytest.approx(_expected(2, 0))
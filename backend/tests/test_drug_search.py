@@ -0,0 +1,121 @@
+"""
+药品搜索测试：FTS5 与进程内索引两种后端的匹配、排序与同步
+"""
+from datetime import date
+
+import pytest
+from flask import current_app
+from sqlalchemy import update
+
+from cache_generations import bump_generations
+from drug_search import GENERATION_NAME, Fts5DrugSearchIndex, filter_drugs_by_keyword, get_drug_search_index, search_drug_ids
+from extensions import db
+from models import Drug, SupplyInfo, User
+from tests.base import BaseTestCase, make_drug, make_tenant
+
+DRUGS = [
+    # (通用名, 商品名, 批准文号, 厂家)
+    ('阿莫西林胶囊', '阿莫仙', 'H20003263', '石药集团'),
+    ('布洛芬缓释胶囊', '芬必得', 'H10900089', '中美史克'),
+    ('头孢克肟片', '世福素', 'H20030118', '阿莫制药厂'),
+    ('Ibuprofen Tablets', 'Advil', 'J20170006', 'Pfizer'),
+]
+
+
+def _drug(generic_name, brand_name, approval_number, manufacturer):
+    return make_drug(approval_number, generic_name, brand_name, manufacturer=manufacturer)
+
+
+class TestDrugSearch(BaseTestCase):
+    """两种后端行为一致"""
+
+    @pytest.fixture(params=['fts5', 'memory'])
+    def drugs(self, request, app):
+        app.config['DRUG_SEARCH_BACKEND'] = request.param
+        app.extensions.pop('drug_search', None)
+        drugs = [_drug(*row) for row in DRUGS]
+        db.session.add_all(drugs)
+        db.session.commit()
+        return {drug.generic_name: drug.id for drug in drugs}
+
+    def test_backend_selection(self, app, drugs):
+        expected = current_app.config['DRUG_SEARCH_BACKEND']
+        assert get_drug_search_index().name == expected
+        # auto：create_all 已创建 drugs_fts
+        app.config['DRUG_SEARCH_BACKEND'] = 'auto'
+        app.extensions.pop('drug_search')
+        assert isinstance(get_drug_search_index(), Fts5DrugSearchIndex)
+
+    def test_ranking_and_fields(self, app, drugs):
+        # 通用名命中排在厂家命中前面
+        assert search_drug_ids('阿莫') == [drugs['阿莫西林胶囊'], drugs['头孢克肟片']]
+        assert search_drug_ids('阿莫', fields=('generic_name', 'brand_name')) == [drugs['阿莫西林胶囊']]
+        # 多个词都要命中；英文不区分大小写
+        assert search_drug_ids('胶囊 芬') == [drugs['布洛芬缓释胶囊']]
+        assert search_drug_ids('ibuprofen') == [drugs['Ibuprofen Tablets']]
+        assert search_drug_ids('h2000') == [drugs['阿莫西林胶囊']]
+        assert search_drug_ids('50%') == []
+        assert search_drug_ids('不存在的药') == []
+
+    def test_filter_query(self, app, drugs):
+        query = filter_drugs_by_keyword(Drug.query, '胶囊', rank=False).order_by(Drug.id)
+        assert [drug.id for drug in query] == [drugs['阿莫西林胶囊'], drugs['布洛芬缓释胶囊']]
+        query = filter_drugs_by_keyword(Drug.query, '阿莫').order_by(Drug.id)
+        assert query.count() == 2
+        assert query.first().id == drugs['阿莫西林胶囊']
+
+    def test_index_follows_drug_changes(self, app, drugs):
+        drug = db.session.get(Drug, drugs['头孢克肟片'])
+        drug.generic_name = '头孢呋辛酯片'
+        db.session.add(_drug('对乙酰氨基酚片', '泰诺林', 'H19990024', '上海强生'))
+        db.session.delete(db.session.get(Drug, drugs['布洛芬缓释胶囊']))
+        db.session.commit()
+
+        assert search_drug_ids('头孢呋辛') == [drug.id]
+        assert search_drug_ids('克肟') == []
+        assert search_drug_ids('布洛芬') == []
+        assert len(search_drug_ids('对乙酰氨基酚')) == 1
+
+    def test_index_follows_other_process_changes(self, app, drugs):
+        """其他进程提交的药品变更（本进程收不到会话事件）通过缓存版本号让进程内索引重建"""
+        assert search_drug_ids('克肟') == [drugs['头孢克肟片']]
+
+        # 模拟另一个 worker：绕过本进程的 ORM 事件改名（FTS5 由触发器同步，进程内索引仍是旧数据）
+        db.session.execute(update(Drug).where(Drug.id == drugs['头孢克肟片']).values(generic_name='头孢呋辛酯片'))
+        bump_generations(db.session, [GENERATION_NAME])
+        db.session.commit()
+
+        assert search_drug_ids('头孢呋辛') == [drugs['头孢克肟片']]
+        assert search_drug_ids('克肟') == []
+
+    def test_catalog_endpoints(self, client, drugs):
+        response = client.get('/api/catalog/drugs/search?q=阿莫')
+        data = self.assert_success_response(response)
+        assert [item['id'] for item in data['items']] == [drugs['阿莫西林胶囊'], drugs['头孢克肟片']]
+
+        response = client.get('/api/catalog/drugs?keyword=阿莫')
+        assert [item['id'] for item in response.get_json()['items']] == [drugs['阿莫西林胶囊']]
+
+        supplier = make_tenant('SP')
+        db.session.add(supplier)
+        db.session.flush()
+        db.session.add(SupplyInfo(tenant_id=supplier.id, drug_id=drugs['阿莫西林胶囊'], available_quantity=10,
+                                  unit_price=12.5, valid_until=date(2099, 1, 1), min_order_quantity=1))
+        db.session.commit()
+        response = client.get('/api/catalog/price/compare?drug_name=阿莫西林')
+        items = response.get_json()['items']
+        assert len(items) == 1
+
+    def test_supply_drugs_list(self, client, drugs):
+        supplier = make_tenant('SP')
+        db.session.add(supplier)
+        db.session.flush()
+        user = User(username='testuser', email='supplier@search.test', role='supplier', tenant_id=supplier.id)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+        headers = self.get_auth_headers(self.login_user(client))
+        response = client.get('/api/supply/drugs?search=J2017', headers=headers)
+        items = response.get_json()['data']['items']
+        assert [item['id'] for item in items] == [drugs['Ibuprofen Tablets']]
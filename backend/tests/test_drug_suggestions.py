@@ -0,0 +1,126 @@
+"""
+药品候选项索引测试：子串匹配、有货企业计数与增量更新
+"""
+from datetime import date
+
+import pytest
+
+from drug_suggestions import DrugSuggestionIndex, get_drug_suggestion_index, name_terms
+from extensions import db
+from models import InventoryItem, SupplyInfo, User
+from supply_utils import update_supply_info_quantity
+from tests.base import BaseTestCase, make_drug, make_tenant
+from tests.test_order_listing import count_queries
+
+
+def _inventory(tenant, drug, quantity):
+    return InventoryItem(tenant_id=tenant.id, drug_id=drug.id, batch_number=f'B-{tenant.id}-{drug.id}',
+                         production_date=date(2025, 1, 1), expiry_date=date(2027, 1, 1),
+                         quantity=quantity, unit_price=10.0)
+
+
+def _supply(tenant, drug, quantity):
+    return SupplyInfo(tenant_id=tenant.id, drug_id=drug.id, available_quantity=quantity, unit_price=10.0,
+                      valid_until=date(2099, 1, 1), min_order_quantity=1)
+
+
+def test_name_terms():
+    assert name_terms('阿莫西林') >= {'阿莫西林', '莫西林', '西林', '林'}
+    assert 'amoxicillin' in name_terms('Amoxicillin')
+
+
+def test_name_terms_pinyin():
+    pytest.importorskip('pypinyin')
+    terms = name_terms('阿莫西林')
+    assert {'amoxilin', 'xilin', 'amxl', 'xl'} <= terms
+
+
+class TestDrugSuggestions(BaseTestCase):
+    """测试候选项索引与就近推荐输入联想接口"""
+
+    @pytest.fixture
+    def data(self, app):
+        suppliers = [make_tenant(code, longitude=121.4, latitude=31.2) for code in ('A', 'B', 'C')]
+        unlocated = make_tenant('D')
+        amoxicillin = make_drug('H-SUG-1', '阿莫西林胶囊', '阿莫仙')
+        ibuprofen = make_drug('H-SUG-2', '布洛芬缓释胶囊', '芬必得')
+        db.session.add_all(suppliers + [unlocated, amoxicillin, ibuprofen])
+        db.session.flush()
+        a, b, c = suppliers
+        db.session.add_all([
+            # 阿莫西林：A 有库存，B 有上架供应，A 同时有供应（只算一次），C 库存为 0，D 没有坐标
+            _inventory(a, amoxicillin, 5), _supply(a, amoxicillin, 3), _supply(b, amoxicillin, 8),
+            _inventory(c, amoxicillin, 0), _inventory(unlocated, amoxicillin, 9),
+            # 布洛芬：A、B、C 都有库存
+            _inventory(a, ibuprofen, 1), _inventory(b, ibuprofen, 1), _inventory(c, ibuprofen, 1),
+        ])
+        db.session.commit()
+        return {'suppliers': suppliers, 'unlocated': unlocated, 'amoxicillin': amoxicillin, 'ibuprofen': ibuprofen}
+
+    def test_suggest(self, app, data):
+        index = DrugSuggestionIndex()
+        index.rebuild()
+        assert [item['generic_name'] for item in index.suggest('胶囊')] == ['布洛芬缓释胶囊', '阿莫西林胶囊']
+        assert index.suggest('西林') == [{
+            'generic_name': '阿莫西林胶囊',
+            'brand_name': '阿莫仙',
+            'specification': '0.25g*24粒',
+            'supplier_count': 2
+        }]
+        assert index.suggest('芬必')[0]['supplier_count'] == 3
+        assert index.suggest('胶囊', limit=1)[0]['generic_name'] == '布洛芬缓释胶囊'
+        assert index.suggest('头孢') == []
+
+    def test_suggest_by_pinyin(self, app, data):
+        pytest.importorskip('pypinyin')
+        index = DrugSuggestionIndex()
+        index.rebuild()
+        # 全拼、首字母前缀，以及从中间音节开始的首字母
+        assert [item['generic_name'] for item in index.suggest('amoxi')] == ['阿莫西林胶囊']
+        assert [item['generic_name'] for item in index.suggest('amxl')] == ['阿莫西林胶囊']
+        assert [item['brand_name'] for item in index.suggest('fbd')] == ['芬必得']
+        assert [item['generic_name'] for item in index.suggest('jn')] == ['布洛芬缓释胶囊', '阿莫西林胶囊']
+
+    def test_incremental_updates(self, app, data):
+        index = get_drug_suggestion_index()
+        loaded_at = index.loaded_at
+        a, b, c = data['suppliers']
+        amoxicillin = data['amoxicillin']
+
+        # C 进货、D 补上坐标：各加一
+        item = InventoryItem.query.filter_by(tenant_id=c.id, drug_id=amoxicillin.id).one()
+        item.quantity = 4
+        data['unlocated'].longitude, data['unlocated'].latitude = 121.5, 31.3
+        db.session.commit()
+        assert index.supplier_count('阿莫西林胶囊', '阿莫仙', '0.25g*24粒') == 4
+
+        # B 的供应被下单占完自动下架（Core UPDATE），回滚的变更不生效
+        supply = SupplyInfo.query.filter_by(tenant_id=b.id, drug_id=amoxicillin.id).one()
+        update_supply_info_quantity(b.id, amoxicillin.id, -8, supply_info_id=supply.id)
+        db.session.commit()
+        db.session.delete(InventoryItem.query.filter_by(tenant_id=c.id, drug_id=amoxicillin.id).one())
+        db.session.flush()
+        db.session.rollback()
+        assert index.supplier_count('阿莫西林胶囊', '阿莫仙', '0.25g*24粒') == 3
+        assert index.loaded_at == loaded_at
+
+        # 新药品需要新的检索词：下次查询时重建
+        db.session.add(make_drug('H-SUG-3', '头孢克肟片', '世福素'))
+        db.session.commit()
+        assert index.loaded_at is None
+        assert get_drug_suggestion_index().suggest('头孢') == []
+
+    def test_endpoint_does_not_query_database(self, client, data):
+        user = User(username='testuser', email='buyer@suggest.test', role='pharmacy',
+                    tenant_id=data['suppliers'][0].id)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        headers = self.get_auth_headers(self.login_user(client))
+
+        response = client.get('/api/nearby/drug-suggestions?keyword=胶囊&limit=5', headers=headers)
+        assert [item['supplier_count'] for item in response.get_json()['drugs']] == [3, 2]
+        with count_queries() as queries:
+            response = client.get('/api/nearby/drug-suggestions?keyword=阿莫', headers=headers)
+        assert response.get_json()['drugs'][0]['generic_name'] == '阿莫西林胶囊'
+        assert queries == []
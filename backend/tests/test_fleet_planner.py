@@ -0,0 +1,170 @@
+"""
+多车辆配送计划测试
+"""
+import random
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from extensions import db
+from fleet_planner import plan_fleet
+from models import Order, OrderItem, User
+from tests.base import BaseTestCase, make_drug, make_tenant
+
+DEPOT = (121.47, 31.23)
+TODAY = date(2026, 3, 2)
+
+
+def _random_stops(count, seed=1, max_demand=20):
+    rng = random.Random(seed)
+    return [
+        {
+            'order_id': i,
+            'longitude': 121.2 + rng.random() * 0.6,
+            'latitude': 30.95 + rng.random() * 0.45,
+            'demand': rng.randint(1, max_demand),
+            'expected_delivery_date': TODAY + timedelta(days=rng.randint(-2, 3))
+        }
+        for i in range(count)
+    ]
+
+
+def _assigned_ids(plan):
+    return [stop['order_id'] for vehicle in plan['vehicles'] for stop in vehicle['stops']]
+
+
+class TestFleetPlanner:
+    """测试分组与路线规划"""
+
+    def test_all_stops_assigned_within_capacity(self):
+        stops = _random_stops(120)
+        plan = plan_fleet(DEPOT, stops, [800] * 4, plan_date=TODAY, time_budget=2, workers=0)
+
+        assert sorted(_assigned_ids(plan)) == list(range(120))
+        assert plan['unassigned'] == []
+        for vehicle in plan['vehicles']:
+            assert vehicle['load'] <= vehicle['capacity']
+            assert vehicle['stops'], '每辆车都应分到目的地'
+            assert [s['order'] for s in vehicle['stops']] == list(range(1, len(vehicle['stops']) + 1))
+            assert vehicle['distance'] == pytest.approx(sum(s['distance_from_prev'] for s in vehicle['stops']))
+        assert plan['total_distance'] == pytest.approx(sum(v['distance'] for v in plan['vehicles']), abs=0.1)
+
+    def test_urgent_orders_are_kept_when_capacity_is_short(self):
+        stops = _random_stops(150, seed=2)
+        plan = plan_fleet(DEPOT, stops, [250] * 3, plan_date=TODAY, time_budget=1, workers=0)
+
+        assigned = [s for v in plan['vehicles'] for s in v['stops']]
+        assert all(v['load'] <= 250 for v in plan['vehicles'])
+        assert len(assigned) + len(plan['unassigned']) == 150
+        assert all(s['reason'] == 'capacity' for s in plan['unassigned'])
+        # 已逾期的订单全部安排，且安排的订单不比暂缓的更晚
+        assert all(s['expected_delivery_date'] >= TODAY for s in plan['unassigned'])
+        assert sum(s['overdue'] for s in assigned) == sum(1 for s in stops if s['expected_delivery_date'] < TODAY)
+
+    def test_oversize_order(self):
+        stops = _random_stops(5)
+        stops[0]['demand'] = 1000
+        plan = plan_fleet(DEPOT, stops, [100, 100], plan_date=TODAY, workers=0)
+        assert [(s['order_id'], s['reason']) for s in plan['unassigned']] == [(0, 'oversize')]
+
+    def test_worker_processes_match_in_process(self):
+        stops = _random_stops(80, seed=3)
+        in_process = plan_fleet(DEPOT, stops, [400] * 3, plan_date=TODAY, time_budget=5, workers=0)
+        pooled = plan_fleet(DEPOT, stops, [400] * 3, plan_date=TODAY, time_budget=5, workers=2)
+        assert _assigned_ids(pooled) == _assigned_ids(in_process)
+
+    def test_300_stops_within_budget(self):
+        stops = _random_stops(300, seed=4)
+        started = time.perf_counter()
+        plan = plan_fleet(DEPOT, stops, [700] * 5, plan_date=TODAY, time_budget=3, workers=0)
+        assert time.perf_counter() - started < 6
+        assert len(_assigned_ids(plan)) == 300
+        assert plan['iterations'] > 0
+
+
+class TestPlanFleetAPI(BaseTestCase):
+    """测试 /api/dispatch/plan_fleet 与 /api/dispatch/orders_destinations"""
+
+    @pytest.fixture
+    def fleet_data(self, app):
+        logistics = make_tenant('LG', 'LOGISTICS')
+        supplier = make_tenant('SP', 'SUPPLIER', longitude=121.40, latitude=31.20)
+        rng = random.Random(8)
+        pharmacies = [make_tenant(f'PH{i}', 'PHARMACY', longitude=121.3 + rng.random() * 0.3,
+                                  latitude=31.1 + rng.random() * 0.2)
+                      for i in range(12)]
+        no_coords = make_tenant('PHX', 'PHARMACY')
+        drug = make_drug('H-FLEET-001')
+        db.session.add_all([logistics, supplier, no_coords, drug] + pharmacies)
+        db.session.flush()
+
+        user = User(username='testuser', email='logistics@fleet.test', role='logistics',
+                    tenant_id=logistics.id)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+
+        orders = []
+        for i, pharmacy in enumerate(pharmacies + [no_coords]):
+            order = Order(
+                order_number=f'FLEET{i:04d}',
+                buyer_tenant_id=pharmacy.id,
+                supplier_tenant_id=supplier.id,
+                logistics_tenant_id=logistics.id,
+                status='SHIPPED' if i != 11 else 'DELIVERED',
+                expected_delivery_date=TODAY + timedelta(days=i % 3 - 1),
+                created_by=user.id
+            )
+            order.items = [
+                OrderItem(drug_id=drug.id, unit_price=10, quantity=10),
+                OrderItem(drug_id=drug.id, unit_price=12, quantity=5 + i),
+            ]
+            orders.append(order)
+        db.session.add_all(orders)
+        db.session.commit()
+        return {'orders': orders}
+
+    def test_orders_destinations(self, client, fleet_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        data = self.assert_success_response(
+            client.get('/api/dispatch/orders_destinations?limit=50', headers=headers))
+
+        # 已送达的订单与没有坐标的药店不返回
+        assert data['count'] == 11
+        first = fleet_data['orders'][0]
+        dest = next(d for d in data['destinations'] if d['order_id'] == first.id)
+        assert dest['quantity'] == 15
+        assert dest['expected_delivery_date'] == (TODAY - timedelta(days=1)).isoformat()
+        dates = [d['expected_delivery_date'] for d in data['destinations']]
+        assert dates == sorted(dates)
+
+    def test_plan_fleet(self, client, fleet_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        response = client.post('/api/dispatch/plan_fleet', headers=headers, json={
+            'start': '121.47,31.23',
+            'vehicles': 2,
+            'capacity': 120,
+            'plan_date': TODAY.isoformat(),
+            'time_budget': 1
+        })
+        data = self.assert_success_response(response)
+
+        assigned = [s for v in data['vehicles'] for s in v['stops']]
+        assert len(data['vehicles']) == 2
+        assert len(assigned) + len(data['unassigned']) == 11
+        assert all(v['load'] <= 120 for v in data['vehicles'])
+        assert all(s['reason'] == 'capacity' for s in data['unassigned'])
+        assert any(s['overdue'] for s in assigned)
+        assert assigned[0]['distance_from_prev_text']
+
+    def test_plan_fleet_validation(self, client, fleet_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        response = client.post('/api/dispatch/plan_fleet', headers=headers, json={
+            'start': '121.47,31.23', 'vehicles': 2, 'capacity': [100]
+        })
+        assert response.status_code == 400
+        response = client.post('/api/dispatch/plan_fleet', headers=headers, json={
+            'start': '121.47,31.23', 'vehicles': 'x', 'capacity': 100
+        })
+        assert response.status_code == 400
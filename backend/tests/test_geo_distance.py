@@ -0,0 +1,76 @@
+"""
+批量直线距离计算测试
+"""
+import random
+
+import pytest
+
+import geo_distance
+from amap import AmapService, calculate_distance_matrix, find_nearby_suppliers
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(7)
+    return [(121.2 + rng.random() * 0.5, 31.0 + rng.random() * 0.4) for _ in range(60)]
+
+
+BACKENDS = [False] + ([True] if geo_distance.HAS_NUMPY else [])
+
+
+@pytest.mark.parametrize('use_numpy', BACKENDS)
+class TestHaversine:
+    """批量计算结果与 AmapService.calculate_distance_haversine 一致"""
+
+    def test_one_to_many(self, points, use_numpy):
+        distances = geo_distance.haversine_one_to_many(121.47, 31.23, points, use_numpy=use_numpy)
+        expected = [AmapService.calculate_distance_haversine(121.47, 31.23, lon, lat)
+                    for lon, lat in points]
+        assert distances == pytest.approx(expected, abs=0.011)
+
+    def test_matrix(self, points, use_numpy):
+        matrix = geo_distance.haversine_matrix(points, use_numpy=use_numpy)
+        for i, (lon1, lat1) in enumerate(points):
+            assert matrix[i][i] == 0.0
+            for j in range(i + 1, len(points)):
+                expected = AmapService.calculate_distance_haversine(lon1, lat1, *points[j])
+                assert matrix[i][j] == matrix[j][i] == pytest.approx(expected, abs=0.011)
+
+    def test_empty(self, use_numpy):
+        assert geo_distance.haversine_one_to_many(121.47, 31.23, [], use_numpy=use_numpy) == []
+        assert geo_distance.haversine_matrix([], use_numpy=use_numpy) == []
+
+
+def test_python_fallback_is_exact(points):
+    """纯 Python 实现与原标量公式逐位相同"""
+    distances = geo_distance.haversine_one_to_many(121.47, 31.23, points, use_numpy=False)
+    assert distances == [AmapService.calculate_distance_haversine(121.47, 31.23, lon, lat)
+                         for lon, lat in points]
+
+
+def test_find_nearby_suppliers(points):
+    suppliers = [{'id': i, 'longitude': lon, 'latitude': lat} for i, (lon, lat) in enumerate(points)]
+    suppliers.append({'id': 'no-coords', 'longitude': None, 'latitude': None})
+
+    results = find_nearby_suppliers((121.47, 31.23), suppliers, max_distance=15000, limit=5)
+
+    expected = sorted(
+        (AmapService.calculate_distance_haversine(121.47, 31.23, s['longitude'], s['latitude']), s['id'])
+        for s in suppliers[:-1]
+    )
+    expected = [item for item in expected if item[0] <= 15000][:5]
+    assert [r['id'] for r in results] == [sid for _, sid in expected]
+    assert all(r['distance_text'] for r in results)
+
+
+def test_calculate_distance_matrix(points):
+    matrix = calculate_distance_matrix(points[0], points[1:10])
+    assert len(matrix) == 10
+    assert matrix[0][3] == pytest.approx(
+        AmapService.calculate_distance_haversine(*points[0], *points[3]), abs=0.011)
+
+
+def test_numpy_unavailable(monkeypatch):
+    monkeypatch.setattr(geo_distance, 'HAS_NUMPY', False)
+    with pytest.raises(RuntimeError):
+        geo_distance.haversine_matrix([(121.0, 31.0)], use_numpy=True)
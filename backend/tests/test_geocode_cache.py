@@ -0,0 +1,156 @@
+"""
+地理编码缓存测试
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import geocode_cache
+from amap import AmapService
+from extensions import db
+from models import GeocodeCache, Tenant
+
+
+class FakeGeocoder:
+    """模拟高德地理编码接口，记录调用次数"""
+
+    def __init__(self, results=None, definitive=True):
+        self.results = results or {}
+        self.definitive = definitive
+        self.calls = 0
+
+    def __call__(self, address, city=None):
+        self.calls += 1
+        result = self.results.get(address.strip())
+        return result, (result is not None or self.definitive)
+
+
+@pytest.fixture
+def fake_geocoder(monkeypatch):
+    geocoder = FakeGeocoder({
+        '上海市黄浦区四牌楼路88号': {
+            'longitude': 121.4737,
+            'latitude': 31.2304,
+            'formatted_address': '上海市黄浦区四牌楼路88号',
+            'province': '上海市',
+            'city': '上海市',
+            'district': '黄浦区',
+            'adcode': '310101'
+        }
+    })
+    monkeypatch.setattr(AmapService, 'request_geocode', staticmethod(geocoder))
+    geocode_cache.reset_stats()
+    return geocoder
+
+
+class TestGeocodeCache:
+    """测试地理编码缓存"""
+
+    def test_repeated_lookup_hits_cache(self, app, fake_geocoder):
+        """同一地址第二次查询不再发起远程调用"""
+        first = AmapService.geocode_address('上海市黄浦区四牌楼路88号')
+        db.session.commit()
+        second = AmapService.geocode_address('  上海市黄浦区四牌楼路88号 ')
+
+        assert fake_geocoder.calls == 1
+        assert first['longitude'] == second['longitude'] == 121.4737
+        assert second['district'] == '黄浦区'
+
+        stats = geocode_cache.get_cache_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['remote_calls'] == 1
+        assert stats['saved_remote_calls'] == 1
+
+    def test_city_is_part_of_key(self, app, fake_geocoder):
+        """不同城市视为不同的缓存条目"""
+        AmapService.geocode_address('上海市黄浦区四牌楼路88号')
+        AmapService.geocode_address('上海市黄浦区四牌楼路88号', '上海')
+        assert fake_geocoder.calls == 2
+
+    def test_unresolvable_address_is_negative_cached(self, app, fake_geocoder):
+        """无法解析的地址写入负缓存"""
+        assert AmapService.geocode_address('不存在的地址') is None
+        assert AmapService.geocode_address('不存在的地址') is None
+        assert fake_geocoder.calls == 1
+
+        entry = GeocodeCache.query.one()
+        assert entry.is_negative
+        assert geocode_cache.get_cache_stats()['negative_hits'] == 1
+
+    def test_transient_failure_is_not_cached(self, app, monkeypatch):
+        """网络异常等非明确失败不写入缓存"""
+        geocoder = FakeGeocoder(definitive=False)
+        monkeypatch.setattr(AmapService, 'request_geocode', staticmethod(geocoder))
+
+        assert AmapService.geocode_address('上海市某路1号') is None
+        assert AmapService.geocode_address('上海市某路1号') is None
+        assert geocoder.calls == 2
+        assert GeocodeCache.query.count() == 0
+
+    def test_expired_entry_is_refreshed(self, app, fake_geocoder):
+        """过期条目重新发起远程调用"""
+        AmapService.geocode_address('上海市黄浦区四牌楼路88号')
+        entry = GeocodeCache.query.one()
+        entry.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+        AmapService.geocode_address('上海市黄浦区四牌楼路88号')
+        assert fake_geocoder.calls == 2
+        assert GeocodeCache.query.one().expires_at > datetime.utcnow()
+
+    def test_geocode_tenant_writes_back_coordinates(self, app, fake_geocoder):
+        """地理编码结果回写到租户坐标"""
+        tenant = Tenant(
+            name='缓存测试供应商',
+            type='SUPPLIER',
+            unified_social_credit_code='GEO-CACHE-001',
+            legal_representative='负责人',
+            contact_person='联系人',
+            contact_phone='13800000000',
+            contact_email='geo@cache.test',
+            address='上海市黄浦区四牌楼路88号',
+            business_scope='药品批发'
+        )
+        db.session.add(tenant)
+        db.session.commit()
+
+        assert geocode_cache.geocode_tenant(tenant) is not None
+        db.session.commit()
+
+        refreshed = db.session.get(Tenant, tenant.id)
+        assert refreshed.longitude == 121.4737
+        assert refreshed.latitude == 31.2304
+
+    def test_hits_are_counted_without_writes(self, app, fake_geocoder):
+        """命中不写缓存表，累计的命中次数在下一次写入缓存时落库"""
+        AmapService.geocode_address('上海市黄浦区四牌楼路88号')
+        db.session.commit()
+        AmapService.geocode_address('上海市黄浦区四牌楼路88号')
+        AmapService.geocode_address('上海市黄浦区四牌楼路88号')
+        assert not db.session.dirty
+        assert GeocodeCache.query.one().hit_count == 0
+        assert geocode_cache.get_cache_stats()['saved_remote_calls'] == 2
+
+        AmapService.geocode_address('不存在的地址')
+        db.session.commit()
+        entry = GeocodeCache.query.filter_by(address='上海市黄浦区四牌楼路88号').one()
+        db.session.refresh(entry)
+        assert entry.hit_count == 2
+        assert geocode_cache.get_cache_stats()['saved_remote_calls'] == 2
+
+    def test_concurrent_miss_reuses_existing_entry(self, app, fake_geocoder):
+        """其他进程已写入同一地址时（唯一约束冲突），刷新已有条目而不是报错"""
+        result = {'longitude': 121.0, 'latitude': 31.0}
+        geocode_cache.store_result('上海市某路2号', None, None, True)
+        db.session.commit()
+
+        entry = geocode_cache.store_result('上海市某路2号', None, result, True)
+        db.session.commit()
+        assert GeocodeCache.query.count() == 1
+        assert entry.longitude == 121.0 and not entry.is_negative
+
+    def test_lookup_without_app_context_falls_back_to_remote(self, fake_geocoder):
+        """没有应用上下文时（如脚本直接调用）跳过缓存，直接远程调用"""
+        assert AmapService.geocode_address('上海市黄浦区四牌楼路88号')['longitude'] == 121.4737
+        assert fake_geocoder.calls == 1
@@ -0,0 +1,156 @@
+"""
+库存预警快照测试
+"""
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import inventory_snapshot
+from extensions import db
+from inventory_snapshot import InventorySnapshot, get_inventory_snapshot
+from inventory_warning_engine import rebuild_warning_states
+from models import InventoryItem, User
+from tests.base import BaseTestCase, make_drug, make_tenant
+from tests.test_order_listing import count_queries
+
+BACKENDS = [False] + ([True] if inventory_snapshot.HAS_NUMPY else [])
+
+
+def _reference(today, low_threshold=10, expiry_days=30):
+    """原预警扫描的逐条统计逻辑，作为对照"""
+    result = {}
+    for item in InventoryItem.query.all():
+        days = (item.expiry_date - today).days
+        low = item.quantity < low_threshold
+        near = days <= expiry_days
+        if not (low or near):
+            continue
+        counts = result.setdefault(item.tenant_id, {
+            'low_stock': 0, 'near_expiry': 0, 'critical': 0, 'critical_batches': 0, 'total': 0
+        })
+        counts['total'] += 1
+        if low:
+            counts['low_stock'] += 1
+            counts['critical'] += item.quantity == 0
+        if near:
+            counts['near_expiry'] += 1
+            counts['critical'] += days <= 0
+        counts['critical_batches'] += item.quantity == 0 or days <= 0
+    return result
+
+
+class TestInventorySnapshot(BaseTestCase):
+    """测试快照加载、增量刷新与预警统计"""
+
+    @pytest.fixture
+    def inventory_data(self, app):
+        tenants = [make_tenant(f'PH{i}', 'PHARMACY') for i in range(4)]
+        drugs = [
+            make_drug(f'H-SNAP-{i:03d}', f'药品{i}', f'药品{i}片')
+            for i in range(3)
+        ]
+        db.session.add_all(tenants + drugs)
+        db.session.flush()
+
+        user = User(username='testuser', email='pharmacy@snapshot.test', role='pharmacy',
+                    tenant_id=tenants[0].id)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+
+        rng = random.Random(14)
+        today = datetime.now().date()
+        for i in range(300):
+            db.session.add(InventoryItem(
+                tenant_id=rng.choice(tenants).id,
+                drug_id=rng.choice(drugs).id,
+                batch_number=f'SNAP{i:04d}',
+                production_date=today - timedelta(days=400),
+                expiry_date=today + timedelta(days=rng.randint(-10, 60)),
+                quantity=rng.choice([0, 0, 3, 9, 10, 50, 200]),
+                unit_price=5.0
+            ))
+        db.session.commit()
+        # 直接写入的批次没有经过预警引擎，像导入工具一样重建预警状态
+        rebuild_warning_states(today)
+        db.session.commit()
+        get_inventory_snapshot().invalidate()
+        return {'tenants': tenants, 'drugs': drugs, 'user': user}
+
+    @pytest.mark.parametrize('use_numpy', BACKENDS)
+    def test_counts_match_reference(self, app, inventory_data, use_numpy):
+        today = datetime.now().date()
+        snapshot = InventorySnapshot()
+        assert snapshot.tenant_counts(today, use_numpy=use_numpy) == _reference(today)
+        assert len(snapshot) == 300
+
+        # 换一组阈值、换一天
+        later = today + timedelta(days=20)
+        assert snapshot.tenant_counts(later, 5, 7, use_numpy=use_numpy) == _reference(later, 5, 7)
+
+    def test_unchanged_refresh_is_one_query(self, app, inventory_data):
+        snapshot = get_inventory_snapshot()
+        counts = snapshot.tenant_counts()
+        # 没有新流水时只查一次流水表，计数直接复用
+        with count_queries() as queries:
+            assert snapshot.tenant_counts() is counts
+        assert len(queries) == 1
+
+    def test_refresh_from_transactions(self, client, inventory_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        snapshot = get_inventory_snapshot()
+        snapshot.tenant_counts()
+        assert snapshot.refresh() == 0
+
+        tenant_id = inventory_data['tenants'][0].id
+        item = InventoryItem.query.filter_by(tenant_id=tenant_id, quantity=50).first()
+        response = client.put(f'/api/v1/inventory/items/{item.id}', headers=headers,
+                              json={'quantity_delta': -50, 'notes': '盘点'})
+        assert response.status_code == 200, response.get_json()
+        response = client.post('/api/v1/inventory/items', headers=headers, json={
+            'drug_id': inventory_data['drugs'][0].id,
+            'batch_number': 'SNAP-NEW',
+            'production_date': '2026-01-01',
+            'expiry_date': (datetime.now().date() + timedelta(days=3)).isoformat(),
+            'quantity': 2,
+            'unit_price': 8.0
+        })
+        assert response.status_code == 201, response.get_json()
+
+        assert snapshot.refresh() == 2
+        assert len(snapshot) == 301
+        today = datetime.now().date()
+        assert snapshot.tenant_counts(today) == _reference(today)
+
+        data = self.assert_success_response(client.get('/api/v1/inventory/warning-summary', headers=headers))
+        expected = _reference(today)[tenant_id]
+        assert data['data']['summary']['low_stock_count'] == expected['low_stock']
+        assert data['data']['summary']['near_expiry_count'] == expected['near_expiry']
+        assert data['data']['summary']['critical_count'] == expected['critical_batches']
+
+    def test_removed_items_and_reload(self, app, inventory_data):
+        snapshot = InventorySnapshot(max_age=3600)
+        snapshot.load()
+        removed = InventoryItem.query.order_by(InventoryItem.id).limit(5).all()
+        removed_ids = [item.id for item in removed]
+        for item in removed:
+            db.session.delete(item)
+        db.session.commit()
+
+        snapshot._apply_changes(removed_ids)
+        assert len(snapshot) == 295
+        assert sorted(snapshot.item_ids) == [item.id for item in InventoryItem.query.order_by(InventoryItem.id)]
+        today = datetime.now().date()
+        assert snapshot.tenant_counts(today) == _reference(today)
+
+        # 不写流水的直接改表在快照过期后整体重载时生效
+        InventoryItem.query.update({InventoryItem.quantity: 0})
+        db.session.commit()
+        assert snapshot.tenant_counts(today) != _reference(today)
+        snapshot.max_age = 0
+        assert snapshot.tenant_counts(today) == _reference(today)
+
+
+def test_empty_snapshot(app):
+    assert InventorySnapshot().tenant_counts(date(2026, 3, 1)) == {}
@@ -0,0 +1,146 @@
+"""
+物流订单列表游标分页测试
+"""
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Order, OrderItem, User
+from order_utils import decode_cursor, encode_cursor
+from tests.base import BaseTestCase, make_drug, make_tenant
+from tests.test_order_listing import count_queries
+
+BASE_TIME = datetime(2026, 3, 1, 8, 0, 0)
+
+
+class TestLogisticsFeed(BaseTestCase):
+    """测试 /api/logistics/orders 的游标分页与流式导出"""
+
+    @pytest.fixture
+    def feed_data(self, app):
+        logistics = make_tenant('LG', 'LOGISTICS')
+        other_logistics = make_tenant('LG2', 'LOGISTICS')
+        supplier = make_tenant('SP', 'SUPPLIER')
+        pharmacies = [make_tenant(f'PH{i}', 'PHARMACY') for i in range(3)]
+        drug = make_drug('H-FEED-001')
+        db.session.add_all([logistics, other_logistics, supplier, drug] + pharmacies)
+        db.session.flush()
+
+        user = User(username='testuser', email='logistics@feed.test', role='logistics',
+                    tenant_id=logistics.id)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+
+        statuses = ['SHIPPED', 'IN_TRANSIT', 'DELIVERED', 'COMPLETED']
+        orders = []
+        for i in range(45):
+            order = Order(
+                order_number=f'FEED{i:04d}',
+                buyer_tenant_id=pharmacies[i % 3].id,
+                supplier_tenant_id=supplier.id,
+                logistics_tenant_id=other_logistics.id if i % 10 == 9 else logistics.id,
+                status=statuses[i % 4],
+                tracking_number=f'SF{i:06d}',
+                expected_delivery_date=date(2026, 3, 5),
+                created_by=user.id
+            )
+            order.items = [
+                OrderItem(drug_id=drug.id, unit_price=10, quantity=i + 1, batch_number=f'B{i:03d}')
+            ]
+            orders.append(order)
+        db.session.add_all(orders)
+        db.session.flush()
+        for i, order in enumerate(orders):
+            order.updated_at = BASE_TIME + timedelta(minutes=i // 3)
+        db.session.commit()
+
+        expected = [o for o in orders if o.logistics_tenant_id == logistics.id and o.status != 'COMPLETED']
+        expected.sort(key=lambda o: o.id, reverse=True)
+        return {'expected_ids': [o.id for o in expected]}
+
+    def _walk(self, client, headers, on_page=None):
+        ids, cursor = [], None
+        while True:
+            url = '/api/logistics/orders?limit=7' + (f'&cursor={cursor}' if cursor else '')
+            data = self.assert_success_response(client.get(url, headers=headers))
+            ids.extend(row['id'] for row in data['data'])
+            if on_page:
+                on_page(data)
+            if not data['has_more']:
+                return ids
+            cursor = data['next_cursor']
+
+    def test_cursor_pages_cover_every_order_once(self, client, feed_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        pages = []
+
+        def check_page(data):
+            pages.append(data)
+            if data['has_more']:
+                assert len(data['data']) == 7
+            else:
+                assert data['next_cursor'] is None
+
+        ids = self._walk(client, headers, check_page)
+        assert ids == feed_data['expected_ids']
+        assert len(pages) == -(-len(ids) // 7)
+
+    def test_orders_updated_while_paging_stay_in_place(self, client, feed_data):
+        """翻页期间订单状态变更（updated_at 变化）不会被漏掉或重复返回"""
+        headers = self.get_auth_headers(self.login_user(client))
+        expected = feed_data['expected_ids']
+
+        def update_orders(data):
+            if data['has_more']:
+                # 把尚未翻到的最旧一单和已经翻过的第一单都改为最新
+                for order_id in (expected[-1], expected[0]):
+                    order = db.session.get(Order, order_id)
+                    order.status = 'IN_TRANSIT' if order.status != 'IN_TRANSIT' else 'DELIVERED'
+                db.session.commit()
+
+        assert self._walk(client, headers, update_orders) == expected
+
+    def test_page_query_count_is_constant(self, client, feed_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        self.assert_success_response(client.get('/api/logistics/orders?limit=1', headers=headers))
+
+        with count_queries() as small:
+            self.assert_success_response(client.get('/api/logistics/orders?limit=3', headers=headers))
+        with count_queries() as large:
+            data = self.assert_success_response(client.get('/api/logistics/orders?limit=30', headers=headers))
+
+        assert len(small) == len(large)
+        row = data['data'][0]
+        assert row['order_no'] == 'FEED0044'
+        assert row['pharmacy_name'] == 'PHARMACY-PH2'
+        assert row['supplier_name'] == 'SUPPLIER-SP'
+        assert row['drug_name'] == '阿莫西林'
+        assert row['batch_number'] == 'B044'
+        assert row['quantity'] == 45
+        assert row['total_amount'] == '450.0'
+        assert row['logistics_company_name'] == 'LOGISTICS-LG'
+
+    def test_ndjson_stream(self, client, app, feed_data):
+        app.config['LOGISTICS_ORDERS_STREAM_BATCH'] = 4
+        headers = self.get_auth_headers(self.login_user(client))
+
+        response = client.get('/api/logistics/orders?format=ndjson&status=SHIPPED', headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert all(row['status'] == 'SHIPPED' for row in rows)
+        assert len(rows) == 12
+
+    def test_invalid_cursor(self, client, feed_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        response = client.get('/api/logistics/orders?cursor=not-a-cursor', headers=headers)
+        assert response.status_code == 400
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+    with pytest.raises(ValueError):
+        decode_cursor('e30')
@@ -0,0 +1,228 @@
+"""
+就近供应商推荐测试
+"""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from amap import AmapService
+from extensions import db
+from geo_index import SupplierSpatialIndex
+from models import Tenant, User, Drug, SupplyInfo
+from tests.base import BaseTestCase
+
+
+def _brute_force(points, longitude, latitude, limit, max_distance=None, candidate_ids=None):
+    results = []
+    for tenant_id, lon, lat in points:
+        if candidate_ids is not None and tenant_id not in candidate_ids:
+            continue
+        distance = AmapService.calculate_distance_haversine(longitude, latitude, lon, lat)
+        if max_distance is not None and distance > max_distance:
+            continue
+        results.append((distance, tenant_id))
+    results.sort()
+    return results[:limit]
+
+
+class TestSupplierSpatialIndex:
+    """测试供应商网格索引"""
+
+    @pytest.fixture
+    def points(self):
+        rng = random.Random(42)
+        # 上海市区范围内随机分布的供应商
+        return [
+            (i, 121.2 + rng.random() * 0.5, 31.0 + rng.random() * 0.4)
+            for i in range(1, 2001)
+        ]
+
+    def test_nearest_matches_brute_force(self, points):
+        """K 近邻结果与全量扫描一致"""
+        index = SupplierSpatialIndex()
+        index.rebuild(points)
+
+        for longitude, latitude in [(121.47, 31.23), (121.3, 31.05), (122.0, 31.8)]:
+            assert index.nearest(longitude, latitude, limit=10) == \
+                _brute_force(points, longitude, latitude, 10)
+
+    def test_nearest_with_radius_and_candidates(self, points):
+        """半径过滤与候选集合过滤"""
+        index = SupplierSpatialIndex()
+        index.rebuild(points)
+
+        candidates = {tid for tid, _, _ in points if tid % 3 == 0}
+        assert index.nearest(121.47, 31.23, limit=20, max_distance=3000, candidate_ids=candidates) == \
+            _brute_force(points, 121.47, 31.23, 20, 3000, candidates)
+
+        small = {5, 17, 999}
+        assert index.nearest(121.47, 31.23, limit=10, candidate_ids=small) == \
+            _brute_force(points, 121.47, 31.23, 10, None, small)
+
+    def test_upsert_and_remove(self):
+        """坐标更新与移除"""
+        index = SupplierSpatialIndex()
+        index.rebuild([(1, 121.47, 31.23), (2, 121.60, 31.30)])
+
+        assert index.nearest(121.47, 31.23, limit=1)[0][1] == 1
+
+        index.upsert(2, 121.4701, 31.2301)
+        index.remove(1)
+        assert len(index) == 1
+        assert index.nearest(121.47, 31.23, limit=5)[0][1] == 2
+        assert 1 not in index
+
+    def test_grid_bounds_follow_updates(self, points):
+        """网格范围随增删增量维护，与按全部网格重新计算的结果一致"""
+        index = SupplierSpatialIndex()
+        index.rebuild(points[:100])
+        rng = random.Random(7)
+        for tenant_id, longitude, latitude in points[100:400]:
+            index.upsert(tenant_id, longitude + rng.uniform(-0.5, 0.5), latitude)
+            if tenant_id % 3 == 0:
+                index.remove(rng.randint(1, tenant_id))
+            rows = [row for row, _ in index._cells]
+            cols = [col for _, col in index._cells]
+            assert index._grid_bounds() == (min(rows), max(rows), min(cols), max(cols))
+
+        current = [(tid, *index._points[tid]) for tid in index._points]
+        assert index.nearest(121.47, 31.23, limit=10) == _brute_force(current, 121.47, 31.23, 10)
+
+
+class TestNearbySuppliersAPI(BaseTestCase):
+    """测试就近供应商接口"""
+
+    @pytest.fixture
+    def nearby_data(self, app):
+        drug = Drug(
+            generic_name='阿莫西林',
+            brand_name='阿莫西林胶囊',
+            approval_number='H-NEARBY-001',
+            dosage_form='胶囊',
+            specification='250mg*24粒',
+            manufacturer='测试制药厂',
+            category='抗生素',
+            prescription_type='处方药'
+        )
+        db.session.add(drug)
+
+        pharmacy = Tenant(
+            name='测试药店',
+            type='PHARMACY',
+            unified_social_credit_code='NEARBY-PH-001',
+            legal_representative='负责人',
+            contact_person='联系人',
+            contact_phone='13800000000',
+            contact_email='pharmacy@nearby.test',
+            address='上海市黄浦区',
+            business_scope='药品零售',
+            longitude=121.47,
+            latitude=31.23
+        )
+        db.session.add(pharmacy)
+
+        suppliers = []
+        offsets = [0.01, 0.03, 0.05, 0.2]
+        for i, offset in enumerate(offsets, 1):
+            supplier = Tenant(
+                name=f'测试供应商{i}',
+                type='SUPPLIER',
+                unified_social_credit_code=f'NEARBY-SP-{i:03d}',
+                legal_representative='负责人',
+                contact_person='联系人',
+                contact_phone=f'1390000000{i}',
+                contact_email=f'supplier{i}@nearby.test',
+                address=f'上海市测试路{i}号',
+                business_scope='药品批发',
+                longitude=121.47 + offset,
+                latitude=31.23
+            )
+            suppliers.append(supplier)
+        db.session.add_all(suppliers)
+        db.session.flush()
+
+        for supplier in suppliers:
+            db.session.add(SupplyInfo(
+                tenant_id=supplier.id,
+                drug_id=drug.id,
+                available_quantity=100,
+                unit_price=12.5,
+                valid_until=date.today() + timedelta(days=90),
+                min_order_quantity=1,
+                status='ACTIVE'
+            ))
+
+        user = User(
+            username='testuser',
+            email='pharmacy-user@nearby.test',
+            role='pharmacy',
+            tenant_id=pharmacy.id,
+            is_authenticated=True
+        )
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+        return {'suppliers': suppliers, 'pharmacy': pharmacy}
+
+    def test_nearby_suppliers_sorted_by_distance(self, client, nearby_data):
+        """按距离返回最近的供应商"""
+        token = self.login_user(client)
+        headers = self.get_auth_headers(token)
+
+        response = client.post('/api/nearby/suppliers', headers=headers, json={
+            'drug_name': '阿莫西林',
+            'longitude': 121.47,
+            'latitude': 31.23,
+            'max_distance': 10000,
+            'limit': 2
+        })
+        data = self.assert_success_response(response)
+
+        expected_ids = [s.id for s in nearby_data['suppliers'][:2]]
+        assert [s['id'] for s in data['suppliers']] == expected_ids
+        assert data['total'] == 4
+        assert data['filtered'] == 2
+        assert data['suppliers'][0]['distance'] < data['suppliers'][1]['distance']
+        assert data['suppliers'][0]['inventory']['drug_info']['generic_name'] == '阿莫西林'
+
+    def test_supplier_location_update_refreshes_index(self, client, nearby_data):
+        """供应商更新位置后，就近推荐立即生效"""
+        far_supplier = nearby_data['suppliers'][-1]
+        supplier_user = User(
+            username='far_supplier',
+            email='far@nearby.test',
+            role='supplier',
+            tenant_id=far_supplier.id,
+            is_authenticated=True
+        )
+        supplier_user.set_password('password123')
+        db.session.add(supplier_user)
+        db.session.commit()
+
+        pharmacy_headers = self.get_auth_headers(self.login_user(client))
+        request_body = {
+            'drug_name': '阿莫西林',
+            'longitude': 121.47,
+            'latitude': 31.23,
+            'limit': 1
+        }
+
+        # 先查询一次，构建索引
+        response = client.post('/api/nearby/suppliers', headers=pharmacy_headers, json=request_body)
+        data = self.assert_success_response(response)
+        assert data['suppliers'][0]['id'] == nearby_data['suppliers'][0].id
+
+        supplier_headers = self.get_auth_headers(
+            self.login_user(client, username='far_supplier')
+        )
+        response = client.put('/api/nearby/update-location', headers=supplier_headers, json={
+            'longitude': 121.4701,
+            'latitude': 31.2301
+        })
+        self.assert_success_response(response)
+
+        response = client.post('/api/nearby/suppliers', headers=pharmacy_headers, json=request_body)
+        data = self.assert_success_response(response)
+        assert data['suppliers'][0]['id'] == far_supplier.id
@@ -0,0 +1,123 @@
+"""
+订单列表查询计划测试：每页 SQL 条数不随订单数增长
+"""
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+from models import Order, OrderItem, User
+from tests.base import BaseTestCase, make_drug, make_tenant
+
+
+@contextmanager
+def count_queries():
+    """统计代码块内执行的 SQL 条数"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+class TestOrderListing(BaseTestCase):
+    """测试 /api/orders 的预加载与字段投影"""
+
+    @pytest.fixture
+    def order_data(self, app):
+        pharmacy = make_tenant('PH', 'PHARMACY')
+        suppliers = [make_tenant(f'SP{i}', 'SUPPLIER') for i in range(3)]
+        logistics = make_tenant('LG', 'LOGISTICS')
+        drugs = [
+            make_drug(f'H-LIST-{i:03d}', f'药品{i}', '阿莫西林胶囊' if i == 0 else f'品牌{i}')
+            for i in range(4)
+        ]
+        db.session.add_all([pharmacy, logistics] + suppliers + drugs)
+        db.session.flush()
+
+        user = User(username='testuser', email='pharmacy@list.test', role='pharmacy',
+                    tenant_id=pharmacy.id)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+
+        orders = []
+        for i in range(30):
+            order = Order(
+                order_number=f'LIST{i:04d}',
+                buyer_tenant_id=pharmacy.id,
+                supplier_tenant_id=suppliers[i % 3].id,
+                logistics_tenant_id=logistics.id if i % 2 else None,
+                status='PENDING',
+                expected_delivery_date=date(2026, 3, 1),
+                created_by=user.id,
+                confirmed_by=user.id if i % 2 else None
+            )
+            # 每单三条明细，其中两条是阿莫西林（用于检查药品名筛选不产生重复订单）
+            order.items = [
+                OrderItem(drug_id=drugs[0].id, unit_price=10, quantity=i + 1),
+                OrderItem(drug_id=drugs[(i % 3) + 1].id, unit_price=2.5, quantity=4),
+                OrderItem(drug_id=drugs[0].id, unit_price=1, quantity=1),
+            ]
+            orders.append(order)
+        db.session.add_all(orders)
+        db.session.commit()
+        return {'orders': orders}
+
+    def _list(self, client, headers, query):
+        with count_queries() as statements:
+            data = self.assert_success_response(client.get(f'/api/orders?{query}', headers=headers))['data']
+        return data, len(statements)
+
+    def test_query_count_is_constant_per_page(self, client, order_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        # 先请求一次，使两次统计时当前用户的加载状态一致
+        self._list(client, headers, 'per_page=1')
+
+        small, small_count = self._list(client, headers, 'per_page=5')
+        large, large_count = self._list(client, headers, 'per_page=30')
+
+        assert len(small['items']) == 5
+        assert len(large['items']) == 30
+        assert small_count == large_count
+        assert large_count <= 4
+
+        oldest = large['items'][-1]
+        assert oldest['order_number'] == 'LIST0000'
+        assert oldest['total_amount'] == pytest.approx(10 * 1 + 2.5 * 4 + 1)
+        assert oldest['total_quantity'] == 1 + 4 + 1
+        assert oldest['buyer_tenant']['name'] == 'PHARMACY-PH'
+        assert oldest['created_by_user']['username'] == 'testuser'
+        assert len(oldest['items']) == 3
+        assert oldest['items'][0]['drug']['generic_name']
+
+    def test_fields_projection(self, client, order_data):
+        headers = self.get_auth_headers(self.login_user(client))
+
+        full, full_count = self._list(client, headers, 'per_page=30')
+        data, count = self._list(client, headers, 'per_page=30&fields=order_number,total_amount,total_quantity,supplier_tenant')
+
+        item = data['items'][0]
+        assert set(item) == {'id', 'order_number', 'total_amount', 'total_quantity', 'supplier_tenant'}
+        expected = {o['id']: (o['total_amount'], o['total_quantity']) for o in full['items']}
+        for order in data['items']:
+            assert (order['total_amount'], order['total_quantity']) == pytest.approx(expected[order['id']])
+        # 不加载明细时合计直接取订单合计列，省去明细查询
+        assert count < full_count
+
+    def test_drug_name_filter_has_no_duplicates(self, client, order_data):
+        headers = self.get_auth_headers(self.login_user(client))
+
+        data, _ = self._list(client, headers, 'per_page=100&drug_name=阿莫西林')
+
+        ids = [order['id'] for order in data['items']]
+        assert len(ids) == len(set(ids)) == 30
+        assert data['pagination']['total'] == 30
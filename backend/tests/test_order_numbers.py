@@ -0,0 +1,126 @@
+"""
+订单号分配测试：序列计数器、事务回滚与多进程并发
+"""
+import multiprocessing
+from datetime import date
+
+import pytest
+from flask import Flask
+
+from db_utils import retry_on_busy
+from extensions import db
+from models import Order, OrderNumberSequence, User
+from order_numbers import allocate_sequence, assign_order_numbers
+from tests.base import BaseTestCase, make_tenant
+
+ORDERS_PER_PROCESS = 150
+PROCESSES = 4
+
+
+def _seed_parties():
+    pharmacy, supplier = make_tenant('PH', 'PHARMACY'), make_tenant('SP', 'SUPPLIER')
+    db.session.add_all([pharmacy, supplier])
+    db.session.flush()
+    user = User(username='testuser', email='buyer@numbers.test', role='pharmacy', tenant_id=pharmacy.id)
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return pharmacy.id, supplier.id, user.id
+
+
+def _new_order(pharmacy_id, supplier_id, user_id, **kwargs):
+    return Order(buyer_tenant_id=pharmacy_id, supplier_tenant_id=supplier_id, status='PENDING',
+                 created_by=user_id, **kwargs)
+
+
+def _file_app(path):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}', TESTING=True)
+    db.init_app(app)
+    return app
+
+
+def _create_orders(db_path, parties, count):
+    """子进程：逐单提交 count 笔订单"""
+    app = _file_app(db_path)
+    with app.app_context():
+        for _ in range(count):
+            def work():
+                db.session.add(_new_order(*parties))
+                db.session.commit()
+            retry_on_busy(work, attempts=50, delay=0.005)
+        db.session.remove()
+
+
+class TestOrderNumbers(BaseTestCase):
+    """测试订单号按 (前缀, 日期) 序列分配"""
+
+    @pytest.fixture
+    def parties(self, app):
+        return _seed_parties()
+
+    def test_sequential_numbers_per_prefix(self, app, parties):
+        pharmacy_id, supplier_id, user_id = parties
+        day = date.today().strftime('%Y%m%d')
+        orders = [_new_order(*parties) for _ in range(3)]
+        db.session.add_all(orders)
+        db.session.commit()
+        assert [o.order_number for o in orders] == [f'PH{day}00000{i}' for i in (1, 2, 3)]
+
+        # 买方是供应商时使用 SP 前缀，独立计数
+        reverse = _new_order(supplier_id, pharmacy_id, user_id)
+        explicit = _new_order(*parties, order_number='MANUAL-1')
+        db.session.add_all([reverse, explicit])
+        db.session.commit()
+        assert reverse.order_number == f'SP{day}000001'
+        assert explicit.order_number == 'MANUAL-1'
+
+        sequence = db.session.get(OrderNumberSequence, ('PH', day))
+        assert sequence.last_value == 3
+
+    def test_rollback_releases_numbers(self, app, parties):
+        db.session.add(_new_order(*parties))
+        db.session.flush()
+        db.session.rollback()
+
+        order = _new_order(*parties)
+        db.session.add(order)
+        db.session.commit()
+        assert order.order_number.endswith('000001')
+
+    def test_large_sequences(self, app, parties):
+        assert allocate_sequence('PH', '20260320', 999_999) == 1
+        orders = [_new_order(*parties) for _ in range(2)]
+        assert assign_order_numbers(orders, today=date(2026, 3, 20)) == 2
+        assert [o.order_number for o in orders] == ['PH202603201000000', 'PH202603201000001']
+
+
+def test_concurrent_processes_never_collide(tmp_path):
+    # 多个进程各自连接同一个文件数据库，模拟多个 gunicorn worker 同时下单
+    db_path = tmp_path / 'numbers.db'
+    app = _file_app(db_path)
+    with app.app_context():
+        db.create_all()
+        parties = _seed_parties()
+        db.session.remove()
+        db.engine.dispose()
+
+    context = multiprocessing.get_context('spawn')
+    workers = [
+        context.Process(target=_create_orders, args=(str(db_path), parties, ORDERS_PER_PROCESS))
+        for _ in range(PROCESSES)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+        assert worker.exitcode == 0
+
+    with app.app_context():
+        numbers = [number for number, in db.session.query(Order.order_number)]
+        assert len(numbers) == PROCESSES * ORDERS_PER_PROCESS
+        assert len(set(numbers)) == len(numbers)
+        day = date.today().strftime('%Y%m%d')
+        assert db.session.get(OrderNumberSequence, ('PH', day)).last_value == len(numbers)
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,177 @@
+"""
+订单统计聚合与缓存测试
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from cache_generations import bump_generations, current_generations
+from extensions import db
+from models import Order, User
+from order_stats import aggregate_order_stats, get_stats_cache
+from tests.base import BaseTestCase, make_tenant
+from tests.test_order_listing import count_queries
+
+STATUSES = ['PENDING', 'PENDING', 'CONFIRMED', 'SHIPPED', 'IN_TRANSIT', 'DELIVERED',
+            'COMPLETED', 'CANCELLED_BY_PHARMACY', 'EXPIRED_CANCELLED']
+
+
+class TestOrderStats(BaseTestCase):
+    """测试 /api/orders/stats 与主页统计"""
+
+    @pytest.fixture
+    def stats_data(self, app):
+        pharmacy = make_tenant('PH', 'PHARMACY')
+        other = make_tenant('PH2', 'PHARMACY')
+        supplier = make_tenant('SP', 'SUPPLIER')
+        db.session.add_all([pharmacy, other, supplier])
+        db.session.flush()
+
+        user = User(username='testuser', email='pharmacy@stats.test', role='pharmacy',
+                    tenant_id=pharmacy.id)
+        user.set_password('password123')
+        supplier_user = User(username='supplieruser', email='supplier@stats.test', role='supplier',
+                             tenant_id=supplier.id)
+        supplier_user.set_password('password123')
+        db.session.add_all([user, supplier_user])
+        db.session.flush()
+
+        orders = []
+        for i, status in enumerate(STATUSES + ['PENDING']):
+            orders.append(Order(
+                order_number=f'STATS{i:04d}',
+                buyer_tenant_id=pharmacy.id if i < len(STATUSES) else other.id,
+                supplier_tenant_id=supplier.id,
+                status=status,
+                expected_delivery_date=date(2026, 3, 1),
+                created_by=user.id
+            ))
+        # 一笔上个月以前的订单，不计入本月
+        orders[-2].created_at = datetime.now().replace(day=1) - timedelta(days=40)
+        db.session.add_all(orders)
+        db.session.commit()
+        return {'orders': orders, 'pharmacy': pharmacy}
+
+    def test_aggregate_matches_per_status_counts(self, app, stats_data):
+        pharmacy_id = stats_data['pharmacy'].id
+        with count_queries() as statements:
+            stats = aggregate_order_stats(Order.buyer_tenant_id == pharmacy_id)
+
+        assert len(statements) == 1
+        assert stats['total'] == len(STATUSES)
+        assert stats['pending'] == 2
+        assert stats['cancelled'] == 2
+        assert stats['completed'] == 1
+        for status in set(STATUSES):
+            assert stats['by_status'][status] == Order.query.filter_by(
+                buyer_tenant_id=pharmacy_id, status=status).count()
+        assert stats['this_month'] == len(STATUSES) - 1
+
+    def test_stats_endpoint_is_cached_and_invalidated(self, client, stats_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        get_stats_cache().clear()
+
+        first = self.assert_success_response(client.get('/api/orders/stats', headers=headers))['data']
+        assert first['total'] == len(STATUSES)
+        assert first['pending'] == 2
+        assert first['this_month'] == len(STATUSES) - 1
+        assert get_stats_cache().stats()['misses'] == 1
+
+        self.assert_success_response(client.get('/api/orders/stats', headers=headers))
+        assert get_stats_cache().stats()['hits'] == 1
+
+        # 状态变更提交后缓存失效，并在同一事务内递增共享的缓存版本号
+        generation = current_generations(['order_stats'])['order_stats']
+        order = db.session.get(Order, stats_data['orders'][0].id)
+        order.status = 'CONFIRMED'
+        db.session.commit()
+        assert current_generations(['order_stats'])['order_stats'] == generation + 1
+
+        updated = self.assert_success_response(client.get('/api/orders/stats', headers=headers))['data']
+        assert updated['pending'] == 1
+        assert updated['confirmed'] == 2
+
+    def test_rollback_keeps_cache(self, app, stats_data):
+        from order_stats import get_order_stats
+
+        cache = get_stats_cache()
+        cache.clear()
+        get_order_stats('buyer', stats_data['pharmacy'].id)
+        generation = current_generations(['order_stats'])['order_stats']
+
+        order = db.session.get(Order, stats_data['orders'][0].id)
+        order.status = 'CONFIRMED'
+        db.session.flush()
+        db.session.rollback()
+
+        assert cache.stats()['entries'] == 1
+        assert get_order_stats('buyer', stats_data['pharmacy'].id)['pending'] == 2
+        assert current_generations(['order_stats'])['order_stats'] == generation
+
+    def test_generation_bumped_once_per_transaction(self, app, stats_data):
+        """一个事务内多次 flush 订单变更，提交时只递增一次版本号"""
+        generation = current_generations(['order_stats'])['order_stats']
+        first, second = (db.session.get(Order, order.id) for order in stats_data['orders'][:2])
+        with count_queries() as statements:
+            first.status = 'CONFIRMED'
+            db.session.flush()
+            second.status = 'CONFIRMED'
+            db.session.flush()
+            first.status = 'SHIPPED'
+            db.session.commit()
+        assert len([s for s in statements if 'cache_generations' in s]) == 1
+        assert current_generations(['order_stats'])['order_stats'] == generation + 1
+
+        # 回滚到保存点不丢弃外层事务已记下的版本号
+        first.status = 'IN_TRANSIT'
+        db.session.flush()
+        savepoint = db.session.begin_nested()
+        second.status = 'SHIPPED'
+        db.session.flush()
+        savepoint.rollback()
+        db.session.commit()
+        assert current_generations(['order_stats'])['order_stats'] == generation + 2
+
+    def test_home_stats(self, client, stats_data):
+        get_stats_cache().clear()
+        data = self.assert_success_response(client.get('/api/home/stats'))['data']
+        assert data['total_orders'] == len(STATUSES) + 1
+        assert data['month_orders'] == len(STATUSES)
+
+        headers = self.get_auth_headers(self.login_user(client, username='supplieruser'))
+        data = self.assert_success_response(client.get('/api/home/user-stats', headers=headers))['data']
+        assert data['my_orders'] == len(STATUSES) + 1
+        assert data['pending_orders'] == 3
+
+        # 新订单提交后全平台统计随之更新
+        db.session.add(Order(
+            order_number='STATS9999',
+            buyer_tenant_id=stats_data['pharmacy'].id,
+            supplier_tenant_id=stats_data['orders'][0].supplier_tenant_id,
+            status='PENDING',
+            expected_delivery_date=date(2026, 3, 1),
+            created_by=stats_data['orders'][0].created_by
+        ))
+        db.session.commit()
+        data = self.assert_success_response(client.get('/api/home/stats'))['data']
+        assert data['total_orders'] == len(STATUSES) + 2
+        assert data['today_orders'] >= 1
+
+    def test_other_process_commit_invalidates_cache(self, app, stats_data):
+        """其他进程提交的变更（本进程收不到会话事件）通过缓存版本号失效"""
+        from order_stats import GENERATION_NAME, get_order_stats
+
+        pharmacy_id = stats_data['pharmacy'].id
+        get_stats_cache().clear()
+        assert get_order_stats('buyer', pharmacy_id)['pending'] == 2
+
+        # 模拟另一个 worker：绕过本进程的 ORM 事件修改订单
+        db.session.execute(update(Order).where(Order.id == stats_data['orders'][0].id).values(status='CONFIRMED'))
+        db.session.commit()
+        assert get_order_stats('buyer', pharmacy_id)['pending'] == 2
+
+        bump_generations(db.session, [GENERATION_NAME])
+        db.session.commit()
+        assert get_order_stats('buyer', pharmacy_id)['pending'] == 1
+        assert current_generations([GENERATION_NAME])[GENERATION_NAME] >= 1
@@ -0,0 +1,129 @@
+"""
+订单合计列同步与校验测试
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from extensions import db
+import models
+from models import Order, OrderItem, SupplyInfo, User
+from order_utils import find_stale_order_totals, write_order_totals
+from tests.base import BaseTestCase, make_drug, make_tenant
+
+
+def test_totals_listener_registered_with_models():
+    """只导入模型的脚本也会同步订单合计"""
+    assert event.contains(db.session, 'after_flush', models.sync_order_totals)
+
+
+class TestOrderTotals(BaseTestCase):
+    """测试明细写入后订单合计列的同步、金额排序筛选与一致性校验"""
+
+    @pytest.fixture
+    def totals_data(self, app):
+        pharmacy, supplier = make_tenant('PH', 'PHARMACY'), make_tenant('SP', 'SUPPLIER')
+        drugs = [
+            make_drug(f'H-TOTAL-{i:03d}', f'药品{i}', f'品牌{i}')
+            for i in range(2)
+        ]
+        db.session.add_all([pharmacy, supplier] + drugs)
+        db.session.flush()
+
+        user = User(username='testuser', email='pharmacy@totals.test', role='pharmacy', tenant_id=pharmacy.id)
+        user.set_password('password123')
+        supply = SupplyInfo(tenant_id=supplier.id, drug_id=drugs[0].id, available_quantity=500,
+                            unit_price=12.35, valid_until=date(2027, 1, 1), min_order_quantity=1)
+        db.session.add_all([user, supply])
+        db.session.flush()
+
+        orders = []
+        for i in range(5):
+            order = Order(order_number=f'TOTAL{i:04d}', buyer_tenant_id=pharmacy.id,
+                          supplier_tenant_id=supplier.id, status='PENDING', created_by=user.id)
+            order.items = [OrderItem(drug_id=drugs[0].id, unit_price=10 * (i + 1), quantity=2),
+                           OrderItem(drug_id=drugs[1].id, unit_price=0.5, quantity=i + 1)]
+            orders.append(order)
+        db.session.add_all(orders)
+        db.session.commit()
+        return {'orders': orders, 'drugs': drugs, 'supply': supply}
+
+    @staticmethod
+    def _totals(order):
+        return order.total_amount, order.total_quantity, order.item_count
+
+    def test_new_orders_have_totals(self, app, totals_data):
+        order = totals_data['orders'][2]
+        assert self._totals(order) == (Decimal('61.50'), 5, 2)
+        assert find_stale_order_totals([o.id for o in Order.query]) == {}
+
+    def test_item_mutations_update_totals(self, app, totals_data):
+        order, drugs = totals_data['orders'][0], totals_data['drugs']
+
+        order.items[0].quantity = 5
+        db.session.commit()
+        assert self._totals(order) == (Decimal('50.50'), 6, 2)
+
+        # 只设置 order_id 的明细也会计入
+        db.session.add(OrderItem(order_id=order.id, drug_id=drugs[1].id, unit_price=1.25, quantity=4))
+        db.session.commit()
+        db.session.expire_all()
+        assert self._totals(db.session.get(Order, order.id)) == (Decimal('55.50'), 10, 3)
+
+        order = db.session.get(Order, order.id)
+        order.items.remove(order.items[0])
+        db.session.delete(order.items[-1])
+        db.session.commit()
+        assert self._totals(order) == (Decimal('0.50'), 1, 1)
+
+        # 明细改挂到其他订单，两个订单都要刷新
+        other = totals_data['orders'][1]
+        order.items[0].order_id = other.id
+        db.session.commit()
+        db.session.expire_all()
+        assert self._totals(db.session.get(Order, order.id)) == (Decimal('0.00'), 0, 0)
+        assert find_stale_order_totals([o.id for o in Order.query]) == {}
+
+    def test_create_order_endpoint(self, client, totals_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        response = client.post('/api/orders', headers=headers, json={
+            'supply_info_id': totals_data['supply'].id,
+            'quantity': 3,
+            'expected_delivery_date': '2026-12-01'
+        })
+        assert response.status_code == 201, response.get_json()
+        data = response.get_json()['data']
+        assert data['total_amount'] == pytest.approx(37.05)
+        assert data['total_quantity'] == 3
+        assert data['item_count'] == 1
+
+    def test_sort_and_filter_by_amount(self, client, totals_data):
+        headers = self.get_auth_headers(self.login_user(client))
+        data = self.assert_success_response(client.get(
+            '/api/orders?sort=amount_desc&min_amount=50&fields=order_number,total_amount', headers=headers
+        ))['data']
+        amounts = [item['total_amount'] for item in data['items']]
+        assert amounts == sorted(amounts, reverse=True)
+        assert [item['order_number'] for item in data['items']] == ['TOTAL0004', 'TOTAL0003', 'TOTAL0002']
+
+        data = self.assert_success_response(client.get(
+            '/api/orders?sort=amount_asc&max_amount=41&fields=order_number', headers=headers
+        ))['data']
+        assert [item['order_number'] for item in data['items']] == ['TOTAL0000', 'TOTAL0001']
+
+    def test_checker_repairs_direct_writes(self, app, totals_data):
+        orders = totals_data['orders']
+        # 绕过会话的批量改动不会触发同步
+        OrderItem.query.filter(OrderItem.unit_price == 0.5).update({OrderItem.quantity: 10})
+        db.session.commit()
+
+        stale = find_stale_order_totals([order.id for order in orders])
+        assert set(stale) == {order.id for order in orders}
+        assert stale[orders[0].id] == (Decimal('25.00'), 12, 2)
+
+        write_order_totals(stale)
+        db.session.commit()
+        assert self._totals(orders[0]) == (Decimal('25.00'), 12, 2)
+        assert find_stale_order_totals([order.id for order in orders]) == {}
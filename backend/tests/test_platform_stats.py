@@ -0,0 +1,129 @@
+"""
+平台统计快照测试
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import EnterpriseCertification, InventoryItem, Order, SupplyInfo, User
+from platform_stats import PlatformStatsService, compute_platform_stats, get_platform_stats_service
+from tests.base import BaseTestCase, make_drug, make_tenant
+from tests.test_order_listing import count_queries
+
+
+class TestPlatformStats(BaseTestCase):
+    """测试平台统计的聚合结果、查询数与快照复用"""
+
+    @pytest.fixture
+    def platform_data(self, app):
+        pharmacy, other, supplier = make_tenant('PH', 'PHARMACY'), make_tenant('PH2', 'PHARMACY'), make_tenant('SP', 'SUPPLIER')
+        drug = make_drug('H-PLAT-001')
+        db.session.add_all([pharmacy, other, supplier, drug])
+        db.session.flush()
+
+        users = [
+            User(username='regulator', email='regulator@platform.test', role='regulator'),
+            User(username='admin', email='admin@platform.test', role='admin'),
+            User(username='testuser', email='pharmacy@platform.test', role='pharmacy',
+                 tenant_id=pharmacy.id, is_authenticated=True),
+            User(username='disabled', email='disabled@platform.test', role='pharmacy',
+                 tenant_id=other.id, is_active=False),
+        ]
+        users[-1].created_at = datetime.utcnow() - timedelta(days=30)
+        for user in users:
+            user.set_password('password123')
+        db.session.add_all(users)
+        db.session.flush()
+
+        for i, status in enumerate(['PENDING', 'PENDING', 'SHIPPED', 'COMPLETED']):
+            order = Order(order_number=f'PLAT{i:04d}', buyer_tenant_id=pharmacy.id,
+                          supplier_tenant_id=supplier.id, status=status, created_by=users[2].id)
+            if i == 3:
+                order.created_at = datetime.now() - timedelta(days=3)
+            db.session.add(order)
+
+        for quantity, status in [(5, 'ACTIVE'), (50, 'ACTIVE'), (3, 'INACTIVE'), (80, 'EXPIRED')]:
+            db.session.add(SupplyInfo(tenant_id=supplier.id, drug_id=drug.id, available_quantity=quantity,
+                                      unit_price=12.5, valid_until=date(2027, 1, 1), status=status))
+
+        today = datetime.utcnow().date()
+        for i, (quantity, days) in enumerate([(0, -3), (4, 10), (20, 200), (60, 31), (8, 400)]):
+            db.session.add(InventoryItem(tenant_id=pharmacy.id, drug_id=drug.id, batch_number=f'PLAT{i}',
+                                         production_date=today - timedelta(days=300),
+                                         expiry_date=today + timedelta(days=days),
+                                         quantity=quantity, unit_price=5.0))
+
+        for user, status in zip(users[1:], ['pending', 'approved', 'rejected']):
+            db.session.add(EnterpriseCertification(
+                user_id=user.id, role='pharmacy', company_name=f'认证企业{user.id}',
+                unified_social_credit_code=f'CERT-{user.id}', contact_person='联系人',
+                contact_phone='13800000000', contact_email=user.email,
+                registered_address='上海市', business_scope='测试', status=status))
+        db.session.commit()
+        return {'users': users, 'pharmacy': pharmacy, 'supplier': supplier}
+
+    def test_compute_matches_individual_counts(self, app, platform_data):
+        with count_queries() as queries:
+            stats = compute_platform_stats()
+        assert len(queries) == 6
+
+        assert stats['tenants'] == {'total': 3, 'by_type': {'PHARMACY': 2, 'SUPPLIER': 1}}
+        assert stats['orders']['total'] == 4
+        assert stats['orders']['today'] == 3
+        assert stats['orders']['by_status'] == {'PENDING': 2, 'SHIPPED': 1, 'COMPLETED': 1}
+        assert stats['supply'] == {'total': 4, 'active': 2, 'inactive': 2, 'active_low_stock': 1}
+        assert stats['users'] == {'total': 4, 'active': 3, 'disabled': 1, 'authenticated': 1,
+                                  'new_last_7_days': 3}
+        assert stats['certifications'] == {'pending': 1, 'approved': 1, 'rejected': 1}
+        assert stats['inventory'] == {'total_items': 5, 'low_stock': 3, 'near_expiry': 2, 'expired': 1}
+        assert stats['as_of']
+
+    def test_regulator_dashboard_reads_snapshot(self, client, platform_data):
+        headers = self.get_auth_headers(self.login_user(client, username='regulator'))
+        first = client.get('/api/regulator/statistics/dashboard', headers=headers)
+        assert first.status_code == 200, first.get_json()
+        data = first.get_json()
+        assert data['enterprises']['total'] == 3
+        assert data['orders']['today'] == 3
+        assert data['inventory'] == {'total_records': 4, 'active_supply': 2, 'low_stock_alerts': 1}
+        assert data['users'] == {'total': 4, 'active': 3, 'authenticated': 1}
+
+        # 快照未过期时不再统计，新订单在下次刷新后才计入
+        db.session.add(Order(order_number='PLAT-NEW', buyer_tenant_id=platform_data['pharmacy'].id,
+                             supplier_tenant_id=platform_data['supplier'].id, status='PENDING',
+                             created_by=platform_data['users'][2].id))
+        db.session.commit()
+        with count_queries() as queries:
+            second = client.get('/api/regulator/statistics/dashboard', headers=headers).get_json()
+        assert not any('count(' in sql.lower() for sql in queries)
+        assert second == data
+
+        service = get_platform_stats_service()
+        assert service.refreshes == 1
+        service.refresh()
+        third = client.get('/api/regulator/statistics/dashboard', headers=headers).get_json()
+        assert third['orders']['total'] == 5
+        assert third['as_of'] >= data['as_of']
+
+    def test_admin_system_status_reads_snapshot(self, client, platform_data):
+        headers = self.get_auth_headers(self.login_user(client, username='admin'))
+        response = client.get('/api/admin/system/status', headers=headers)
+        assert response.status_code == 200, response.get_json()
+        data = response.get_json()
+        assert data['as_of'] and data['generated_at']
+        assert data['users'] == {'total': 4, 'active': 3, 'disabled': 1, 'new_last_7_days': 3}
+        assert data['orders'] == {'total': 4, 'by_status': {'PENDING': 2, 'SHIPPED': 1, 'COMPLETED': 1}}
+        assert data['supply'] == {'active_supplies': 2, 'inactive_supplies': 2}
+        assert data['inventory']['expired'] == 1
+        assert 'geocode_cache' in data
+
+    def test_stale_snapshot_refreshes_inline(self, app, platform_data):
+        service = PlatformStatsService(app, interval=0)
+        first = service.get()
+        assert service.get() is not first
+        assert service.refreshes == 2
+
+        service.interval = 3600
+        assert service.get() is service.get()
+        assert service.refreshes == 2
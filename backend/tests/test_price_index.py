@@ -0,0 +1,115 @@
+"""
+价格索引测试：多药品归并排序、价格区间、分页、有效期与增量更新
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from extensions import db
+from models import SupplyInfo
+from price_index import DrugPriceIndex, get_price_index
+from supply_utils import update_supply_info_quantity
+from tests.base import BaseTestCase, make_drug, make_tenant
+from tests.test_order_listing import count_queries
+
+TOMORROW = date.today() + timedelta(days=1)
+
+
+def _prices(items):
+    return [item['unit_price'] for item in items]
+
+
+class TestPriceIndex(BaseTestCase):
+    """测试价格索引与价格对比接口"""
+
+    @pytest.fixture
+    def data(self, app):
+        a, b = make_tenant('A'), make_tenant('B')
+        capsule = make_drug('H-PRICE-1', '阿莫西林胶囊', '阿莫西林胶囊')
+        tablet = make_drug('H-PRICE-2', '阿莫西林片', '阿莫西林片')
+        db.session.add_all([a, b, capsule, tablet])
+        db.session.flush()
+
+        def supply(tenant, drug, price, quantity=10, status='ACTIVE', valid_until=date(2099, 1, 1)):
+            return SupplyInfo(tenant_id=tenant.id, drug_id=drug.id, unit_price=price, available_quantity=quantity,
+                              status=status, valid_until=valid_until, min_order_quantity=1)
+
+        supplies = {
+            'capsule_a': supply(a, capsule, 12.0),
+            'capsule_b': supply(b, capsule, 9.5),
+            'tablet_a': supply(a, tablet, 11.0, valid_until=TOMORROW),
+            'tablet_b': supply(b, tablet, 15.0),
+            'sold_out': supply(a, tablet, 1.0, quantity=0),
+            'inactive': supply(b, tablet, 2.0, status='INACTIVE'),
+            'expired': supply(b, capsule, 3.0, valid_until=date.today()),
+        }
+        db.session.add_all(supplies.values())
+        db.session.commit()
+        return {'tenants': (a, b), 'drugs': (capsule, tablet), 'supplies': supplies}
+
+    def test_query(self, app, data):
+        capsule, tablet = data['drugs']
+        index = DrugPriceIndex()
+        index.rebuild()
+        assert len(index) == 4
+        drug_ids = [capsule.id, tablet.id]
+
+        items, total = index.query(drug_ids)
+        assert (_prices(items), total) == ([9.5, 11.0, 12.0, 15.0], 4)
+        assert items[0]['supplier_name'] == 'SUPPLIER-B' and items[0]['drug_name'] == '阿莫西林胶囊'
+        items, _ = index.query(drug_ids, sort='price_desc', limit=3)
+        assert _prices(items) == [15.0, 12.0, 11.0]
+        items, total = index.query(drug_ids, min_price=10, max_price=12)
+        assert (_prices(items), total) == ([11.0, 12.0], 2)
+        items, total = index.query(drug_ids, offset=3, limit=2)
+        assert (_prices(items), total) == ([15.0], 4)
+        assert index.query([tablet.id])[1] == 2
+
+        # 有效期到了的报价被剔除
+        assert index.expire(TOMORROW) == 1
+        assert _prices(index.query(drug_ids)[0]) == [9.5, 12.0, 15.0]
+
+    def test_incremental_updates(self, app, data):
+        index = get_price_index()
+        loaded_at = index.loaded_at
+        capsule, tablet = data['drugs']
+        a, b = data['tenants']
+        supplies = data['supplies']
+
+        supplies['capsule_a'].unit_price = 8.0
+        supplies['inactive'].status = 'ACTIVE'
+        db.session.delete(supplies['tablet_b'])
+        a.name = '供应商-A（新）'
+        db.session.commit()
+        items, _ = index.query([capsule.id, tablet.id])
+        assert _prices(items) == [2.0, 8.0, 9.5, 11.0]
+        assert items[1]['supplier_name'] == '供应商-A（新）'
+
+        # 下单占完库存（Core UPDATE）自动下架；回滚的变更不生效
+        update_supply_info_quantity(b.id, capsule.id, -10, supply_info_id=supplies['capsule_b'].id)
+        db.session.commit()
+        supplies['tablet_a'].unit_price = 0.5
+        db.session.flush()
+        db.session.rollback()
+        assert _prices(index.query([capsule.id, tablet.id])[0]) == [2.0, 8.0, 11.0]
+
+        new_supply = SupplyInfo(tenant_id=b.id, drug_id=tablet.id, unit_price=7.0, available_quantity=5,
+                                valid_until=date(2099, 1, 1), min_order_quantity=1)
+        db.session.add(new_supply)
+        db.session.commit()
+        assert _prices(index.query([tablet.id])[0]) == [2.0, 7.0, 11.0]
+        assert index.loaded_at == loaded_at
+
+    def test_compare_endpoint(self, client, data):
+        response = client.get('/api/catalog/price/compare?drug_name=阿莫西林&per_page=3')
+        body = response.get_json()
+        assert (_prices(body['items']), body['total'], body['pages']) == ([9.5, 11.0, 12.0], 4, 2)
+
+        response = client.get('/api/catalog/price/compare?drug_name=阿莫西林&sort=price_desc&max_price=12')
+        assert _prices(response.get_json()['items']) == [12.0, 11.0, 9.5]
+
+        # 索引构建后只剩药品搜索一条查询
+        with count_queries() as queries:
+            response = client.get('/api/catalog/price/compare?drug_name=阿莫西林片&page=2&per_page=1')
+        assert _prices(response.get_json()['items']) == [15.0]
+        assert len(queries) == 1
@@ -0,0 +1,102 @@
+"""
+读写分离测试：只读接口走只读引擎、写入与之后的查询回到主库、读主库的请求头
+"""
+from flask import Flask, jsonify
+from sqlalchemy import event, update
+
+from db_utils import configure_database, install_database_hooks, read_from_primary, read_database_url, read_replica
+from extensions import READ_ENGINE_KEY, db
+from models import Drug
+from tests.base import make_drug
+
+
+def _routing_app(path):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}', SQLITE_READ_ONLY_ENGINE=True)
+    configure_database(app)
+    db.init_app(app)
+    install_database_hooks(app)
+    used = []
+
+    @app.route('/drugs')
+    @read_replica
+    def list_drugs():
+        count = Drug.query.count()
+        with read_from_primary():
+            primary_count = Drug.query.count()
+        return jsonify({'count': count, 'primary_count': primary_count})
+
+    @app.route('/drugs/<approval_number>', methods=['POST'])
+    @read_replica
+    def add_drug(approval_number):
+        before = Drug.query.count()
+        db.session.add(make_drug(approval_number))
+        db.session.commit()
+        return jsonify({'before': before, 'after': Drug.query.count()})
+
+    @app.route('/drugs/<approval_number>/rename', methods=['POST'])
+    @read_replica
+    def rename_drug(approval_number):
+        db.session.execute(update(Drug).where(Drug.approval_number == approval_number)
+                           .values(brand_name='新商品名'))
+        db.session.commit()
+        return jsonify({'brand_name': Drug.query.filter_by(approval_number=approval_number).one().brand_name})
+
+    with app.app_context():
+        db.create_all()
+        engines = {'primary': db.engine, 'read': app.extensions[READ_ENGINE_KEY]}
+        for key, engine in engines.items():
+            event.listen(engine, 'before_cursor_execute',
+                         lambda conn, cursor, statement, *args, key=key: used.append((key, statement.split()[0])))
+    return app, used
+
+
+def test_read_database_url():
+    assert read_database_url({'SQLALCHEMY_DATABASE_URI': 'sqlite:////data/app.db'}) is None
+    assert read_database_url({'SQLALCHEMY_DATABASE_URI': 'sqlite:////data/app.db', 'SQLITE_READ_ONLY_ENGINE': True}) \
+        == 'sqlite:///file:/data/app.db?mode=ro&uri=true'
+    assert read_database_url({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'SQLITE_READ_ONLY_ENGINE': True}) is None
+    assert read_database_url({'SQLALCHEMY_DATABASE_URI': 'postgresql://primary/drugs',
+                              'READ_DATABASE_URL': 'postgresql://replica/drugs'}) == 'postgresql://replica/drugs'
+
+
+def test_read_only_routes_use_read_engine(tmp_path):
+    app, used = _routing_app(tmp_path / 'routing.db')
+    client = app.test_client()
+
+    used.clear()
+    assert client.get('/drugs').get_json() == {'count': 0, 'primary_count': 0}
+    assert [key for key, _ in used] == ['read', 'primary']
+
+    # 写入走主库，写入之后本请求的查询也读主库
+    used.clear()
+    assert client.post('/drugs/H-ROUTE-1').get_json() == {'before': 0, 'after': 1}
+    assert used[0] == ('read', 'SELECT')
+    assert {key for key, _ in used[1:]} == {'primary'}
+
+    # 下一个请求重新读只读引擎；要求读主库时整个请求都在主库
+    used.clear()
+    assert client.get('/drugs').get_json()['count'] == 1
+    assert used[0][0] == 'read'
+    used.clear()
+    client.get('/drugs', headers={'X-Read-Consistency': 'primary'})
+    assert {key for key, _ in used} == {'primary'}
+
+    # 直接执行的 UPDATE 不经过 flush，也写主库，之后的查询读主库
+    used.clear()
+    assert client.post('/drugs/H-ROUTE-1/rename').get_json() == {'brand_name': '新商品名'}
+    assert used[0] == ('primary', 'UPDATE')
+    assert {key for key, _ in used} == {'primary'}
+
+    with app.app_context():
+        # 未标记为只读的代码都在主库
+        used.clear()
+        Drug.query.count()
+        assert {key for key, _ in used} == {'primary'}
+        db.session.remove()
+        db.engine.dispose()
+        app.extensions[READ_ENGINE_KEY].dispose()
+
+
+def test_testing_config_has_no_read_engine(app):
+    assert READ_ENGINE_KEY not in app.extensions
@@ -0,0 +1,93 @@
+"""
+监管订单概览测试：每页 SQL 条数不随每页订单数增长
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Order, OrderItem, User
+from tests.base import BaseTestCase, make_drug, make_tenant
+from tests.test_order_listing import count_queries
+
+
+class TestRegulatorOrdersOverview(BaseTestCase):
+    """测试 /api/regulator/orders/overview 的分组统计与日期趋势"""
+
+    @pytest.fixture
+    def overview_data(self, app):
+        pharmacies = [make_tenant(f'PH{i}', 'PHARMACY') for i in range(3)]
+        suppliers = [make_tenant(f'SP{i}', 'SUPPLIER') for i in range(3)]
+        drug = make_drug('H-OVW-001', '布洛芬', '芬必得')
+        db.session.add_all(pharmacies + suppliers + [drug])
+        db.session.flush()
+
+        regulator = User(username='regulator', email='regulator@overview.test', role='regulator')
+        regulator.set_password('password123')
+        db.session.add(regulator)
+        db.session.flush()
+
+        now = datetime.now()
+        for i in range(60):
+            order = Order(
+                order_number=f'OVW{i:04d}',
+                buyer_tenant_id=pharmacies[i % 3].id,
+                supplier_tenant_id=suppliers[i % 3].id,
+                status='PENDING' if i % 2 else 'COMPLETED',
+                created_by=regulator.id,
+                created_at=now - timedelta(days=i % 10, seconds=i)
+            )
+            # 最后几笔订单没有明细
+            if i < 55:
+                order.items = [
+                    OrderItem(drug_id=drug.id, unit_price=2.5 + j, quantity=i + j + 1)
+                    for j in range(i % 3 + 1)
+                ]
+            db.session.add(order)
+        db.session.commit()
+
+    def _overview(self, client, **params):
+        headers = self.get_auth_headers(self.login_user(client, username='regulator'))
+        response = client.get('/api/regulator/orders/overview', headers=headers, query_string=params)
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()
+
+    def test_totals_match_items(self, client, overview_data):
+        data = self._overview(client, per_page=60)
+        assert data['total'] == 60
+        for row in data['orders']:
+            items = OrderItem.query.filter_by(order_id=row['id']).all()
+            assert row['total_amount'] == pytest.approx(sum(float(i.unit_price) * i.quantity for i in items))
+            assert row['total_quantity'] == sum(i.quantity for i in items)
+            assert row['items_count'] == len(items)
+            order = db.session.get(Order, row['id'])
+            assert row['buyer']['name'] == order.buyer_tenant.name
+            assert row['supplier']['id'] == order.supplier_tenant_id
+
+    def test_query_count_independent_of_page_size(self, client, overview_data):
+        headers = self.get_auth_headers(self.login_user(client, username='regulator'))
+        counts = {}
+        for per_page in (5, 20, 60):
+            with count_queries() as queries:
+                response = client.get('/api/regulator/orders/overview', headers=headers,
+                                      query_string={'per_page': per_page})
+            assert response.status_code == 200
+            assert len(response.get_json()['orders']) == per_page
+            counts[per_page] = len(queries)
+        assert len(set(counts.values())) == 1, counts
+        assert not any('FROM order_items' in sql and 'GROUP BY' not in sql for sql in queries)
+
+    def test_daily_trend_buckets(self, client, overview_data):
+        data = self._overview(client, trend_days=14)
+        trend = data['statistics']['daily_trend']
+        today = datetime.now().date()
+        assert [row['date'] for row in trend] == [
+            str(today - timedelta(days=offset)) for offset in range(13, -1, -1)
+        ]
+        # 订单分布在最近 10 天
+        assert sum(row['count'] for row in trend) == 60
+        assert all(row['count'] == 0 for row in trend[:4])
+
+        data = self._overview(client)
+        assert len(data['statistics']['daily_trend']) == 7
+        assert data['statistics']['status_distribution'] == {'PENDING': 30, 'COMPLETED': 30}
@@ -0,0 +1,116 @@
+"""
+配送路径优化算法测试
+"""
+import itertools
+import random
+
+import pytest
+
+import route_optimizer
+from extensions import db
+from geo_distance import haversine_matrix
+from models import User
+from tests.base import BaseTestCase
+
+BACKENDS = [False] + ([True] if route_optimizer.HAS_NUMPY else [])
+
+
+def _random_matrix(rng, n, symmetric=True):
+    matrix = [[0.0 if i == j else float(rng.randint(1, 100)) for j in range(n)] for i in range(n)]
+    if symmetric:
+        for i in range(n):
+            for j in range(i):
+                matrix[i][j] = matrix[j][i]
+    return matrix
+
+
+def _brute_force(matrix):
+    return min(route_optimizer.tour_length(matrix, order)
+               for order in itertools.permutations(range(1, len(matrix))))
+
+
+@pytest.fixture
+def city_matrix():
+    rng = random.Random(3)
+    points = [(121.2 + rng.random() * 0.5, 31.0 + rng.random() * 0.4) for _ in range(81)]
+    return haversine_matrix(points)
+
+
+@pytest.mark.parametrize('use_numpy', BACKENDS)
+class TestRouteOptimizer:
+    """测试精确解与局部搜索"""
+
+    @pytest.mark.parametrize('symmetric', [True, False])
+    def test_held_karp_is_optimal(self, use_numpy, symmetric):
+        rng = random.Random(11)
+        for n in range(2, 9):
+            matrix = _random_matrix(rng, n, symmetric)
+            order = route_optimizer.held_karp(matrix, use_numpy=use_numpy)
+            assert sorted(order) == list(range(1, n))
+            assert route_optimizer.tour_length(matrix, order) == pytest.approx(_brute_force(matrix))
+
+    @pytest.mark.parametrize('symmetric', [True, False])
+    def test_local_search_improves_greedy(self, use_numpy, symmetric):
+        rng = random.Random(5)
+        for n in range(3, 9):
+            matrix = _random_matrix(rng, n, symmetric)
+            order, _ = route_optimizer.local_search(matrix, time_budget=1.0, use_numpy=use_numpy)
+            greedy = route_optimizer.nearest_neighbor(matrix)
+            assert sorted(order) == list(range(1, n))
+            assert route_optimizer.tour_length(matrix, order) <= \
+                route_optimizer.tour_length(matrix, greedy) + 1e-9
+
+    def test_solve_reports_length_and_iterations(self, use_numpy, city_matrix):
+        greedy = route_optimizer.solve(city_matrix, 'greedy', use_numpy=use_numpy)
+        improved = route_optimizer.solve(city_matrix, 'local_search', time_budget=5, use_numpy=use_numpy)
+
+        assert sorted(improved['order']) == list(range(1, len(city_matrix)))
+        assert improved['iterations'] > 0
+        assert improved['length'] < greedy['length']
+        assert improved['length'] == pytest.approx(
+            route_optimizer.tour_length(city_matrix, improved['order']), abs=0.01)
+
+    def test_zero_time_budget_returns_greedy(self, use_numpy, city_matrix):
+        result = route_optimizer.solve(city_matrix, 'local_search', time_budget=0, use_numpy=use_numpy)
+        assert result['iterations'] == 0
+        assert result['order'] == route_optimizer.nearest_neighbor(city_matrix)
+
+
+def test_dp_falls_back_to_local_search_for_large_inputs(city_matrix):
+    result = route_optimizer.solve(city_matrix, 'dp', time_budget=0.2)
+    assert result['algorithm'] == 'local_search'
+
+
+class TestOptimizeRouteAPI(BaseTestCase):
+    """测试 /api/dispatch/optimize_route 的 local_search 模式"""
+
+    def test_local_search_mode(self, client, app):
+        user = User(username='testuser', email='logistics@route.test', role='logistics')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+        rng = random.Random(9)
+        destinations = [
+            {'name': f'药店{i}', 'location': f'{121.3 + rng.random() * 0.3:.5f},{31.1 + rng.random() * 0.2:.5f}'}
+            for i in range(20)
+        ]
+        headers = self.get_auth_headers(self.login_user(client))
+
+        greedy = self.assert_success_response(client.post('/api/dispatch/optimize_route', headers=headers, json={
+            'start': '121.47,31.23', 'destinations': destinations
+        }))
+        improved = self.assert_success_response(client.post('/api/dispatch/optimize_route', headers=headers, json={
+            'start': '121.47,31.23', 'destinations': destinations,
+            'algorithm': 'local_search', 'time_budget': 2
+        }))
+
+        assert improved['algorithm'] == 'local_search'
+        assert improved['iterations'] > 0
+        assert improved['total_distance'] <= greedy['total_distance']
+        assert sorted(d['name'] for d in improved['route']) == sorted(d['name'] for d in destinations)
+
+        response = client.post('/api/dispatch/optimize_route', headers=headers, json={
+            'start': '121.47,31.23', 'destinations': destinations, 'time_budget': 'abc'
+        })
+        assert response.status_code == 400
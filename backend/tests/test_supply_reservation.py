@@ -0,0 +1,137 @@
+"""
+供应信息库存原子预占测试
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from db_utils import is_database_busy, retry_on_busy
+from extensions import db
+from models import SupplyInfo, User
+from supply_utils import update_supply_info_quantity
+from tests.base import BaseTestCase, make_drug, make_tenant
+
+
+def _seed_supply(stock):
+    supplier = make_tenant('SP', 'SUPPLIER')
+    drug = make_drug('H-RSV-001', '头孢克肟', '头孢克肟片')
+    db.session.add_all([supplier, drug])
+    db.session.flush()
+    supply = SupplyInfo(tenant_id=supplier.id, drug_id=drug.id, available_quantity=stock,
+                        unit_price=8.0, valid_until=date(2027, 1, 1), min_order_quantity=1)
+    db.session.add(supply)
+    db.session.commit()
+    return supply
+
+
+def _busy_error():
+    return OperationalError('UPDATE supply_info ...', {}, Exception('database is locked'))
+
+
+class TestSupplyReservation(BaseTestCase):
+    """测试条件 UPDATE 预占、上下架状态与下单接口"""
+
+    @pytest.fixture
+    def supply(self, app):
+        return _seed_supply(5)
+
+    def test_reserve_and_restore(self, app, supply):
+        args = (supply.tenant_id, supply.drug_id)
+        assert update_supply_info_quantity(*args, -3, supply_info_id=supply.id) is supply
+        assert supply.available_quantity == 2 and supply.status == 'ACTIVE'
+
+        # 数量不足时不扣减
+        assert update_supply_info_quantity(*args, -3, supply_info_id=supply.id) is None
+        assert supply.available_quantity == 2
+
+        update_supply_info_quantity(*args, -2, supply_info_id=supply.id)
+        assert (supply.available_quantity, supply.status) == (0, 'INACTIVE')
+        update_supply_info_quantity(*args, 4, supply_info_id=supply.id)
+        assert (supply.available_quantity, supply.status) == (4, 'ACTIVE')
+        db.session.commit()
+        assert db.session.get(SupplyInfo, supply.id).available_quantity == 4
+
+    def test_create_order_rejects_oversell(self, client, supply):
+        pharmacy = make_tenant('PH', 'PHARMACY')
+        db.session.add(pharmacy)
+        db.session.flush()
+        user = User(username='testuser', email='buyer@reserve.test', role='pharmacy', tenant_id=pharmacy.id)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        headers = self.get_auth_headers(self.login_user(client))
+
+        response = client.post('/api/orders', headers=headers, json={'supply_info_id': supply.id, 'quantity': 4})
+        assert response.status_code == 201, response.get_json()
+
+        # 另一个请求在检查后、扣减前把库存用掉：条件 UPDATE 不会扣成负数
+        SupplyInfo.query.filter_by(id=supply.id).update({SupplyInfo.available_quantity: 1})
+        db.session.commit()
+        response = client.post('/api/orders', headers=headers, json={'supply_info_id': supply.id, 'quantity': 1})
+        assert response.status_code == 201
+        response = client.post('/api/orders', headers=headers, json={'supply_info_id': supply.id, 'quantity': 1})
+        assert response.status_code == 400
+        assert db.session.get(SupplyInfo, supply.id).available_quantity == 0
+
+
+def test_retry_on_busy(app):
+    calls = []
+
+    def failing(times, error):
+        def work():
+            calls.append(1)
+            if len(calls) <= times:
+                raise error
+            return 'done'
+        return work
+
+    assert retry_on_busy(failing(2, _busy_error()), attempts=5, delay=0) == 'done'
+    assert len(calls) == 3
+
+    calls.clear()
+    with pytest.raises(OperationalError):
+        retry_on_busy(failing(5, _busy_error()), attempts=2, delay=0)
+    assert len(calls) == 2
+
+    # 其他数据库错误不重试
+    other = OperationalError('SELECT 1', {}, Exception('no such table: orders'))
+    assert not is_database_busy(other)
+    calls.clear()
+    with pytest.raises(OperationalError):
+        retry_on_busy(failing(5, other), attempts=5, delay=0)
+    assert len(calls) == 1
+
+
+def test_concurrent_reservations_do_not_oversell(tmp_path):
+    # 内存数据库不能跨连接共享，并发测试使用临时文件数据库
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "reserve.db"}', TESTING=True)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        supply = _seed_supply(50)
+        supply_id, tenant_id, drug_id = supply.id, supply.tenant_id, supply.drug_id
+        db.session.remove()
+
+    def reserve(_):
+        with app.app_context():
+            def work():
+                reserved = update_supply_info_quantity(tenant_id, drug_id, -1, supply_info_id=supply_id)
+                db.session.commit()
+                return reserved is not None
+            try:
+                return retry_on_busy(work, attempts=20, delay=0.01)
+            finally:
+                db.session.remove()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(reserve, range(80)))
+
+    assert results.count(True) == 50
+    with app.app_context():
+        assert db.session.get(SupplyInfo, supply_id).available_quantity == 0
+        db.session.remove()
+        db.engine.dispose()
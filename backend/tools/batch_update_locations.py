@@ -4,24 +4,24 @@
 """
 import sys
 import os
-import time
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
 from models import Tenant
-from amap import AmapService
+from batch_geocoder import BatchGeocoder, batch_geocode_tenants
 from extensions import db
 
 
-def update_tenant_locations(tenant_type=None, force_update=False, delay=0.5):
+def update_tenant_locations(tenant_type=None, force_update=False, qps=3, concurrency=4):
     """
     批量更新租户位置坐标
     
     Args:
         tenant_type: 租户类型过滤（PHARMACY, SUPPLIER, LOGISTICS），None 表示全部
         force_update: 是否强制更新已有坐标的租户
-        delay: 每次 API 调用之间的延迟（秒），避免超出配额
+        qps: 每秒最多发起的 API 请求数，应与高德配额一致
+        concurrency: 并发请求数
     """
     app = create_app()
     
@@ -60,50 +60,30 @@ def update_tenant_locations(tenant_type=None, force_update=False, delay=0.5):
             return
         
         # 开始更新
-        success_count = 0
-        failed_count = 0
-        skipped_count = 0
+        skipped = [t for t in tenants if not t.address or t.address.strip() == '']
+        to_geocode = [t for t in tenants if t.address and t.address.strip() != '']
+        skipped_count = len(skipped)
         
         print("\n开始更新...\n")
         print("="*80)
         
-        for i, tenant in enumerate(tenants, 1):
-            print(f"\n[{i}/{len(tenants)}] 处理: {tenant.name}")
-            print(f"  类型: {tenant.type}")
-            print(f"  地址: {tenant.address}")
-            
-            # 检查是否有地址
-            if not tenant.address or tenant.address.strip() == '':
-                print(f"  ✗ 跳过：缺少地址信息")
-                skipped_count += 1
-                continue
-            
-            try:
-                # 调用地理编码 API
-                print(f"  正在获取坐标...")
-                result = AmapService.geocode_address(tenant.address)
-                
-                if result:
-                    tenant.longitude = result['longitude']
-                    tenant.latitude = result['latitude']
-                    
-                    print(f"  ✓ 成功获取坐标:")
-                    print(f"    经度: {result['longitude']}")
-                    print(f"    纬度: {result['latitude']}")
-                    print(f"    详细地址: {result.get('formatted_address', 'N/A')}")
-                    
-                    success_count += 1
-                else:
-                    print(f"  ✗ 失败：无法解析地址")
-                    failed_count += 1
-                
-                # 延迟，避免API频率限制
-                if delay > 0 and i < len(tenants):
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                print(f"  ✗ 错误: {str(e)}")
-                failed_count += 1
+        for tenant in skipped:
+            print(f"  ✗ 跳过：{tenant.name} 缺少地址信息")
+        
+        # 并发批量地理编码：连接池复用 + 令牌桶限流 + 失败重试，坐标批量写回
+        with BatchGeocoder.from_app(qps=qps, concurrency=concurrency) as geocoder:
+            report = batch_geocode_tenants(to_geocode, geocoder=geocoder)
+        
+        for i, tenant in enumerate(to_geocode, 1):
+            result = report['results'].get(tenant.id)
+            if result:
+                print(f"[{i}/{len(to_geocode)}] ✓ {tenant.name}: "
+                      f"({result['longitude']}, {result['latitude']}) {result.get('formatted_address', '')}")
+            else:
+                print(f"[{i}/{len(to_geocode)}] ✗ {tenant.name}: 无法解析地址")
+        
+        success_count = report['updated']
+        failed_count = report['failed']
         
         # 提交更改
         print("\n" + "="*80)
@@ -125,6 +105,8 @@ def update_tenant_locations(tenant_type=None, force_update=False, delay=0.5):
         print(f"失败: {failed_count}")
         print(f"跳过: {skipped_count}")
         print(f"总计: {len(tenants)}")
+        print(f"缓存命中: {report['cache_hits']}，远程调用: {report['remote_calls']}，"
+              f"重试: {report['retries']}，耗时: {report['elapsed']}s")
         print("="*80)
 
 
@@ -173,8 +155,10 @@ def main():
     parser.add_argument('--type', choices=['PHARMACY', 'SUPPLIER', 'LOGISTICS', 'REGULATOR'],
                        help='指定要更新的租户类型')
     parser.add_argument('--force', action='store_true', help='强制更新已有坐标的租户')
-    parser.add_argument('--delay', type=float, default=0.5,
-                       help='每次API调用之间的延迟（秒），默认0.5秒')
+    parser.add_argument('--qps', type=float, default=3,
+                       help='每秒最多发起的API请求数（与高德配额一致），默认3')
+    parser.add_argument('--concurrency', type=int, default=4,
+                       help='并发请求数，默认4')
     
     args = parser.parse_args()
     
@@ -184,7 +168,8 @@ def main():
         update_tenant_locations(
             tenant_type=args.type,
             force_update=args.force,
-            delay=args.delay
+            qps=args.qps,
+            concurrency=args.concurrency
         )
 
 
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+校验订单合计列（orders.total_amount / total_quantity / item_count）与订单明细是否一致
+
+正常写入由会话事件同步维护；直接改库、批量导入明细后运行本工具检查，
+加 --fix 把不一致的订单按明细重新写入。
+
+用法：
+  cd backend
+  python tools/check_order_totals.py [--fix]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# 确保项目根路径在 sys.path 中
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app import create_app
+from extensions import db
+from models import Order
+from order_utils import find_stale_order_totals, write_order_totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='校验订单合计列与订单明细是否一致')
+    parser.add_argument('--fix', action='store_true', help='按明细修正不一致的订单')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        order_ids = [order_id for order_id, in db.session.query(Order.id).order_by(Order.id)]
+        stale = find_stale_order_totals(order_ids)
+        for order_id, (amount, quantity, count) in sorted(stale.items())[:20]:
+            print(f'  订单 {order_id}: 应为 金额 {amount} / 数量 {quantity} / 明细 {count}')
+
+        if not stale:
+            print(f'✓ 已检查 {len(order_ids)} 个订单，合计全部一致')
+            return 0
+        if not args.fix:
+            print(f'✗ {len(stale)} / {len(order_ids)} 个订单合计与明细不一致，使用 --fix 修正')
+            return 1
+        write_order_totals(stale)
+        db.session.commit()
+        print(f'✓ 已修正 {len(stale)} 个订单的合计')
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -23,6 +23,7 @@ try:
     from app import create_app
     from extensions import db
     from models import Order, CirculationRecord, Tenant, User
+    from circulation_rollup import rebuild_rollups
 except Exception as e:
     print('导入应用失败，请在 backend 目录下运行本脚本，且确保已安装依赖。错误：', e)
     raise
@@ -231,6 +232,10 @@ def main():
         # 最终提交
         db.session.commit()
         
+        # 直接写入的记录不经过上报接口，需要重建看板汇总
+        rebuild_rollups()
+        db.session.commit()
+        
         print('\n' + '=' * 60)
         print(f'✓ 流通记录生成完成！')
         print(f'  总订单数: {len(orders)}')
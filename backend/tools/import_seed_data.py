@@ -22,6 +22,7 @@ if str(BACKEND_DIR) not in sys.path:
 from app import create_app  # noqa
 from extensions import db
 from models import Drug, InventoryItem, Tenant  # noqa
+from inventory_warning_engine import rebuild_warning_states  # noqa
 
 
 def parse_datetime(value: str) -> datetime:
@@ -110,6 +111,10 @@ def main(argv: Iterable[str] = None):
             count = import_file(json_path, config['model'], config['casters'])
             print(f'Imported {count} rows from {json_path.name}')
 
+        # 批量导入绕过了库存预警引擎，按导入后的库存重建预警状态
+        rebuild_warning_states()
+        db.session.commit()
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+下单库存预占压测：并发向同一条供应信息下单，检查不超卖并统计吞吐量
+
+在临时 SQLite 文件数据库中准备一条供应信息（可供数量 --stock）与若干药店用户，
+用 --workers 个线程（各自的数据库连接）通过 POST /api/orders 发起 --orders 笔订单。
+结束后核对：成功订单的数量合计 + 剩余可供数量 == 初始可供数量，且剩余数量不为负。
+
+用法：
+  cd backend
+  python tools/load_test_order_reservation.py --orders 300 --workers 16 --stock 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+# 确保项目根路径在 sys.path 中
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='并发下单库存预占压测')
+    parser.add_argument('--orders', type=int, default=300, help='下单请求总数')
+    parser.add_argument('--workers', type=int, default=16, help='并发线程数')
+    parser.add_argument('--stock', type=int, default=100, help='供应信息初始可供数量')
+    parser.add_argument('--quantity', type=int, default=1, help='每笔订单的订购数量')
+    parser.add_argument('--buyers', type=int, default=8, help='下单的药店用户数')
+    parser.add_argument('--db', help='SQLite 数据库文件（默认使用临时文件，结束后删除）')
+    return parser.parse_args()
+
+
+def seed(db, buyers, stock):
+    from models import Drug, SupplyInfo, Tenant, User
+
+    def tenant(code, tenant_type):
+        return Tenant(
+            name=f'压测{tenant_type}-{code}',
+            type=tenant_type,
+            unified_social_credit_code=f'LOAD-{code}',
+            legal_representative='负责人',
+            contact_person='联系人',
+            contact_phone='13800000000',
+            contact_email=f'{code}@load.test',
+            address=f'上海市压测路{code}号',
+            business_scope='压测'
+        )
+
+    supplier = tenant('SP', 'SUPPLIER')
+    pharmacies = [tenant(f'PH{i}', 'PHARMACY') for i in range(buyers)]
+    drug = Drug(generic_name='阿莫西林', brand_name='阿莫西林胶囊', approval_number='H-LOAD-001',
+                dosage_form='胶囊', specification='0.25g*24粒', manufacturer='压测制药厂',
+                category='抗生素', prescription_type='处方药')
+    db.session.add_all([supplier, drug] + pharmacies)
+    db.session.flush()
+
+    users = []
+    for i, pharmacy in enumerate(pharmacies):
+        user = User(username=f'load_buyer_{i}', email=f'buyer{i}@load.test', role='pharmacy',
+                    tenant_id=pharmacy.id, is_authenticated=True)
+        user.set_password('LoadTest123')
+        users.append(user)
+    supply = SupplyInfo(tenant_id=supplier.id, drug_id=drug.id, available_quantity=stock,
+                        unit_price=12.5, valid_until=date.today() + timedelta(days=365),
+                        min_order_quantity=1, status='ACTIVE')
+    db.session.add_all(users + [supply])
+    db.session.commit()
+    return supply.id, [user.username for user in users]
+
+
+def main():
+    args = parse_args()
+    db_path = args.db or tempfile.mkstemp(suffix='.db', prefix='order_load_')[1]
+    # 必须在导入 app 之前设置，配置类在导入时读取 DATABASE_URL
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ.setdefault('FLASK_ENV', 'development')
+
+    from app import create_app
+    from extensions import db
+    from models import Order, SupplyInfo
+
+    app = create_app()
+    app.logger.setLevel('ERROR')
+    try:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            supply_id, usernames = seed(db, args.buyers, args.stock)
+
+        client = app.test_client()
+        tokens = []
+        for username in usernames:
+            response = client.post('/api/auth/login', json={'username': username, 'password': 'LoadTest123'})
+            tokens.append(response.get_json()['access_token'])
+
+        def place(index):
+            headers = {'Authorization': f'Bearer {tokens[index % len(tokens)]}'}
+            started = time.perf_counter()
+            response = app.test_client().post('/api/orders', headers=headers, json={
+                'supply_info_id': supply_id,
+                'quantity': args.quantity
+            })
+            return response.status_code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(place, range(args.orders)))
+        elapsed = time.perf_counter() - started
+
+        statuses = Counter(status for status, _ in results)
+        latencies = sorted(latency for _, latency in results)
+        with app.app_context():
+            remaining = db.session.get(SupplyInfo, supply_id).available_quantity
+            ordered = sum(order.total_quantity for order in Order.query.filter_by(supply_info_id=supply_id))
+            order_count = Order.query.filter_by(supply_info_id=supply_id).count()
+    finally:
+        if not args.db:
+            os.remove(db_path)
+
+    print(f'请求数 {args.orders}，并发 {args.workers}，初始可供数量 {args.stock}，每单 {args.quantity}')
+    print(f'响应状态: {dict(sorted(statuses.items()))}')
+    print(f'成功订单 {order_count} 笔，订购合计 {ordered}，剩余可供数量 {remaining}')
+    print(f'耗时 {elapsed:.2f}s，吞吐量 {args.orders / elapsed:.1f} 请求/秒，'
+          f'延迟 p50 {statistics.median(latencies) * 1000:.1f}ms / '
+          f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms')
+
+    oversold = remaining < 0 or ordered + remaining != args.stock or statuses[201] != order_count
+    if oversold:
+        print('✗ 库存数量不一致：出现超卖或丢失更新')
+        return 1
+    print('✓ 未超卖')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+重建流通看板的按日汇总（circulation_daily_rollups）
+
+导入历史流通记录、直接改库或调整药店地址后运行。
+
+用法：
+  cd backend
+  python tools/rebuild_circulation_rollups.py                       # 全部重建
+  python tools/rebuild_circulation_rollups.py --days 90             # 只重建最近 90 天
+  python tools/rebuild_circulation_rollups.py --start 2026-01-01 --end 2026-01-31
+"""
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# 确保项目根路径在 sys.path 中
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app import create_app
+from circulation_rollup import rebuild_rollups
+from extensions import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重建流通看板按日汇总')
+    parser.add_argument('--start', type=date.fromisoformat, help='起始日期（含），如 2026-01-01')
+    parser.add_argument('--end', type=date.fromisoformat, help='结束日期（含）')
+    parser.add_argument('--days', type=int, help='只重建最近 N 天（UTC）')
+    args = parser.parse_args()
+
+    start_day, end_day = args.start, args.end
+    if args.days:
+        start_day = datetime.utcnow().date() - timedelta(days=args.days - 1)
+
+    app = create_app()
+    with app.app_context():
+        rows = rebuild_rollups(start_day, end_day)
+        db.session.commit()
+
+    scope = f'{start_day or "最早"} ~ {end_day or "最新"}'
+    print(f'✓ 已重建 {scope} 的流通汇总，共 {rows} 行')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+重建药品搜索索引（drugs_fts 及同步触发器）
+
+直接导入药品数据（绕过触发器）或对 drugs 表做过重建表的迁移后运行。
+
+用法：
+  cd backend
+  python tools/rebuild_drug_search_index.py
+"""
+import sys
+from pathlib import Path
+
+# 确保项目根路径在 sys.path 中
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app import create_app
+from extensions import db
+from drug_search import get_drug_search_index
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        index = get_drug_search_index()
+        rows = index.rebuild()
+        db.session.commit()
+
+    print(f'✓ 已重建药品搜索索引（{index.name}），共 {rows} 个药品')
+
+
+if __name__ == '__main__':
+    main()
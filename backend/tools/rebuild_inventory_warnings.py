@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+重建库存预警状态与企业预警计数（inventory_warning_states / inventory_warning_counters）
+
+导入库存批次、直接改库或调整预警阈值后运行。
+
+用法：
+  cd backend
+  python tools/rebuild_inventory_warnings.py
+"""
+import sys
+from pathlib import Path
+
+# 确保项目根路径在 sys.path 中
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app import create_app
+from extensions import db
+from inventory_warning_engine import rebuild_warning_states
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        rows = rebuild_warning_states()
+        db.session.commit()
+
+    print(f'✓ 已重建库存预警状态，共 {rows} 个批次')
+
+
+if __name__ == '__main__':
+    main()
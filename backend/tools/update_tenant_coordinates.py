@@ -13,7 +13,10 @@ project_root = Path(__file__).resolve().parents[1]
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
+from sqlalchemy import update
+
 from app import create_app
+from batch_geocoder import batch_geocode_tenants
 from extensions import db
 from models import Tenant
 
@@ -46,8 +49,13 @@ COORDINATES = {
     }
 }
 
-def update_coordinates():
-    """更新租户坐标信息"""
+def update_coordinates(geocode_missing=False):
+    """
+    更新租户坐标信息
+    
+    Args:
+        geocode_missing: 是否对不在坐标表中且缺少坐标的租户进行批量地理编码
+    """
     app = create_app()
     
     with app.app_context():
@@ -61,25 +69,42 @@ def update_coordinates():
         # 获取所有租户
         tenants = Tenant.query.all()
         
+        mappings = []
+        missing = []
         for tenant in tenants:
             if tenant.name in COORDINATES:
                 coord_data = COORDINATES[tenant.name]
-                
-                # 更新地址和坐标
-                tenant.address = coord_data['address']
-                tenant.latitude = coord_data['latitude']
-                tenant.longitude = coord_data['longitude']
+                mappings.append({
+                    'id': tenant.id,
+                    'address': coord_data['address'],
+                    'latitude': coord_data['latitude'],
+                    'longitude': coord_data['longitude']
+                })
                 
                 print(f"\n✅ 更新: {tenant.name}")
                 print(f"   类型: {tenant.type}")
-                print(f"   地址: {tenant.address}")
-                print(f"   坐标: ({tenant.latitude}, {tenant.longitude})")
+                print(f"   地址: {coord_data['address']}")
+                print(f"   坐标: ({coord_data['latitude']}, {coord_data['longitude']})")
                 
                 updated_count += 1
+            elif geocode_missing and tenant.address and (tenant.longitude is None or tenant.latitude is None):
+                missing.append(tenant)
             else:
                 print(f"\n⚠️  跳过: {tenant.name} (没有坐标数据)")
                 skipped_count += 1
         
+        # 按主键批量 UPDATE，一条语句写回所有坐标
+        if mappings:
+            db.session.execute(update(Tenant), mappings)
+        
+        if missing:
+            print(f"\n对 {len(missing)} 个缺少坐标的租户进行批量地理编码...")
+            report = batch_geocode_tenants(missing)
+            updated_count += report['updated']
+            skipped_count += report['failed']
+            print(f"   成功: {report['updated']}，失败: {report['failed']}，"
+                  f"缓存命中: {report['cache_hits']}，耗时: {report['elapsed']}s")
+        
         # 提交更改
         try:
             db.session.commit()
@@ -96,5 +121,5 @@ def update_coordinates():
         return True
 
 if __name__ == '__main__':
-    success = update_coordinates()
+    success = update_coordinates(geocode_missing='--geocode' in sys.argv[1:])
     sys.exit(0 if success else 1)
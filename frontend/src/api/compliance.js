@@ -28,27 +28,56 @@ export async function fetchCompliancePreview({ start, end, region } = {}) {
   return data
 }
 
-export async function exportComplianceReport({ start, end, region, format = 'pdf' } = {}) {
+async function readError(res, fallback) {
+  let message = fallback
+  try {
+    const data = await res.json()
+    if (data?.msg) message = data.msg
+  } catch {
+    const text = await res.text()
+    if (text) message = text
+  }
+  return new Error(message)
+}
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+// 提交导出任务后轮询进度，文件生成后再下载；onProgress 收到 0-100 的进度
+export async function exportComplianceReport({ start, end, region, format = 'pdf', onProgress, pollInterval = 1000 } = {}) {
   const token = getToken()
   const headers = {}
   if (token) headers.Authorization = `Bearer ${token}`
 
   const params = buildQuery({ start, end, region, format })
-  const res = await fetch(`${BASE}/report/export${params}`, {
-    method: 'GET',
+  const submitRes = await fetch(`${BASE}/report/exports${params}`, {
+    method: 'POST',
     headers,
   })
+  if (!submitRes.ok) {
+    throw await readError(submitRes, '导出合规分析报告失败')
+  }
+  let job = (await submitRes.json()).data
 
-  if (!res.ok) {
-    let message = '导出合规分析报告失败'
-    try {
-      const data = await res.json()
-      if (data?.msg) message = data.msg
-    } catch {
-      const text = await res.text()
-      if (text) message = text
+  while (job.status !== 'done') {
+    if (job.status === 'failed') {
+      throw new Error(job.error || '导出合规分析报告失败')
     }
-    throw new Error(message)
+    if (onProgress) onProgress(job.progress)
+    await sleep(pollInterval)
+    const statusRes = await fetch(`${BASE}/report/exports/${job.job_id}`, { method: 'GET', headers })
+    if (!statusRes.ok) {
+      throw await readError(statusRes, '查询导出任务失败')
+    }
+    job = (await statusRes.json()).data
+  }
+  if (onProgress) onProgress(100)
+
+  const res = await fetch(`${BASE}/report/exports/${job.job_id}/download`, {
+    method: 'GET',
+    headers,
+  })
+  if (!res.ok) {
+    throw await readError(res, '导出合规分析报告失败')
   }
 
   const blob = await res.blob()
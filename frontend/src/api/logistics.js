@@ -50,7 +50,9 @@ export const logisticsApi = {
    * @param {string} params.status - 订单状态（SHIPPED/IN_TRANSIT/DELIVERED）
    * @param {string} params.start_date - 开始日期（ISO格式）
    * @param {string} params.end_date - 结束日期（ISO格式）
-   * @returns {Promise<AxiosResponse>}
+   * @param {number} params.limit - 每页数量
+   * @param {string} params.cursor - 上一页返回的 next_cursor
+   * @returns {Promise<AxiosResponse>} 一页订单，响应体含 has_more 与 next_cursor
    */
   getOrders: (params = {}) => {
     return apiClient.get('/api/logistics/orders', { params })
@@ -114,7 +114,7 @@ export const orderApi = {
   },
 
   /**
-   * 获取物流公司的订单列表
+   * 获取物流公司的订单列表（一页，响应体含 has_more 与 next_cursor，传 cursor 取下一页）
    */
   getLogisticsOrders: (params = {}) => {
     return apiClient.get('/api/logistics/orders', { params })